@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ConsultantConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "Consultant"
+
+    def ready(self):
+        # 注册信号处理（仪表盘缓存失效）
+        from Consultant import signals  # noqa: F401
@@ -0,0 +1,232 @@
+"""
+冷热数据归档
+已结束且创建时间早于 ARCHIVE_AFTER_DAYS 天的咨询订单、咨询档案（连同其访谈记录）和预约订单，
+由 manage.py archive 分批移入对应的归档表（每批一个事务：复制到归档表后从业务表删除），
+业务表及其索引只保留近期和进行中的数据；列表和详情接口传入 include_archived 时同时查询归档表
+
+- 订单：completed/cancelled/rejected 状态，可先于所属档案归档
+- 档案：completed/closed 状态且业务表中已没有关联订单（否则删除档案会把订单的档案置空），访谈记录随档案一起归档；
+  仍在危机关注名单上（风险等级不低于 CRISIS_WATCH_LEVEL）的档案不归档。归档表没有危机标记，
+  归档档案的 SessionCrisisFlag、CrisisWatch 行随业务表的删除级联删除，不再出现在按标记/等级的查询中
+- 预约订单（管理员端）：已完成状态，按提交时间判断
+归档表只读，归档后的档案不能再新增或修改访谈记录
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from Consultant import crisis
+from Consultant.models import (
+    ArchivedConsultationOrder, ArchivedConsultationRecord, ArchivedConsultationSession,
+    ConsultationOrder, ConsultationRecord, ConsultationSession, CrisisWatch, OrderIndex,
+)
+from CounselorAdmin.models import Appointment, ArchivedAppointment
+
+
+# 可归档的状态
+ORDER_STATUSES = ('completed', 'cancelled', 'rejected')
+RECORD_STATUSES = ('completed', 'closed')
+APPOINTMENT_STATUSES = ('已完成',)
+
+# 按此顺序归档：订单先于档案，档案的订单都归档后档案才能归档
+TABLES = ('orders', 'records', 'appointments')
+
+
+def after_days():
+    return getattr(settings, 'ARCHIVE_AFTER_DAYS', 365)
+
+
+def batch_size():
+    return getattr(settings, 'ARCHIVE_BATCH_SIZE', 500)
+
+
+def cutoff(days=None):
+    """早于该时间创建的已结束数据可以归档"""
+    return timezone.now() - timedelta(days=after_days() if days is None else days)
+
+
+def wants_archived(data):
+    """请求参数 include_archived 是否开启（支持 true/1/"true"/"1"）"""
+    value = data.get('include_archived')
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes')
+    return bool(value)
+
+
+# ==================== 归档 ====================
+
+def eligible_orders(before):
+    return ConsultationOrder.objects.filter(status__in=ORDER_STATUSES, created_time__lt=before)
+
+
+def _closed_records(before):
+    """已结束、较早创建且不在危机关注名单上的档案"""
+    watched = CrisisWatch.objects.filter(record_id=OuterRef('pk'), risk_level__gte=crisis.watch_level())
+    return ConsultationRecord.objects.filter(
+        current_status__in=RECORD_STATUSES,
+        created_time__lt=before,
+    ).exclude(Exists(watched))
+
+
+def eligible_records(before):
+    return _closed_records(before).exclude(Exists(ConsultationOrder.objects.filter(record_id=OuterRef('pk'))))
+
+
+def eligible_appointments(before):
+    return Appointment.objects.filter(status__in=APPOINTMENT_STATUSES, submit_time__lt=before)
+
+
+_ELIGIBLE = {
+    'orders': eligible_orders,
+    'records': eligible_records,
+    'appointments': eligible_appointments,
+}
+
+
+def pending(before, tables=TABLES):
+    """
+    各表待归档的行数（访谈记录按待归档档案统计）
+    同时归档订单时，订单都将被归档的档案也计入
+    """
+    counts = {}
+    for table in tables:
+        queryset = _ELIGIBLE[table](before)
+        if table == 'records' and 'orders' in tables:
+            remaining_orders = ConsultationOrder.objects.filter(record_id=OuterRef('pk')).exclude(
+                status__in=ORDER_STATUSES, created_time__lt=before
+            )
+            queryset = _closed_records(before).exclude(Exists(remaining_orders))
+        counts[table] = queryset.count()
+        if table == 'records':
+            counts['sessions'] = ConsultationSession.objects.filter(record__in=queryset.values('pk')).count()
+    return counts
+
+
+def _copy(model, archive_model, queryset):
+    """将查询集中的行原样（包括主键）写入归档表，返回行数"""
+    names = [field.attname for field in model._meta.concrete_fields]
+    rows = [archive_model(**values) for values in queryset.values(*names)]
+    archive_model.objects.bulk_create(rows)
+    return len(rows)
+
+
+def _move_orders(ids):
+    count = _copy(ConsultationOrder, ArchivedConsultationOrder, ConsultationOrder.objects.filter(id__in=ids))
+    # 先标记订单索引为已归档，删除业务表的行时索引行保留
+    OrderIndex.objects.filter(source='order', source_id__in=ids).update(archived=True)
+    ConsultationOrder.objects.filter(id__in=ids).delete()
+    return {'orders': count}
+
+
+def _move_records(ids):
+    sessions = ConsultationSession.objects.filter(record_id__in=ids)
+    session_count = _copy(ConsultationSession, ArchivedConsultationSession, sessions)
+    sessions.delete()
+    count = _copy(ConsultationRecord, ArchivedConsultationRecord, ConsultationRecord.objects.filter(id__in=ids))
+    ConsultationRecord.objects.filter(id__in=ids).delete()
+    return {'records': count, 'sessions': session_count}
+
+
+def _move_appointments(ids):
+    count = _copy(Appointment, ArchivedAppointment, Appointment.objects.filter(id__in=ids))
+    OrderIndex.objects.filter(source='appointment', source_id__in=ids).update(archived=True)
+    Appointment.objects.filter(id__in=ids).delete()
+    return {'appointments': count}
+
+
+_MOVE = {
+    'orders': _move_orders,
+    'records': _move_records,
+    'appointments': _move_appointments,
+}
+
+
+def archive_batches(table, before, size=None):
+    """
+    分批归档一张表，每批在一个事务中完成，每完成一批 yield {表名: 移动行数}
+    批次之间不持有锁，归档期间业务接口可以正常读写
+    """
+    size = size or batch_size()
+    while True:
+        with transaction.atomic():
+            ids = list(
+                _ELIGIBLE[table](before).select_for_update().order_by('pk').values_list('pk', flat=True)[:size]
+            )
+            if not ids:
+                return
+            counts = _MOVE[table](ids)
+        yield counts
+
+
+# ==================== 查询 ====================
+
+def get_record(include_archived, **lookups):
+    """查找咨询档案，业务表中不存在且 include_archived 时查找归档表；都不存在时抛出 ConsultationRecord.DoesNotExist"""
+    try:
+        return ConsultationRecord.objects.get(**lookups)
+    except ConsultationRecord.DoesNotExist:
+        if not include_archived:
+            raise
+        record = ArchivedConsultationRecord.objects.filter(**lookups).first()
+        if record is None:
+            raise
+        return record
+
+
+def archived_orders(order_ids):
+    """
+    批量查找已归档的订单 {订单ID: 订单}，关联档案（业务表或归档表）一并批量取出，
+    访问 order.record 不再逐条查询
+    """
+    orders = ArchivedConsultationOrder.objects.in_bulk(set(order_ids) - {None})
+    record_ids = {order.record_id for order in orders.values()} - {None}
+    records = ConsultationRecord.objects.in_bulk(record_ids)
+    missing = record_ids - set(records)
+    if missing:
+        records.update(ArchivedConsultationRecord.objects.in_bulk(missing))
+    for order in orders.values():
+        order._record = records.get(order.record_id)
+    return orders
+
+
+def archived_order_record_q(**lookups):
+    """归档订单按关联档案筛选的条件（档案可能在业务表或归档表中），如 archived_order_record_q(client_name__icontains='张')"""
+    return (
+        Q(record_id__in=ConsultationRecord.objects.filter(**lookups).values('id'))
+        | Q(record_id__in=ArchivedConsultationRecord.objects.filter(**lookups).values('id'))
+    )
+
+
+def paginate(queryset, archived_queryset, start, end, order_by=None):
+    """
+    业务表和归档表合并分页，返回 (总数, 当前页对象列表)
+    order_by 为排序字段（如 '-created_time'），两边各取前 end 条的排序键合并后取当前页，再按ID取出对象；
+    未指定时业务表在前、归档表在后
+    """
+    hot_total = queryset.count()
+    total = hot_total + archived_queryset.count()
+
+    if order_by is None:
+        items = list(queryset[start:end]) if start < hot_total else []
+        if end > hot_total:
+            items += list(archived_queryset[max(start - hot_total, 0):end - hot_total])
+        return total, items
+
+    field = order_by.lstrip('-')
+    descending = order_by.startswith('-')
+    pk_order = '-pk' if descending else 'pk'
+    keys = []
+    for source, qs in enumerate((queryset, archived_queryset)):
+        for pk, value in qs.order_by(order_by, pk_order).values_list('pk', field)[:end]:
+            keys.append((value, pk, source))
+    keys.sort(key=lambda key: (key[0], key[1]), reverse=descending)
+    page = keys[start:end]
+
+    objects = [
+        queryset.in_bulk([pk for _, pk, source in page if source == 0]),
+        archived_queryset.in_bulk([pk for _, pk, source in page if source == 1]),
+    ]
+    return total, [objects[source][pk] for _, pk, source in page]
@@ -0,0 +1,295 @@
+"""
+咨询师每日可预约时段位图
+排班分散在两张表中：管理员端 Schedule（每个开始/结束时间段一行）和咨询师端 CounselorSchedule（每天一行，time_slots 为
+时间段数组，元素为 "09:00-12:00" 字符串或 {"start", "end", "available"} 对象），另有周期排班规则 ScheduleRule
+（咨询师当天没有 Schedule 记录时按规则展开，见 CounselorAdmin/schedule_rules.py），停诊记录在 Cancellation 中。
+这里把它们合并为每个 (咨询师, 日期) 一行的 CounselorAvailability：一天按 SLOT_MINUTES 分钟划分为 SLOTS_PER_DAY 个时段，
+第 i 位表示 [i * SLOT_MINUTES, (i + 1) * SLOT_MINUTES) 分钟区间：
+
+- scheduled：排班完整覆盖的时段
+- available：scheduled 去掉与停诊时间有重叠的时段
+
+排班或停诊保存、删除时由信号重算受影响的日期，批量导入后调用 refresh_many()。
+查询时把多个咨询师、多个日期的位图取成一个 NumPy 矩阵，按位与判断时间窗口是否空闲，按行/列做与（每天都空闲）、
+或（任一天空闲）运算，一次查询回答整个咨询师团队在一段日期内的空闲情况
+"""
+import json
+from datetime import date, datetime, time, timedelta
+
+from django.db import transaction
+
+from Consultant.models import CounselorAvailability, CounselorSchedule
+from Consultant.timeslots import parse_time_slot
+from CounselorAdmin import schedule_rules
+from CounselorAdmin.models import Cancellation, Schedule, ScheduleRule
+
+
+# 时段长度固定为30分钟：一天48位，可以存入64位整数列（修改后需执行 manage.py rebuild_availability）
+SLOT_MINUTES = 30
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+FULL_DAY = (1 << SLOTS_PER_DAY) - 1
+
+
+# ==================== 位运算 ====================
+
+def covering_bits(start, end):
+    """[start, end) 分钟区间完整覆盖的时段（排班只计入完整的时段）"""
+    first = -(-max(start, 0) // SLOT_MINUTES)
+    last = min(end, 24 * 60) // SLOT_MINUTES
+    return ((1 << (last - first)) - 1) << first if last > first else 0
+
+
+def touching_bits(start, end):
+    """与 [start, end) 分钟区间有重叠的时段（停诊和查询的时间窗口按重叠计）"""
+    first = max(start, 0) // SLOT_MINUTES
+    last = -(-min(end, 24 * 60) // SLOT_MINUTES)
+    return ((1 << (last - first)) - 1) << first if last > first else 0
+
+
+def slot_ranges(bits):
+    """位图 -> 连续空闲区间的分钟数列表 [(开始, 结束)]"""
+    ranges = []
+    start = None
+    for index in range(SLOTS_PER_DAY + 1):
+        if index < SLOTS_PER_DAY and bits >> index & 1:
+            if start is None:
+                start = index * SLOT_MINUTES
+        elif start is not None:
+            ranges.append((start, index * SLOT_MINUTES))
+            start = None
+    return ranges
+
+
+def _minute(value):
+    return value.hour * 60 + value.minute
+
+
+def parse_time_slots(value):
+    """咨询师端排班的 time_slots -> [(开始分钟数, 结束分钟数)]，跳过无法解析和 available 为 false 的时间段"""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            value = value.split(',')
+    if not isinstance(value, (list, tuple)):
+        value = [value] if value else []
+    ranges = []
+    for item in value:
+        if isinstance(item, dict):
+            if item.get('available') is False:
+                continue
+            start, _ = parse_time_slot(str(item.get('start') or ''))
+            end, _ = parse_time_slot(str(item.get('end') or ''))
+        else:
+            start, end = parse_time_slot(str(item))
+        if start is not None and end is not None and start < end:
+            ranges.append((start, end))
+    return ranges
+
+
+def build(schedule_ranges, cancellations):
+    """
+    由排班时间段和停诊计算位图
+    schedule_ranges: [(咨询师ID, 日期, 开始分钟数, 结束分钟数)]；cancellations: [(咨询师ID, 开始时间, 结束时间)]
+    返回 {(咨询师ID, 日期): (scheduled, available)}
+    """
+    scheduled = {}
+    for counselor_id, day, start, end in schedule_ranges:
+        key = (counselor_id, day)
+        scheduled[key] = scheduled.get(key, 0) | covering_bits(start, end)
+
+    blocked = {}
+    for counselor_id, cancel_start, cancel_end in cancellations:
+        day = cancel_start.date()
+        while day <= cancel_end.date():
+            start = _minute(cancel_start) if day == cancel_start.date() else 0
+            end = _minute(cancel_end) if day == cancel_end.date() else 24 * 60
+            key = (counselor_id, day)
+            if key in scheduled:
+                blocked[key] = blocked.get(key, 0) | touching_bits(start, end)
+            day += timedelta(days=1)
+
+    return {key: (bits, bits & ~blocked.get(key, 0)) for key, bits in scheduled.items() if bits}
+
+
+def collect(schedule_model, counselor_schedule_model, cancellation_model, counselor_ids=None, start=None, end=None,
+            rule_model=None):
+    """
+    从排班表和停诊表读取并计算位图（模型由调用方传入，迁移中使用历史模型）
+    counselor_ids 为None时不限咨询师，start/end 为None时不限日期；
+    传入 rule_model 时加上周期排班规则展开的排班，end 为None时展开到 schedule_rules.horizon_end()
+    """
+    schedules = schedule_model.objects.all()
+    counselor_schedules = counselor_schedule_model.objects.all()
+    cancellations = cancellation_model.objects.all()
+    if counselor_ids is not None:
+        schedules = schedules.filter(counselor_id__in=counselor_ids)
+        counselor_schedules = counselor_schedules.filter(counselor_id__in=counselor_ids)
+        cancellations = cancellations.filter(counselor_id__in=counselor_ids)
+    if start is not None:
+        schedules = schedules.filter(work_date__gte=start)
+        counselor_schedules = counselor_schedules.filter(schedule_date__gte=start)
+        cancellations = cancellations.filter(cancel_end__gt=datetime.combine(start, time.min))
+    if end is not None:
+        schedules = schedules.filter(work_date__lte=end)
+        counselor_schedules = counselor_schedules.filter(schedule_date__lte=end)
+        cancellations = cancellations.filter(cancel_start__lt=datetime.combine(end + timedelta(days=1), time.min))
+
+    ranges = [
+        (counselor_id, day, _minute(start_time), _minute(end_time))
+        for counselor_id, day, start_time, end_time in schedules.values_list(
+            'counselor_id', 'work_date', 'start_time', 'end_time'
+        )
+    ]
+    if rule_model is not None:
+        # 咨询师当天有 Schedule 记录时以记录为准，不再取规则
+        explicit = {(counselor_id, day) for counselor_id, day, _, _ in ranges}
+        rule_start = start or date.min
+        rule_end = end or schedule_rules.horizon_end()
+        rows = schedule_rules.rule_rows(rule_model.objects.all(), rule_start, rule_end, counselor_ids)
+        ranges.extend(
+            (counselor_id, day, _minute(start_time), _minute(end_time))
+            for counselor_id, day, start_time, end_time in schedule_rules.expand_rows(rows, rule_start, rule_end)
+            if (counselor_id, day) not in explicit
+        )
+    for counselor_id, day, time_slots in counselor_schedules.values_list('counselor_id', 'schedule_date', 'time_slots'):
+        ranges.extend((counselor_id, day, slot_start, slot_end) for slot_start, slot_end in parse_time_slots(time_slots))
+
+    # 只计算排班日期范围内的停诊（跨多天的停诊不逐日展开到范围之外）
+    rows = []
+    for counselor_id, cancel_start, cancel_end in cancellations.values_list('counselor_id', 'cancel_start', 'cancel_end'):
+        if start is not None:
+            cancel_start = max(cancel_start, datetime.combine(start, time.min))
+        if end is not None:
+            cancel_end = min(cancel_end, datetime.combine(end, time.max))
+        rows.append((counselor_id, cancel_start, cancel_end))
+    return build(ranges, rows)
+
+
+# ==================== 同步 ====================
+
+@transaction.atomic
+def refresh(counselor_id, start, end=None):
+    """重算咨询师 [start, end] 日期范围内每天的位图（end 为None时只重算 start 当天）"""
+    end = end or start
+    bitmaps = collect(Schedule, CounselorSchedule, Cancellation, [counselor_id], start, end, ScheduleRule)
+    CounselorAvailability.objects.filter(counselor_id=counselor_id, day__gte=start, day__lte=end).delete()
+    CounselorAvailability.objects.bulk_create([
+        CounselorAvailability(counselor_id=counselor_id, day=day, scheduled=scheduled, available=available)
+        for (_, day), (scheduled, available) in bitmaps.items()
+    ])
+
+
+def refresh_many(pairs):
+    """批量导入排班后重算 {(咨询师ID, 日期)}，每个咨询师按最早到最晚日期重算一次"""
+    ranges = {}
+    for counselor_id, day in pairs:
+        first, last = ranges.get(counselor_id, (day, day))
+        ranges[counselor_id] = (min(first, day), max(last, day))
+    for counselor_id, (first, last) in ranges.items():
+        refresh(counselor_id, first, last)
+
+
+def refresh_cancellation(counselor_id, cancel_start, cancel_end):
+    """停诊新增、修改、删除后重算其覆盖的日期"""
+    if counselor_id and cancel_start and cancel_end:
+        refresh(counselor_id, cancel_start.date(), cancel_end.date())
+
+
+def refresh_rule(counselor_id, start_date, end_date):
+    """周期排班规则新增、修改、删除后重算其生效的日期（长期有效或超出展开范围的部分只算到 schedule_rules.horizon_end()）"""
+    last = schedule_rules.horizon_end()
+    last = min(end_date, last) if end_date else last
+    if counselor_id and start_date and start_date <= last:
+        refresh(counselor_id, start_date, last)
+
+
+def previous_rule(rule):
+    """规则修改前的 (咨询师ID, 生效日期, 失效日期)，新规则返回None"""
+    if rule.pk is None:
+        return None
+    return ScheduleRule.objects.filter(pk=rule.pk).values_list('counselor_id', 'start_date', 'end_date').first()
+
+
+def previous_cancellation(cancellation):
+    """停诊修改前的 (咨询师ID, 开始时间, 结束时间)，新停诊返回None"""
+    if cancellation.pk is None:
+        return None
+    return Cancellation.objects.filter(pk=cancellation.pk).values_list('counselor_id', 'cancel_start', 'cancel_end').first()
+
+
+@transaction.atomic
+def rebuild(counselor_ids=None):
+    """从排班表和停诊表重建位图（counselor_ids 为None时重建全部），返回行数"""
+    rows = CounselorAvailability.objects.all()
+    if counselor_ids is not None:
+        rows = rows.filter(counselor_id__in=counselor_ids)
+    rows.delete()
+    bitmaps = collect(Schedule, CounselorSchedule, Cancellation, counselor_ids, rule_model=ScheduleRule)
+    CounselorAvailability.objects.bulk_create([
+        CounselorAvailability(counselor_id=counselor_id, day=day, scheduled=scheduled, available=available)
+        for (counselor_id, day), (scheduled, available) in bitmaps.items()
+    ], batch_size=1000)
+    return len(bitmaps)
+
+
+# ==================== 查询 ====================
+
+def dates_between(start, end, weekdays=None):
+    """[start, end] 内的日期列表，weekdays 为星期几（1-7，周一为1）的集合时只保留这些日期"""
+    days = []
+    day = start
+    while day <= end:
+        if not weekdays or day.isoweekday() in weekdays:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def matrix(days, counselor_ids=None):
+    """
+    取出位图矩阵，返回 (咨询师ID数组, 矩阵)，矩阵形状为 (咨询师数, 日期数)，没有排班的日期为0
+    counselor_ids 为None时包含在这些日期有排班的所有咨询师
+    长期有效的规则只展开到 schedule_rules.horizon_end()，之后的日期没有完整的位图行，按排班、规则和停诊即时计算
+    """
+    import numpy as np  # 只有可用时段查询使用，首次调用时才加载numpy
+
+    horizon = schedule_rules.horizon_end()
+    stored = [day for day in days if day <= horizon]
+    queryset = CounselorAvailability.objects.filter(day__in=stored)
+    if counselor_ids is not None:
+        queryset = queryset.filter(counselor_id__in=counselor_ids)
+    rows = list(queryset.values_list('counselor_id', 'day', 'available'))
+    late = [day for day in days if day > horizon]
+    if late:
+        late_days = set(late)
+        bitmaps = collect(Schedule, CounselorSchedule, Cancellation, counselor_ids, late[0], late[-1], ScheduleRule)
+        rows.extend(
+            (counselor_id, day, available)
+            for (counselor_id, day), (_, available) in bitmaps.items() if day in late_days
+        )
+
+    if counselor_ids is None:
+        counselor_ids = sorted({row[0] for row in rows})
+    ids = np.asarray(counselor_ids, dtype=np.int64)
+    result = np.zeros((len(ids), len(days)), dtype=np.int64)
+    if rows:
+        column = {day: index for index, day in enumerate(days)}
+        row_ids, row_days, bits = zip(*rows)
+        order = np.argsort(ids)
+        rows_index = order[np.searchsorted(ids, np.asarray(row_ids, dtype=np.int64), sorter=order)]
+        result[rows_index, [column[day] for day in row_days]] = np.asarray(bits, dtype=np.int64)
+    return ids, result
+
+
+def free(bitmaps, start, end):
+    """位图矩阵中 [start, end) 分钟窗口完全空闲的位置（布尔矩阵）"""
+    mask = touching_bits(start, end)
+    return (bitmaps & mask) == mask
+
+
+def parse_date(value):
+    """'YYYY-MM-DD' -> date，已是 date 时原样返回"""
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value).strip(), '%Y-%m-%d').date()
@@ -0,0 +1,124 @@
+"""
+访谈编号分配与访谈计数
+ConsultationRecord.interview_count 为档案已分配的最大访谈编号（即访谈次数），新访谈的编号由一条条件UPDATE原子分配：
+
+    UPDATE consultation_records SET interview_count = interview_count + n WHERE id = ... RETURNING interview_count
+
+并发请求各自得到互不重叠的编号，不需要先查询最大编号；批量导入时一次为同一档案预留 n 个连续编号
+CounselorProfile.consultation_count 为咨询师名下档案（含已归档档案）的访谈总数，在同一事务中随访谈创建/删除增减
+
+调用方需在 transaction.atomic() 中分配编号并创建访谈，创建失败时编号和计数随事务回滚
+计数出现偏差时（如直接修改数据库）可用 manage.py reconcile_counters 检查和修正
+"""
+from django.db import connection, transaction
+from django.db.models import Count, F, Max
+from django.db.models.functions import Coalesce
+
+from Consultant import read_model
+from Consultant.models import ArchivedConsultationSession, ConsultationRecord, ConsultationSession, CounselorProfile
+
+
+# 咨询师详情中可由接口修改的字段，保存已有详情时作为 update_fields，不写回 consultation_count
+PROFILE_EDITABLE_FIELDS = [
+    field.name for field in CounselorProfile._meta.concrete_fields
+    if not field.primary_key and field.name not in ('counselor', 'consultation_count', 'created_time')
+]
+
+
+def _supports_update_returning():
+    """UPDATE ... RETURNING：PostgreSQL 和 SQLite 3.35+ 支持，MySQL/MariaDB 不支持"""
+    if connection.vendor == 'postgresql':
+        return True
+    return connection.vendor == 'sqlite' and connection.features.can_return_columns_from_insert
+
+
+def allocate_session_numbers(record_id, count=1, counselor=None):
+    """
+    为档案分配 count 个连续的访谈编号，返回编号 range，同时把档案负责咨询师的访谈总数加 count
+    指定 counselor 时只分配属于该咨询师的档案；档案不存在时抛出 ConsultationRecord.DoesNotExist
+    """
+    if count <= 0:
+        return range(0)
+    opts = ConsultationRecord._meta
+    quote = connection.ops.quote_name
+    count_column = quote(opts.get_field('interview_count').column)
+    counselor_column = quote(opts.get_field('counselor').column)
+    sql = (
+        f'UPDATE {quote(opts.db_table)} SET {count_column} = {count_column} + %s '
+        f'WHERE {quote(opts.pk.column)} = %s'
+    )
+    params = [count, record_id]
+    if counselor is not None:
+        sql += f' AND {counselor_column} = %s'
+        params.append(counselor.pk)
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            if _supports_update_returning():
+                cursor.execute(f'{sql} RETURNING {count_column}, {counselor_column}', params)
+                row = cursor.fetchone()
+            else:
+                # 不支持 RETURNING 时先更新再读取，更新后的行在事务结束前被锁定，读到的就是本次分配的结果
+                cursor.execute(sql, params)
+                row = None
+                if cursor.rowcount:
+                    row = ConsultationRecord.objects.filter(pk=record_id).values_list('interview_count', 'counselor_id').first()
+        if row is None:
+            raise ConsultationRecord.DoesNotExist(f'档案 {record_id} 不存在')
+        last, counselor_id = row
+        adjust_consultation_count(counselor_id, count)
+    return range(last - count + 1, last + 1)
+
+
+def adjust_consultation_count(counselor_id, delta):
+    """咨询师访谈总数增减 delta，事务提交后使咨询师卡片缓存失效"""
+    if not counselor_id or not delta:
+        return
+    CounselorProfile.objects.filter(counselor_id=counselor_id).update(consultation_count=F('consultation_count') + delta)
+    transaction.on_commit(lambda: read_model.invalidate_card(counselor_id))
+
+
+# ==================== 核对 ====================
+
+def record_drift():
+    """访谈次数与最大访谈编号不一致的档案，返回 [(档案ID, 当前值, 正确值)]"""
+    queryset = ConsultationRecord.objects.annotate(
+        expected=Coalesce(Max('sessions__session_number'), 0)
+    ).exclude(interview_count=F('expected'))
+    return list(queryset.values_list('id', 'interview_count', 'expected').order_by('id'))
+
+
+def profile_drift():
+    """访谈总数与实际访谈数不一致的咨询师，返回 [(咨询师ID, 当前值, 正确值)]"""
+    expected = {}
+    for session_model in (ConsultationSession, ArchivedConsultationSession):
+        rows = (
+            session_model.objects.exclude(record__counselor_id=None)
+            .values('record__counselor_id').annotate(total=Count('id')).values_list('record__counselor_id', 'total')
+        )
+        for counselor_id, total in rows:
+            expected[counselor_id] = expected.get(counselor_id, 0) + total
+    drift = []
+    for counselor_id, current in CounselorProfile.objects.values_list('counselor_id', 'consultation_count').order_by('counselor_id'):
+        if current != expected.get(counselor_id, 0):
+            drift.append((counselor_id, current, expected.get(counselor_id, 0)))
+    return drift
+
+
+def fix_drift(record_rows, profile_rows):
+    """
+    按核对结果修正计数，返回实际修正的 (档案数, 咨询师数)
+    只在值仍为核对时的值时更新（条件UPDATE），核对之后又有新访谈写入的行留到下次核对
+    """
+    records = 0
+    for record_id, current, expected in record_rows:
+        records += ConsultationRecord.objects.filter(id=record_id, interview_count=current).update(interview_count=expected)
+    profiles = 0
+    for counselor_id, current, expected in profile_rows:
+        updated = CounselorProfile.objects.filter(counselor_id=counselor_id, consultation_count=current).update(
+            consultation_count=expected
+        )
+        if updated:
+            read_model.invalidate_card(counselor_id)
+        profiles += updated
+    return records, profiles
@@ -0,0 +1,185 @@
+"""
+访谈危机标记与危机关注名单
+ConsultationSession.crisis_status 以JSON数组字符串（或逗号分隔的字符串）保存危机状态，不能按标记查询；
+访谈保存时由信号同步两张表：
+
+- SessionCrisisFlag：每个访谈的每个危机标记一行，带风险等级，按标记/等级有索引
+- CrisisWatch：每个档案一行，保存最近一次访谈（访谈编号最大）的危机标记和最高风险等级
+
+风险等级由 CRISIS_LEVELS（标记 -> 等级）决定，未列出的非空标记按 CRISIS_UNKNOWN_LEVEL 计；
+风险等级不低于 CRISIS_WATCH_LEVEL 的档案为高风险。修改等级配置或批量写入访谈后执行 manage.py rebuild_crisis_watch
+"""
+import json
+
+from django.conf import settings
+from django.db import transaction
+
+from Consultant.models import ConsultationSession, CrisisWatch, SessionCrisisFlag
+
+
+DEFAULT_LEVELS = {
+    '无': 0,
+    '低风险': 1,
+    '中风险': 2,
+    '高风险': 3,
+}
+
+
+def levels():
+    return getattr(settings, 'CRISIS_LEVELS', DEFAULT_LEVELS)
+
+
+def unknown_level():
+    return getattr(settings, 'CRISIS_UNKNOWN_LEVEL', 1)
+
+
+def watch_level():
+    return getattr(settings, 'CRISIS_WATCH_LEVEL', 2)
+
+
+def parse_flags(value):
+    """
+    危机状态 -> 去重后的标记数组
+    支持JSON数组字符串（_convert_crisis_status_to_string 写入的格式）、逗号分隔的字符串（Excel导入）和单个标记
+    """
+    if not value:
+        return []
+    if isinstance(value, list):
+        items = value
+    else:
+        # 先按JSON解析：JSON数组本身含逗号，不能先按逗号拆分
+        try:
+            parsed = json.loads(value)
+            items = parsed if isinstance(parsed, list) else [value]
+        except (ValueError, TypeError):
+            items = value.split(',')
+    flags = []
+    for item in items:
+        flag = str(item).strip() if item is not None else ''
+        if flag and flag not in flags:
+            flags.append(flag)
+    return flags
+
+
+def level_of(flag):
+    return levels().get(flag, unknown_level())
+
+
+def risk_level(flags):
+    """一组标记的风险等级（最高等级），没有标记时为0"""
+    return max((level_of(flag) for flag in flags), default=0)
+
+
+# ==================== 同步 ====================
+
+def sync_session(session):
+    """按访谈的 crisis_status 更新其危机标记行（未变化时不写入）"""
+    flags = parse_flags(session.crisis_status)
+    existing = dict(SessionCrisisFlag.objects.filter(session_id=session.pk).values_list('flag', 'level'))
+    if existing == {flag: level_of(flag) for flag in flags}:
+        return
+    SessionCrisisFlag.objects.filter(session_id=session.pk).delete()
+    SessionCrisisFlag.objects.bulk_create([
+        SessionCrisisFlag(session_id=session.pk, flag=flag, level=level_of(flag)) for flag in flags
+    ])
+
+
+def refresh(record_id):
+    """按档案最近一次访谈更新关注名单，档案没有访谈时移出名单"""
+    latest = (
+        ConsultationSession.objects.filter(record_id=record_id)
+        .order_by('-session_number')
+        .values('id', 'session_number', 'interview_date', 'crisis_status', 'record__counselor_id')
+        .first()
+    )
+    if latest is None:
+        CrisisWatch.objects.filter(record_id=record_id).delete()
+        return
+    flags = parse_flags(latest['crisis_status'])
+    CrisisWatch.objects.update_or_create(
+        record_id=record_id,
+        defaults={
+            'counselor_id': latest['record__counselor_id'],
+            'session_id': latest['id'],
+            'session_number': latest['session_number'],
+            'interview_date': latest['interview_date'],
+            'flags': flags,
+            'risk_level': risk_level(flags),
+        },
+    )
+
+
+def session_saved(session):
+    with transaction.atomic():
+        sync_session(session)
+        refresh(session.record_id)
+
+
+def record_saved(record):
+    """档案更换负责咨询师时同步到关注名单"""
+    CrisisWatch.objects.filter(record_id=record.pk).exclude(counselor_id=record.counselor_id).update(
+        counselor_id=record.counselor_id
+    )
+
+
+# ==================== 查询 ====================
+
+def watchlist(min_level=None, counselor_id=None):
+    """风险等级不低于 min_level（默认 CRISIS_WATCH_LEVEL）的档案，风险等级高、访谈日期近的在前"""
+    queryset = CrisisWatch.objects.filter(risk_level__gte=watch_level() if min_level is None else min_level)
+    if counselor_id:
+        queryset = queryset.filter(counselor_id=counselor_id)
+    return queryset.order_by('-risk_level', '-interview_date', 'record_id')
+
+
+# ==================== 重建 ====================
+
+@transaction.atomic
+def rebuild(record_ids=None, batch_size=1000):
+    """
+    从访谈记录重建危机标记和关注名单（record_ids 为None时重建全部），返回 (访谈数, 关注名单行数)
+    批量导入访谈（bulk_create 不触发信号）后对导入的档案调用
+    """
+    sessions = ConsultationSession.objects.all()
+    watches = CrisisWatch.objects.all()
+    if record_ids is not None:
+        record_ids = list(record_ids)
+        sessions = sessions.filter(record_id__in=record_ids)
+        watches = watches.filter(record_id__in=record_ids)
+    SessionCrisisFlag.objects.filter(session__in=sessions.values('id')).delete()
+    watches.delete()
+
+    session_count = 0
+    latest = {}
+    last = 0
+    while True:
+        batch = list(
+            sessions.filter(id__gt=last).order_by('id')
+            .values('id', 'record_id', 'record__counselor_id', 'session_number', 'interview_date', 'crisis_status')[:batch_size]
+        )
+        if not batch:
+            break
+        rows = []
+        for session in batch:
+            flags = parse_flags(session['crisis_status'])
+            rows.extend(SessionCrisisFlag(session_id=session['id'], flag=flag, level=level_of(flag)) for flag in flags)
+            current = latest.get(session['record_id'])
+            if current is None or session['session_number'] > current[0]['session_number']:
+                latest[session['record_id']] = (session, flags)
+        SessionCrisisFlag.objects.bulk_create(rows)
+        session_count += len(batch)
+        last = batch[-1]['id']
+
+    CrisisWatch.objects.bulk_create([
+        CrisisWatch(
+            record_id=record_id,
+            counselor_id=session['record__counselor_id'],
+            session_id=session['id'],
+            session_number=session['session_number'],
+            interview_date=session['interview_date'],
+            flags=flags,
+            risk_level=risk_level(flags),
+        )
+        for record_id, (session, flags) in latest.items()
+    ], batch_size=batch_size)
+    return session_count, len(latest)
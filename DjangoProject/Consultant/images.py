@@ -0,0 +1,138 @@
+"""
+图片衍生图处理
+上传图片后在后台线程池中生成限制尺寸的缩略图和WebP版本，历史图片在首次访问时按需生成
+衍生图存放在 static/variants/<规格>/<原图相对路径去扩展名>.webp
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from Consultant import storage
+
+
+# 衍生图规格：名称 -> 最长边像素
+DEFAULT_VARIANTS = {
+    'thumb': 320,
+    'webp': 1280,
+}
+
+VARIANT_DIR = 'variants'
+
+# 原图最大像素数，超过时不生成衍生图（防止解压炸弹占满内存）
+DEFAULT_MAX_PIXELS = 50_000_000
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def variant_specs():
+    return getattr(settings, 'IMAGE_VARIANTS', DEFAULT_VARIANTS)
+
+
+def max_pixels():
+    return getattr(settings, 'IMAGE_MAX_PIXELS', DEFAULT_MAX_PIXELS)
+
+
+def _get_executor():
+    """延迟创建后台线程池（Pillow缩放时会释放GIL，少量线程即可）"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'IMAGE_WORKERS', 2),
+                    thread_name_prefix='image-variant'
+                )
+    return _executor
+
+
+def is_image(path):
+    return os.path.splitext(path or '')[1].lower() in storage.IMAGE_EXTENSIONS
+
+
+def variant_relative_path(path, variant):
+    """原图相对路径 -> 衍生图相对路径"""
+    base = os.path.splitext(storage.normalize_path(path))[0]
+    return f"{VARIANT_DIR}/{variant}/{base}.webp"
+
+
+def generate_variant(path, variant):
+    """
+    生成单个衍生图，已存在时直接返回
+
+    返回:
+        衍生图相对路径，原图不存在、无法解析或像素数超过 IMAGE_MAX_PIXELS 时返回None
+    """
+    max_size = variant_specs().get(variant)
+    if not max_size or not is_image(path):
+        return None
+
+    target_relative = variant_relative_path(path, variant)
+    target_path = storage.absolute_path(target_relative)
+    if os.path.exists(target_path):
+        return target_relative
+
+    source_path = storage.absolute_path(path)
+    if not os.path.exists(source_path):
+        return None
+
+    from PIL import Image, ImageOps
+
+    limit = max_pixels()
+    # 只读取图片头后按上限检查，解码前拒绝；不修改 Pillow 全局的 MAX_IMAGE_PIXELS（进程内其他 Image.open 仍按默认值）
+    tmp_path = f"{target_path}.{threading.get_ident()}.tmp"
+    try:
+        with Image.open(source_path) as img:
+            if img.width * img.height > limit:
+                raise Image.DecompressionBombError(f'图片像素数 {img.width * img.height} 超过上限 {limit}')
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((max_size, max_size), Image.LANCZOS)
+            if img.mode not in ('RGB', 'RGBA'):
+                img = img.convert('RGBA' if 'transparency' in img.info or img.mode in ('LA', 'PA') else 'RGB')
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            img.save(tmp_path, 'WEBP', quality=80, method=4)
+        os.replace(tmp_path, target_path)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        print(f"生成衍生图失败 {path} ({variant}): {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return None
+    return target_relative
+
+
+def generate_variants(path):
+    """生成所有规格的衍生图"""
+    for variant in variant_specs():
+        generate_variant(path, variant)
+
+
+def schedule_variants(paths):
+    """提交到后台线程池异步生成衍生图，不阻塞上传请求"""
+    if isinstance(paths, str):
+        paths = [paths]
+    executor = _get_executor()
+    for path in paths:
+        if path and is_image(path):
+            executor.submit(generate_variants, path)
+
+
+def variant_url(path, variant):
+    """
+    获取衍生图URL
+    衍生图已生成时返回静态文件地址，否则返回按需生成地址（首次访问时生成后重定向）
+    """
+    if not path or not is_image(path):
+        return ''
+    relative_path = variant_relative_path(path, variant)
+    if os.path.exists(storage.absolute_path(relative_path)):
+        return f"/static/{relative_path}"
+    return f"/media/variant/{variant}/{storage.normalize_path(path)}"
+
+
+def variant_urls(path):
+    """获取所有规格的衍生图URL，例如 {'thumb': ..., 'webp': ...}"""
+    if not path or not is_image(path):
+        return {}
+    return {variant: variant_url(path, variant) for variant in variant_specs()}
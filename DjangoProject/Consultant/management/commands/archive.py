@@ -0,0 +1,88 @@
+"""
+Django管理命令：将已结束的历史数据移入归档表
+已完成/已取消/已拒绝的咨询订单、已完成/已关闭的咨询档案（连同访谈记录）和已完成的预约订单，
+创建时间早于 --days 天（默认 ARCHIVE_AFTER_DAYS）的分批移入归档表，每批一个事务；
+建议在访问量低的时段用定时任务执行，归档后的数据可通过列表/详情接口的 include_archived 参数查询
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Consultant import archive
+
+
+class Command(BaseCommand):
+    help = '将已结束且较早的咨询订单、咨询档案（含访谈记录）和预约订单分批移入归档表'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            help=f'归档创建时间早于多少天的数据（默认：ARCHIVE_AFTER_DAYS，当前 {archive.after_days()}）'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help=f'每批（每个事务）移动的行数（默认：ARCHIVE_BATCH_SIZE，当前 {archive.batch_size()}）'
+        )
+        parser.add_argument(
+            '--tables',
+            nargs='+',
+            choices=archive.TABLES,
+            default=list(archive.TABLES),
+            help='只归档指定的表（默认全部：orders records appointments）'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0,
+            help='每批之间暂停的秒数，减少对在线业务的影响（默认：0）'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='只统计待归档的行数，不移动数据'
+        )
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else archive.after_days()
+        if days < 0:
+            raise CommandError('--days 不能小于0')
+        size = options['batch_size'] or archive.batch_size()
+        if size <= 0:
+            raise CommandError('--batch-size 必须大于0')
+        before = archive.cutoff(days)
+        # 按固定顺序执行：订单先于档案归档
+        tables = [table for table in archive.TABLES if table in options['tables']]
+
+        self.stdout.write(f'归档创建时间早于 {before:%Y-%m-%d %H:%M:%S}（{days} 天前）的已结束数据')
+        if options['dry_run']:
+            for table, count in archive.pending(before, tables).items():
+                self.stdout.write(f'  {table}: {count} 行待归档')
+            return
+
+        self.stdout.write(f"{'表':<14}{'行数':>10}{'批次':>8}{'耗时(s)':>10}{'吞吐(行/s)':>12}")
+        grand_total = 0
+        start_all = time.perf_counter()
+        for table in tables:
+            moved = {}
+            batches = 0
+            start = time.perf_counter()
+            for counts in archive.archive_batches(table, before, size):
+                batches += 1
+                for name, count in counts.items():
+                    moved[name] = moved.get(name, 0) + count
+                if options['verbosity'] >= 2:
+                    self.stdout.write(f'  {table} 第 {batches} 批: {counts}')
+                if options['sleep']:
+                    time.sleep(options['sleep'])
+            # 吞吐量不计批次之间的暂停
+            elapsed = time.perf_counter() - start - batches * options['sleep']
+            for name, count in (moved or {table: 0}).items():
+                self.stdout.write(
+                    f'{name:<14}{count:>10}{batches:>8}{elapsed:>10.2f}{count / elapsed if elapsed else 0:>12.0f}'
+                )
+                grand_total += count
+
+        elapsed = time.perf_counter() - start_all
+        self.stdout.write(self.style.SUCCESS(f'归档完成：共移动 {grand_total} 行，耗时 {elapsed:.2f} 秒'))
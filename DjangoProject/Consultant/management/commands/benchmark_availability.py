@@ -0,0 +1,176 @@
+"""
+Django管理命令：可预约时段查询基准测试
+对比两种方式回答"哪些咨询师在未来N周的每个星期X的某个时间窗口都空闲"：
+
+- 按行展开：读取排班（Schedule、CounselorSchedule）和停诊行，在Python中逐个咨询师、逐个日期合并时间段判断
+- 位图：读取 CounselorAvailability 位图矩阵，NumPy 按位与后按日期做与/或
+
+默认使用数据库中的数据（可先执行 generate_test_data）；指定 --synthetic 时按固定随机种子在内存中生成排班，只比较计算耗时
+"""
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from Consultant import availability
+from Consultant.models import CounselorSchedule
+from CounselorAdmin.models import Cancellation, Schedule
+
+
+class Command(BaseCommand):
+    help = '对比按行展开排班与位图矩阵两种方式查询咨询师空闲时间的耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--weeks', type=int, default=8, help='查询的周数（默认：8）')
+        parser.add_argument('--weekday', type=int, default=2, help='星期几，1-7（默认：2，即周二）')
+        parser.add_argument('--start', default='14:00', help='时间窗口开始（默认：14:00）')
+        parser.add_argument('--end', default='15:00', help='时间窗口结束（默认：15:00）')
+        parser.add_argument('--repeat', type=int, default=5, help='每种方式重复次数，取最快一次（默认：5）')
+        parser.add_argument(
+            '--synthetic',
+            type=int,
+            metavar='N',
+            help='在内存中为 N 个咨询师生成每天的排班和少量停诊（不读写数据库）'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            start = self.minute(options['start'])
+            end = self.minute(options['end'])
+        except ValueError:
+            raise CommandError('--start/--end 格式应为 HH:MM')
+        if start >= end or options['weeks'] <= 0 or not 1 <= options['weekday'] <= 7:
+            raise CommandError('时间窗口、周数或星期参数错误')
+
+        today = timezone.now().date()
+        days = availability.dates_between(today, today + timedelta(weeks=options['weeks']) - timedelta(days=1),
+                                          {options['weekday']})
+
+        if options['synthetic']:
+            # 内存数据：两种方式都只计算，不计读取耗时
+            ranges, cancellations = self.synthetic(options['synthetic'], days)
+            preloaded = self.matrix_from(availability.build(ranges, cancellations), options['synthetic'], days)
+
+            def load_rows():
+                return ranges, cancellations
+
+            def load_matrix():
+                return preloaded
+        else:
+            def load_rows():
+                return self.rows_from_db(days)
+
+            def load_matrix():
+                return availability.matrix(days)
+
+        def by_rows():
+            ranges, cancellations = load_rows()
+            return self.row_based(ranges, cancellations, days, start, end)
+
+        def by_bitmap():
+            counselor_ids, matrix = load_matrix()
+            free = availability.free(matrix, start, end)
+            return {int(counselor_ids[index]) for index in free.all(axis=1).nonzero()[0]}
+
+        availability.matrix([today])  # 预先加载numpy，不计入耗时
+        row_ms, row_result = self.best_time(by_rows, options['repeat'])
+        bitmap_ms, bitmap_result = self.best_time(by_bitmap, options['repeat'])
+
+        self.stdout.write(f'日期数: {len(days)}，时间窗口: {options["start"]}-{options["end"]}')
+        self.stdout.write(f"{'方式':<12}{'耗时(ms)':>12}{'空闲咨询师数':>14}")
+        self.stdout.write(f"{'按行展开':<12}{row_ms:>12.2f}{len(row_result):>14}")
+        self.stdout.write(f"{'位图':<12}{bitmap_ms:>12.2f}{len(bitmap_result):>14}")
+        if row_result != bitmap_result:
+            # 排班或停诊不在30分钟整点时，位图按完整时段计算，结果可能与按分钟展开不同
+            self.stdout.write(self.style.WARNING(f'两种方式结果不一致：{sorted(row_result ^ bitmap_result)[:20]}'))
+        self.stdout.write(self.style.SUCCESS(f'加速比 {row_ms / bitmap_ms if bitmap_ms else 0:.1f}x'))
+
+    @staticmethod
+    def minute(value):
+        parsed = datetime.strptime(value, '%H:%M')
+        return parsed.hour * 60 + parsed.minute
+
+    def best_time(self, func, repeat):
+        best = None
+        result = None
+        for _ in range(max(repeat, 1)):
+            started = time.perf_counter()
+            result = func()
+            elapsed = (time.perf_counter() - started) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def rows_from_db(self, days):
+        """按行读取这些日期的排班和停诊"""
+        first = datetime.combine(days[0], datetime.min.time())
+        last = datetime.combine(days[-1] + timedelta(days=1), datetime.min.time())
+        ranges = [
+            (counselor_id, day, self.minute(start.strftime('%H:%M')), self.minute(end.strftime('%H:%M')))
+            for counselor_id, day, start, end in Schedule.objects.filter(work_date__in=days).values_list(
+                'counselor_id', 'work_date', 'start_time', 'end_time'
+            )
+        ]
+        for counselor_id, day, time_slots in CounselorSchedule.objects.filter(schedule_date__in=days).values_list(
+            'counselor_id', 'schedule_date', 'time_slots'
+        ):
+            ranges.extend((counselor_id, day, start, end) for start, end in availability.parse_time_slots(time_slots))
+        cancellations = list(
+            Cancellation.objects.filter(cancel_start__lt=last, cancel_end__gt=first)
+            .values_list('counselor_id', 'cancel_start', 'cancel_end')
+        )
+        return ranges, cancellations
+
+    def row_based(self, ranges, cancellations, days, start, end):
+        """逐个咨询师、逐个日期合并排班时间段，判断窗口是否被完整覆盖且不与停诊重叠"""
+        by_day = defaultdict(list)
+        for counselor_id, day, slot_start, slot_end in ranges:
+            by_day[(counselor_id, day)].append((slot_start, slot_end))
+        by_counselor = defaultdict(list)
+        for counselor_id, cancel_start, cancel_end in cancellations:
+            by_counselor[counselor_id].append((cancel_start, cancel_end))
+
+        free = set()
+        for counselor_id in {key[0] for key in by_day}:
+            for day in days:
+                covered = start
+                for slot_start, slot_end in sorted(by_day.get((counselor_id, day), [])):
+                    if slot_start <= covered < slot_end:
+                        covered = slot_end
+                if covered < end:
+                    break
+                window_start = datetime.combine(day, datetime.min.time()) + timedelta(minutes=start)
+                window_end = datetime.combine(day, datetime.min.time()) + timedelta(minutes=end)
+                if any(cancel_start < window_end and cancel_end > window_start
+                       for cancel_start, cancel_end in by_counselor.get(counselor_id, [])):
+                    break
+            else:
+                free.add(counselor_id)
+        return free
+
+    def synthetic(self, counselors, days):
+        """固定随机种子生成：每个咨询师每天上午、下午各一段排班，约5%的日期有一段停诊"""
+        rng = random.Random(42)
+        ranges = []
+        cancellations = []
+        for counselor_id in range(1, counselors + 1):
+            for day in days:
+                ranges.append((counselor_id, day, rng.choice([8, 9, 10]) * 60, 12 * 60))
+                ranges.append((counselor_id, day, rng.choice([13, 14]) * 60, rng.choice([16, 17, 18]) * 60))
+                if rng.random() < 0.05:
+                    begin = datetime.combine(day, datetime.min.time()) + timedelta(hours=rng.randint(8, 17))
+                    cancellations.append((counselor_id, begin, begin + timedelta(hours=rng.randint(1, 3))))
+        return ranges, cancellations
+
+    def matrix_from(self, bitmaps, counselors, days):
+        """内存中的位图 -> 与 availability.matrix 相同结构的 (咨询师ID数组, 矩阵)"""
+        import numpy as np
+
+        ids = np.arange(1, counselors + 1, dtype=np.int64)
+        matrix = np.zeros((counselors, len(days)), dtype=np.int64)
+        column = {day: index for index, day in enumerate(days)}
+        for (counselor_id, day), (_, available) in bitmaps.items():
+            matrix[counselor_id - 1, column[day]] = available
+        return ids, matrix
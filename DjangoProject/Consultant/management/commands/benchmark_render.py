@@ -0,0 +1,143 @@
+"""
+Django管理命令：响应渲染基准测试
+对比标准库 JSONRenderer 与 orjson 渲染器的耗时，以及原始/gzip/brotli 压缩后的字节数
+数据来自数据库中已有的记录（可先执行 generate_test_data），数据不足时按固定随机种子生成模拟数据
+"""
+import gzip
+import random
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from DjangoProject.renderers import FastJSONRenderer, orjson
+from DjangoProject.middleware import brotli
+from Consultant.models import ConsultationRecord, ConsultationOrder
+from Consultant.serializers.record import ConsultationRecordListSerializer
+from Consultant.serializers.order import ConsultationOrderListSerializer
+
+
+class Command(BaseCommand):
+    help = '对比JSON渲染耗时和压缩后响应大小'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=500,
+            help='每个数据集的记录条数（默认：500）'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='每项测试重复次数，取最快一次（默认：20）'
+        )
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        repeat = options['repeat']
+
+        if orjson is None:
+            self.stdout.write(self.style.WARNING('未安装 orjson，FastJSONRenderer 将回退到标准库'))
+        if brotli is None:
+            self.stdout.write(self.style.WARNING('未安装 brotli，跳过 br 压缩统计'))
+
+        datasets = self.build_datasets(rows)
+        std_renderer = JSONRenderer()
+        fast_renderer = FastJSONRenderer()
+
+        header = f"{'数据集':<16}{'条数':>6}{'标准库(ms)':>12}{'orjson(ms)':>12}{'加速比':>8}{'原始(KB)':>10}{'gzip(KB)':>10}{'br(KB)':>10}"
+        self.stdout.write(header)
+        for name, data in datasets:
+            std_ms = self.best_time(std_renderer, data, repeat)
+            fast_ms = self.best_time(fast_renderer, data, repeat)
+            body = fast_renderer.render(data)
+            gzip_size = len(gzip.compress(body, compresslevel=6))
+            br_text = f"{len(brotli.compress(body, quality=5)) / 1024:.1f}" if brotli is not None else '-'
+            self.stdout.write(
+                f"{name:<16}{len(data['data']):>6}{std_ms:>12.2f}{fast_ms:>12.2f}"
+                f"{std_ms / fast_ms if fast_ms else 0:>8.1f}"
+                f"{len(body) / 1024:>10.1f}{gzip_size / 1024:>10.1f}{br_text:>10}"
+            )
+
+        self.stdout.write(self.style.SUCCESS('基准测试完成'))
+
+    def best_time(self, renderer, data, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            renderer.render(data)
+            elapsed = (time.perf_counter() - start) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    def build_datasets(self, rows):
+        """优先使用数据库数据，经序列化器输出后与接口返回结构一致"""
+        datasets = []
+
+        records = ConsultationRecord.objects.all()[:rows]
+        if len(records) >= rows // 2:
+            datasets.append(('咨询记录列表', self.wrap(ConsultationRecordListSerializer(records, many=True).data)))
+        else:
+            datasets.append(('咨询记录(模拟)', self.wrap(self.fake_records(rows))))
+
+        orders = ConsultationOrder.objects.all()[:rows]
+        if len(orders) >= rows // 2:
+            datasets.append(('咨询订单列表', self.wrap(ConsultationOrderListSerializer(orders, many=True).data)))
+        else:
+            datasets.append(('咨询订单(模拟)', self.wrap(self.fake_orders(rows))))
+
+        datasets.append(('月排班(模拟)', self.wrap(self.fake_schedule(rows))))
+        return datasets
+
+    def wrap(self, data):
+        return {'code': 0, 'message': '获取成功', 'data': list(data)}
+
+    def fake_records(self, rows):
+        rng = random.Random(42)
+        base = datetime(2025, 1, 1, 8, 0)
+        return [
+            {
+                'id': i + 1,
+                'studentName': f'学生{rng.randint(1000, 9999)}',
+                'studentId': f'2025{rng.randint(100000, 999999)}',
+                'consultationType': rng.choice(['个体咨询', '团体咨询', '危机干预']),
+                'status': rng.choice(['进行中', '已结束']),
+                'consultationCount': rng.randint(1, 12),
+                'createdTime': base + timedelta(hours=i * 3),
+                'summary': '来访者主诉学业压力较大，睡眠质量下降，' * rng.randint(1, 4),
+            }
+            for i in range(rows)
+        ]
+
+    def fake_orders(self, rows):
+        rng = random.Random(43)
+        base = datetime(2025, 1, 1, 8, 0)
+        return [
+            {
+                'id': i + 1,
+                'orderNo': f'ORD{20250101000000 + i}',
+                'studentName': f'学生{rng.randint(1000, 9999)}',
+                'counselorName': f'咨询师{rng.randint(1, 30)}',
+                'appointmentTime': base + timedelta(minutes=i * 50),
+                'campus': rng.choice(['主校区', '东校区', '南校区']),
+                'status': rng.choice(['待确认', '已确认', '已完成', '已取消']),
+            }
+            for i in range(rows)
+        ]
+
+    def fake_schedule(self, rows):
+        rng = random.Random(44)
+        return [
+            {
+                'date': f'2025-01-{day % 28 + 1:02d}',
+                'counselors': [
+                    {'id': rng.randint(1, 30), 'name': f'咨询师{rng.randint(1, 30)}', 'campus': '主校区',
+                     'slots': [f'{h:02d}:00-{h + 1:02d}:00' for h in range(8, 18) if rng.random() > 0.4]}
+                    for _ in range(5)
+                ],
+            }
+            for day in range(max(rows // 10, 1))
+        ]
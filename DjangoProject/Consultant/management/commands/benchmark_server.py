@@ -0,0 +1,322 @@
+"""
+Django管理命令：WSGI / ASGI 并发吞吐基准测试
+在同一进程、同一数据库上分别用 WSGIHandler 和 ASGIHandler 处理相同的请求，对比并发连接下的吞吐量和延迟：
+- WSGI：模拟线程 worker（如 gunicorn --threads），同时最多 --wsgi-threads 个请求在处理，其余连接排队
+- ASGI：模拟单个事件循环 worker（如 uvicorn），异步视图在等待 I/O 时让出事件循环
+不经过网络和 HTTP 服务器，只比较 Django 请求处理模型的差异；端到端压测可用 uvicorn/gunicorn 启动后使用外部压测工具
+
+邮件验证码接口（--endpoint email）不会真正发送邮件：测试期间 _send_email_code 替换为等待 --io-latency 秒，
+模拟 SMTP 服务器的响应时间
+"""
+import asyncio
+import io
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.utils.timezone import now
+
+from DjangoProject import async_views
+from Consultant import template_files
+from Consultant.models import ConsultantAuthToken
+from Consultant.views import auth as auth_views
+from CounselorAdmin.models import Counselor, VerificationCode
+
+
+BENCHMARK_USERNAME = 'benchmark_server'
+BENCHMARK_EMAIL = 'benchmark_server@example.com'
+# 测试用模板文件名前缀，测试结束后删除
+FILE_PREFIX = 'benchmark_server_'
+
+ENDPOINTS = ('email', 'download', 'upload', 'profile')
+
+
+class Command(BaseCommand):
+    help = '在同一数据库上对比 WSGI 与 ASGI 处理并发请求的吞吐量和延迟'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--endpoint',
+            choices=ENDPOINTS,
+            default='email',
+            help='测试接口：email 邮件验证码 / download 模板打包下载 / upload 模板上传 / profile 个人信息（同步视图，对照）（默认：email）'
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='每种模式的总请求数（默认：200）'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=50,
+            help='并发连接数（默认：50）'
+        )
+        parser.add_argument(
+            '--wsgi-threads',
+            type=int,
+            default=8,
+            help='WSGI worker 的线程数（默认：8）'
+        )
+        parser.add_argument(
+            '--async-threads',
+            type=int,
+            help='覆盖 ASYNC_THREAD_POOLS 中各线程池的大小（默认使用配置值）'
+        )
+        parser.add_argument(
+            '--io-latency',
+            type=float,
+            default=0.2,
+            help='模拟的SMTP响应时间（秒），仅 email 接口使用（默认：0.2）'
+        )
+        parser.add_argument(
+            '--file-size',
+            type=int,
+            default=256,
+            help='download/upload 接口使用的文件大小（KB，默认：256）'
+        )
+        parser.add_argument(
+            '--mode',
+            choices=('both', 'wsgi', 'asgi'),
+            default='both',
+            help='只测试其中一种模式（默认：both）'
+        )
+
+    def handle(self, *args, **options):
+        if options['async_threads']:
+            pools = getattr(settings, 'ASYNC_THREAD_POOLS', None) or async_views.DEFAULT_THREAD_POOLS
+            settings.ASYNC_THREAD_POOLS = {name: options['async_threads'] for name in pools}
+        counselor, token = self.seed(options['file_size'])
+        try:
+            request = self.build_request(options['endpoint'], counselor, token, options['file_size'])
+            with self.simulated_smtp(options['io_latency']):
+                results = []
+                if options['mode'] in ('both', 'wsgi'):
+                    results.append(('WSGI', self.run_wsgi(request, options['requests'], options['concurrency'], options['wsgi_threads'])))
+                if options['mode'] in ('both', 'asgi'):
+                    results.append(('ASGI', self.run_asgi(request, options['requests'], options['concurrency'])))
+        finally:
+            self.cleanup(counselor, token)
+
+        self.stdout.write(
+            f"接口 {options['endpoint']}，{options['requests']} 个请求，并发 {options['concurrency']}，"
+            f"WSGI 线程 {options['wsgi_threads']}，ASGI 线程池 {getattr(settings, 'ASYNC_THREAD_POOLS', {})}"
+        )
+        self.stdout.write(f"{'模式':<8}{'耗时(s)':>10}{'吞吐(req/s)':>14}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'失败':>6}")
+        for name, (elapsed, latencies, failures) in results:
+            self.stdout.write(
+                f"{name:<8}{elapsed:>10.2f}{len(latencies) / elapsed:>14.1f}"
+                f"{self.percentile(latencies, 50):>10.1f}{self.percentile(latencies, 95):>10.1f}"
+                f"{self.percentile(latencies, 99):>10.1f}{failures:>6}"
+            )
+        self.stdout.write(self.style.SUCCESS('基准测试完成'))
+
+    # ==================== 测试数据 ====================
+
+    def seed(self, file_size):
+        """创建测试咨询师、Token 和模板文件（两种模式使用同一份数据）"""
+        counselor, self.created_counselor = Counselor.objects.get_or_create(
+            username=BENCHMARK_USERNAME,
+            defaults={'name': '压测咨询师', 'gender': '男', 'phone': '00000000000', 'email': BENCHMARK_EMAIL},
+        )
+        token = ConsultantAuthToken.objects.create(
+            counselor=counselor,
+            token=uuid.uuid4().hex,
+            expires_at=now() + timedelta(hours=1),
+        )
+        directory = template_files.templates_dir()
+        os.makedirs(directory, exist_ok=True)
+        content = os.urandom(file_size * 1024)
+        for i in range(2):
+            with open(os.path.join(directory, f'{FILE_PREFIX}{i}.bin'), 'wb') as f:
+                f.write(content)
+        return counselor, token
+
+    def cleanup(self, counselor, token):
+        token.delete()
+        VerificationCode.objects.filter(email=BENCHMARK_EMAIL).delete()
+        if self.created_counselor:
+            counselor.delete()
+        directory = template_files.templates_dir()
+        for name in os.listdir(directory):
+            if name.startswith(FILE_PREFIX):
+                os.remove(os.path.join(directory, name))
+
+    @contextmanager
+    def simulated_smtp(self, latency):
+        original = auth_views._send_email_code
+
+        def send_email_code(email, code):
+            time.sleep(latency)
+            return True
+
+        auth_views._send_email_code = send_email_code
+        try:
+            yield
+        finally:
+            auth_views._send_email_code = original
+
+    def build_request(self, endpoint, counselor, token, file_size):
+        """返回 (路径, Content-Type, 请求体, 请求头)"""
+        headers = {'X-User-Id': str(counselor.id), 'X-Auth-Token': token.token}
+        if endpoint == 'email':
+            body = json.dumps({'email': BENCHMARK_EMAIL, 'purpose': 'login'}).encode()
+            return '/consultant/api/consultant/auth/email', 'application/json', body, {}
+        if endpoint == 'download':
+            body = json.dumps({'fileNames': [f'{FILE_PREFIX}0.bin', f'{FILE_PREFIX}1.bin']}).encode()
+            return '/consultant/api/consultant/interview/download', 'application/json', body, headers
+        if endpoint == 'upload':
+            upload = io.BytesIO(os.urandom(file_size * 1024))
+            upload.name = f'{FILE_PREFIX}upload.bin'
+            body = encode_multipart(BOUNDARY, {'file': upload})
+            return '/consultant/api/consultant/interview/upload/template', MULTIPART_CONTENT, body, headers
+        return '/consultant/api/consultant/user/profile', 'application/json', b'{}', headers
+
+    # ==================== WSGI ====================
+
+    def run_wsgi(self, request, total, concurrency, threads):
+        handler = WSGIHandler()
+        path, content_type, body, headers = request
+        counter = iter(range(total))
+        counter_lock = threading.Lock()
+        latencies = []
+        failures = [0]
+
+        def environ():
+            env = {
+                'REQUEST_METHOD': 'POST',
+                'PATH_INFO': path,
+                'SCRIPT_NAME': '',
+                'QUERY_STRING': '',
+                'CONTENT_TYPE': content_type,
+                'CONTENT_LENGTH': str(len(body)),
+                'SERVER_NAME': 'localhost',
+                'SERVER_PORT': '80',
+                'SERVER_PROTOCOL': 'HTTP/1.1',
+                'HTTP_HOST': 'localhost',
+                'wsgi.input': io.BytesIO(body),
+                'wsgi.errors': sys.stderr,
+                'wsgi.url_scheme': 'http',
+                'wsgi.multithread': True,
+                'wsgi.multiprocess': False,
+            }
+            for name, value in headers.items():
+                env['HTTP_' + name.upper().replace('-', '_')] = value
+            return env
+
+        def process():
+            status_line = []
+            result = handler(environ(), lambda status, response_headers, exc_info=None: status_line.append(status))
+            try:
+                for _ in result:
+                    pass
+            finally:
+                result.close()
+            return status_line[0]
+
+        def client(workers):
+            while True:
+                with counter_lock:
+                    if next(counter, None) is None:
+                        return
+                start = time.perf_counter()
+                # worker 线程池的任务队列按先后顺序处理，连接在队列中等待的时间同样计入延迟
+                status_line = workers.submit(process).result()
+                latencies.append((time.perf_counter() - start) * 1000)
+                if not status_line.startswith('2'):
+                    failures[0] += 1
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='wsgi-worker') as workers:
+            with ThreadPoolExecutor(max_workers=concurrency) as clients:
+                for future in [clients.submit(client, workers) for _ in range(concurrency)]:
+                    future.result()
+        return time.perf_counter() - start, latencies, failures[0]
+
+    # ==================== ASGI ====================
+
+    def run_asgi(self, request, total, concurrency):
+        return asyncio.run(self._run_asgi(request, total, concurrency))
+
+    async def _run_asgi(self, request, total, concurrency):
+        application = ASGIHandler()
+        path, content_type, body, headers = request
+        scope_headers = [
+            (b'host', b'localhost'),
+            (b'content-type', content_type.encode()),
+            (b'content-length', str(len(body)).encode()),
+        ] + [(name.lower().encode(), value.encode()) for name, value in headers.items()]
+        remaining = [total]
+        latencies = []
+        failures = [0]
+
+        async def call():
+            scope = {
+                'type': 'http',
+                'asgi': {'version': '3.0'},
+                'http_version': '1.1',
+                'method': 'POST',
+                'scheme': 'http',
+                'path': path,
+                'raw_path': path.encode(),
+                'query_string': b'',
+                'root_path': '',
+                'headers': scope_headers,
+                'client': ('127.0.0.1', 0),
+                'server': ('localhost', 80),
+            }
+            finished = asyncio.Event()
+            status_code = []
+            body_sent = [False]
+
+            async def receive():
+                if not body_sent[0]:
+                    body_sent[0] = True
+                    return {'type': 'http.request', 'body': body, 'more_body': False}
+                # 响应发送完成后才断开连接
+                await finished.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status_code.append(message['status'])
+                elif message['type'] == 'http.response.body' and not message.get('more_body'):
+                    finished.set()
+
+            await application(scope, receive, send)
+            finished.set()
+            return status_code[0]
+
+        async def client():
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                start = time.perf_counter()
+                status_code = await call()
+                latencies.append((time.perf_counter() - start) * 1000)
+                if not 200 <= status_code < 300:
+                    failures[0] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return time.perf_counter() - start, latencies, failures[0]
+
+    @staticmethod
+    def percentile(values, pct):
+        if not values:
+            return 0.0
+        if len(values) == 1:
+            return values[0]
+        return statistics.quantiles(values, n=100, method='inclusive')[min(pct, 99) - 1]
@@ -0,0 +1,47 @@
+"""
+Django管理命令：把按周重复的排班记录压缩为周期排班规则
+按月发布的排班在 Schedule 中每天每个时间段一行，稳定的排班大量重复；本命令按咨询师、星期几找出重复的排班，
+转为 ScheduleRule（中间没有排班的日期记为例外日期），与规则一致的记录删除，不一致的日期保留记录覆盖规则。
+月视图和可预约时段位图按"规则 + 记录覆盖"读取，压缩前后查询结果一致
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from CounselorAdmin import schedule_rules
+from CounselorAdmin.models import Schedule
+
+
+class Command(BaseCommand):
+    help = '把 Schedule 中按周重复的排班转为周期排班规则并删除重复的记录'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--counselors',
+            nargs='+',
+            type=int,
+            help='只处理指定咨询师ID（默认全部，已有规则的咨询师跳过）'
+        )
+        parser.add_argument(
+            '--min-weeks',
+            type=int,
+            default=4,
+            help='同一星期几的排班至少重复多少周才转为规则（默认：4）'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='只统计，不写入规则、不删除记录'
+        )
+
+    def handle(self, *args, **options):
+        if options['min_weeks'] < 2:
+            raise CommandError('--min-weeks 至少为2')
+
+        before = Schedule.objects.count()
+        result = schedule_rules.compact(options['counselors'], options['min_weeks'], options['dry_run'])
+        prefix = '[试运行] ' if options['dry_run'] else ''
+        self.stdout.write(
+            f"{prefix}{result['counselors']} 个咨询师生成 {result['rules']} 条规则，"
+            f"删除 {result['deleted']} 条排班记录，保留 {result['kept']} 条（共 {before} 条）"
+        )
+        if not options['dry_run'] and result['rules']:
+            self.stdout.write(self.style.SUCCESS(f'排班记录 {before} -> {Schedule.objects.count()}'))
@@ -0,0 +1,77 @@
+"""
+Django管理命令：导出数据到CSV/Excel文件
+适合数据量很大的导出（如几十万条访谈记录），不占用web worker；也可执行已创建的导出任务
+"""
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from CounselorAdmin import exports
+from DjangoProject import export
+
+
+class Command(BaseCommand):
+    help = '导出访谈评估/负面事件/转介记录/咨询档案/咨询记录到CSV或Excel文件'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'kind',
+            nargs='?',
+            choices=exports.kinds(),
+            help='导出类型'
+        )
+        parser.add_argument(
+            '--format',
+            choices=export.FORMATS,
+            default='xlsx',
+            help='文件格式（默认：xlsx）'
+        )
+        parser.add_argument(
+            '--filters',
+            default='{}',
+            help='筛选条件JSON，与列表接口的请求参数相同，如 \'{"std_grade": "高一"}\''
+        )
+        parser.add_argument(
+            '--output',
+            help='输出文件路径（不指定时创建导出任务，文件保存到 EXPORT_DIR，可通过下载接口获取）'
+        )
+        parser.add_argument(
+            '--job',
+            help='执行已创建的导出任务（任务ID）'
+        )
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+
+        if options['job']:
+            job = exports.run_job(options['job'])
+            self._report_job(job, start)
+            return
+
+        if not options['kind']:
+            raise CommandError('请指定导出类型或 --job')
+        try:
+            params = json.loads(options['filters'])
+        except ValueError as e:
+            raise CommandError(f'--filters 不是合法的JSON: {e}')
+
+        if options['output']:
+            title, headers, rows = exports.build(options['kind'], params)
+            count = export.write_file(options['format'], headers, rows, options['output'], sheet_title=title)
+            self.stdout.write(self.style.SUCCESS(
+                f'已导出 {count} 行到 {options["output"]}，耗时 {time.monotonic() - start:.1f} 秒'
+            ))
+            return
+
+        job = exports.create_job(options['kind'], options['format'], params, created_by='manage.py')
+        job = exports.run_job(job.job_id)
+        self._report_job(job, start)
+
+    def _report_job(self, job, start):
+        if job.status != 'completed':
+            raise CommandError(f'导出任务 {job.job_id} 失败: {job.error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'导出任务 {job.job_id} 完成：{job.row_count} 行，文件 {exports.job_path(job)}，'
+            f'耗时 {time.monotonic() - start:.1f} 秒'
+        ))
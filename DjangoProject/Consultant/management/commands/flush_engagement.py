@@ -0,0 +1,31 @@
+"""
+Django管理命令：将宣教资讯的阅读/点赞/收藏计数日志写入数据库
+worker 在写入条数或时间达到阈值时会自动刷新，访问量很低时可用定时任务调用本命令
+"""
+from django.core.management.base import BaseCommand
+
+from CounselorAdmin import engagement
+
+
+class Command(BaseCommand):
+    help = '将计数日志中尚未写入的阅读/点赞/收藏计数批量写入 articles 表'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='只显示待写入的增量，不写入数据库'
+        )
+
+    def handle(self, *args, **options):
+        deltas = engagement.pending()
+        self.stdout.write(f'待写入的资讯数: {len(deltas)}')
+
+        if options['dry_run']:
+            for article_id, fields in sorted(deltas.items()):
+                changes = ', '.join(f'{field} {delta:+d}' for field, delta in fields.items() if delta)
+                self.stdout.write(f'  资讯 {article_id}: {changes}')
+            return
+
+        count = engagement.flush()
+        self.stdout.write(self.style.SUCCESS(f'已写入 {count} 条资讯的计数'))
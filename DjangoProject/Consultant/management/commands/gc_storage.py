@@ -0,0 +1,129 @@
+"""
+Django管理命令：回收未被引用的上传文件
+标记阶段收集业务表中仍在使用的文件路径，清理阶段删除失效的 FileStorage 引用记录和无引用的磁盘文件
+"""
+import os
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from Consultant import images, storage
+from Consultant.models import FileStorage
+
+
+# 旧版上传目录（内容寻址存储之前按时间戳/UUID命名的文件）
+LEGACY_DIRS = [
+    'session_signature',
+    'session_attach',
+    'counselor_avatar',
+    'banner_photo',
+    'referral_image',
+    'article_video',
+]
+
+
+class Command(BaseCommand):
+    help = '回收未被任何业务记录引用的上传文件（内容寻址存储）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours',
+            type=int,
+            default=24,
+            help='宽限时间（小时），在此时间内创建的文件不会被回收，避免误删正在上传的文件（默认：24）'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='只统计不删除'
+        )
+        parser.add_argument(
+            '--legacy',
+            action='store_true',
+            help='同时清理旧版上传目录中未被引用的文件'
+        )
+
+    def handle(self, *args, **options):
+        grace_hours = options['grace_hours']
+        dry_run = options['dry_run']
+        cutoff = timezone.now() - timedelta(hours=grace_hours)
+        cutoff_ts = time.time() - grace_hours * 3600
+
+        # 标记：业务表中仍在使用的路径
+        live_paths = storage.collect_live_paths()
+        self.stdout.write(f'业务表引用文件数: {len(live_paths)}')
+
+        # 清理失效的引用记录（业务记录已删除或已更换文件）
+        stale_refs = FileStorage.objects.filter(created_time__lt=cutoff).exclude(content_hash='')
+        stale_ids = [
+            ref_id for ref_id, path in stale_refs.values_list('id', 'file_path').iterator()
+            if path not in live_paths
+        ]
+        if stale_ids and not dry_run:
+            for start in range(0, len(stale_ids), 500):
+                FileStorage.objects.filter(id__in=stale_ids[start:start + 500]).delete()
+        self.stdout.write(f'失效引用记录: {len(stale_ids)}')
+
+        # 清理无引用的内容寻址文件
+        referenced = set(FileStorage.objects.exclude(content_hash='').values_list('file_path', flat=True))
+        referenced |= live_paths
+        removed_count, removed_bytes = self._sweep(storage.blob_dir(), referenced, cutoff_ts, dry_run)
+
+        # 清理原图已不存在的衍生图（缩略图/WebP）
+        count, size = self._sweep_variants(referenced, cutoff_ts, dry_run)
+        removed_count += count
+        removed_bytes += size
+
+        if options['legacy']:
+            for dir_name in LEGACY_DIRS:
+                count, size = self._sweep(
+                    os.path.join(storage.upload_root(), dir_name), referenced, cutoff_ts, dry_run
+                )
+                removed_count += count
+                removed_bytes += size
+
+        action = '可回收' if dry_run else '已回收'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action}文件 {removed_count} 个，共 {removed_bytes / 1024 / 1024:.2f} MB'
+        ))
+
+    def _sweep_variants(self, referenced, cutoff_ts, dry_run):
+        """衍生图路径为 variants/<规格>/<原图去扩展名>.webp，原图无引用时一并删除"""
+        variant_root = os.path.join(storage.upload_root(), images.VARIANT_DIR)
+        live_variants = set()
+        for path in referenced:
+            if images.is_image(path):
+                for variant in images.variant_specs():
+                    live_variants.add(images.variant_relative_path(path, variant))
+        return self._sweep(variant_root, live_variants, cutoff_ts, dry_run)
+
+    def _sweep(self, directory, referenced, cutoff_ts, dry_run):
+        """遍历目录删除未被引用且超过宽限时间的文件"""
+        removed_count = 0
+        removed_bytes = 0
+        if not os.path.isdir(directory):
+            return removed_count, removed_bytes
+
+        root_dir = storage.upload_root()
+        for current_dir, _, file_names in os.walk(directory):
+            for file_name in file_names:
+                file_path = os.path.join(current_dir, file_name)
+                relative_path = os.path.relpath(file_path, root_dir).replace(os.sep, '/')
+                if relative_path in referenced:
+                    continue
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    continue
+                if stat.st_mtime > cutoff_ts:
+                    continue
+                removed_count += 1
+                removed_bytes += stat.st_size
+                if not dry_run:
+                    try:
+                        os.remove(file_path)
+                    except OSError as e:
+                        self.stderr.write(f'删除失败 {relative_path}: {e}')
+        return removed_count, removed_bytes
@@ -0,0 +1,25 @@
+"""
+Django管理命令：重建咨询师可预约时段位图
+位图（CounselorAvailability）正常情况下随排班和停诊的保存、删除同步，Excel导入排班后也会重算；
+用 queryset.update、bulk_create 等方式修改排班或停诊、或直接修改数据库之后，用本命令从排班表和停诊表整体重建。
+长期有效的周期排班规则只展开到今天起 SCHEDULE_RULE_HORIZON_DAYS 天，需每天执行一次本命令使展开范围向后滚动
+"""
+from django.core.management.base import BaseCommand
+
+from Consultant import availability
+
+
+class Command(BaseCommand):
+    help = '从排班表（Schedule、CounselorSchedule）、周期排班规则和停诊表重建咨询师每日可预约时段位图'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--counselors',
+            nargs='+',
+            type=int,
+            help='只重建指定咨询师ID（默认全部）'
+        )
+
+    def handle(self, *args, **options):
+        total = availability.rebuild(options['counselors'])
+        self.stdout.write(self.style.SUCCESS(f'已重建 {total} 个咨询师日的可预约时段位图'))
@@ -0,0 +1,44 @@
+"""
+Django管理命令：核对并重建咨询师标签索引
+标签关联（CounselorTag）正常情况下随咨询师和咨询师详情的保存同步；
+批量写入（bulk_create、queryset.update）或直接修改数据库之后，用本命令与咨询师资料核对，或整体重建
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from Consultant import tags
+
+
+class Command(BaseCommand):
+    help = '核对咨询师标签索引与咨询师的擅长标签、咨询方式，不一致或指定 --force 时重建'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='不一致时返回非零退出码（不重建，可用于定时巡检）'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='一致时也重建（同时清理不再使用的标签）'
+        )
+
+    def handle(self, *args, **options):
+        drift = tags.drift()
+        if drift:
+            self.stdout.write(self.style.WARNING(
+                f"{len(drift)} 个咨询师的标签索引不一致：{', '.join(str(counselor_id) for counselor_id in drift[:20])}"
+                + (' ...' if len(drift) > 20 else '')
+            ))
+
+        if options['check']:
+            if drift:
+                raise CommandError('咨询师标签索引与咨询师资料不一致')
+            self.stdout.write('咨询师标签索引一致')
+            return
+        if not (drift or options['force']):
+            self.stdout.write('咨询师标签索引一致，无需重建')
+            return
+
+        counselors, links = tags.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'已重建 {counselors} 个咨询师的标签索引，共 {links} 条关联'))
@@ -0,0 +1,37 @@
+"""
+Django管理命令：重建访谈危机标记和危机关注名单
+危机标记（SessionCrisisFlag）和关注名单（CrisisWatch）正常情况下随访谈保存同步；
+修改 CRISIS_LEVELS 等风险等级配置、批量写入访谈或直接修改数据库之后，用本命令从访谈记录整体重建
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from Consultant import crisis
+
+
+class Command(BaseCommand):
+    help = '解析全部访谈的危机状态，重建危机标记和每个档案最近一次访谈的危机关注名单'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--records',
+            nargs='+',
+            type=int,
+            help='只重建指定档案ID（默认全部）'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='每批读取的访谈数（默认：1000）'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size 必须大于0')
+
+        sessions, watches = crisis.rebuild(options['records'], options['batch_size'])
+        high_risk = crisis.watchlist().count()
+        self.stdout.write(self.style.SUCCESS(
+            f'已重建 {sessions} 条访谈的危机标记，关注名单 {watches} 个档案，'
+            f'其中风险等级不低于 {crisis.watch_level()} 的 {high_risk} 个'
+        ))
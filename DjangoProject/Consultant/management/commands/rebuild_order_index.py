@@ -0,0 +1,52 @@
+"""
+Django管理命令：核对并重建订单索引
+订单索引（OrderIndex）正常情况下由信号随预约订单、咨询订单和档案的写入同步；
+批量写入（bulk_create、queryset.update）或直接修改数据库之后，用本命令按各表行数核对，或从业务表和归档表整体重建
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from Consultant import order_index
+
+
+class Command(BaseCommand):
+    help = '核对订单索引与预约订单、咨询订单（含归档表）的行数，不一致或指定 --force 时重建索引'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='行数不一致时返回非零退出码（不重建，可用于定时巡检）'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='行数一致时也重建（如批量修改了订单的状态、日期等字段之后）'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='重建时每批读取和写入的行数（默认：1000）'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size 必须大于0')
+
+        mismatched = False
+        self.stdout.write(f"{'来源':<14}{'归档':>6}{'索引行数':>10}{'实际行数':>10}")
+        for (source, archived), (indexed, actual) in order_index.counts().items():
+            mismatched = mismatched or indexed != actual
+            line = f"{source:<14}{'是' if archived else '否':>6}{indexed:>10}{actual:>10}"
+            self.stdout.write(self.style.WARNING(line) if indexed != actual else line)
+
+        if options['check']:
+            if mismatched:
+                raise CommandError('订单索引与订单表行数不一致')
+            return
+        if not (mismatched or options['force']):
+            self.stdout.write('订单索引与订单表行数一致，无需重建')
+            return
+
+        total = order_index.rebuild(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'订单索引已重建，共 {total} 行'))
@@ -0,0 +1,53 @@
+"""
+Django管理命令：核对并修正访谈计数和评分汇总
+档案的访谈次数（interview_count）应等于最大访谈编号，咨询师的访谈总数（consultation_count）应等于名下档案（含已归档）的访谈数，
+咨询师评分汇总（CounselorRatingSummary）应与评价表一致；
+正常情况下它们随访谈、评价的写入在同一事务中更新，本命令用于直接修改数据库或导入历史数据之后的检查
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from Consultant import counters, ratings
+
+
+class Command(BaseCommand):
+    help = '核对档案访谈次数、咨询师访谈总数和评分汇总，修正与访谈记录、评价不一致的计数'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='只列出不一致的计数，不修正'
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='存在不一致时返回非零退出码（不修正，可用于定时巡检）'
+        )
+
+    def handle(self, *args, **options):
+        record_rows = counters.record_drift()
+        profile_rows = counters.profile_drift()
+        rating_ids = ratings.summary_drift()
+
+        self.stdout.write(f'访谈次数不一致的档案: {len(record_rows)}')
+        for record_id, current, expected in record_rows[:20]:
+            self.stdout.write(f'  档案 {record_id}: {current} -> {expected}')
+        self.stdout.write(f'访谈总数不一致的咨询师: {len(profile_rows)}')
+        for counselor_id, current, expected in profile_rows[:20]:
+            self.stdout.write(f'  咨询师 {counselor_id}: {current} -> {expected}')
+        self.stdout.write(f'评分汇总不一致的咨询师: {len(rating_ids)}')
+        if rating_ids:
+            self.stdout.write(f"  咨询师 {', '.join(str(counselor_id) for counselor_id in rating_ids[:20])}")
+
+        if options['check']:
+            if record_rows or profile_rows or rating_ids:
+                raise CommandError('计数与访谈记录或评价不一致')
+            return
+        if options['dry_run'] or not (record_rows or profile_rows or rating_ids):
+            return
+
+        records, profiles = counters.fix_drift(record_rows, profile_rows)
+        rebuilt = ratings.rebuild(rating_ids) if rating_ids else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'已修正 {records} 个档案、{profiles} 个咨询师的计数，重建 {rebuilt} 个咨询师的评分汇总'
+        ))
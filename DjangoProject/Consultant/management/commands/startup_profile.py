@@ -0,0 +1,195 @@
+"""
+Django管理命令：启动耗时与内存分析
+在子进程中以 python -X importtime 执行 django.setup() 并加载全部URL配置（与worker处理第一个请求前的状态相同），
+汇总各顶层包的导入耗时，报告 setup 前后的常驻内存（RSS），并检查 pandas 等重型依赖是否在启动时被加载
+重型依赖应在首次使用时导入（如上传接口内的 import pandas），可将 --check 加入CI跟踪启动性能回退
+"""
+import json
+import os
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+# 只在特定接口中使用、不应在启动时加载的依赖
+# （email.mime、markdown 分别由 django.utils.log 和 rest_framework.compat 在启动时导入，不在检查范围内）
+HEAVY_MODULES = ('pandas', 'numpy', 'openpyxl', 'PIL', 'smtplib')
+
+# 子进程执行的脚本：输出 setup 前后的RSS（KB）和启动时已加载的重型依赖
+_CHILD_SCRIPT = r'''
+import json, os, sys, time
+
+def rss_kb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    try:
+        import resource
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage // 1024 if sys.platform == 'darwin' else usage
+    except ImportError:
+        return 0
+
+baseline = rss_kb()
+start = time.perf_counter()
+import django
+django.setup()
+setup_ms = (time.perf_counter() - start) * 1000
+after_setup = rss_kb()
+from django.urls import get_resolver
+get_resolver().url_patterns
+total_ms = (time.perf_counter() - start) * 1000
+heavy = [name for name in json.loads(sys.argv[1]) if name in sys.modules]
+print(json.dumps({
+    'baseline_kb': baseline,
+    'setup_kb': after_setup,
+    'urls_kb': rss_kb(),
+    'setup_ms': setup_ms,
+    'total_ms': total_ms,
+    'heavy': heavy,
+}))
+'''
+
+
+def parse_importtime(output):
+    """
+    解析 -X importtime 输出，返回 [(模块名, 自身耗时us, 累计耗时us, 层级)]
+    每行格式：import time:   self [us] | cumulative | imported package
+    """
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue  # 表头
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), self_us, cumulative_us, depth))
+    return entries
+
+
+def import_chain(entries, module):
+    """
+    返回导入 module 的模块链 [module, 父模块, ..., 顶层模块]，未导入时返回空列表
+    -X importtime 先输出子模块，其后第一个层级更小的行即为导入它的模块
+    """
+    for index, (name, _, _, depth) in enumerate(entries):
+        if name != module:
+            continue
+        chain = [name]
+        for parent, _, _, parent_depth in entries[index + 1:]:
+            if parent_depth < depth:
+                chain.append(parent)
+                depth = parent_depth
+            if depth == 0:
+                break
+        return chain
+    return []
+
+
+def top_level_packages(entries):
+    """按顶层包汇总自身耗时（包含其全部子模块），返回 {包名: 耗时us}"""
+    totals = {}
+    for name, self_us, _, _ in entries:
+        package = name.split('.')[0]
+        totals[package] = totals.get(package, 0) + self_us
+    return totals
+
+
+class Command(BaseCommand):
+    help = '分析 django.setup() 和URL配置加载的导入耗时、常驻内存，检查启动时是否加载了重型依赖'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=15,
+            help='显示耗时最多的前N个包和模块（默认：15）'
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='以JSON格式输出（便于记录和对比）'
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='启动时加载了重型依赖（%s）则返回非零退出码' % ', '.join(HEAVY_MODULES)
+        )
+
+    def handle(self, *args, **options):
+        result = self.profile()
+        packages = sorted(top_level_packages(result['imports']).items(), key=lambda item: item[1], reverse=True)
+        modules = sorted(result['imports'], key=lambda entry: entry[1], reverse=True)
+        top = options['top']
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'setup_ms': round(result['setup_ms'], 1),
+                'total_ms': round(result['total_ms'], 1),
+                'baseline_rss_kb': result['baseline_kb'],
+                'setup_rss_kb': result['setup_kb'],
+                'urls_rss_kb': result['urls_kb'],
+                'heavy_modules': {name: import_chain(result['imports'], name)[1:] for name in result['heavy']},
+                'packages': [{'name': name, 'ms': round(us / 1000, 1)} for name, us in packages[:top]],
+                'modules': [{'name': name, 'self_ms': round(self_us / 1000, 1), 'cumulative_ms': round(cumulative_us / 1000, 1)}
+                            for name, self_us, cumulative_us, _ in modules[:top]],
+            }, ensure_ascii=False, indent=2))
+        else:
+            self.report(result, packages[:top], modules[:top])
+
+        if options['check'] and result['heavy']:
+            raise CommandError(f"启动时加载了重型依赖：{', '.join(result['heavy'])}")
+
+    def profile(self):
+        """在全新的子进程中执行启动过程（当前进程已完成 setup，无法再统计）"""
+        env = dict(os.environ)
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'DjangoProject.settings')
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', _CHILD_SCRIPT, json.dumps(HEAVY_MODULES)],
+            capture_output=True,
+            text=True,
+            env=env,
+            cwd=os.getcwd(),
+        )
+        if completed.returncode != 0:
+            raise CommandError(f'启动失败：\n{completed.stderr[-2000:]}')
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        result['imports'] = parse_importtime(completed.stderr)
+        return result
+
+    def report(self, result, packages, modules):
+        mb = lambda kb: kb / 1024
+        self.stdout.write(
+            f"django.setup(): {result['setup_ms']:.0f} ms，加载URL配置后共 {result['total_ms']:.0f} ms"
+            f"（含导入时间统计本身的开销），共导入 {len(result['imports'])} 个模块"
+        )
+        self.stdout.write(
+            f"常驻内存：解释器启动 {mb(result['baseline_kb']):.1f} MB，setup 后 {mb(result['setup_kb']):.1f} MB，"
+            f"加载URL配置后 {mb(result['urls_kb']):.1f} MB"
+        )
+
+        self.stdout.write(f"\n{'顶层包':<32}{'导入耗时(ms)':>14}")
+        for name, us in packages:
+            self.stdout.write(f"{name:<32}{us / 1000:>14.1f}")
+
+        self.stdout.write(f"\n{'模块':<48}{'自身(ms)':>10}{'累计(ms)':>10}")
+        for name, self_us, cumulative_us, _ in modules:
+            self.stdout.write(f"{name:<48}{self_us / 1000:>10.1f}{cumulative_us / 1000:>10.1f}")
+
+        if result['heavy']:
+            self.stdout.write(self.style.WARNING(f"\n启动时加载了重型依赖：{', '.join(result['heavy'])}，应改为在使用处导入"))
+            for name in result['heavy']:
+                self.stdout.write(f"  {' <- '.join(import_chain(result['imports'], name))}")
+        else:
+            self.stdout.write(self.style.SUCCESS('\n启动时未加载重型依赖'))
@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-19 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Consultant", "0004_counselorprofile_experience"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="filestorage",
+            name="content_hash",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                default="",
+                max_length=64,
+                verbose_name="内容哈希(SHA-256)",
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-19 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Consultant", "0005_filestorage_content_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="consultationrecord",
+            name="interview_type",
+            field=models.CharField(
+                blank=True, max_length=50, null=True, verbose_name="访谈类型"
+            ),
+        ),
+    ]
@@ -0,0 +1,425 @@
+# Generated by Django 5.2 on 2026-10-19 10:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("CounselorAdmin", "0011_archivedappointment"),
+        ("Consultant", "0006_consultationrecord_interview_type"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedConsultationRecord",
+            fields=[
+                (
+                    "id",
+                    models.BigIntegerField(
+                        primary_key=True, serialize=False, verbose_name="主键ID"
+                    ),
+                ),
+                (
+                    "record_no",
+                    models.CharField(
+                        max_length=20, unique=True, verbose_name="档案编号"
+                    ),
+                ),
+                (
+                    "client_name",
+                    models.CharField(max_length=50, verbose_name="来访者姓名"),
+                ),
+                (
+                    "client_type",
+                    models.CharField(
+                        choices=[("student", "student"), ("adult", "adult")],
+                        default="student",
+                        max_length=10,
+                        verbose_name="来访者类型",
+                    ),
+                ),
+                (
+                    "gender",
+                    models.CharField(
+                        choices=[("男", "男"), ("女", "女")],
+                        max_length=2,
+                        verbose_name="性别",
+                    ),
+                ),
+                (
+                    "age",
+                    models.IntegerField(blank=True, null=True, verbose_name="年龄"),
+                ),
+                (
+                    "student_id",
+                    models.CharField(
+                        blank=True,
+                        max_length=50,
+                        null=True,
+                        verbose_name="学籍号(学生类型)",
+                    ),
+                ),
+                (
+                    "school",
+                    models.CharField(
+                        blank=True, max_length=100, null=True, verbose_name="学校"
+                    ),
+                ),
+                (
+                    "grade",
+                    models.CharField(
+                        blank=True, max_length=20, null=True, verbose_name="年级"
+                    ),
+                ),
+                (
+                    "class_name",
+                    models.CharField(
+                        blank=True, max_length=20, null=True, verbose_name="班级"
+                    ),
+                ),
+                (
+                    "education",
+                    models.CharField(
+                        blank=True,
+                        max_length=50,
+                        null=True,
+                        verbose_name="教育程度(成人类型)",
+                    ),
+                ),
+                (
+                    "occupation",
+                    models.CharField(
+                        blank=True,
+                        max_length=50,
+                        null=True,
+                        verbose_name="职业(成人类型)",
+                    ),
+                ),
+                (
+                    "contact",
+                    models.CharField(
+                        blank=True, max_length=100, null=True, verbose_name="联系方式"
+                    ),
+                ),
+                (
+                    "emergency_contact_name",
+                    models.CharField(
+                        blank=True,
+                        max_length=50,
+                        null=True,
+                        verbose_name="紧急联系人姓名",
+                    ),
+                ),
+                (
+                    "emergency_contact_phone",
+                    models.CharField(
+                        blank=True,
+                        max_length=20,
+                        null=True,
+                        verbose_name="紧急联系人电话",
+                    ),
+                ),
+                (
+                    "referral_source",
+                    models.CharField(
+                        blank=True, max_length=200, null=True, verbose_name="咨询来源"
+                    ),
+                ),
+                (
+                    "main_complaint",
+                    models.TextField(blank=True, null=True, verbose_name="主诉问题"),
+                ),
+                (
+                    "consultation_goal",
+                    models.TextField(blank=True, null=True, verbose_name="咨询目标"),
+                ),
+                (
+                    "interview_count",
+                    models.IntegerField(default=0, verbose_name="总访谈次数"),
+                ),
+                (
+                    "interview_type",
+                    models.CharField(
+                        blank=True, max_length=50, null=True, verbose_name="访谈类型"
+                    ),
+                ),
+                (
+                    "current_status",
+                    models.CharField(
+                        choices=[
+                            ("active", "active"),
+                            ("completed", "completed"),
+                            ("closed", "closed"),
+                        ],
+                        max_length=10,
+                        verbose_name="档案状态",
+                    ),
+                ),
+                (
+                    "created_time",
+                    models.DateTimeField(db_index=True, verbose_name="创建时间"),
+                ),
+                (
+                    "archived_time",
+                    models.DateTimeField(auto_now_add=True, verbose_name="归档时间"),
+                ),
+                (
+                    "counselor",
+                    models.ForeignKey(
+                        blank=True,
+                        db_constraint=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="CounselorAdmin.counselor",
+                        verbose_name="负责咨询师",
+                    ),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        db_constraint=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="CounselorAdmin.counselor",
+                        verbose_name="创建人",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "咨询档案（归档）",
+                "verbose_name_plural": "咨询档案（归档）",
+                "db_table": "consultation_records_archive",
+            },
+        ),
+        migrations.AlterField(
+            model_name="consultationreview",
+            name="order",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="reviews",
+                to="Consultant.consultationorder",
+                verbose_name="订单",
+            ),
+        ),
+        migrations.CreateModel(
+            name="ArchivedConsultationSession",
+            fields=[
+                (
+                    "id",
+                    models.BigIntegerField(
+                        primary_key=True, serialize=False, verbose_name="主键ID"
+                    ),
+                ),
+                ("session_number", models.IntegerField(verbose_name="第几次访谈")),
+                ("interview_date", models.DateField(verbose_name="访谈日期")),
+                (
+                    "interview_time",
+                    models.CharField(
+                        blank=True, max_length=50, null=True, verbose_name="访谈时间"
+                    ),
+                ),
+                (
+                    "duration",
+                    models.IntegerField(
+                        blank=True, null=True, verbose_name="访谈时长(分钟)"
+                    ),
+                ),
+                (
+                    "visit_status",
+                    models.CharField(
+                        choices=[
+                            ("scheduled", "scheduled"),
+                            ("completed", "completed"),
+                            ("cancelled", "cancelled"),
+                        ],
+                        max_length=10,
+                        verbose_name="访谈状态",
+                    ),
+                ),
+                (
+                    "objective_description",
+                    models.TextField(blank=True, null=True, verbose_name="客观描述"),
+                ),
+                (
+                    "doctor_evaluation",
+                    models.TextField(blank=True, null=True, verbose_name="医生评定"),
+                ),
+                (
+                    "follow_up_plan",
+                    models.TextField(blank=True, null=True, verbose_name="后续计划"),
+                ),
+                (
+                    "next_visit_plan",
+                    models.TextField(
+                        blank=True, null=True, verbose_name="下次访谈计划"
+                    ),
+                ),
+                (
+                    "crisis_status",
+                    models.CharField(
+                        blank=True, max_length=50, null=True, verbose_name="危机状态"
+                    ),
+                ),
+                (
+                    "consultant_name",
+                    models.CharField(
+                        blank=True, max_length=50, null=True, verbose_name="咨询师姓名"
+                    ),
+                ),
+                (
+                    "is_third_party_evaluation",
+                    models.BooleanField(default=False, verbose_name="是否为他评"),
+                ),
+                (
+                    "signature_image",
+                    models.CharField(
+                        blank=True,
+                        max_length=500,
+                        null=True,
+                        verbose_name="签名图片URL",
+                    ),
+                ),
+                (
+                    "attach_images",
+                    models.JSONField(
+                        blank=True, null=True, verbose_name="附加图片URL数组"
+                    ),
+                ),
+                ("created_time", models.DateTimeField(verbose_name="创建时间")),
+                (
+                    "archived_time",
+                    models.DateTimeField(auto_now_add=True, verbose_name="归档时间"),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        db_constraint=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="CounselorAdmin.counselor",
+                        verbose_name="创建人",
+                    ),
+                ),
+                (
+                    "record",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="sessions",
+                        to="Consultant.archivedconsultationrecord",
+                        verbose_name="档案",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "咨询访谈（归档）",
+                "verbose_name_plural": "咨询访谈（归档）",
+                "db_table": "consultation_sessions_archive",
+            },
+        ),
+        migrations.CreateModel(
+            name="ArchivedConsultationOrder",
+            fields=[
+                (
+                    "id",
+                    models.BigIntegerField(
+                        primary_key=True, serialize=False, verbose_name="主键ID"
+                    ),
+                ),
+                (
+                    "order_no",
+                    models.CharField(
+                        max_length=30, unique=True, verbose_name="订单编号"
+                    ),
+                ),
+                (
+                    "record_id",
+                    models.BigIntegerField(
+                        blank=True, db_index=True, null=True, verbose_name="关联档案ID"
+                    ),
+                ),
+                (
+                    "service_type",
+                    models.CharField(
+                        choices=[("online", "online"), ("offline", "offline")],
+                        max_length=10,
+                        verbose_name="服务类型",
+                    ),
+                ),
+                (
+                    "counseling_keywords",
+                    models.JSONField(
+                        blank=True, null=True, verbose_name="咨询关键词数组"
+                    ),
+                ),
+                ("appointment_date", models.DateField(verbose_name="预约日期")),
+                ("time_slot", models.CharField(max_length=50, verbose_name="预约时段")),
+                (
+                    "contact_info",
+                    models.CharField(
+                        blank=True, max_length=100, null=True, verbose_name="联系方式"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "pending"),
+                            ("accepted", "accepted"),
+                            ("completed", "completed"),
+                            ("cancelled", "cancelled"),
+                            ("rejected", "rejected"),
+                        ],
+                        max_length=10,
+                        verbose_name="订单状态",
+                    ),
+                ),
+                ("submit_time", models.DateTimeField(verbose_name="提交时间")),
+                (
+                    "accept_time",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="接单时间"
+                    ),
+                ),
+                (
+                    "end_time",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="结束时间"
+                    ),
+                ),
+                (
+                    "created_time",
+                    models.DateTimeField(db_index=True, verbose_name="创建时间"),
+                ),
+                (
+                    "archived_time",
+                    models.DateTimeField(auto_now_add=True, verbose_name="归档时间"),
+                ),
+                (
+                    "counselor",
+                    models.ForeignKey(
+                        blank=True,
+                        db_constraint=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="CounselorAdmin.counselor",
+                        verbose_name="咨询师",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "咨询订单（归档）",
+                "verbose_name_plural": "咨询订单（归档）",
+                "db_table": "consultation_orders_archive",
+            },
+        ),
+    ]
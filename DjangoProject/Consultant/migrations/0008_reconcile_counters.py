@@ -0,0 +1,56 @@
+# Generated by Django 5.2 on 2026-10-19 11:05
+
+from django.db import migrations
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def reconcile_counters(apps, schema_editor):
+    """
+    访谈编号改为按 interview_count 原子分配前，先把已有档案的访谈次数修正为最大访谈编号，
+    咨询师访谈总数修正为名下档案（含已归档）的访谈数
+    """
+    ConsultationRecord = apps.get_model("Consultant", "ConsultationRecord")
+    ConsultationSession = apps.get_model("Consultant", "ConsultationSession")
+    ArchivedConsultationSession = apps.get_model(
+        "Consultant", "ArchivedConsultationSession"
+    )
+    CounselorProfile = apps.get_model("Consultant", "CounselorProfile")
+
+    max_number = (
+        ConsultationSession.objects.filter(record_id=OuterRef("pk"))
+        .values("record_id")
+        .annotate(value=Max("session_number"))
+        .values("value")
+    )
+    ConsultationRecord.objects.update(interview_count=Coalesce(Subquery(max_number), 0))
+
+    totals = {}
+    for session_model in (ConsultationSession, ArchivedConsultationSession):
+        rows = (
+            session_model.objects.exclude(record__counselor_id=None)
+            .values("record__counselor_id")
+            .annotate(total=Count("id"))
+            .values_list("record__counselor_id", "total")
+        )
+        for counselor_id, total in rows:
+            totals[counselor_id] = totals.get(counselor_id, 0) + total
+    for profile in CounselorProfile.objects.only(
+        "id", "counselor_id", "consultation_count"
+    ):
+        expected = totals.get(profile.counselor_id, 0)
+        if profile.consultation_count != expected:
+            CounselorProfile.objects.filter(id=profile.id).update(
+                consultation_count=expected
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Consultant", "0007_archivedconsultationrecord_and_more"),
+    ]
+
+    operations = [
+        migrations.RunPython(reconcile_counters, migrations.RunPython.noop),
+    ]
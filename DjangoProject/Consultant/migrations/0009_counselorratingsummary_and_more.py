@@ -0,0 +1,132 @@
+# Generated by Django 5.2 on 2026-10-19 12:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_rating_summaries(apps, schema_editor):
+    """按已有评价生成咨询师评分汇总和每日评分，之后由信号增量维护"""
+    ConsultationReview = apps.get_model("Consultant", "ConsultationReview")
+    CounselorRatingSummary = apps.get_model("Consultant", "CounselorRatingSummary")
+    CounselorRatingDaily = apps.get_model("Consultant", "CounselorRatingDaily")
+
+    aggregates = {
+        "review_count": Count("id"),
+        "rating_sum": Sum("rating"),
+        **{
+            f"rating_{rating}": Count("id", filter=Q(rating=rating))
+            for rating in range(1, 6)
+        },
+    }
+    summaries = []
+    for row in (
+        ConsultationReview.objects.values("counselor_id")
+        .annotate(**aggregates)
+        .order_by()
+    ):
+        row["average_rating"] = row["rating_sum"] / row["review_count"]
+        summaries.append(CounselorRatingSummary(**row))
+    CounselorRatingSummary.objects.bulk_create(summaries)
+
+    rows = (
+        ConsultationReview.objects.annotate(day=TruncDate("created_time"))
+        .values("counselor_id", "day")
+        .annotate(review_count=Count("id"), rating_sum=Sum("rating"))
+        .order_by()
+    )
+    CounselorRatingDaily.objects.bulk_create(
+        [CounselorRatingDaily(**row) for row in rows]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("CounselorAdmin", "0011_archivedappointment"),
+        ("Consultant", "0008_reconcile_counters"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CounselorRatingSummary",
+            fields=[
+                (
+                    "counselor",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="rating_summary",
+                        serialize=False,
+                        to="CounselorAdmin.counselor",
+                        verbose_name="咨询师",
+                    ),
+                ),
+                ("review_count", models.IntegerField(default=0, verbose_name="评价数")),
+                ("rating_sum", models.IntegerField(default=0, verbose_name="评分总和")),
+                ("rating_1", models.IntegerField(default=0, verbose_name="1分评价数")),
+                ("rating_2", models.IntegerField(default=0, verbose_name="2分评价数")),
+                ("rating_3", models.IntegerField(default=0, verbose_name="3分评价数")),
+                ("rating_4", models.IntegerField(default=0, verbose_name="4分评价数")),
+                ("rating_5", models.IntegerField(default=0, verbose_name="5分评价数")),
+                (
+                    "average_rating",
+                    models.FloatField(
+                        db_index=True, default=0, verbose_name="平均评分"
+                    ),
+                ),
+                (
+                    "updated_time",
+                    models.DateTimeField(auto_now=True, verbose_name="更新时间"),
+                ),
+            ],
+            options={
+                "verbose_name": "咨询师评分汇总",
+                "verbose_name_plural": "咨询师评分汇总",
+                "db_table": "counselor_rating_summaries",
+            },
+        ),
+        migrations.AlterField(
+            model_name="consultationreview",
+            name="order",
+            field=models.ForeignKey(
+                db_constraint=False,
+                null=True,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="reviews",
+                to="Consultant.consultationorder",
+                verbose_name="订单",
+            ),
+        ),
+        migrations.CreateModel(
+            name="CounselorRatingDaily",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        primary_key=True, serialize=False, verbose_name="主键ID"
+                    ),
+                ),
+                ("day", models.DateField(verbose_name="日期")),
+                ("review_count", models.IntegerField(default=0, verbose_name="评价数")),
+                ("rating_sum", models.IntegerField(default=0, verbose_name="评分总和")),
+                (
+                    "counselor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="rating_daily",
+                        to="CounselorAdmin.counselor",
+                        verbose_name="咨询师",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "咨询师每日评分",
+                "verbose_name_plural": "咨询师每日评分",
+                "db_table": "counselor_rating_daily",
+                "unique_together": {("counselor", "day")},
+            },
+        ),
+        migrations.RunPython(backfill_rating_summaries, migrations.RunPython.noop),
+    ]
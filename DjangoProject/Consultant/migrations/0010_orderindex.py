@@ -0,0 +1,279 @@
+# Generated by Django 5.2 on 2026-10-19 13:40
+
+import re
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 1000
+
+# 规范化规则写在迁移中，不随 Consultant.order_index 的修改而变化
+STATUS_MAP = {
+    "未开始": "pending",
+    "进行中": "active",
+    "已完成": "completed",
+    "pending": "pending",
+    "accepted": "active",
+    "completed": "completed",
+    "cancelled": "cancelled",
+    "rejected": "rejected",
+    "等待中": "pending",
+    "待接单": "pending",
+    "咨询中": "active",
+    "已结束": "completed",
+    "已取消": "cancelled",
+    "已拒绝": "rejected",
+}
+
+SERVICE_TYPE_MAP = {
+    "个体咨询": "individual",
+    "团体咨询": "group",
+    "家庭咨询": "family",
+    "危机干预": "crisis",
+    "在线咨询": "online",
+    "线下咨询": "offline",
+    "online": "online",
+    "offline": "offline",
+}
+
+_KEYWORD_SEPARATORS = re.compile(r"[,，、;；\s]+")
+
+
+def normalize_status(value):
+    return STATUS_MAP.get(value, value or "")
+
+
+def normalize_service_type(value):
+    return SERVICE_TYPE_MAP.get(value, value or "")
+
+
+def parse_keywords(value):
+    if not value:
+        return []
+    if isinstance(value, (list, tuple)):
+        items = value
+    else:
+        items = _KEYWORD_SEPARATORS.split(str(value))
+    return [
+        str(item).strip() for item in items if item is not None and str(item).strip()
+    ]
+
+
+# 时段解析写在迁移中，不随 Consultant.timeslots 的修改而变化
+_TIME_RANGE = re.compile(
+    r"(\d{1,2})\s*[:：]\s*(\d{2})(?:\s*[-~～至到—–]+\s*(\d{1,2})\s*[:：]\s*(\d{2}))?"
+)
+
+
+def parse_time_slot(value):
+    match = _TIME_RANGE.search(value or "")
+    if not match:
+        return None, None
+    start_hour, start_minute, end_hour, end_minute = match.groups()
+    start = int(start_hour) * 60 + int(start_minute)
+    if start >= 24 * 60:
+        return None, None
+    if end_hour is None:
+        return start, None
+    end = int(end_hour) * 60 + int(end_minute)
+    return start, end if start < end <= 24 * 60 else None
+
+
+def backfill_order_index(apps, schema_editor):
+    """按已有的预约订单、咨询订单（含归档表）生成订单索引，之后由信号同步"""
+    OrderIndex = apps.get_model("Consultant", "OrderIndex")
+    ConsultationRecord = apps.get_model("Consultant", "ConsultationRecord")
+    ArchivedConsultationRecord = apps.get_model(
+        "Consultant", "ArchivedConsultationRecord"
+    )
+    sources = [
+        ("appointment", False, apps.get_model("CounselorAdmin", "Appointment")),
+        ("appointment", True, apps.get_model("CounselorAdmin", "ArchivedAppointment")),
+        ("order", False, apps.get_model("Consultant", "ConsultationOrder")),
+        ("order", True, apps.get_model("Consultant", "ArchivedConsultationOrder")),
+    ]
+
+    for source, archived, model in sources:
+        last = 0
+        while True:
+            batch = list(model.objects.filter(pk__gt=last).order_by("pk")[:BATCH_SIZE])
+            if not batch:
+                break
+            records = {}
+            if source == "order":
+                record_ids = {obj.record_id for obj in batch} - {None}
+                records = ConsultationRecord.objects.in_bulk(record_ids)
+                records.update(
+                    ArchivedConsultationRecord.objects.in_bulk(
+                        record_ids - set(records)
+                    )
+                )
+            rows = []
+            for obj in batch:
+                start, end = parse_time_slot(obj.time_slot)
+                if source == "appointment":
+                    client = {
+                        "record_id": None,
+                        "client_name": obj.client_name or "",
+                        "client_gender": obj.client_gender or "",
+                        "client_age": obj.client_age,
+                        "created_time": obj.submit_time,
+                    }
+                else:
+                    record = records.get(obj.record_id)
+                    client = {
+                        "record_id": obj.record_id,
+                        "client_name": record.client_name if record else "",
+                        "client_gender": record.gender if record else "",
+                        "client_age": record.age if record else None,
+                        "created_time": obj.created_time,
+                    }
+                rows.append(
+                    OrderIndex(
+                        source=source,
+                        source_id=obj.pk,
+                        archived=archived,
+                        order_no=obj.order_no,
+                        counselor_id=obj.counselor_id,
+                        status=normalize_status(obj.status),
+                        service_type=normalize_service_type(obj.service_type),
+                        keywords=parse_keywords(obj.counseling_keywords),
+                        appointment_date=obj.appointment_date,
+                        time_slot=obj.time_slot or "",
+                        slot_start_minute=start,
+                        slot_end_minute=end,
+                        **client,
+                    )
+                )
+            OrderIndex.objects.bulk_create(rows)
+            last = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("CounselorAdmin", "0011_archivedappointment"),
+        ("Consultant", "0009_counselorratingsummary_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OrderIndex",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        primary_key=True, serialize=False, verbose_name="主键ID"
+                    ),
+                ),
+                (
+                    "source",
+                    models.CharField(
+                        choices=[("appointment", "预约订单"), ("order", "咨询订单")],
+                        max_length=12,
+                        verbose_name="来源",
+                    ),
+                ),
+                ("source_id", models.BigIntegerField(verbose_name="来源订单ID")),
+                ("archived", models.BooleanField(default=False, verbose_name="已归档")),
+                (
+                    "order_no",
+                    models.CharField(
+                        db_index=True, max_length=30, verbose_name="订单编号"
+                    ),
+                ),
+                (
+                    "record_id",
+                    models.BigIntegerField(
+                        blank=True, db_index=True, null=True, verbose_name="关联档案ID"
+                    ),
+                ),
+                (
+                    "client_name",
+                    models.CharField(
+                        blank=True, max_length=50, verbose_name="来访者姓名"
+                    ),
+                ),
+                (
+                    "client_gender",
+                    models.CharField(blank=True, max_length=2, verbose_name="性别"),
+                ),
+                (
+                    "client_age",
+                    models.IntegerField(blank=True, null=True, verbose_name="年龄"),
+                ),
+                ("status", models.CharField(max_length=10, verbose_name="规范化状态")),
+                (
+                    "service_type",
+                    models.CharField(
+                        blank=True, max_length=20, verbose_name="规范化服务类型"
+                    ),
+                ),
+                (
+                    "keywords",
+                    models.JSONField(
+                        blank=True, default=list, verbose_name="咨询关键词数组"
+                    ),
+                ),
+                (
+                    "appointment_date",
+                    models.DateField(blank=True, null=True, verbose_name="预约日期"),
+                ),
+                (
+                    "time_slot",
+                    models.CharField(
+                        blank=True, max_length=50, verbose_name="预约时段"
+                    ),
+                ),
+                (
+                    "slot_start_minute",
+                    models.IntegerField(
+                        blank=True, null=True, verbose_name="时段开始（当天分钟数）"
+                    ),
+                ),
+                (
+                    "slot_end_minute",
+                    models.IntegerField(
+                        blank=True, null=True, verbose_name="时段结束（当天分钟数）"
+                    ),
+                ),
+                ("created_time", models.DateTimeField(verbose_name="创建时间")),
+                (
+                    "counselor",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="order_index",
+                        to="CounselorAdmin.counselor",
+                        verbose_name="咨询师",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "订单索引",
+                "verbose_name_plural": "订单索引",
+                "db_table": "order_index",
+                "indexes": [
+                    models.Index(
+                        fields=["source", "archived", "status"],
+                        name="order_index_source_4977b4_idx",
+                    ),
+                    models.Index(
+                        fields=["counselor", "source", "archived", "created_time"],
+                        name="order_index_counsel_8150db_idx",
+                    ),
+                    models.Index(
+                        fields=["counselor", "appointment_date"],
+                        name="order_index_counsel_bb8f6f_idx",
+                    ),
+                    models.Index(
+                        fields=["source", "appointment_date"],
+                        name="order_index_source_f89430_idx",
+                    ),
+                ],
+                "unique_together": {("source", "source_id")},
+            },
+        ),
+        migrations.RunPython(backfill_order_index, migrations.RunPython.noop),
+    ]
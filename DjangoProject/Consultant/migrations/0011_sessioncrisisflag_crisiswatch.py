@@ -0,0 +1,225 @@
+# Generated by Django 5.2 on 2026-10-19 15:05
+
+import json
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 1000
+
+# 解析和分级规则写在迁移中，不随 Consultant.crisis 的修改而变化（等级配置仍读取 settings）
+DEFAULT_LEVELS = {
+    "无": 0,
+    "低风险": 1,
+    "中风险": 2,
+    "高风险": 3,
+}
+
+
+def parse_flags(value):
+    if not value:
+        return []
+    if isinstance(value, list):
+        items = value
+    else:
+        try:
+            parsed = json.loads(value)
+            items = parsed if isinstance(parsed, list) else [value]
+        except (ValueError, TypeError):
+            items = value.split(",")
+    flags = []
+    for item in items:
+        flag = str(item).strip() if item is not None else ""
+        if flag and flag not in flags:
+            flags.append(flag)
+    return flags
+
+
+def level_of(flag):
+    levels = getattr(settings, "CRISIS_LEVELS", DEFAULT_LEVELS)
+    return levels.get(flag, getattr(settings, "CRISIS_UNKNOWN_LEVEL", 1))
+
+
+def risk_level(flags):
+    return max((level_of(flag) for flag in flags), default=0)
+
+
+def backfill_crisis_flags(apps, schema_editor):
+    """解析已有访谈的危机状态，生成危机标记和每个档案最近一次访谈的关注名单"""
+    ConsultationSession = apps.get_model("Consultant", "ConsultationSession")
+    SessionCrisisFlag = apps.get_model("Consultant", "SessionCrisisFlag")
+    CrisisWatch = apps.get_model("Consultant", "CrisisWatch")
+
+    latest = {}
+    last = 0
+    while True:
+        batch = list(
+            ConsultationSession.objects.filter(id__gt=last)
+            .order_by("id")
+            .values(
+                "id",
+                "record_id",
+                "record__counselor_id",
+                "session_number",
+                "interview_date",
+                "crisis_status",
+            )[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        rows = []
+        for session in batch:
+            flags = parse_flags(session["crisis_status"])
+            rows.extend(
+                SessionCrisisFlag(
+                    session_id=session["id"], flag=flag, level=level_of(flag)
+                )
+                for flag in flags
+            )
+            current = latest.get(session["record_id"])
+            if (
+                current is None
+                or session["session_number"] > current[0]["session_number"]
+            ):
+                latest[session["record_id"]] = (session, flags)
+        SessionCrisisFlag.objects.bulk_create(rows)
+        last = batch[-1]["id"]
+
+    CrisisWatch.objects.bulk_create(
+        [
+            CrisisWatch(
+                record_id=record_id,
+                counselor_id=session["record__counselor_id"],
+                session_id=session["id"],
+                session_number=session["session_number"],
+                interview_date=session["interview_date"],
+                flags=flags,
+                risk_level=risk_level(flags),
+            )
+            for record_id, (session, flags) in latest.items()
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("CounselorAdmin", "0011_archivedappointment"),
+        ("Consultant", "0010_orderindex"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SessionCrisisFlag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        primary_key=True, serialize=False, verbose_name="主键ID"
+                    ),
+                ),
+                (
+                    "flag",
+                    models.CharField(
+                        db_index=True, max_length=50, verbose_name="危机标记"
+                    ),
+                ),
+                (
+                    "level",
+                    models.IntegerField(
+                        db_index=True, default=0, verbose_name="风险等级"
+                    ),
+                ),
+                (
+                    "session",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="crisis_flags",
+                        to="Consultant.consultationsession",
+                        verbose_name="访谈",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "访谈危机标记",
+                "verbose_name_plural": "访谈危机标记",
+                "db_table": "consultation_session_crisis_flags",
+                "unique_together": {("session", "flag")},
+            },
+        ),
+        migrations.CreateModel(
+            name="CrisisWatch",
+            fields=[
+                (
+                    "record",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="crisis_watch",
+                        serialize=False,
+                        to="Consultant.consultationrecord",
+                        verbose_name="档案",
+                    ),
+                ),
+                (
+                    "session_number",
+                    models.IntegerField(default=0, verbose_name="访谈编号"),
+                ),
+                (
+                    "interview_date",
+                    models.DateField(blank=True, null=True, verbose_name="访谈日期"),
+                ),
+                (
+                    "flags",
+                    models.JSONField(
+                        blank=True, default=list, verbose_name="危机标记数组"
+                    ),
+                ),
+                ("risk_level", models.IntegerField(default=0, verbose_name="风险等级")),
+                (
+                    "updated_time",
+                    models.DateTimeField(auto_now=True, verbose_name="更新时间"),
+                ),
+                (
+                    "counselor",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="crisis_watches",
+                        to="CounselorAdmin.counselor",
+                        verbose_name="负责咨询师",
+                    ),
+                ),
+                (
+                    "session",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="Consultant.consultationsession",
+                        verbose_name="最近一次访谈",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "危机关注名单",
+                "verbose_name_plural": "危机关注名单",
+                "db_table": "crisis_watchlist",
+                "indexes": [
+                    models.Index(
+                        fields=["risk_level", "interview_date"],
+                        name="crisis_watc_risk_le_d29196_idx",
+                    ),
+                    models.Index(
+                        fields=["counselor", "risk_level"],
+                        name="crisis_watc_counsel_21afaf_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_crisis_flags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,155 @@
+# Generated by Django 5.2 on 2026-10-19 15:40
+
+import re
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# 标签规范化规则写在迁移中，不随 Consultant.tags / Consultant.order_index 的修改而变化
+NAME_MAX_LENGTH = 50
+
+SERVICE_TYPE_MAP = {
+    "个体咨询": "individual",
+    "团体咨询": "group",
+    "家庭咨询": "family",
+    "危机干预": "crisis",
+    "在线咨询": "online",
+    "线下咨询": "offline",
+    "online": "online",
+    "offline": "offline",
+}
+
+_KEYWORD_SEPARATORS = re.compile(r"[,，、;；\s]+")
+
+
+def parse_keywords(value):
+    if not value:
+        return []
+    if isinstance(value, (list, tuple)):
+        items = value
+    else:
+        items = _KEYWORD_SEPARATORS.split(str(value))
+    return [
+        str(item).strip() for item in items if item is not None and str(item).strip()
+    ]
+
+
+def normalize_name(value):
+    return str(value).strip()[:NAME_MAX_LENGTH]
+
+
+def counselor_tags(expertise_tags, expertise, serve_type):
+    pairs = set()
+    for value in (expertise_tags, expertise):
+        for name in parse_keywords(value):
+            pairs.add(("expertise", normalize_name(name)))
+    for name in parse_keywords(serve_type):
+        pairs.add(
+            ("serve_type", normalize_name(SERVICE_TYPE_MAP.get(name, name or "")))
+        )
+    return {pair for pair in pairs if pair[1]}
+
+
+def backfill_counselor_tags(apps, schema_editor):
+    """从已有咨询师的擅长标签和咨询方式生成标签字典和关联行"""
+    Counselor = apps.get_model("CounselorAdmin", "Counselor")
+    CounselorProfile = apps.get_model("Consultant", "CounselorProfile")
+    Tag = apps.get_model("Consultant", "Tag")
+    CounselorTag = apps.get_model("Consultant", "CounselorTag")
+
+    expertise = dict(CounselorProfile.objects.values_list("counselor_id", "expertise"))
+    links = {
+        counselor_id: counselor_tags(
+            expertise_tags, expertise.get(counselor_id), serve_type
+        )
+        for counselor_id, expertise_tags, serve_type in Counselor.objects.values_list(
+            "id", "expertise_tags", "serve_type"
+        )
+    }
+    pairs = set().union(*links.values())
+    Tag.objects.bulk_create([Tag(kind=kind, name=name) for kind, name in pairs])
+    ids = {
+        (kind, name): pk
+        for pk, kind, name in Tag.objects.values_list("id", "kind", "name")
+    }
+    CounselorTag.objects.bulk_create(
+        [
+            CounselorTag(counselor_id=counselor_id, tag_id=ids[pair])
+            for counselor_id, counselor_pairs in links.items()
+            for pair in counselor_pairs
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("CounselorAdmin", "0011_archivedappointment"),
+        ("Consultant", "0011_sessioncrisisflag_crisiswatch"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Tag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        primary_key=True, serialize=False, verbose_name="主键ID"
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("expertise", "擅长标签"), ("serve_type", "咨询方式")],
+                        max_length=20,
+                        verbose_name="类型",
+                    ),
+                ),
+                ("name", models.CharField(max_length=50, verbose_name="标签")),
+            ],
+            options={
+                "verbose_name": "标签",
+                "verbose_name_plural": "标签",
+                "db_table": "tags",
+                "unique_together": {("kind", "name")},
+            },
+        ),
+        migrations.CreateModel(
+            name="CounselorTag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        primary_key=True, serialize=False, verbose_name="主键ID"
+                    ),
+                ),
+                (
+                    "counselor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="tag_links",
+                        to="CounselorAdmin.counselor",
+                        verbose_name="咨询师",
+                    ),
+                ),
+                (
+                    "tag",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="counselor_links",
+                        to="Consultant.tag",
+                        verbose_name="标签",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "咨询师标签",
+                "verbose_name_plural": "咨询师标签",
+                "db_table": "counselor_tags",
+                "unique_together": {("tag", "counselor")},
+            },
+        ),
+        migrations.RunPython(backfill_counselor_tags, migrations.RunPython.noop),
+    ]
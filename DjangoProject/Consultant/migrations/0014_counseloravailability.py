@@ -0,0 +1,183 @@
+# Generated by Django 5.2 on 2026-10-19 16:20
+
+import json
+import re
+from datetime import timedelta
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# 位图计算写在迁移中，不随 Consultant.availability 的修改而变化
+SLOT_MINUTES = 30
+
+# 时段解析写在迁移中，不随 Consultant.timeslots 的修改而变化
+_TIME_RANGE = re.compile(
+    r"(\d{1,2})\s*[:：]\s*(\d{2})(?:\s*[-~～至到—–]+\s*(\d{1,2})\s*[:：]\s*(\d{2}))?"
+)
+
+
+def parse_time_slot(value):
+    match = _TIME_RANGE.search(value or "")
+    if not match:
+        return None, None
+    start_hour, start_minute, end_hour, end_minute = match.groups()
+    start = int(start_hour) * 60 + int(start_minute)
+    if start >= 24 * 60:
+        return None, None
+    if end_hour is None:
+        return start, None
+    end = int(end_hour) * 60 + int(end_minute)
+    return start, end if start < end <= 24 * 60 else None
+
+
+def covering_bits(start, end):
+    first = -(-max(start, 0) // SLOT_MINUTES)
+    last = min(end, 24 * 60) // SLOT_MINUTES
+    return ((1 << (last - first)) - 1) << first if last > first else 0
+
+
+def touching_bits(start, end):
+    first = max(start, 0) // SLOT_MINUTES
+    last = -(-min(end, 24 * 60) // SLOT_MINUTES)
+    return ((1 << (last - first)) - 1) << first if last > first else 0
+
+
+def minute(value):
+    return value.hour * 60 + value.minute
+
+
+def parse_time_slots(value):
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            value = value.split(",")
+    if not isinstance(value, (list, tuple)):
+        value = [value] if value else []
+    ranges = []
+    for item in value:
+        if isinstance(item, dict):
+            if item.get("available") is False:
+                continue
+            start, _ = parse_time_slot(str(item.get("start") or ""))
+            end, _ = parse_time_slot(str(item.get("end") or ""))
+        else:
+            start, end = parse_time_slot(str(item))
+        if start is not None and end is not None and start < end:
+            ranges.append((start, end))
+    return ranges
+
+
+def collect(schedule_model, counselor_schedule_model, cancellation_model):
+    """排班和停诊 -> {(咨询师ID, 日期): (scheduled, available)}"""
+    scheduled = {}
+    for counselor_id, day, start_time, end_time in schedule_model.objects.values_list(
+        "counselor_id", "work_date", "start_time", "end_time"
+    ):
+        key = (counselor_id, day)
+        scheduled[key] = scheduled.get(key, 0) | covering_bits(
+            minute(start_time), minute(end_time)
+        )
+    for counselor_id, day, time_slots in counselor_schedule_model.objects.values_list(
+        "counselor_id", "schedule_date", "time_slots"
+    ):
+        for start, end in parse_time_slots(time_slots):
+            key = (counselor_id, day)
+            scheduled[key] = scheduled.get(key, 0) | covering_bits(start, end)
+
+    blocked = {}
+    for (
+        counselor_id,
+        cancel_start,
+        cancel_end,
+    ) in cancellation_model.objects.values_list(
+        "counselor_id", "cancel_start", "cancel_end"
+    ):
+        day = cancel_start.date()
+        while day <= cancel_end.date():
+            start = minute(cancel_start) if day == cancel_start.date() else 0
+            end = minute(cancel_end) if day == cancel_end.date() else 24 * 60
+            key = (counselor_id, day)
+            if key in scheduled:
+                blocked[key] = blocked.get(key, 0) | touching_bits(start, end)
+            day += timedelta(days=1)
+
+    return {
+        key: (bits, bits & ~blocked.get(key, 0))
+        for key, bits in scheduled.items()
+        if bits
+    }
+
+
+def backfill_availability(apps, schema_editor):
+    """由已有的排班和停诊计算每个咨询师每天的可预约时段位图"""
+    CounselorAvailability = apps.get_model("Consultant", "CounselorAvailability")
+    bitmaps = collect(
+        apps.get_model("CounselorAdmin", "Schedule"),
+        apps.get_model("Consultant", "CounselorSchedule"),
+        apps.get_model("CounselorAdmin", "Cancellation"),
+    )
+    CounselorAvailability.objects.bulk_create(
+        [
+            CounselorAvailability(
+                counselor_id=counselor_id,
+                day=day,
+                scheduled=scheduled,
+                available=available,
+            )
+            for (counselor_id, day), (scheduled, available) in bitmaps.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("CounselorAdmin", "0012_appointment_slot_end_minute_and_more"),
+        ("Consultant", "0013_archivedconsultationorder_slot_end_minute_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CounselorAvailability",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        primary_key=True, serialize=False, verbose_name="主键ID"
+                    ),
+                ),
+                ("day", models.DateField(verbose_name="日期")),
+                (
+                    "scheduled",
+                    models.BigIntegerField(default=0, verbose_name="排班时段位图"),
+                ),
+                (
+                    "available",
+                    models.BigIntegerField(
+                        default=0, verbose_name="可预约时段位图（排班去掉停诊）"
+                    ),
+                ),
+                (
+                    "counselor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="availability",
+                        to="CounselorAdmin.counselor",
+                        verbose_name="咨询师",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "咨询师可预约时段",
+                "verbose_name_plural": "咨询师可预约时段",
+                "db_table": "counselor_availability",
+                "indexes": [
+                    models.Index(fields=["day"], name="counselor_a_day_bc3d71_idx")
+                ],
+                "unique_together": {("counselor", "day")},
+            },
+        ),
+        migrations.RunPython(backfill_availability, migrations.RunPython.noop),
+    ]
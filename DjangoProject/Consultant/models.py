@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.hashers import make_password
 from CounselorAdmin.models import Counselor  # 复用现有的Counselor模型
+from Consultant import timeslots
 
 
 # 咨询师用户表（复用CounselorAdmin的Counselor模型，但添加额外字段）
@@ -189,6 +190,82 @@ class ConsultationSession(models.Model):
         return f"{self.record.record_no} - 第{self.session_number}次访谈"
 
 
+# 访谈危机标记表 (consultation_session_crisis_flags)
+class SessionCrisisFlag(models.Model):
+    """
+    访谈危机标记表
+    ConsultationSession.crisis_status 保存的危机状态数组按标记拆成行，随访谈保存同步（见 Consultant/crisis.py），
+    可按标记或风险等级直接查询访谈，不需要逐条解析 crisis_status
+    """
+    id = models.BigAutoField(primary_key=True, verbose_name='主键ID')
+    session = models.ForeignKey(
+        ConsultationSession,
+        on_delete=models.CASCADE,
+        related_name='crisis_flags',
+        verbose_name='访谈'
+    )
+    flag = models.CharField(max_length=50, db_index=True, verbose_name='危机标记')
+    level = models.IntegerField(default=0, db_index=True, verbose_name='风险等级')
+
+    class Meta:
+        db_table = 'consultation_session_crisis_flags'
+        verbose_name = '访谈危机标记'
+        verbose_name_plural = '访谈危机标记'
+        unique_together = [['session', 'flag']]
+
+    def __str__(self):
+        return f"{self.session_id} - {self.flag}"
+
+
+# 危机关注名单 (crisis_watchlist)
+class CrisisWatch(models.Model):
+    """
+    危机关注名单
+    每个档案一行，保存其最近一次访谈（访谈编号最大）的危机标记和风险等级，随访谈的新增、修改、删除更新；
+    管理员按风险等级查询当前的高风险来访者只需一次索引查询
+    """
+    record = models.OneToOneField(
+        ConsultationRecord,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='crisis_watch',
+        verbose_name='档案'
+    )
+    counselor = models.ForeignKey(
+        Counselor,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='crisis_watches',
+        verbose_name='负责咨询师'
+    )
+    session = models.ForeignKey(
+        ConsultationSession,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='最近一次访谈'
+    )
+    session_number = models.IntegerField(default=0, verbose_name='访谈编号')
+    interview_date = models.DateField(blank=True, null=True, verbose_name='访谈日期')
+    flags = models.JSONField(default=list, blank=True, verbose_name='危机标记数组')
+    risk_level = models.IntegerField(default=0, verbose_name='风险等级')
+    updated_time = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        db_table = 'crisis_watchlist'
+        verbose_name = '危机关注名单'
+        verbose_name_plural = '危机关注名单'
+        indexes = [
+            models.Index(fields=['risk_level', 'interview_date']),
+            models.Index(fields=['counselor', 'risk_level']),
+        ]
+
+    def __str__(self):
+        return f"{self.record_id} - {self.risk_level}"
+
+
 # 咨询订单表 (consultation_orders)
 class ConsultationOrder(models.Model):
     """
@@ -229,6 +306,9 @@ class ConsultationOrder(models.Model):
     counseling_keywords = models.JSONField(blank=True, null=True, verbose_name='咨询关键词数组')
     appointment_date = models.DateField(null=False, blank=False, verbose_name='预约日期')
     time_slot = models.CharField(max_length=50, null=False, blank=False, verbose_name='预约时段')
+    # 由 time_slot 解析出的当天分钟数，保存时自动填写（见 Consultant/timeslots.py）
+    slot_start_minute = models.IntegerField(blank=True, null=True, verbose_name='时段开始（当天分钟数）')
+    slot_end_minute = models.IntegerField(blank=True, null=True, verbose_name='时段结束（当天分钟数）')
     contact_info = models.CharField(max_length=100, blank=True, null=True, verbose_name='联系方式')
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name='订单状态')
     submit_time = models.DateTimeField(auto_now_add=True, verbose_name='提交时间')
@@ -240,10 +320,26 @@ class ConsultationOrder(models.Model):
         db_table = 'consultation_orders'
         verbose_name = '咨询订单'
         verbose_name_plural = '咨询订单'
+        indexes = [
+            # 按咨询师、预约日期的时段统计和时间冲突判断
+            models.Index(fields=['counselor', 'appointment_date', 'slot_start_minute']),
+        ]
 
     def __str__(self):
         return f"{self.order_no} - {self.status}"
 
+    def save(self, *args, **kwargs):
+        """
+        保存时由预约时段解析出开始、结束分钟数
+        指定 update_fields 且不包含 time_slot 时（如只更新状态）不重新解析
+        """
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'time_slot' in update_fields:
+            timeslots.apply(self)
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | set(timeslots.FIELDS)
+        super().save(*args, **kwargs)
+
 
 # 咨询评价表 (consultation_reviews)
 class ConsultationReview(models.Model):
@@ -251,9 +347,13 @@ class ConsultationReview(models.Model):
     咨询评价表
     """
     id = models.BigAutoField(primary_key=True, verbose_name='主键ID')
+    # 订单归档后评价仍保留在业务表中（咨询师评论列表使用），因此不建数据库约束、不随订单删除
+    # 可为空使 select_related('order') 使用左连接，订单已归档的评价不会从结果中丢失
     order = models.ForeignKey(
         ConsultationOrder,
-        on_delete=models.CASCADE,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
         related_name='reviews',
         verbose_name='订单'
     )
@@ -276,6 +376,116 @@ class ConsultationReview(models.Model):
         return f"{self.counselor.name} - {self.rating}分"
 
 
+# 咨询师评分汇总表 (counselor_rating_summaries)
+class CounselorRatingSummary(models.Model):
+    """
+    咨询师评分汇总
+    评价新增/删除/修改时由信号增量更新（见 Consultant/ratings.py），按评分排序和展示评分分布时不需要聚合评价表
+    """
+    counselor = models.OneToOneField(
+        Counselor,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='rating_summary',
+        verbose_name='咨询师'
+    )
+    review_count = models.IntegerField(default=0, verbose_name='评价数')
+    rating_sum = models.IntegerField(default=0, verbose_name='评分总和')
+    rating_1 = models.IntegerField(default=0, verbose_name='1分评价数')
+    rating_2 = models.IntegerField(default=0, verbose_name='2分评价数')
+    rating_3 = models.IntegerField(default=0, verbose_name='3分评价数')
+    rating_4 = models.IntegerField(default=0, verbose_name='4分评价数')
+    rating_5 = models.IntegerField(default=0, verbose_name='5分评价数')
+    average_rating = models.FloatField(default=0, db_index=True, verbose_name='平均评分')
+    updated_time = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        db_table = 'counselor_rating_summaries'
+        verbose_name = '咨询师评分汇总'
+        verbose_name_plural = '咨询师评分汇总'
+
+    def __str__(self):
+        return f"{self.counselor_id} - {self.average_rating:.2f}分"
+
+
+# 咨询师每日评分表 (counselor_rating_daily)，用于计算近期平均评分
+class CounselorRatingDaily(models.Model):
+    """
+    咨询师每日评分：按评价日期累计的评价数和评分总和
+    近期平均评分只需汇总最近N天的行，不需要扫描评价表
+    """
+    id = models.BigAutoField(primary_key=True, verbose_name='主键ID')
+    counselor = models.ForeignKey(
+        Counselor,
+        on_delete=models.CASCADE,
+        related_name='rating_daily',
+        verbose_name='咨询师'
+    )
+    day = models.DateField(verbose_name='日期')
+    review_count = models.IntegerField(default=0, verbose_name='评价数')
+    rating_sum = models.IntegerField(default=0, verbose_name='评分总和')
+
+    class Meta:
+        db_table = 'counselor_rating_daily'
+        verbose_name = '咨询师每日评分'
+        verbose_name_plural = '咨询师每日评分'
+        unique_together = [['counselor', 'day']]
+
+    def __str__(self):
+        return f"{self.counselor_id} - {self.day}"
+
+
+# 标签字典表 (tags)
+class Tag(models.Model):
+    """
+    标签字典表
+    咨询师的擅长标签（Counselor.expertise_tags、CounselorProfile.expertise）和咨询方式（Counselor.serve_type）
+    规范化后每个取值一行，由 CounselorTag 关联到咨询师（见 Consultant/tags.py）
+    """
+    KIND_CHOICES = [
+        ('expertise', '擅长标签'),
+        ('serve_type', '咨询方式'),
+    ]
+
+    id = models.BigAutoField(primary_key=True, verbose_name='主键ID')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name='类型')
+    name = models.CharField(max_length=50, verbose_name='标签')
+
+    class Meta:
+        db_table = 'tags'
+        verbose_name = '标签'
+        verbose_name_plural = '标签'
+        unique_together = [['kind', 'name']]
+
+    def __str__(self):
+        return f"{self.kind}:{self.name}"
+
+
+# 咨询师标签关联表 (counselor_tags)
+class CounselorTag(models.Model):
+    """
+    咨询师标签关联表
+    咨询师或咨询师详情保存时由信号同步，按标签查找咨询师走 (tag, counselor) 索引，不需要解析JSON字段
+    """
+    id = models.BigAutoField(primary_key=True, verbose_name='主键ID')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='counselor_links', verbose_name='标签')
+    counselor = models.ForeignKey(
+        Counselor,
+        on_delete=models.CASCADE,
+        related_name='tag_links',
+        verbose_name='咨询师'
+    )
+
+    class Meta:
+        db_table = 'counselor_tags'
+        verbose_name = '咨询师标签'
+        verbose_name_plural = '咨询师标签'
+        unique_together = [['tag', 'counselor']]
+
+    def __str__(self):
+        return f"{self.counselor_id} - {self.tag_id}"
+
+
 # 咨询师排班表 (counselor_schedules) - 新版本，使用JSON存储时间段
 class CounselorSchedule(models.Model):
     """
@@ -304,6 +514,38 @@ class CounselorSchedule(models.Model):
         return f"{self.counselor.name} - {self.schedule_date}"
 
 
+# 咨询师每日可预约时段表 (counselor_availability)
+class CounselorAvailability(models.Model):
+    """
+    咨询师每日可预约时段位图
+    每个 (咨询师, 日期) 一行，一天按30分钟划分为48个时段，第i位表示第i个时段；
+    由排班（Schedule、CounselorSchedule）和停诊（Cancellation）计算，随排班和停诊的保存、删除同步（见 Consultant/availability.py）
+    """
+    id = models.BigAutoField(primary_key=True, verbose_name='主键ID')
+    counselor = models.ForeignKey(
+        Counselor,
+        on_delete=models.CASCADE,
+        related_name='availability',
+        verbose_name='咨询师'
+    )
+    day = models.DateField(verbose_name='日期')
+    scheduled = models.BigIntegerField(default=0, verbose_name='排班时段位图')
+    available = models.BigIntegerField(default=0, verbose_name='可预约时段位图（排班去掉停诊）')
+
+    class Meta:
+        db_table = 'counselor_availability'
+        verbose_name = '咨询师可预约时段'
+        verbose_name_plural = '咨询师可预约时段'
+        unique_together = [['counselor', 'day']]
+        indexes = [
+            # 按日期查询全部咨询师
+            models.Index(fields=['day']),
+        ]
+
+    def __str__(self):
+        return f"{self.counselor_id} - {self.day}"
+
+
 # 停诊记录表 (counselor_absences)
 class CounselorAbsence(models.Model):
     """
@@ -368,6 +610,7 @@ class FileStorage(models.Model):
         related_name='uploaded_files',
         verbose_name='上传者'
     )
+    content_hash = models.CharField(max_length=64, blank=True, default='', db_index=True, verbose_name='内容哈希(SHA-256)')
     created_time = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
 
     class Meta:
@@ -377,3 +620,232 @@ class FileStorage(models.Model):
 
     def __str__(self):
         return self.file_name
+
+
+# 以下为归档表：结束时间较早的档案、访谈和订单由 manage.py archive 从业务表移入，字段与业务表相同
+# 主键沿用业务表中的ID（业务表ID不会复用，热表和归档表的ID不重复）；外键不建数据库约束，关联的咨询师删除后保留原ID
+
+# 咨询档案归档表 (consultation_records_archive)
+class ArchivedConsultationRecord(models.Model):
+    """
+    咨询档案归档表
+    只读，接口传入 include_archived 时查询
+    """
+    id = models.BigIntegerField(primary_key=True, verbose_name='主键ID')
+    record_no = models.CharField(max_length=20, unique=True, verbose_name='档案编号')
+    client_name = models.CharField(max_length=50, verbose_name='来访者姓名')
+    client_type = models.CharField(max_length=10, choices=ConsultationRecord.CLIENT_TYPE_CHOICES, default='student', verbose_name='来访者类型')
+    gender = models.CharField(max_length=2, choices=ConsultationRecord.GENDER_CHOICES, verbose_name='性别')
+    age = models.IntegerField(blank=True, null=True, verbose_name='年龄')
+    student_id = models.CharField(max_length=50, blank=True, null=True, verbose_name='学籍号(学生类型)')
+    school = models.CharField(max_length=100, blank=True, null=True, verbose_name='学校')
+    grade = models.CharField(max_length=20, blank=True, null=True, verbose_name='年级')
+    class_name = models.CharField(max_length=20, blank=True, null=True, verbose_name='班级')
+    education = models.CharField(max_length=50, blank=True, null=True, verbose_name='教育程度(成人类型)')
+    occupation = models.CharField(max_length=50, blank=True, null=True, verbose_name='职业(成人类型)')
+    contact = models.CharField(max_length=100, blank=True, null=True, verbose_name='联系方式')
+    emergency_contact_name = models.CharField(max_length=50, blank=True, null=True, verbose_name='紧急联系人姓名')
+    emergency_contact_phone = models.CharField(max_length=20, blank=True, null=True, verbose_name='紧急联系人电话')
+    referral_source = models.CharField(max_length=200, blank=True, null=True, verbose_name='咨询来源')
+    main_complaint = models.TextField(blank=True, null=True, verbose_name='主诉问题')
+    consultation_goal = models.TextField(blank=True, null=True, verbose_name='咨询目标')
+    counselor = models.ForeignKey(
+        Counselor,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='负责咨询师'
+    )
+    interview_count = models.IntegerField(default=0, verbose_name='总访谈次数')
+    interview_type = models.CharField(max_length=50, blank=True, null=True, verbose_name='访谈类型')
+    current_status = models.CharField(max_length=10, choices=ConsultationRecord.STATUS_CHOICES, verbose_name='档案状态')
+    created_by = models.ForeignKey(
+        Counselor,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='创建人'
+    )
+    created_time = models.DateTimeField(db_index=True, verbose_name='创建时间')
+    archived_time = models.DateTimeField(auto_now_add=True, verbose_name='归档时间')
+
+    class Meta:
+        db_table = 'consultation_records_archive'
+        verbose_name = '咨询档案（归档）'
+        verbose_name_plural = '咨询档案（归档）'
+
+    def __str__(self):
+        return f"{self.record_no} - {self.client_name}"
+
+
+# 咨询访谈归档表 (consultation_sessions_archive)，随所属档案一起归档
+class ArchivedConsultationSession(models.Model):
+    """
+    咨询访谈归档表
+    """
+    id = models.BigIntegerField(primary_key=True, verbose_name='主键ID')
+    record = models.ForeignKey(
+        ArchivedConsultationRecord,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='sessions',
+        verbose_name='档案'
+    )
+    session_number = models.IntegerField(verbose_name='第几次访谈')
+    interview_date = models.DateField(verbose_name='访谈日期')
+    interview_time = models.CharField(max_length=50, blank=True, null=True, verbose_name='访谈时间')
+    duration = models.IntegerField(blank=True, null=True, verbose_name='访谈时长(分钟)')
+    visit_status = models.CharField(max_length=10, choices=ConsultationSession.VISIT_STATUS_CHOICES, verbose_name='访谈状态')
+    objective_description = models.TextField(blank=True, null=True, verbose_name='客观描述')
+    doctor_evaluation = models.TextField(blank=True, null=True, verbose_name='医生评定')
+    follow_up_plan = models.TextField(blank=True, null=True, verbose_name='后续计划')
+    next_visit_plan = models.TextField(blank=True, null=True, verbose_name='下次访谈计划')
+    crisis_status = models.CharField(max_length=50, blank=True, null=True, verbose_name='危机状态')
+    consultant_name = models.CharField(max_length=50, blank=True, null=True, verbose_name='咨询师姓名')
+    is_third_party_evaluation = models.BooleanField(default=False, verbose_name='是否为他评')
+    signature_image = models.CharField(max_length=500, blank=True, null=True, verbose_name='签名图片URL')
+    attach_images = models.JSONField(blank=True, null=True, verbose_name='附加图片URL数组')
+    created_by = models.ForeignKey(
+        Counselor,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='创建人'
+    )
+    created_time = models.DateTimeField(verbose_name='创建时间')
+    archived_time = models.DateTimeField(auto_now_add=True, verbose_name='归档时间')
+
+    class Meta:
+        db_table = 'consultation_sessions_archive'
+        verbose_name = '咨询访谈（归档）'
+        verbose_name_plural = '咨询访谈（归档）'
+
+    def __str__(self):
+        return f"{self.record_id} - 第{self.session_number}次访谈"
+
+
+# 咨询订单归档表 (consultation_orders_archive)
+class ArchivedConsultationOrder(models.Model):
+    """
+    咨询订单归档表
+    订单可以先于所属档案归档，record_id 只保存档案ID，通过 record 属性在业务表和归档表中查找
+    """
+    id = models.BigIntegerField(primary_key=True, verbose_name='主键ID')
+    order_no = models.CharField(max_length=30, unique=True, verbose_name='订单编号')
+    record_id = models.BigIntegerField(blank=True, null=True, db_index=True, verbose_name='关联档案ID')
+    counselor = models.ForeignKey(
+        Counselor,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='咨询师'
+    )
+    service_type = models.CharField(max_length=10, choices=ConsultationOrder.SERVICE_TYPE_CHOICES, verbose_name='服务类型')
+    counseling_keywords = models.JSONField(blank=True, null=True, verbose_name='咨询关键词数组')
+    appointment_date = models.DateField(verbose_name='预约日期')
+    time_slot = models.CharField(max_length=50, verbose_name='预约时段')
+    slot_start_minute = models.IntegerField(blank=True, null=True, verbose_name='时段开始（当天分钟数）')
+    slot_end_minute = models.IntegerField(blank=True, null=True, verbose_name='时段结束（当天分钟数）')
+    contact_info = models.CharField(max_length=100, blank=True, null=True, verbose_name='联系方式')
+    status = models.CharField(max_length=10, choices=ConsultationOrder.STATUS_CHOICES, verbose_name='订单状态')
+    submit_time = models.DateTimeField(verbose_name='提交时间')
+    accept_time = models.DateTimeField(blank=True, null=True, verbose_name='接单时间')
+    end_time = models.DateTimeField(blank=True, null=True, verbose_name='结束时间')
+    created_time = models.DateTimeField(db_index=True, verbose_name='创建时间')
+    archived_time = models.DateTimeField(auto_now_add=True, verbose_name='归档时间')
+
+    class Meta:
+        db_table = 'consultation_orders_archive'
+        verbose_name = '咨询订单（归档）'
+        verbose_name_plural = '咨询订单（归档）'
+
+    def __str__(self):
+        return f"{self.order_no} - {self.status}"
+
+    @property
+    def record(self):
+        """关联档案（业务表或归档表中的档案，已删除时为None）"""
+        if not hasattr(self, '_record'):
+            self._record = None
+            if self.record_id is not None:
+                self._record = (
+                    ConsultationRecord.objects.filter(id=self.record_id).first()
+                    or ArchivedConsultationRecord.objects.filter(id=self.record_id).first()
+                )
+        return self._record
+
+
+# 订单索引表 (order_index)
+class OrderIndex(models.Model):
+    """
+    订单索引表（读模型）
+    预约订单（CounselorAdmin.Appointment，管理员端）和咨询订单（ConsultationOrder，咨询师端）每条一行，
+    由信号随两张业务表的增删改同步；状态、服务类型、关键词、预约时段统一为规范化的取值，
+    订单列表的筛选、计数、排序和统计只查询本表，当前页的订单再按ID从业务表或归档表取出
+    订单归档后保留索引行（archived=True），可用 manage.py rebuild_order_index 核对和重建
+    """
+    SOURCE_CHOICES = [
+        ('appointment', '预约订单'),
+        ('order', '咨询订单'),
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', '未开始'),
+        ('active', '进行中'),
+        ('completed', '已完成'),
+        ('cancelled', '已取消'),
+        ('rejected', '已拒绝'),
+    ]
+
+    id = models.BigAutoField(primary_key=True, verbose_name='主键ID')
+    source = models.CharField(max_length=12, choices=SOURCE_CHOICES, verbose_name='来源')
+    source_id = models.BigIntegerField(verbose_name='来源订单ID')
+    archived = models.BooleanField(default=False, verbose_name='已归档')
+    order_no = models.CharField(max_length=30, db_index=True, verbose_name='订单编号')
+    counselor = models.ForeignKey(
+        Counselor,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='order_index',
+        verbose_name='咨询师'
+    )
+    # 咨询订单的来访者信息取自关联档案，档案修改时同步
+    record_id = models.BigIntegerField(blank=True, null=True, db_index=True, verbose_name='关联档案ID')
+    client_name = models.CharField(max_length=50, blank=True, verbose_name='来访者姓名')
+    client_gender = models.CharField(max_length=2, blank=True, verbose_name='性别')
+    client_age = models.IntegerField(blank=True, null=True, verbose_name='年龄')
+    status = models.CharField(max_length=10, verbose_name='规范化状态')
+    service_type = models.CharField(max_length=20, blank=True, verbose_name='规范化服务类型')
+    keywords = models.JSONField(default=list, blank=True, verbose_name='咨询关键词数组')
+    appointment_date = models.DateField(blank=True, null=True, verbose_name='预约日期')
+    time_slot = models.CharField(max_length=50, blank=True, verbose_name='预约时段')
+    slot_start_minute = models.IntegerField(blank=True, null=True, verbose_name='时段开始（当天分钟数）')
+    slot_end_minute = models.IntegerField(blank=True, null=True, verbose_name='时段结束（当天分钟数）')
+    created_time = models.DateTimeField(verbose_name='创建时间')
+
+    class Meta:
+        db_table = 'order_index'
+        verbose_name = '订单索引'
+        verbose_name_plural = '订单索引'
+        unique_together = [['source', 'source_id']]
+        indexes = [
+            # 管理员订单列表：按来源、是否归档、状态筛选
+            models.Index(fields=['source', 'archived', 'status']),
+            # 咨询师订单列表：按咨询师筛选、创建时间倒序
+            models.Index(fields=['counselor', 'source', 'archived', 'created_time']),
+            # 按预约日期的统计（今日订单、时段分布）
+            models.Index(fields=['counselor', 'appointment_date']),
+            models.Index(fields=['source', 'appointment_date']),
+        ]
+
+    def __str__(self):
+        return f"{self.source}:{self.source_id} - {self.status}"
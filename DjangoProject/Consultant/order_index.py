@@ -0,0 +1,253 @@
+"""
+订单索引（读模型）
+预约订单（Appointment）和咨询订单（ConsultationOrder）分属两张结构不同的表，OrderIndex 为两者各保存一行规范化的索引：
+
+- 状态：pending / active / completed / cancelled / rejected（未开始/进行中/已完成 与 pending/accepted/completed 等统一）
+- 服务类型：individual / group / family / crisis / online / offline，无法识别的原样保存
+- 关键词：统一为字符串数组（预约订单的关键词为逗号分隔的字符串）
+- 预约时段：解析出开始、结束的当天分钟数（如 "09:00-10:00" -> 540, 600）
+
+索引行由信号随业务表的增删改同步，归档时标记 archived 而不删除；
+列表接口在索引表上筛选、计数和分页，当前页再用 load() 按ID从业务表或归档表批量取出订单
+"""
+import re
+
+from django.db import transaction
+
+from Consultant.models import (
+    ArchivedConsultationOrder, ArchivedConsultationRecord, ConsultationOrder, ConsultationRecord, OrderIndex,
+)
+from Consultant.timeslots import parse_time_slot
+from CounselorAdmin.models import Appointment, ArchivedAppointment
+
+
+APPOINTMENT = 'appointment'
+ORDER = 'order'
+
+# 各来源的业务表和归档表
+MODELS = {
+    APPOINTMENT: (Appointment, ArchivedAppointment),
+    ORDER: (ConsultationOrder, ArchivedConsultationOrder),
+}
+
+# 状态：管理员端中文状态、咨询师端英文状态、咨询师端筛选用的中文名称 -> 规范化状态
+STATUS_MAP = {
+    '未开始': 'pending',
+    '进行中': 'active',
+    '已完成': 'completed',
+    'pending': 'pending',
+    'accepted': 'active',
+    'completed': 'completed',
+    'cancelled': 'cancelled',
+    'rejected': 'rejected',
+    '等待中': 'pending',
+    '待接单': 'pending',
+    '咨询中': 'active',
+    '已结束': 'completed',
+    '已取消': 'cancelled',
+    '已拒绝': 'rejected',
+}
+
+# 服务类型：中文名称和咨询订单的 online/offline -> 规范化服务类型
+SERVICE_TYPE_MAP = {
+    '个体咨询': 'individual',
+    '团体咨询': 'group',
+    '家庭咨询': 'family',
+    '危机干预': 'crisis',
+    '在线咨询': 'online',
+    '线下咨询': 'offline',
+    'online': 'online',
+    'offline': 'offline',
+}
+
+SERVICE_TYPE_LABELS = {
+    'individual': '个体咨询',
+    'group': '团体咨询',
+    'family': '家庭咨询',
+    'crisis': '危机干预',
+    'online': '在线咨询',
+    'offline': '线下咨询',
+}
+
+STATUS_LABELS = dict(OrderIndex.STATUS_CHOICES)
+
+_KEYWORD_SEPARATORS = re.compile(r'[,，、;；\s]+')
+
+
+# ==================== 规范化 ====================
+
+def normalize_status(value):
+    return STATUS_MAP.get(value, value or '')
+
+
+def normalize_service_type(value):
+    return SERVICE_TYPE_MAP.get(value, value or '')
+
+
+def parse_keywords(value):
+    """关键词数组或逗号（、；空格）分隔的字符串 -> 去除空白后的字符串数组"""
+    if not value:
+        return []
+    if isinstance(value, (list, tuple)):
+        items = value
+    else:
+        items = _KEYWORD_SEPARATORS.split(str(value))
+    return [str(item).strip() for item in items if item is not None and str(item).strip()]
+
+
+def _values(source, obj, record=None):
+    """索引行的字段值；咨询订单的来访者信息取自 record（业务表或归档表中的档案，可为None）"""
+    start, end = parse_time_slot(obj.time_slot)
+    values = {
+        'order_no': obj.order_no,
+        'counselor_id': obj.counselor_id,
+        'status': normalize_status(obj.status),
+        'service_type': normalize_service_type(obj.service_type),
+        'keywords': parse_keywords(obj.counseling_keywords),
+        'appointment_date': obj.appointment_date,
+        'time_slot': obj.time_slot or '',
+        'slot_start_minute': start,
+        'slot_end_minute': end,
+    }
+    if source == APPOINTMENT:
+        values.update(
+            record_id=None,
+            client_name=obj.client_name or '',
+            client_gender=obj.client_gender or '',
+            client_age=obj.client_age,
+            created_time=obj.submit_time,
+        )
+    else:
+        values.update(
+            record_id=obj.record_id,
+            created_time=obj.created_time,
+            **_client_values(record),
+        )
+    return values
+
+
+def _client_values(record):
+    return {
+        'client_name': record.client_name if record else '',
+        'client_gender': record.gender if record else '',
+        'client_age': record.age if record else None,
+    }
+
+
+# ==================== 同步 ====================
+
+def sync(source, obj):
+    """业务表中的订单新增或修改后更新索引行"""
+    record = obj.record if source == ORDER else None
+    OrderIndex.objects.update_or_create(
+        source=source, source_id=obj.pk,
+        defaults={'archived': False, **_values(source, obj, record)},
+    )
+
+
+def remove(source, source_id):
+    """业务表中的订单删除后删除索引行（归档时索引行已先标记为已归档，不删除）"""
+    OrderIndex.objects.filter(source=source, source_id=source_id, archived=False).delete()
+
+
+def sync_record(record):
+    """档案的来访者信息修改后同步到关联的咨询订单（含已归档订单）"""
+    OrderIndex.objects.filter(source=ORDER, record_id=record.pk).update(**_client_values(record))
+
+
+def record_removed(record):
+    """
+    档案删除后清空关联订单的来访者信息；业务表中订单的档案已被置空（SET_NULL），索引行同样置空
+    档案被归档时（归档表中已有该档案）不做处理
+    """
+    if ArchivedConsultationRecord.objects.filter(pk=record.pk).exists():
+        return
+    OrderIndex.objects.filter(source=ORDER, record_id=record.pk).update(**_client_values(None))
+    OrderIndex.objects.filter(source=ORDER, record_id=record.pk, archived=False).update(record_id=None)
+
+
+# ==================== 查询 ====================
+
+def load(rows):
+    """
+    按索引行取出订单对象（业务表或归档表，保持 rows 的顺序），索引行对应的订单已不存在时跳过
+    咨询订单的关联档案一并批量取出
+    """
+    from Consultant import archive
+
+    rows = list(rows)
+    groups = {}
+    for source, source_id, archived in rows:
+        groups.setdefault((source, archived), []).append(source_id)
+
+    objects = {}
+    for (source, archived), ids in groups.items():
+        if source == ORDER and archived:
+            found = archive.archived_orders(ids)
+        elif source == ORDER:
+            found = ConsultationOrder.objects.select_related('record').in_bulk(ids)
+        else:
+            found = MODELS[source][1 if archived else 0].objects.in_bulk(ids)
+        for pk, obj in found.items():
+            objects[(source, pk, archived)] = obj
+    return [objects[key] for key in rows if key in objects]
+
+
+def page(queryset, start, end):
+    """索引查询集分页，返回 (总数, 当前页订单对象列表)"""
+    total = queryset.count()
+    rows = queryset.values_list('source', 'source_id', 'archived')[start:end]
+    return total, load(rows)
+
+
+# ==================== 核对与重建 ====================
+
+def _source_rows(source, archived, batch_size):
+    """按主键分批遍历某个来源的业务表或归档表，yield 一批索引行"""
+    model = MODELS[source][1 if archived else 0]
+    last = None
+    while True:
+        queryset = model.objects.order_by('pk')
+        if last is not None:
+            queryset = queryset.filter(pk__gt=last)
+        batch = list(queryset[:batch_size])
+        if not batch:
+            return
+        records = {}
+        if source == ORDER:
+            record_ids = {obj.record_id for obj in batch} - {None}
+            records = ConsultationRecord.objects.in_bulk(record_ids)
+            missing = record_ids - set(records)
+            if missing:
+                records.update(ArchivedConsultationRecord.objects.in_bulk(missing))
+        yield [
+            OrderIndex(
+                source=source, source_id=obj.pk, archived=archived,
+                **_values(source, obj, records.get(getattr(obj, 'record_id', None))),
+            )
+            for obj in batch
+        ]
+        last = batch[-1].pk
+
+
+def counts():
+    """各来源业务表/归档表的行数与索引行数 {(来源, 是否归档): (索引行数, 实际行数)}"""
+    result = {}
+    for source, models in MODELS.items():
+        for archived, model in ((False, models[0]), (True, models[1])):
+            indexed = OrderIndex.objects.filter(source=source, archived=archived).count()
+            result[(source, archived)] = (indexed, model.objects.count())
+    return result
+
+
+@transaction.atomic
+def rebuild(batch_size=1000):
+    """从业务表和归档表重建全部索引行，返回行数"""
+    OrderIndex.objects.all().delete()
+    total = 0
+    for source in MODELS:
+        for archived in (False, True):
+            for rows in _source_rows(source, archived, batch_size):
+                OrderIndex.objects.bulk_create(rows)
+                total += len(rows)
+    return total
@@ -0,0 +1,189 @@
+"""
+咨询师评分汇总
+评价新增、删除或修改评分时，由信号在同一事务中增量更新 CounselorRatingSummary（评价数、评分总和、1-5分分布、平均分）
+和 CounselorRatingDaily（按日期累计），读取时不聚合评价表：
+- 评论列表返回的评分汇总直接读取汇总行，近期平均分汇总最近 RATING_RECENT_DAYS 天的每日行
+- 管理员咨询师列表按 average_rating（有索引）排序
+批量写入评价（bulk_create、queryset.update）不触发信号，之后需执行 manage.py reconcile_counters 重建汇总
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Cast, TruncDate
+from django.utils import timezone
+
+from Consultant.models import ConsultationReview, CounselorRatingDaily, CounselorRatingSummary
+
+
+RATINGS = (1, 2, 3, 4, 5)
+
+
+def recent_days():
+    return getattr(settings, 'RATING_RECENT_DAYS', 90)
+
+
+def _today():
+    return timezone.localdate() if settings.USE_TZ else timezone.now().date()
+
+
+def _day(value):
+    """评价创建时间对应的日期（与 TruncDate 一致：USE_TZ 时按当前时区）"""
+    if value is None:
+        return _today()
+    return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+
+
+def _review_day(review):
+    return _day(review.created_time)
+
+
+def apply(counselor_id, rating, day, sign):
+    """
+    将一条评价计入（sign=1）或移出（sign=-1）咨询师的评分汇总
+    汇总行用条件UPDATE增量更新，并发的评价写入不会互相覆盖
+    """
+    if not counselor_id or rating is None:
+        return
+    changes = {
+        # 平均分放在最前：MySQL 按顺序执行赋值，后面的赋值会影响前面的表达式
+        'average_rating': Case(
+            When(review_count__lte=-sign, then=Value(0.0)),
+            default=Cast(F('rating_sum') + sign * rating, FloatField()) / (F('review_count') + sign),
+            output_field=FloatField(),
+        ),
+        'review_count': F('review_count') + sign,
+        'rating_sum': F('rating_sum') + sign * rating,
+    }
+    if rating in RATINGS:
+        changes[f'rating_{rating}'] = F(f'rating_{rating}') + sign
+
+    with transaction.atomic():
+        if sign > 0:
+            CounselorRatingSummary.objects.get_or_create(counselor_id=counselor_id)
+            CounselorRatingDaily.objects.get_or_create(counselor_id=counselor_id, day=day)
+        # 移出时不创建汇总行（咨询师被删除时评价级联删除，汇总行已不存在）
+        CounselorRatingSummary.objects.filter(counselor_id=counselor_id).update(
+            updated_time=timezone.now(), **changes
+        )
+        CounselorRatingDaily.objects.filter(counselor_id=counselor_id, day=day).update(
+            review_count=F('review_count') + sign,
+            rating_sum=F('rating_sum') + sign * rating,
+        )
+
+
+def review_saved(review, previous=None):
+    """评价保存后更新汇总，previous 为修改前的 (咨询师ID, 评分, 日期)"""
+    current = (review.counselor_id, review.rating, _review_day(review))
+    if previous == current:
+        return
+    with transaction.atomic():
+        if previous is not None:
+            apply(*previous, sign=-1)
+        apply(*current, sign=1)
+
+
+def review_deleted(review):
+    apply(review.counselor_id, review.rating, _review_day(review), sign=-1)
+
+
+def previous_state(review):
+    """评价修改前的 (咨询师ID, 评分, 日期)，新评价返回None"""
+    if review.pk is None:
+        return None
+    old = ConsultationReview.objects.filter(pk=review.pk).values('counselor_id', 'rating', 'created_time').first()
+    if old is None:
+        return None
+    return old['counselor_id'], old['rating'], _day(old['created_time'])
+
+
+# ==================== 查询 ====================
+
+def summary_of(counselor):
+    """咨询师的评分汇总行（需 select_related('rating_summary')），没有评价时返回None"""
+    try:
+        return counselor.rating_summary
+    except CounselorRatingSummary.DoesNotExist:
+        return None
+
+
+def summary(counselor_id):
+    """咨询师评分汇总：评价数、平均分、1-5分分布和最近 RATING_RECENT_DAYS 天的平均分"""
+    row = CounselorRatingSummary.objects.filter(counselor_id=counselor_id).first()
+    days = recent_days()
+    recent = CounselorRatingDaily.objects.filter(
+        counselor_id=counselor_id,
+        day__gt=_today() - timedelta(days=days),
+    ).aggregate(count=Sum('review_count'), total=Sum('rating_sum'))
+    recent_count = recent['count'] or 0
+    return {
+        'count': row.review_count if row else 0,
+        'average': round(row.average_rating, 2) if row else 0,
+        'distribution': {str(rating): getattr(row, f'rating_{rating}') if row else 0 for rating in RATINGS},
+        'recent_days': days,
+        'recent_count': recent_count,
+        'recent_average': round(recent['total'] / recent_count, 2) if recent_count else 0,
+    }
+
+
+# ==================== 核对与重建 ====================
+
+def _expected_summaries(reviews):
+    """从评价聚合出的汇总 {咨询师ID: {字段: 值}}"""
+    aggregates = {
+        'review_count': Count('id'),
+        'rating_sum': Sum('rating'),
+        **{f'rating_{rating}': Count('id', filter=Q(rating=rating)) for rating in RATINGS},
+    }
+    expected = {}
+    for row in reviews.values('counselor_id').annotate(**aggregates).order_by():
+        counselor_id = row.pop('counselor_id')
+        row['average_rating'] = row['rating_sum'] / row['review_count'] if row['review_count'] else 0
+        expected[counselor_id] = row
+    return expected
+
+
+def summary_drift():
+    """与评价表不一致的咨询师ID列表"""
+    expected = _expected_summaries(ConsultationReview.objects.all())
+    fields = ['review_count', 'rating_sum'] + [f'rating_{rating}' for rating in RATINGS]
+    current = {
+        row['counselor_id']: row
+        for row in CounselorRatingSummary.objects.values('counselor_id', *fields)
+    }
+    drift = []
+    for counselor_id in sorted(set(expected) | set(current)):
+        values = expected.get(counselor_id)
+        row = current.get(counselor_id)
+        if values is None:
+            if row and row['review_count']:
+                drift.append(counselor_id)
+        elif row is None or any(row[field] != values[field] for field in fields):
+            drift.append(counselor_id)
+    return drift
+
+
+@transaction.atomic
+def rebuild(counselor_ids=None):
+    """从评价表重建评分汇总和每日评分（counselor_ids 为None时重建全部），返回重建的咨询师数"""
+    reviews = ConsultationReview.objects.all()
+    summaries = CounselorRatingSummary.objects.all()
+    daily = CounselorRatingDaily.objects.all()
+    if counselor_ids is not None:
+        reviews = reviews.filter(counselor_id__in=counselor_ids)
+        summaries = summaries.filter(counselor_id__in=counselor_ids)
+        daily = daily.filter(counselor_id__in=counselor_ids)
+
+    expected = _expected_summaries(reviews)
+    summaries.delete()
+    daily.delete()
+    CounselorRatingSummary.objects.bulk_create([
+        CounselorRatingSummary(counselor_id=counselor_id, **values) for counselor_id, values in expected.items()
+    ])
+    rows = (
+        reviews.annotate(day=TruncDate('created_time')).values('counselor_id', 'day')
+        .annotate(review_count=Count('id'), rating_sum=Sum('rating')).order_by()
+    )
+    CounselorRatingDaily.objects.bulk_create([CounselorRatingDaily(**row) for row in rows])
+    return len(expected)
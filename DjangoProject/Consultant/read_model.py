@@ -0,0 +1,95 @@
+"""
+咨询师读模型
+Counselor 与 CounselorProfile 一次JOIN查询取出，列表和详情接口共用；
+咨询师卡片（个人中心展示的完整信息）按咨询师缓存，资料或头像变化时通过失效总线失效
+"""
+from CounselorAdmin.models import Counselor
+from Consultant import images
+from Consultant.models import CounselorProfile
+from DjangoProject import invalidation
+from DjangoProject.cache import get_or_compute
+
+
+# 咨询师卡片缓存时间（秒）
+CARD_CACHE_TIMEOUT = 600
+
+
+def counselor_queryset():
+    """咨询师查询集（JOIN咨询师详情表）"""
+    return Counselor.objects.select_related('profile')
+
+
+def get_counselor(counselor_id):
+    """按ID获取咨询师（含详情），不存在时抛出 Counselor.DoesNotExist"""
+    return counselor_queryset().get(id=counselor_id)
+
+
+def profile_of(counselor):
+    """获取咨询师详情，没有详情记录时返回None"""
+    try:
+        return counselor.profile
+    except CounselorProfile.DoesNotExist:
+        return None
+
+
+def serialize_card(counselor):
+    """咨询师卡片：个人中心展示的基本信息和详情"""
+    profile = profile_of(counselor)
+    return {
+        'avatar': profile.avatar if profile and profile.avatar else '',
+        'avatar_variants': images.variant_urls(profile.avatar) if profile and profile.avatar else {},
+        'username': counselor.username,
+        'name': profile.name if profile else counselor.name,
+        'phone': counselor.phone,
+        'email': counselor.email,
+        'graduated_school': profile.graduated_school if profile else '',
+        'address': profile.address if profile else '',
+        'organization': profile.organization if profile else '',
+        'profession': profile.profession if profile else '',
+        'expertise': profile.expertise if profile and profile.expertise else [],
+        'introduction': profile.introduction if profile else '',
+        'education': profile.education if profile else '',
+        'skilled_filed': profile.skilled_filed if profile else '',
+        'certifications': profile.certifications if profile else '',
+        'consultation_count': profile.consultation_count if profile else 0,
+        'created_time': profile.created_time.strftime('%Y-%m-%d %H:%M:%S') if profile and profile.created_time else '',
+        'serve_type': counselor.serve_type if counselor.serve_type else []
+    }
+
+
+# 批量更新咨询师（无法得知具体ID）时使所有卡片失效
+ALL_CARDS_NAMESPACE = 'counselor_card:*'
+
+
+def _card_namespace(counselor_id):
+    return f'counselor_card:{counselor_id}'
+
+
+def get_card(counselor_id):
+    """
+    获取咨询师卡片（缓存），咨询师不存在时返回None
+    缓存命中时不查询数据库
+    """
+    counselor_id = int(counselor_id)
+    key = '%s:%d:%d' % (
+        _card_namespace(counselor_id),
+        invalidation.generation(ALL_CARDS_NAMESPACE),
+        invalidation.generation(_card_namespace(counselor_id)),
+    )
+
+    def compute():
+        counselor = counselor_queryset().filter(id=counselor_id).first()
+        return serialize_card(counselor) if counselor else None
+
+    return get_or_compute(key, compute, timeout=CARD_CACHE_TIMEOUT, namespace='counselor_card')
+
+
+def invalidate_card(counselor_id=None):
+    """
+    咨询师基本信息、详情或头像变化后调用（signals.py 中已在 post_save/post_delete 时调用）
+    counselor_id 为None时使所有咨询师卡片失效
+    """
+    if counselor_id is None:
+        invalidation.publish(ALL_CARDS_NAMESPACE)
+    else:
+        invalidation.publish(_card_namespace(counselor_id))
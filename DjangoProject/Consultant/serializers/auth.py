@@ -4,6 +4,7 @@
 from rest_framework import serializers
 from CounselorAdmin.models import Counselor, VerificationCode
 from Consultant.models import ConsultantAuthToken, CounselorProfile
+from Consultant import images
 
 
 class CounselorLoginSerializer(serializers.Serializer):
@@ -32,10 +33,11 @@ class CounselorUserInfoSerializer(serializers.ModelSerializer):
     email = serializers.EmailField(read_only=True)
     organization = serializers.SerializerMethodField()
     avatar = serializers.SerializerMethodField()
+    avatarVariants = serializers.SerializerMethodField()
     
     class Meta:
         model = Counselor
-        fields = ['userID', 'userName', 'name', 'phone', 'email', 'organization', 'avatar']
+        fields = ['userID', 'userName', 'name', 'phone', 'email', 'organization', 'avatar', 'avatarVariants']
     
     def get_name(self, obj):
         """获取真实姓名"""
@@ -62,6 +64,10 @@ class CounselorUserInfoSerializer(serializers.ModelSerializer):
         except CounselorProfile.DoesNotExist:
             pass
         return ''
+    
+    def get_avatarVariants(self, obj):
+        """获取头像缩略图/WebP地址"""
+        return images.variant_urls(self.get_avatar(obj))
 
 
 class CounselorProfileSerializer(serializers.ModelSerializer):
@@ -1,9 +1,9 @@
 """
 咨询档案相关序列化器
 """
-import json
 from rest_framework import serializers
 from Consultant.models import ConsultationRecord, ConsultationSession
+from Consultant import crisis, images
 
 
 class ConsultationRecordListSerializer(serializers.ModelSerializer):
@@ -91,6 +91,8 @@ class ConsultationSessionDetailSerializer(serializers.ModelSerializer):
     consultantName = serializers.CharField(source='consultant_name', read_only=True)
     signatureImage = serializers.CharField(source='signature_image', read_only=True)
     attachImage = serializers.SerializerMethodField()
+    signatureImageVariants = serializers.SerializerMethodField()
+    attachImageVariants = serializers.SerializerMethodField()
     isThirdPartyEvaluation = serializers.BooleanField(source='is_third_party_evaluation', read_only=True)
     
     class Meta:
@@ -100,7 +102,7 @@ class ConsultationSessionDetailSerializer(serializers.ModelSerializer):
             'class_field', 'date', 'time', 'duration', 'visitStatus',
             'description', 'doctorEvaluation', 'followUpPlan', 'nextVisitPlan',
             'crisisStatus', 'consultantName', 'signatureImage', 'attachImage',
-            'isThirdPartyEvaluation'
+            'signatureImageVariants', 'attachImageVariants', 'isThirdPartyEvaluation'
         ]
     
     def get_name(self, obj):
@@ -117,6 +119,16 @@ class ConsultationSessionDetailSerializer(serializers.ModelSerializer):
             return obj.attach_images[0]
         return ''
     
+    def get_signatureImageVariants(self, obj):
+        """获取签名图片的缩略图/WebP地址"""
+        return images.variant_urls(obj.signature_image)
+    
+    def get_attachImageVariants(self, obj):
+        """获取全部附加图片的缩略图/WebP地址"""
+        if obj.attach_images and isinstance(obj.attach_images, list):
+            return [images.variant_urls(path) for path in obj.attach_images if path]
+        return []
+    
     def get_duration(self, obj):
         """获取访谈时长"""
         if obj.duration:
@@ -125,25 +137,7 @@ class ConsultationSessionDetailSerializer(serializers.ModelSerializer):
     
     def get_crisisStatus(self, obj):
         """获取危机状态（转换为数组）"""
-        if obj.crisis_status:
-            # 如果是字符串，尝试解析为数组
-            if isinstance(obj.crisis_status, str):
-                # 尝试按逗号分隔
-                if ',' in obj.crisis_status:
-                    return [s.strip() for s in obj.crisis_status.split(',') if s.strip()]
-                # 如果是JSON字符串，尝试解析
-                try:
-                    parsed = json.loads(obj.crisis_status)
-                    if isinstance(parsed, list):
-                        return parsed
-                    return [parsed] if parsed else []
-                except:
-                    # 如果不是JSON，返回单个元素的数组
-                    return [obj.crisis_status] if obj.crisis_status else []
-            # 如果已经是数组，直接返回
-            if isinstance(obj.crisis_status, list):
-                return obj.crisis_status
-        return []
+        return crisis.parse_flags(obj.crisis_status)
 
 
 class ConsultationSessionCreateSerializer(serializers.Serializer):
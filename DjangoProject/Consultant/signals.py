@@ -0,0 +1,188 @@
+"""
+信号处理
+订单和咨询档案变化时使仪表盘缓存失效；Token或咨询师信息变化时通过失效总线通知所有worker；
+咨询师基本信息或详情变化时使咨询师卡片缓存失效；评价新增、修改、删除时增量更新咨询师评分汇总；
+预约订单、咨询订单及档案变化时同步订单索引；访谈变化时同步危机标记和危机关注名单；
+咨询师基本信息或详情保存时同步咨询师标签索引；排班、停诊变化时重算咨询师可预约时段位图
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from Consultant import availability, crisis, order_index, ratings, read_model, tags
+from Consultant.models import (
+    ConsultantAuthToken, ConsultationOrder, ConsultationRecord, ConsultationReview, ConsultationSession, CounselorProfile,
+    CounselorSchedule,
+)
+from CounselorAdmin.models import Appointment, Cancellation, Counselor, Schedule, ScheduleRule
+from CounselorAdmin.signals import bulk_changed
+from DjangoProject import invalidation
+from DjangoProject.cache import invalidate_namespace
+
+
+def invalidate_dashboard_cache(sender, **kwargs):
+    invalidate_namespace('dashboard')
+
+
+for _model in (ConsultationOrder, ConsultationRecord):
+    post_save.connect(invalidate_dashboard_cache, sender=_model, dispatch_uid=f'dashboard_save_{_model._meta.label_lower}')
+    post_delete.connect(invalidate_dashboard_cache, sender=_model, dispatch_uid=f'dashboard_delete_{_model._meta.label_lower}')
+
+
+def invalidate_consultant_tokens(sender, **kwargs):
+    invalidation.publish('tokens:consultant')
+
+
+for _model in (ConsultantAuthToken, Counselor):
+    post_save.connect(invalidate_consultant_tokens, sender=_model, dispatch_uid=f'tokens_save_{_model._meta.label_lower}')
+    post_delete.connect(invalidate_consultant_tokens, sender=_model, dispatch_uid=f'tokens_delete_{_model._meta.label_lower}')
+    bulk_changed.connect(invalidate_consultant_tokens, sender=_model, dispatch_uid=f'tokens_bulk_{_model._meta.label_lower}')
+
+
+def invalidate_counselor_card(sender, instance=None, **kwargs):
+    if instance is None:
+        read_model.invalidate_card()
+    elif sender is Counselor:
+        read_model.invalidate_card(instance.id)
+    else:
+        read_model.invalidate_card(instance.counselor_id)
+
+
+for _model in (Counselor, CounselorProfile):
+    post_save.connect(invalidate_counselor_card, sender=_model, dispatch_uid=f'card_save_{_model._meta.label_lower}')
+    post_delete.connect(invalidate_counselor_card, sender=_model, dispatch_uid=f'card_delete_{_model._meta.label_lower}')
+bulk_changed.connect(invalidate_counselor_card, sender=Counselor, dispatch_uid='card_bulk_counselor')
+
+
+def remember_review_rating(sender, instance, raw=False, **kwargs):
+    # 修改已有评价时记下原来的咨询师、评分和日期，保存后从汇总中移出
+    if not raw:
+        instance._rating_previous = ratings.previous_state(instance)
+
+
+def update_rating_summary(sender, instance, raw=False, **kwargs):
+    if not raw:
+        ratings.review_saved(instance, getattr(instance, '_rating_previous', None))
+
+
+def remove_from_rating_summary(sender, instance, **kwargs):
+    ratings.review_deleted(instance)
+
+
+pre_save.connect(remember_review_rating, sender=ConsultationReview, dispatch_uid='rating_pre_save_review')
+post_save.connect(update_rating_summary, sender=ConsultationReview, dispatch_uid='rating_save_review')
+post_delete.connect(remove_from_rating_summary, sender=ConsultationReview, dispatch_uid='rating_delete_review')
+
+
+def sync_order_index(sender, instance, raw=False, **kwargs):
+    if not raw:
+        order_index.sync(_ORDER_SOURCES[sender], instance)
+
+
+def remove_order_index(sender, instance, **kwargs):
+    order_index.remove(_ORDER_SOURCES[sender], instance.pk)
+
+
+_ORDER_SOURCES = {Appointment: order_index.APPOINTMENT, ConsultationOrder: order_index.ORDER}
+for _model in _ORDER_SOURCES:
+    post_save.connect(sync_order_index, sender=_model, dispatch_uid=f'order_index_save_{_model._meta.label_lower}')
+    post_delete.connect(remove_order_index, sender=_model, dispatch_uid=f'order_index_delete_{_model._meta.label_lower}')
+
+
+def sync_order_index_client(sender, instance, raw=False, **kwargs):
+    # 咨询订单索引中的来访者信息取自档案
+    if not raw:
+        order_index.sync_record(instance)
+
+
+def clear_order_index_client(sender, instance, **kwargs):
+    order_index.record_removed(instance)
+
+
+post_save.connect(sync_order_index_client, sender=ConsultationRecord, dispatch_uid='order_index_save_record')
+post_delete.connect(clear_order_index_client, sender=ConsultationRecord, dispatch_uid='order_index_delete_record')
+
+
+def sync_crisis_flags(sender, instance, raw=False, **kwargs):
+    if not raw:
+        crisis.session_saved(instance)
+
+
+def refresh_crisis_watch(sender, instance, **kwargs):
+    # 访谈删除后按档案剩余的最近一次访谈更新关注名单（危机标记行随访谈级联删除）
+    crisis.refresh(instance.record_id)
+
+
+def sync_crisis_watch_counselor(sender, instance, raw=False, **kwargs):
+    if not raw:
+        crisis.record_saved(instance)
+
+
+post_save.connect(sync_crisis_flags, sender=ConsultationSession, dispatch_uid='crisis_save_session')
+post_delete.connect(refresh_crisis_watch, sender=ConsultationSession, dispatch_uid='crisis_delete_session')
+post_save.connect(sync_crisis_watch_counselor, sender=ConsultationRecord, dispatch_uid='crisis_save_record')
+
+
+def sync_counselor_tags(sender, instance, raw=False, **kwargs):
+    # 咨询师删除时关联行级联删除，无需处理
+    if not raw:
+        tags.sync_counselor(instance.id if sender is Counselor else instance.counselor_id)
+
+
+for _model in (Counselor, CounselorProfile):
+    post_save.connect(sync_counselor_tags, sender=_model, dispatch_uid=f'tags_save_{_model._meta.label_lower}')
+
+
+def _deleting_counselor(origin):
+    # 删除咨询师时位图随之级联删除，其排班、停诊的级联删除不再重算（否则会为正在删除的咨询师写入新行）
+    return isinstance(origin, Counselor) or getattr(origin, 'model', None) is Counselor
+
+
+def refresh_availability(sender, instance, raw=False, origin=None, **kwargs):
+    if not (raw or _deleting_counselor(origin)):
+        day = instance.work_date if sender is Schedule else instance.schedule_date
+        availability.refresh(instance.counselor_id, day)
+
+
+for _model in (Schedule, CounselorSchedule):
+    post_save.connect(refresh_availability, sender=_model, dispatch_uid=f'availability_save_{_model._meta.label_lower}')
+    post_delete.connect(refresh_availability, sender=_model, dispatch_uid=f'availability_delete_{_model._meta.label_lower}')
+
+
+def remember_cancellation_range(sender, instance, raw=False, **kwargs):
+    # 修改停诊时间时，原来覆盖的日期同样需要重算
+    if not raw:
+        instance._availability_previous = availability.previous_cancellation(instance)
+
+
+def refresh_cancellation_availability(sender, instance, raw=False, origin=None, **kwargs):
+    if raw or _deleting_counselor(origin):
+        return
+    previous = getattr(instance, '_availability_previous', None)
+    if previous is not None:
+        availability.refresh_cancellation(*previous)
+    availability.refresh_cancellation(instance.counselor_id, instance.cancel_start, instance.cancel_end)
+
+
+pre_save.connect(remember_cancellation_range, sender=Cancellation, dispatch_uid='availability_pre_save_cancellation')
+post_save.connect(refresh_cancellation_availability, sender=Cancellation, dispatch_uid='availability_save_cancellation')
+post_delete.connect(refresh_cancellation_availability, sender=Cancellation, dispatch_uid='availability_delete_cancellation')
+
+
+def remember_rule_range(sender, instance, raw=False, **kwargs):
+    # 修改规则时，原来生效的日期同样需要重算
+    if not raw:
+        instance._availability_previous = availability.previous_rule(instance)
+
+
+def refresh_rule_availability(sender, instance, raw=False, origin=None, **kwargs):
+    if raw or _deleting_counselor(origin):
+        return
+    current = (instance.counselor_id, instance.start_date, instance.end_date)
+    previous = getattr(instance, '_availability_previous', None)
+    if previous is not None and previous != current:
+        availability.refresh_rule(*previous)
+    availability.refresh_rule(*current)
+
+
+pre_save.connect(remember_rule_range, sender=ScheduleRule, dispatch_uid='availability_pre_save_schedule_rule')
+post_save.connect(refresh_rule_availability, sender=ScheduleRule, dispatch_uid='availability_save_schedule_rule')
+post_delete.connect(refresh_rule_availability, sender=ScheduleRule, dispatch_uid='availability_delete_schedule_rule')
@@ -0,0 +1,244 @@
+"""
+内容寻址文件存储服务
+上传文件边写入边计算SHA-256，按哈希去重并分片目录存放，所有文件统一登记到 FileStorage 表
+数据库中保存的路径均为相对 UPLOAD_ROOT（即 static 目录）的路径，例如 blobs/ab/cd/<sha256>.jpg
+"""
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+
+from Consultant.models import FileStorage
+
+
+# 单次读取块大小
+CHUNK_SIZE = 64 * 1024
+
+# 允许上传的图片格式
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
+
+
+def upload_root():
+    """上传文件根目录"""
+    return str(getattr(settings, 'UPLOAD_ROOT', os.path.join(settings.BASE_DIR, 'static')))
+
+
+def blob_dir():
+    """内容寻址存储目录（绝对路径）"""
+    return os.path.join(upload_root(), getattr(settings, 'BLOB_STORAGE_DIR', 'blobs'))
+
+
+def blob_relative_path(content_hash, ext):
+    """
+    根据哈希计算分片后的相对路径
+    两级目录各取哈希前两位，避免单目录文件过多
+    """
+    prefix = getattr(settings, 'BLOB_STORAGE_DIR', 'blobs')
+    return f"{prefix}/{content_hash[:2]}/{content_hash[2:4]}/{content_hash}{ext}"
+
+
+def normalize_path(path):
+    """
+    统一路径格式：去掉开头的 / 和 static/ 前缀
+    头像字段保存的是 /static/counselor_avatar/xxx，其余字段保存相对路径
+    """
+    path = (path or '').lstrip('/')
+    if path.startswith('static/'):
+        path = path[len('static/'):]
+    return path
+
+
+def absolute_path(relative_path):
+    """将相对路径转换为磁盘绝对路径"""
+    return os.path.join(upload_root(), normalize_path(relative_path))
+
+
+def safe_absolute_path(relative_path):
+    """
+    将外部传入的相对路径转换为绝对路径，越出上传根目录时返回None（防止路径穿越）
+    """
+    root = os.path.realpath(upload_root())
+    path = os.path.realpath(absolute_path(relative_path))
+    if path != root and not path.startswith(root + os.sep):
+        return None
+    return path
+
+
+def _normalize_ext(file_name):
+    return os.path.splitext(file_name or '')[1].lower()
+
+
+def _commit_temp_file(tmp_path, content_hash, ext):
+    """
+    将临时文件移动到最终位置
+    相同内容的文件已存在时直接丢弃临时文件（去重）
+    """
+    relative_path = blob_relative_path(content_hash, ext)
+    final_path = absolute_path(relative_path)
+    if os.path.exists(final_path):
+        try:
+            # 刷新修改时间：gc_storage 只回收超过宽限时间的文件，避免回收刚被重新引用的无引用文件
+            os.utime(final_path)
+        except FileNotFoundError:
+            pass  # 刚被回收，按新文件写入
+        else:
+            os.remove(tmp_path)
+            return relative_path, False
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    # 同一文件系统内重命名是原子操作，并发写入同一内容时不会产生半截文件
+    os.replace(tmp_path, final_path)
+    return relative_path, True
+
+
+def _stream_to_blob(chunks, ext):
+    """
+    将数据块流式写入临时文件并同时计算哈希
+
+    返回:
+        (relative_path, content_hash, file_size, created)
+    """
+    tmp_dir = os.path.join(blob_dir(), 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    hasher = hashlib.sha256()
+    file_size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as destination:
+            for chunk in chunks:
+                hasher.update(chunk)
+                destination.write(chunk)
+                file_size += len(chunk)
+        content_hash = hasher.hexdigest()
+        relative_path, created = _commit_temp_file(tmp_path, content_hash, ext)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return relative_path, content_hash, file_size, created
+
+
+def _after_store(relative_path, created):
+    """新写入的图片在后台生成缩略图和WebP衍生图（重复内容已有衍生图，无需再生成）"""
+    if created and _normalize_ext(relative_path) in IMAGE_EXTENSIONS:
+        from Consultant import images
+        images.schedule_variants(relative_path)
+
+
+def _register(relative_path, content_hash, file_name, file_size, file_type, module, uploader, associated_id):
+    """在 FileStorage 中登记一条文件引用"""
+    return FileStorage.objects.create(
+        file_name=(file_name or os.path.basename(relative_path))[:255],
+        file_path=relative_path,
+        file_size=file_size,
+        file_type=(file_type or 'application/octet-stream')[:100],
+        module=module,
+        associated_id=associated_id,
+        uploader=uploader,
+        content_hash=content_hash,
+    )
+
+
+def save_upload(uploaded_file, module, uploader=None, associated_id=None):
+    """
+    保存上传文件
+
+    参数:
+        uploaded_file: Django UploadedFile 对象
+        module: 所属模块（如 session_signature、banner_photo）
+        uploader: 上传的咨询师（管理员上传时为None）
+        associated_id: 关联记录ID
+
+    返回:
+        FileStorage 对象，file_path 为相对 static 目录的路径
+    """
+    ext = _normalize_ext(uploaded_file.name)
+    relative_path, content_hash, file_size, created = _stream_to_blob(uploaded_file.chunks(CHUNK_SIZE), ext)
+    _after_store(relative_path, created)
+    return _register(
+        relative_path, content_hash, uploaded_file.name, file_size,
+        getattr(uploaded_file, 'content_type', None), module, uploader, associated_id
+    )
+
+
+def save_local_file(source_path, file_name, module, file_type=None, uploader=None, associated_id=None):
+    """
+    将服务器本地已有文件纳入存储（计算哈希后移动到分片目录，不复制数据）
+    源文件需与存储目录位于同一文件系统
+    """
+    ext = _normalize_ext(file_name)
+    hasher = hashlib.sha256()
+    with open(source_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    file_size = os.path.getsize(source_path)
+    content_hash = hasher.hexdigest()
+    relative_path, created = _commit_temp_file(source_path, content_hash, ext)
+    _after_store(relative_path, created)
+    return _register(relative_path, content_hash, file_name, file_size, file_type, module, uploader, associated_id)
+
+
+def bind(entries, associated_id):
+    """创建业务记录后回填文件的关联记录ID"""
+    ids = [entry.id for entry in entries if entry is not None]
+    if ids:
+        FileStorage.objects.filter(id__in=ids).update(associated_id=associated_id)
+
+
+def bind_path(file_path, module, associated_id):
+    """按路径回填尚未关联记录的文件（如分片上传完成后再被资讯引用）"""
+    FileStorage.objects.filter(
+        file_path=normalize_path(file_path), module=module, associated_id__isnull=True
+    ).update(associated_id=associated_id)
+
+
+def release(file_paths, module=None, associated_id=None):
+    """
+    释放文件引用（业务记录不再使用该文件）
+    只删除引用记录，磁盘文件由 gc_storage 命令在确认无引用后清理，避免误删被其他记录共享的文件
+    """
+    if isinstance(file_paths, str):
+        file_paths = [file_paths]
+    paths = [normalize_path(p) for p in (file_paths or []) if p]
+    if not paths:
+        return 0
+    queryset = FileStorage.objects.filter(file_path__in=paths)
+    if module:
+        queryset = queryset.filter(module=module)
+    if associated_id is not None:
+        queryset = queryset.filter(associated_id=associated_id)
+    deleted, _ = queryset.delete()
+    return deleted
+
+
+def collect_live_paths():
+    """
+    收集业务表中仍在使用的文件路径（用于垃圾回收的标记阶段）
+    """
+    from Consultant.models import ArchivedConsultationSession, ConsultationSession, CounselorProfile
+    from CounselorAdmin.models import BannerModule, StudentReferral, Article
+
+    live = set()
+
+    def add(path):
+        if path and isinstance(path, str):
+            live.add(normalize_path(path))
+
+    for session_model in (ConsultationSession, ArchivedConsultationSession):
+        for signature, attaches in session_model.objects.values_list('signature_image', 'attach_images').iterator():
+            add(signature)
+            if isinstance(attaches, list):
+                for path in attaches:
+                    add(path)
+    for avatar in CounselorProfile.objects.exclude(avatar__isnull=True).values_list('avatar', flat=True).iterator():
+        add(avatar)
+    for pictures in BannerModule.objects.values_list('pictures', flat=True).iterator():
+        if isinstance(pictures, list):
+            for path in pictures:
+                add(path)
+    for path in StudentReferral.objects.values_list('image_path', flat=True).iterator():
+        add(path)
+    for path in Article.objects.values_list('video_path', flat=True).iterator():
+        add(path)
+    return live
@@ -0,0 +1,189 @@
+"""
+咨询师标签索引与按关键词匹配咨询师
+咨询师的擅长标签（Counselor.expertise_tags、CounselorProfile.expertise）和咨询方式（Counselor.serve_type）都是JSON数组，
+SQLite 上不能建索引，按关键词找咨询师只能取出全部咨询师逐个解析。这里维护两张表：
+
+- Tag：规范化后的标签字典，每个 (类型, 名称) 一行
+- CounselorTag：咨询师与标签的关联，咨询师或咨询师详情保存时由信号按差异同步
+
+match() 按关键词对应的标签ID在关联表上 GROUP BY 计算每个候选咨询师命中的标签数，
+按 关键词覆盖率、Jaccard 相似度（命中数 / (关键词数 + 咨询师标签数 - 命中数)）排序取前 k 个。
+批量写入咨询师（bulk_create、queryset.update）或直接修改数据库之后执行 manage.py rebuild_counselor_tags
+"""
+import heapq
+
+from django.db import transaction
+from django.db.models import Count, Q
+
+from Consultant.models import CounselorProfile, CounselorTag, Tag
+from Consultant.order_index import normalize_service_type, parse_keywords
+from CounselorAdmin.models import Counselor
+
+
+EXPERTISE = 'expertise'
+SERVE_TYPE = 'serve_type'
+
+# 标签名称最大长度（Tag.name）
+NAME_MAX_LENGTH = 50
+
+
+# ==================== 规范化 ====================
+
+def normalize_name(value):
+    return str(value).strip()[:NAME_MAX_LENGTH]
+
+
+def counselor_tags(expertise_tags=None, expertise=None, serve_type=None):
+    """
+    咨询师的标签 -> {(类型, 名称)}
+    擅长标签取咨询师表和详情表的并集（数组或逗号分隔的字符串），咨询方式按订单索引的规则规范化（在线咨询 -> online）
+    """
+    pairs = set()
+    for value in (expertise_tags, expertise):
+        for name in parse_keywords(value):
+            pairs.add((EXPERTISE, normalize_name(name)))
+    for name in parse_keywords(serve_type):
+        pairs.add((SERVE_TYPE, normalize_name(normalize_service_type(name))))
+    return {pair for pair in pairs if pair[1]}
+
+
+def _tag_ids(pairs, create=False):
+    """{(类型, 名称)} -> {(类型, 名称): 标签ID}，create 为True时补建字典中没有的标签"""
+    pairs = set(pairs)
+    if not pairs:
+        return {}
+    by_kind = {}
+    for kind, name in pairs:
+        by_kind.setdefault(kind, set()).add(name)
+    condition = Q()
+    for kind, names in by_kind.items():
+        condition |= Q(kind=kind, name__in=names)
+
+    found = {(kind, name): pk for pk, kind, name in Tag.objects.filter(condition).values_list('id', 'kind', 'name')}
+    missing = pairs - set(found)
+    if create and missing:
+        # 并发保存的咨询师可能同时新建同一标签，冲突时忽略后重新读取
+        Tag.objects.bulk_create([Tag(kind=kind, name=name) for kind, name in missing], ignore_conflicts=True)
+        return _tag_ids(pairs)
+    return found
+
+
+# ==================== 同步 ====================
+
+def sync_counselor(counselor_id):
+    """按咨询师当前的擅长标签和咨询方式更新关联行（只写入差异）"""
+    counselor = Counselor.objects.filter(id=counselor_id).values('expertise_tags', 'serve_type').first()
+    if counselor is None:
+        return
+    expertise = CounselorProfile.objects.filter(counselor_id=counselor_id).values_list('expertise', flat=True).first()
+    pairs = counselor_tags(counselor['expertise_tags'], expertise, counselor['serve_type'])
+
+    with transaction.atomic():
+        wanted = set(_tag_ids(pairs, create=True).values())
+        existing = set(CounselorTag.objects.filter(counselor_id=counselor_id).values_list('tag_id', flat=True))
+        if existing - wanted:
+            CounselorTag.objects.filter(counselor_id=counselor_id, tag_id__in=existing - wanted).delete()
+        CounselorTag.objects.bulk_create(
+            [CounselorTag(counselor_id=counselor_id, tag_id=tag_id) for tag_id in wanted - existing],
+            ignore_conflicts=True,
+        )
+
+
+# ==================== 查询 ====================
+
+def match(keywords, service_type=None, k=10):
+    """
+    按关键词（和咨询方式）匹配启用的咨询师，返回前 k 个
+    [{'counselor_id', 'score'（关键词覆盖率）, 'similarity'（Jaccard）, 'matched'（命中的标签）}]
+    """
+    names = {normalize_name(name) for name in parse_keywords(keywords)} - {''}
+    if not names or k <= 0:
+        return []
+    pairs = {(EXPERTISE, name) for name in names}
+    if service_type:
+        pairs.add((SERVE_TYPE, normalize_name(normalize_service_type(service_type))))
+    ids = _tag_ids(pairs)
+
+    keyword_ids = {ids[pair] for pair in pairs if pair[0] == EXPERTISE and pair in ids}
+    if not keyword_ids:
+        return []
+    candidates = CounselorTag.objects.filter(tag_id__in=keyword_ids).values('counselor_id')
+    if service_type:
+        serve_type_id = next((tag_id for (kind, _), tag_id in ids.items() if kind == SERVE_TYPE), None)
+        if serve_type_id is None:
+            return []
+        candidates = candidates.filter(
+            counselor_id__in=CounselorTag.objects.filter(tag_id=serve_type_id).values('counselor_id')
+        )
+
+    # 一次查询取出每个候选咨询师的命中数和擅长标签总数（走 (tag, counselor) 和 counselor 索引）
+    rows = (
+        CounselorTag.objects.filter(
+            counselor_id__in=candidates, tag__kind=EXPERTISE, counselor__status='启用',
+        )
+        .values('counselor_id')
+        .annotate(total=Count('id'), overlap=Count('id', filter=Q(tag_id__in=keyword_ids)))
+        .order_by()
+    )
+
+    def rank(row):
+        similarity = row['overlap'] / (len(names) + row['total'] - row['overlap'])
+        return row['overlap'] / len(names), similarity, -row['counselor_id']
+
+    top = heapq.nlargest(k, rows, key=rank)
+    matched = {}
+    names_by_id = {tag_id: name for (_, name), tag_id in ids.items()}
+    for counselor_id, tag_id in CounselorTag.objects.filter(
+        counselor_id__in=[row['counselor_id'] for row in top], tag_id__in=keyword_ids,
+    ).values_list('counselor_id', 'tag_id'):
+        matched.setdefault(counselor_id, []).append(names_by_id[tag_id])
+
+    result = []
+    for row in top:
+        score, similarity, _ = rank(row)
+        result.append({
+            'counselor_id': row['counselor_id'],
+            'score': round(score, 4),
+            'similarity': round(similarity, 4),
+            'matched': sorted(matched.get(row['counselor_id'], [])),
+        })
+    return result
+
+
+# ==================== 核对与重建 ====================
+
+def _expected_links():
+    """从咨询师表和详情表计算出的关联 {咨询师ID: {(类型, 名称)}}"""
+    expertise = dict(CounselorProfile.objects.values_list('counselor_id', 'expertise'))
+    return {
+        counselor_id: counselor_tags(expertise_tags, expertise.get(counselor_id), serve_type)
+        for counselor_id, expertise_tags, serve_type in Counselor.objects.values_list('id', 'expertise_tags', 'serve_type')
+    }
+
+
+def drift():
+    """关联行与咨询师资料不一致的咨询师ID列表"""
+    expected = _expected_links()
+    current = {}
+    for counselor_id, kind, name in CounselorTag.objects.values_list('counselor_id', 'tag__kind', 'tag__name'):
+        current.setdefault(counselor_id, set()).add((kind, name))
+    return sorted(
+        counselor_id for counselor_id in set(expected) | set(current)
+        if expected.get(counselor_id, set()) != current.get(counselor_id, set())
+    )
+
+
+@transaction.atomic
+def rebuild():
+    """从咨询师资料重建全部关联行，并删除不再被任何咨询师使用的标签，返回 (咨询师数, 关联行数)"""
+    expected = _expected_links()
+    ids = _tag_ids(set().union(*expected.values()), create=True)
+    CounselorTag.objects.all().delete()
+    rows = [
+        CounselorTag(counselor_id=counselor_id, tag_id=ids[pair])
+        for counselor_id, pairs in expected.items()
+        for pair in pairs
+    ]
+    CounselorTag.objects.bulk_create(rows, batch_size=1000)
+    Tag.objects.filter(counselor_links__isnull=True).delete()
+    return len(expected), len(rows)
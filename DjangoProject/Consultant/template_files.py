@@ -0,0 +1,53 @@
+"""
+模板文件（templates 目录）读写
+咨询师端和管理员端的模板上传/下载接口共用；均为阻塞调用，异步视图通过 run_blocking 在线程池中执行
+"""
+import io
+import os
+import zipfile
+
+from django.conf import settings
+
+
+def templates_dir():
+    return os.path.join(settings.BASE_DIR, 'templates')
+
+
+def save(uploaded_files):
+    """将上传文件写入templates文件夹，返回保存的文件名列表"""
+    directory = templates_dir()
+    os.makedirs(directory, exist_ok=True)
+    saved_files = []
+    for uploaded_file in uploaded_files:
+        filename = os.path.basename(uploaded_file.name)
+        save_path = os.path.join(directory, filename)
+
+        with open(save_path, 'wb+') as dest:
+            for chunk in uploaded_file.chunks():
+                dest.write(chunk)
+
+        saved_files.append(filename)
+    return saved_files
+
+
+def find(names):
+    """按文件名查找模板文件（只取文件名部分，防止路径穿越），返回 (存在的文件路径列表, 不存在的文件名列表)"""
+    directory = templates_dir()
+    file_paths = []
+    missing = []
+    for name in (os.path.basename(n) for n in names):
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            file_paths.append(path)
+        else:
+            missing.append(name)
+    return file_paths, missing
+
+
+def zip_files(file_paths):
+    """将多个文件打包为zip，返回zip内容"""
+    memfile = io.BytesIO()
+    with zipfile.ZipFile(memfile, mode='w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for p in file_paths:
+            zf.write(p, arcname=os.path.basename(p))
+    return memfile.getvalue()
@@ -1,3 +1,1532 @@
-from django.test import TestCase
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date, datetime, time as clock, timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, StreamingHttpResponse
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from Consultant import (
+    archive, availability, counters, crisis, images, order_index, ratings, storage, tags, template_files, timeslots,
+)
+from Consultant.models import (
+    ArchivedConsultationOrder, ArchivedConsultationRecord, ArchivedConsultationSession, ConsultantAuthToken, ConsultationOrder, ConsultationRecord, ConsultationReview, ConsultationSession, CounselorProfile,
+    CounselorAvailability, CounselorSchedule, CounselorTag, CrisisWatch, FileStorage, OrderIndex, SessionCrisisFlag,
+)
+from CounselorAdmin.models import (
+    AdminAuthToken, AdminUser, Appointment, ArchivedAppointment, Article, Cancellation, Category, Counselor, Schedule,
+    ScheduleRule,
+)
+from CounselorAdmin import schedule_rules
+from Consultant import utils as consultant_utils
+from DjangoProject import async_views, cache, invalidation
+from DjangoProject.authentication import TokenCache
+from DjangoProject.upload_handlers import GuardedUploadHandler
+
+
+def _create_counselor(index, with_profile=True):
+    counselor = Counselor.objects.create(
+        username=f'counselor_{index}',
+        name=f'咨询师{index}',
+        gender='女',
+        phone=f'1380000{index:04d}',
+        email=f'counselor{index}@example.com',
+        serve_type=['线下'],
+        password=make_password('password'),
+    )
+    if with_profile:
+        CounselorProfile.objects.create(counselor=counselor, name=f'咨询师{index}', organization='心理中心')
+    return counselor
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class CounselorReadModelQueryTests(TestCase):
+    """咨询师读模型：列表/详情一次JOIN查询，个人中心卡片缓存及失效"""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.counselor = _create_counselor(1)
+        ConsultantAuthToken.objects.create(counselor=self.counselor, token='consultant-token')
+        self.consultant_headers = {'HTTP_X_USER_ID': str(self.counselor.id), 'HTTP_X_AUTH_TOKEN': 'consultant-token'}
+
+        admin = AdminUser.objects.create(username='admin', gender='男', password='x')
+        AdminAuthToken.objects.create(user=admin, token='admin-token')
+        self.admin_headers = {'HTTP_X_USER_ID': str(admin.id), 'HTTP_X_AUTH_TOKEN': 'admin-token'}
+
+    def consultant_post(self, path, data=None):
+        return self.client.post(path, data or {}, content_type='application/json', **self.consultant_headers)
+
+    def admin_post(self, path, data=None):
+        return self.client.post(path, data or {}, content_type='application/json', **self.admin_headers)
+
+    def test_user_profile_served_from_card_cache(self):
+        response = self.consultant_post('/consultant/api/consultant/user/profile')
+        self.assertEqual(response.json()['data']['organization'], '心理中心')
+
+        # Token和卡片均已缓存，不再查询数据库
+        with self.assertNumQueries(0):
+            response = self.consultant_post('/consultant/api/consultant/user/profile')
+        self.assertEqual(response.json()['data']['name'], '咨询师1')
+
+    def test_update_profile_invalidates_card(self):
+        self.consultant_post('/consultant/api/consultant/user/profile')
+        self.consultant_post('/consultant/api/consultant/user/updateProfile', {'profile': {'name': '新名字', 'organization': '新机构'}})
+
+        # 咨询师信息变化同时使Token缓存失效：Token查询 + 卡片一次JOIN查询
+        with self.assertNumQueries(2):
+            response = self.consultant_post('/consultant/api/consultant/user/profile')
+        self.assertEqual(response.json()['data']['name'], '新名字')
+        self.assertEqual(response.json()['data']['organization'], '新机构')
+
+    def test_admin_update_invalidates_card(self):
+        self.consultant_post('/consultant/api/consultant/user/profile')
+        self.admin_post('/counselor_admin/api/admin/consultants/update', {'id': self.counselor.id, 'address': '上海'})
+
+        response = self.consultant_post('/consultant/api/consultant/user/profile')
+        self.assertEqual(response.json()['data']['address'], '上海')
+
+    def test_consultants_list_query_count_is_constant(self):
+        self.admin_post('/counselor_admin/api/admin/consultants/list')
+
+        with CaptureQueriesContext(connection) as few:
+            self.admin_post('/counselor_admin/api/admin/consultants/list')
+        for index in range(2, 8):
+            _create_counselor(index, with_profile=index % 2 == 0)
+        with CaptureQueriesContext(connection) as many:
+            response = self.admin_post('/counselor_admin/api/admin/consultants/list')
+
+        self.assertEqual(len(response.json()['data']), 7)
+        self.assertEqual(len(few), len(many))
+        # COUNT + JOIN查询
+        self.assertEqual(len(many), 2)
+
+    def test_consultants_list_profile_single_lookup(self):
+        self.admin_post('/counselor_admin/api/admin/consultants/list')
+
+        # 咨询师和详情一次查询，活跃Token一次查询
+        with self.assertNumQueries(2):
+            response = self.admin_post('/counselor_admin/api/admin/consultants/list/profile', {'id': self.counselor.id})
+        self.assertEqual(response.json()['token'], 'consultant-token')
+
+    def test_login_loads_profile_with_counselor(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/consultant/api/consultant/auth/login', {
+                'loginType': 'password',
+                'accountType': 'email',
+                'account': 'counselor1@example.com',
+                'credential': 'password',
+            }, content_type='application/json')
+
+        self.assertEqual(response.json()['code'], 0)
+        profile_queries = [q for q in queries.captured_queries if q['sql'].startswith('SELECT') and 'counselor_profiles' in q['sql']]
+        self.assertEqual(len(profile_queries), 1)
+
+
+class SessionNumberAllocationTests(TransactionTestCase):
+    """访谈编号原子分配：并发创建访谈编号不重复，档案访谈次数和咨询师访谈总数保持准确"""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.counselor = _create_counselor(1)
+        self.record = ConsultationRecord.objects.create(
+            record_no='RC-COUNTER', client_name='来访者', gender='女', counselor=self.counselor
+        )
+
+    def create_session(self, count=1):
+        with transaction.atomic():
+            numbers = counters.allocate_session_numbers(self.record.id, count)
+            ConsultationSession.objects.bulk_create([
+                ConsultationSession(record=self.record, session_number=number, interview_date=date.today())
+                for number in numbers
+            ])
+        return list(numbers)
+
+    def test_concurrent_allocation(self):
+        threads, per_thread = 8, 5
+        barrier = threading.Barrier(threads)
+        allocated = []
+        errors = []
+
+        def worker():
+            try:
+                barrier.wait()
+                for _ in range(per_thread):
+                    while True:
+                        try:
+                            allocated.extend(self.create_session())
+                            break
+                        except OperationalError:
+                            # SQLite 同一时刻只允许一个写事务，其他线程稍后重试
+                            time.sleep(0.005)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        total = threads * per_thread
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(allocated), list(range(1, total + 1)))
+        self.assertEqual(ConsultationSession.objects.filter(record=self.record).count(), total)
+        self.record.refresh_from_db()
+        self.assertEqual(self.record.interview_count, total)
+        self.assertEqual(CounselorProfile.objects.get(counselor=self.counselor).consultation_count, total)
+        self.assertEqual(counters.record_drift(), [])
+        self.assertEqual(counters.profile_drift(), [])
+
+    def test_bulk_reservation_and_reconcile(self):
+        self.assertEqual(self.create_session(3), [1, 2, 3])
+        self.assertEqual(self.create_session(), [4])
+
+        # 直接修改数据库造成的偏差由核对修正
+        ConsultationRecord.objects.filter(id=self.record.id).update(interview_count=1)
+        CounselorProfile.objects.filter(counselor=self.counselor).update(consultation_count=99)
+        records, profiles = counters.fix_drift(counters.record_drift(), counters.profile_drift())
+        self.assertEqual((records, profiles), (1, 1))
+        self.assertEqual(self.create_session(), [5])
+        self.assertEqual(CounselorProfile.objects.get(counselor=self.counselor).consultation_count, 5)
+
+
+class RatingSummaryTests(TestCase):
+    """评分汇总：随评价增删改增量维护，评论列表和咨询师列表直接读取汇总"""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.counselor = _create_counselor(1)
+        self.other = _create_counselor(2)
+        ConsultantAuthToken.objects.create(counselor=self.counselor, token='consultant-token')
+        self.consultant_headers = {'HTTP_X_USER_ID': str(self.counselor.id), 'HTTP_X_AUTH_TOKEN': 'consultant-token'}
+
+        admin = AdminUser.objects.create(username='admin', gender='男', password='x')
+        AdminAuthToken.objects.create(user=admin, token='admin-token')
+        self.admin_headers = {'HTTP_X_USER_ID': str(admin.id), 'HTTP_X_AUTH_TOKEN': 'admin-token'}
+
+        self.record = ConsultationRecord.objects.create(
+            record_no='R0001', client_name='张三', gender='男', counselor=self.counselor
+        )
+
+    def create_review(self, index, rating, counselor=None):
+        order = ConsultationOrder.objects.create(
+            order_no=f'O{index:04d}', record=self.record, counselor=counselor or self.counselor,
+            service_type='线下', appointment_date=date(2026, 1, 1), time_slot='09:00-10:00', status='completed',
+        )
+        return ConsultationReview.objects.create(order=order, counselor=counselor or self.counselor, rating=rating)
+
+    def test_summary_follows_review_changes(self):
+        first = self.create_review(1, 5)
+        self.create_review(2, 3)
+        first.rating = 1
+        first.save()
+        self.create_review(3, 4).delete()
+
+        summary = ratings.summary(self.counselor.id)
+        self.assertEqual(summary['count'], 2)
+        self.assertEqual(summary['average'], 2)
+        self.assertEqual(summary['distribution'], {'1': 1, '2': 0, '3': 1, '4': 0, '5': 0})
+        self.assertEqual((summary['recent_count'], summary['recent_average']), (2, 2))
+        self.assertEqual(ratings.summary_drift(), [])
+
+        # 绕过信号的修改由核对发现并重建
+        ConsultationReview.objects.filter(id=first.id).update(rating=5)
+        self.assertEqual(ratings.summary_drift(), [self.counselor.id])
+        ratings.rebuild(ratings.summary_drift())
+        self.assertEqual(ratings.summary(self.counselor.id)['average'], 4)
+
+    def test_comments_join_orders_and_return_summary(self):
+        for index in range(4):
+            self.create_review(index, 4)
+        archive._move_orders([ConsultationOrder.objects.order_by('id').values_list('id', flat=True).first()])
+
+        path = '/consultant/api/consultant/comments'
+        self.client.post(path, {}, content_type='application/json', **self.consultant_headers)
+        # COUNT + 评价/订单/档案JOIN查询 + 归档订单及其档案 + 评分汇总和近期评分
+        with self.assertNumQueries(6):
+            response = self.client.post(path, {}, content_type='application/json', **self.consultant_headers)
+        body = response.json()
+        self.assertEqual([item['name'] for item in body['data']], ['张三'] * 4)
+        self.assertEqual((body['rating']['count'], body['rating']['average']), (4, 4))
+
+    def test_consultants_list_sorted_by_rating(self):
+        self.create_review(1, 3)
+        self.create_review(2, 5, counselor=self.other)
+        _create_counselor(3)
+
+        path = '/counselor_admin/api/admin/consultants/list'
+        self.client.post(path, {'sort': 'rating'}, content_type='application/json', **self.admin_headers)
+        # COUNT + 咨询师/详情/评分汇总JOIN查询
+        with self.assertNumQueries(2):
+            response = self.client.post(path, {'sort': 'rating'}, content_type='application/json', **self.admin_headers)
+        data = response.json()['data']
+        self.assertEqual([item['name'] for item in data], ['咨询师2', '咨询师1', '咨询师3'])
+        self.assertEqual([item['rating'] for item in data], [5, 3, 0])
+
+
+class OrderIndexTests(TestCase):
+    """订单索引：随预约订单、咨询订单和档案同步，订单列表在索引上分页"""
+
+    def setUp(self):
+        self.counselor = _create_counselor(1)
+        ConsultantAuthToken.objects.create(counselor=self.counselor, token='consultant-token')
+        self.consultant_headers = {'HTTP_X_USER_ID': str(self.counselor.id), 'HTTP_X_AUTH_TOKEN': 'consultant-token'}
+
+        admin = AdminUser.objects.create(username='admin', gender='男', password='x')
+        AdminAuthToken.objects.create(user=admin, token='admin-token')
+        self.admin_headers = {'HTTP_X_USER_ID': str(admin.id), 'HTTP_X_AUTH_TOKEN': 'admin-token'}
+
+        self.record = ConsultationRecord.objects.create(
+            record_no='R0001', client_name='张三', gender='男', age=20, counselor=self.counselor
+        )
+        self.orders = [
+            ConsultationOrder.objects.create(
+                order_no=f'O{index:04d}', record=self.record, counselor=self.counselor, service_type='online',
+                counseling_keywords=['焦虑'], appointment_date=date(2026, 1, 1), time_slot='09:00-10:00',
+                status='completed' if index == 0 else 'accepted',
+            )
+            for index in range(3)
+        ]
+        self.appointment = Appointment.objects.create(
+            order_no='A0001', client_name='李四', client_gender='女', service_type='个体咨询',
+            counseling_keywords='焦虑，失眠', appointment_date=date(2026, 1, 2), time_slot='14:30~15:30',
+        )
+
+    def test_index_rows_are_normalized_and_synced(self):
+        row = OrderIndex.objects.get(source='appointment', source_id=self.appointment.id)
+        self.assertEqual((row.status, row.service_type, row.keywords), ('pending', 'individual', ['焦虑', '失眠']))
+        self.assertEqual((row.slot_start_minute, row.slot_end_minute), (870, 930))
+        self.assertEqual(order_index.parse_time_slot('上午'), (None, None))
+
+        self.record.client_name = '王五'
+        self.record.save()
+        self.assertEqual(set(OrderIndex.objects.filter(source='order').values_list('client_name', flat=True)), {'王五'})
+
+        archive._move_orders([self.orders[0].id])
+        self.assertTrue(OrderIndex.objects.get(source='order', source_id=self.orders[0].id).archived)
+        self.orders[1].delete()
+        self.assertFalse(OrderIndex.objects.filter(source='order', source_id=self.orders[1].id).exists())
+        self.assertTrue(all(indexed == actual for indexed, actual in order_index.counts().values()))
+
+    def test_listings_page_on_index(self):
+        archive._move_orders([self.orders[0].id])
+
+        path = '/consultant/api/consultant/orders'
+        self.client.post(path, {}, content_type='application/json', **self.consultant_headers)
+        # COUNT + 索引分页 + 当前页订单和档案JOIN查询
+        with self.assertNumQueries(3):
+            response = self.client.post(
+                path, {'status': '咨询中'}, content_type='application/json', **self.consultant_headers
+            )
+        self.assertEqual(response.json()['data']['total'], 2)
+        self.assertEqual(response.json()['data']['data'][0]['name'], '张三')
+
+        response = self.client.post(
+            path, {'include_archived': True, 'status': '已结束'}, content_type='application/json', **self.consultant_headers
+        )
+        self.assertEqual([item['id'] for item in response.json()['data']['data']], [self.orders[0].id])
+
+        response = self.client.post(
+            '/counselor_admin/api/admin/order/list', {'source': 'all', 'include_archived': True},
+            content_type='application/json', **self.admin_headers,
+        )
+        data = response.json()['data']
+        self.assertEqual([item['source'] for item in data], ['appointment', 'order', 'order', 'order'])
+        self.assertEqual((data[0]['type'], data[0]['key_word']), ('个体咨询', '焦虑，失眠'))
+        self.assertEqual((data[1]['type'], data[1]['status'], data[3]['status']), ('在线咨询', '进行中', '已完成'))
+
+
+class ContentStorageTests(TestCase):
+    """内容寻址存储：按哈希分片目录去重存放，每次上传登记一条引用，gc_storage 回收无引用的旧文件"""
+
+    def setUp(self):
+        self.upload_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.upload_root, ignore_errors=True)
+        settings_override = override_settings(UPLOAD_ROOT=self.upload_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.content = b'%PDF-1.4 report'
+        self.content_hash = hashlib.sha256(self.content).hexdigest()
+
+    def upload(self, content=None, name='report.PDF', module='session_attach', **kwargs):
+        uploaded = SimpleUploadedFile(name, content or self.content, content_type='application/pdf')
+        return storage.save_upload(uploaded, module, **kwargs)
+
+    def age(self, relative_path, hours):
+        stamp = time.time() - hours * 3600
+        os.utime(storage.absolute_path(relative_path), (stamp, stamp))
+
+    def test_sharded_path_and_reference_row(self):
+        counselor = _create_counselor(1)
+        entry = self.upload(uploader=counselor, associated_id=7)
+        expected = f'blobs/{self.content_hash[:2]}/{self.content_hash[2:4]}/{self.content_hash}.pdf'
+        self.assertEqual(entry.file_path, expected)
+        self.assertEqual(
+            (entry.file_name, entry.file_size, entry.file_type, entry.module, entry.associated_id, entry.uploader_id, entry.content_hash),
+            ('report.PDF', len(self.content), 'application/pdf', 'session_attach', 7, counselor.id, self.content_hash),
+        )
+        with open(storage.absolute_path(entry.file_path), 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertEqual(os.listdir(os.path.join(storage.blob_dir(), 'tmp')), [])
+        self.assertEqual(storage.normalize_path('/static/' + entry.file_path), entry.file_path)
+        self.assertIsNone(storage.safe_absolute_path('../settings.py'))
+
+    def test_duplicate_content_shares_one_file(self):
+        first = self.upload()
+        self.age(first.file_path, 48)
+        second = self.upload(name='copy.pdf', module='banner_photo')
+
+        self.assertEqual(first.file_path, second.file_path)
+        self.assertEqual(FileStorage.objects.filter(file_path=first.file_path).count(), 2)
+        shard = os.path.dirname(storage.absolute_path(first.file_path))
+        self.assertEqual(os.listdir(shard), [os.path.basename(first.file_path)])
+        # 去重命中时刷新修改时间，宽限时间内不会被回收
+        self.assertGreater(os.stat(storage.absolute_path(first.file_path)).st_mtime, time.time() - 60)
+
+    def test_gc_storage_removes_unreferenced_files(self):
+        live = self.upload()
+        CounselorProfile.objects.filter(counselor=_create_counselor(1)).update(avatar=f'/static/{live.file_path}')
+        orphan = self.upload(content=b'orphan')
+        recent = self.upload(content=b'recent')
+        FileStorage.objects.filter(id__in=[orphan.id, recent.id]).delete()
+        FileStorage.objects.update(created_time=timezone.now() - timedelta(days=3))
+        for entry in (live, orphan):
+            self.age(entry.file_path, 48)
+
+        out = io.StringIO()
+        call_command('gc_storage', '--dry-run', stdout=out)
+        self.assertIn('可回收文件 1 个', out.getvalue())
+        self.assertTrue(os.path.exists(storage.absolute_path(orphan.file_path)))
+
+        call_command('gc_storage', stdout=io.StringIO())
+        self.assertFalse(os.path.exists(storage.absolute_path(orphan.file_path)))
+        self.assertTrue(os.path.exists(storage.absolute_path(live.file_path)))
+        # 宽限时间内的文件即使没有引用也保留
+        self.assertTrue(os.path.exists(storage.absolute_path(recent.file_path)))
+        self.assertEqual(list(FileStorage.objects.values_list('id', flat=True)), [live.id])
+
+    def test_gc_storage_drops_stale_references(self):
+        entry = self.upload()
+        FileStorage.objects.update(created_time=timezone.now() - timedelta(days=3))
+        self.age(entry.file_path, 48)
+        # 引用记录的业务记录已不再使用该文件：先删除引用记录，再回收文件
+        call_command('gc_storage', stdout=io.StringIO())
+        self.assertFalse(FileStorage.objects.exists())
+        self.assertFalse(os.path.exists(storage.absolute_path(entry.file_path)))
+
+
+class ServeUploadTests(TestCase):
+    """上传文件访问：Range 分段、条件请求返回304、内容寻址文件长期缓存，可交给前端服务器发送"""
+
+    def setUp(self):
+        self.upload_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.upload_root, ignore_errors=True)
+        settings_override = override_settings(UPLOAD_ROOT=self.upload_root, MEDIA_SENDFILE=None)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.content = bytes(range(256)) * 4
+        self.blob = storage.save_upload(SimpleUploadedFile('clip.mp4', self.content), 'article_video').file_path
+        self.url = f'/static/{self.blob}'
+
+    def test_full_response_and_cache_headers(self):
+        response = self.client.get(self.url)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Content-Type'], 'video/mp4')
+        self.assertEqual(response['Content-Length'], str(len(self.content)))
+        self.assertEqual(response['ETag'], '"%s"' % hashlib.sha256(self.content).hexdigest())
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+        head = self.client.head(self.url)
+        self.assertEqual((head.status_code, head.content, head['Content-Length']), (200, b'', str(len(self.content))))
+
+        # 非内容寻址文件按修改时间和大小生成ETag，短期缓存
+        legacy = storage.absolute_path('counselor_avatar/a.png')
+        os.makedirs(os.path.dirname(legacy))
+        with open(legacy, 'wb') as f:
+            f.write(b'png')
+        with override_settings(MEDIA_CACHE_MAX_AGE=60):
+            response = self.client.get('/static/counselor_avatar/a.png')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+        self.assertRegex(response['ETag'], r'^"[0-9a-f]+-3"$')
+
+    def test_range_requests(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual((response.status_code, response['Content-Range'], response['Content-Length']), (206, f'bytes 10-19/{len(self.content)}', '10'))
+        self.assertEqual(b''.join(response.streaming_content), self.content[10:20])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-6')
+        self.assertEqual(b''.join(response.streaming_content), self.content[-6:])
+        response = self.client.get(self.url, HTTP_RANGE='bytes=1000-')
+        self.assertEqual(b''.join(response.streaming_content), self.content[1000:])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=5000-')
+        self.assertEqual((response.status_code, response['Content-Range']), (416, f'bytes */{len(self.content)}'))
+        # 不支持的格式（多段）和 If-Range 不匹配时返回完整文件
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=0-1,5-6').status_code, 200)
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE='"old"').status_code, 200)
+        etag = self.client.head(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE=etag).status_code, 206)
+
+    def test_conditional_requests(self):
+        first = self.client.head(self.url)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual((response.status_code, response['ETag']), (304, first['ETag']))
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=f'"x", W/{first["ETag"]}').status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304)
+        # If-None-Match 优先于 If-Modified-Since
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH='"x"', HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_sendfile_modes(self):
+        with override_settings(MEDIA_SENDFILE='x-accel-redirect', MEDIA_ACCEL_PREFIX='/internal/'):
+            response = self.client.get(self.url, HTTP_RANGE='bytes=0-1')
+        self.assertEqual((response.status_code, response.content), (200, b''))
+        self.assertEqual(response['X-Accel-Redirect'], f'/internal/{self.blob}')
+        self.assertEqual(response['Content-Type'], 'video/mp4')
+        with override_settings(MEDIA_SENDFILE='x-sendfile'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Sendfile'], storage.safe_absolute_path(self.blob))
+
+    def test_rejects_missing_temporary_and_outside_paths(self):
+        tmp = os.path.join(storage.blob_dir(), 'tmp', 'x.upload')
+        with open(tmp, 'wb') as f:
+            f.write(b'partial')
+        for url in ('/static/blobs/tmp/x.upload', '/static/missing.png', '/static/../manage.py', '/static/blobs'):
+            self.assertEqual(self.client.get(url).status_code, 404, url)
+        self.assertEqual(self.client.post(self.url).status_code, 405)
+
+
+class ImageVariantTests(TestCase):
+    """衍生图：按最长边缩放为WebP，已生成时直接复用，超过像素上限或无法解析的图片不生成"""
+
+    def setUp(self):
+        self.upload_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.upload_root, ignore_errors=True)
+        settings_override = override_settings(UPLOAD_ROOT=self.upload_root, IMAGE_VARIANTS={'thumb': 32})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def write_image(self, name, size=(80, 40), mode='RGB'):
+        from PIL import Image
+
+        path = storage.absolute_path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        Image.new(mode, size).save(path)
+        return name
+
+    def test_generates_and_reuses_webp_variant(self):
+        from PIL import Image
+
+        path = self.write_image('blobs/ab/cd/photo.png', mode='P')
+        self.assertEqual(images.variant_url(path, 'thumb'), '/media/variant/thumb/blobs/ab/cd/photo.png')
+
+        relative = images.generate_variant(path, 'thumb')
+        self.assertEqual(relative, 'variants/thumb/blobs/ab/cd/photo.webp')
+        with Image.open(storage.absolute_path(relative)) as img:
+            self.assertEqual((img.format, img.size), ('WEBP', (32, 16)))
+        self.assertEqual(images.variant_urls(path), {'thumb': f'/static/{relative}'})
+
+        mtime = os.stat(storage.absolute_path(relative)).st_mtime_ns
+        self.assertEqual(images.generate_variant(path, 'thumb'), relative)
+        self.assertEqual(os.stat(storage.absolute_path(relative)).st_mtime_ns, mtime)
+
+        response = self.client.get('/media/variant/thumb/blobs/ab/cd/photo.png')
+        self.assertEqual((response.status_code, response['Location']), (302, f'/static/{relative}'))
+
+    def test_rejects_unsupported_and_broken_images(self):
+        self.assertIsNone(images.generate_variant('blobs/report.pdf', 'thumb'))
+        self.assertIsNone(images.generate_variant('blobs/missing.png', 'thumb'))
+        self.assertIsNone(images.generate_variant(self.write_image('blobs/a.png'), 'unknown'))
+
+        broken = storage.absolute_path('blobs/broken.jpg')
+        with open(broken, 'wb') as f:
+            f.write(b'not an image')
+        self.assertIsNone(images.generate_variant('blobs/broken.jpg', 'thumb'))
+        # 按需生成失败时回退到原图
+        response = self.client.get('/media/variant/thumb/blobs/broken.jpg')
+        self.assertEqual(response['Location'], '/static/blobs/broken.jpg')
+
+    def test_pixel_limit_guards_against_decompression_bombs(self):
+        from PIL import Image
+
+        path = self.write_image('blobs/large.png', size=(200, 200))
+        default_limit = Image.MAX_IMAGE_PIXELS
+        for limit in (30_000, 1_000):
+            with override_settings(IMAGE_MAX_PIXELS=limit):
+                self.assertIsNone(images.generate_variant(path, 'thumb'))
+        self.assertFalse(os.path.exists(storage.absolute_path('variants')))
+        # 上限只作用于衍生图生成，不修改 Pillow 的全局设置
+        self.assertEqual(Image.MAX_IMAGE_PIXELS, default_limit)
+        self.assertEqual(images.generate_variant(path, 'thumb'), 'variants/thumb/blobs/large.webp')
+
+
+class UploadAuthenticationTests(TestCase):
+    """上传鉴权：请求头认证在接收请求体前检查上限和配额，请求体凭证的上传暂存到认证通过后才保存"""
+
+    def setUp(self):
+        self.upload_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.upload_root, ignore_errors=True)
+        settings_override = override_settings(UPLOAD_ROOT=self.upload_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        admin = AdminUser.objects.create(username='admin', gender='男', password='x')
+        AdminAuthToken.objects.create(user=admin, token='admin-token')
+        self.admin = admin
+        self.category = Category.objects.create(category_name='心理健康')
+        self.counselor = _create_counselor(1)
+        ConsultantAuthToken.objects.create(counselor=self.counselor, token='consultant-token')
+
+    def article(self, size, **fields):
+        data = {
+            'category_id': self.category.id, 'title': '视频', 'type': '视频', 'author': 'admin', 'resource': '本站',
+            'content': '内容', 'video': SimpleUploadedFile('lesson.mp4', b'\0' * size, content_type='video/mp4'),
+        }
+        data.update(fields)
+        return data
+
+    def test_body_credentials_accept_upload_within_spool_limit(self):
+        # 前端只在请求体中携带凭证：暂存上限以内的视频认证通过后保存
+        response = self.client.post(
+            '/counselor_admin/api/admin/articles/create',
+            self.article(2 * 1024 * 1024, user_id=self.admin.id, token='admin-token'),
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        article = Article.objects.get(id=response.json()['id'])
+        self.assertEqual(FileStorage.objects.get(module='article_video').file_size, 2 * 1024 * 1024)
+        self.assertTrue(article.video_path.startswith('blobs/'))
+
+    def test_body_credentials_over_spool_limit(self):
+        response = self.client.post(
+            '/counselor_admin/api/admin/articles/create',
+            self.article(3 * 1024 * 1024, user_id=self.admin.id, token='admin-token'),
+        )
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(FileStorage.objects.exists())
+
+    def test_invalid_header_credentials_not_received(self):
+        # 请求头凭证无效：返回401，上传处理器不接收文件内容
+        receive = mock.patch.object(
+            GuardedUploadHandler, 'receive_data_chunk', autospec=True, side_effect=GuardedUploadHandler.receive_data_chunk,
+        )
+        for path, data, user_id in (
+            ('/counselor_admin/api/admin/articles/create', self.article(5 * 1024 * 1024), self.admin.id),
+            ('/consultant/api/consultant/updateAvatar', {
+                'avatar': SimpleUploadedFile('a.png', b'\0' * 5 * 1024 * 1024, content_type='image/png'),
+            }, self.counselor.id),
+        ):
+            with receive as received:
+                response = self.client.post(path, data, HTTP_X_USER_ID=str(user_id), HTTP_X_AUTH_TOKEN='wrong')
+            self.assertEqual(response.status_code, 401)
+            self.assertFalse(received.called)
+        self.assertFalse(FileStorage.objects.exists())
+
+    def test_body_credentials_rejected_before_storing(self):
+        response = self.client.post(
+            '/counselor_admin/api/admin/articles/create', self.article(1024, user_id=self.admin.id, token='wrong'),
+        )
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(FileStorage.objects.exists())
+
+    @override_settings(UPLOAD_MAX_REQUEST_SIZE=64 * 1024, UNAUTHENTICATED_UPLOAD_MAX_SIZE=64 * 1024)
+    def test_upload_size_limits(self):
+        path = '/counselor_admin/api/admin/articles/create'
+        headers = {'HTTP_X_USER_ID': str(self.admin.id), 'HTTP_X_AUTH_TOKEN': 'admin-token'}
+        self.assertEqual(self.client.post(path, self.article(128 * 1024), **headers).status_code, 413)
+        response = self.client.post(path, self.article(128 * 1024, user_id=self.admin.id, token='admin-token'))
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(FileStorage.objects.exists())
+
+    def test_body_credentials_checked_against_quota(self):
+        path = '/consultant/api/consultant/updateAvatar'
+        with override_settings(COUNSELOR_UPLOAD_QUOTA=1024):
+            response = self.client.post(path, {
+                'userID': self.counselor.id, 'token': 'consultant-token',
+                'avatar': SimpleUploadedFile('a.png', b'\0' * 2048, content_type='image/png'),
+            })
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(FileStorage.objects.exists())
+
+    def test_token_classes_scoped_by_path(self):
+        # 管理员凭证不能访问咨询师端接口（两端认证类同时注册在 DRF 中）
+        response = self.client.post(
+            '/consultant/api/consultant/user/profile', {}, content_type='application/json',
+            HTTP_X_USER_ID=str(self.admin.id), HTTP_X_AUTH_TOKEN='admin-token',
+        )
+        self.assertEqual(response.status_code, 401)
+
+
+class TieredCacheTests(TestCase):
+    """两级缓存、读穿透的单次计算（进程内合并 + 跨进程锁）、XFetch 提前刷新和视图缓存"""
+
+    def setUp(self):
+        settings_override = override_settings(CACHES={
+            'default': {
+                'BACKEND': 'DjangoProject.cache.TieredCache', 'LOCATION': 'tiered-test',
+                'OPTIONS': {'L1_TIMEOUT': 60},
+            },
+            'tiered-test': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tiered-test'},
+        })
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        caches['default'].clear()
+        cache.reset_stats()
+
+    def test_l1_serves_until_cleared(self):
+        tiered = caches['default']
+        tiered.set('key', {'value': 1}, timeout=300)
+        self.assertEqual(caches['tiered-test'].get('key'), {'value': 1})
+        caches['tiered-test'].delete('key')
+        # 本进程L1仍有值；清空L1后回到L2读取
+        self.assertEqual(tiered.get('key'), {'value': 1})
+        tiered.clear_local()
+        self.assertIsNone(tiered.get('key'))
+
+        # add 以L2为准（跨进程互斥）
+        caches['tiered-test'].set('lock', 'other')
+        self.assertFalse(tiered.add('lock', 'mine'))
+        self.assertTrue(tiered.add('free', 'mine'))
+        self.assertEqual(tiered.get('free'), 'mine')
+        tiered.delete('free')
+        self.assertFalse(tiered.has_key('free'))
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'value'
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(cache.get_or_compute('k', compute, namespace='t')))
+        leader.start()
+        started.wait(5)
+        followers = [
+            threading.Thread(target=lambda: results.append(cache.get_or_compute('k', compute, namespace='t')))
+            for _ in range(4)
+        ]
+        for thread in followers:
+            thread.start()
+        # 等其余线程都进入等待后再让计算完成
+        deadline = time.monotonic() + 5
+        while cache.stats()['t']['coalesced'] < 4 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        release.set()
+        for thread in [leader] + followers:
+            thread.join(5)
+
+        self.assertEqual((len(calls), results), (1, ['value'] * 5))
+        stats = cache.stats()['t']
+        self.assertEqual((stats['misses'], stats['coalesced']), (5, 4))
+        self.assertEqual(cache.get_or_compute('k', compute, namespace='t'), 'value')
+        self.assertEqual(cache.stats()['t']['hits'], 1)
+
+    def test_cross_process_lock_returns_stale_or_waits(self):
+        tiered = caches['default']
+        # 其他进程持有计算锁：有旧值时直接返回旧值
+        tiered.set('k', ('old', 10.0, time.time() + 1), 60)
+        tiered.add('k:lock', 1, 30)
+        with mock.patch.object(cache.random, 'random', return_value=0.01):
+            self.assertEqual(cache.get_or_compute('k', lambda: 'new', namespace='t'), 'old')
+        self.assertEqual(cache.stats()['t']['early_refreshes'], 1)
+
+        # 没有旧值时等待持锁进程写入结果
+        tiered.delete('k')
+
+        def other_process(seconds):
+            tiered.set('k', ('theirs', 0.0, None), 60)
+
+        with mock.patch.object(cache.time, 'sleep', side_effect=other_process):
+            self.assertEqual(cache.get_or_compute('k', lambda: 'mine', namespace='t'), 'theirs')
+
+        # 持锁进程退出（锁已释放）且没有写入结果时自行计算
+        tiered.delete('k')
+        tiered.delete('k:lock')
+        tiered.add('k:lock', 1, 30)
+        with mock.patch.object(cache.time, 'sleep', side_effect=lambda seconds: tiered.delete('k:lock')):
+            self.assertEqual(cache.get_or_compute('k', lambda: 'mine', namespace='t'), 'mine')
+
+    def test_xfetch_refresh_probability(self):
+        now = time.time()
+        # 离过期越近、计算越慢，越可能提前刷新；beta 为0时关闭
+        with mock.patch.object(cache.random, 'random', return_value=0.5):
+            self.assertTrue(cache._should_refresh_early(2.0, now + 1, 1.0, now))
+            self.assertFalse(cache._should_refresh_early(2.0, now + 100, 1.0, now))
+            self.assertFalse(cache._should_refresh_early(2.0, None, 1.0, now))
+            caches['default'].set('k', ('old', 2.0, now + 1), 60)
+            self.assertEqual(cache.get_or_compute('k', lambda: 'new', namespace='t', beta=0), 'old')
+            self.assertEqual(cache.get_or_compute('k', lambda: 'new', namespace='t'), 'new')
+        self.assertEqual(caches['default'].get('k')[0], 'new')
+
+        def fail():
+            raise RuntimeError('boom')
+
+        with self.assertRaises(RuntimeError):
+            cache.get_or_compute('error', fail, namespace='t')
+        self.assertIsNone(caches['default'].get('error'))
+        self.assertFalse(caches['default'].has_key('error:lock'))
+
+    def test_cached_view_varies_by_counselor_and_invalidates(self):
+        path = '/consultant/api/consultant/dashboard/today-transactions'
+        first, second = _create_counselor(1), _create_counselor(2)
+        headers = {}
+        for counselor in (first, second):
+            ConsultantAuthToken.objects.create(counselor=counselor, token=f'token-{counselor.id}')
+            headers[counselor.id] = {'HTTP_X_USER_ID': str(counselor.id), 'HTTP_X_AUTH_TOKEN': f'token-{counselor.id}'}
+        record = ConsultationRecord.objects.create(record_no='R1', client_name='来访者', gender='女', counselor=first)
+
+        def count(counselor):
+            response = self.client.post(path, {}, content_type='application/json', **headers[counselor.id])
+            return response.json()['data']['count']
+
+        self.assertEqual((count(first), count(second)), (0, 0))
+        # 绕过信号写入：命名空间未失效时读到缓存的旧值
+        ConsultationOrder.objects.bulk_create([ConsultationOrder(
+            order_no='O1', record=record, counselor=first, service_type='online',
+            appointment_date=timezone.now().date(), time_slot='09:00-10:00', status='accepted',
+        )])
+        order_index.rebuild()
+        self.assertEqual(count(first), 0)
+        self.assertEqual(cache.stats()['dashboard']['hits'], 1)
+
+        cache.invalidate_namespace('dashboard')
+        self.assertEqual((count(first), count(second)), (1, 0))
+        # 鉴权失败的响应不缓存
+        self.assertEqual(self.client.post(path, {}, content_type='application/json').status_code, 401)
+
+
+def _publish_in_child(namespace, times):
+    # fork 出的子进程重新映射代数文件
+    for _ in range(times):
+        invalidation.publish(namespace)
+
+
+class InvalidationBusTests(TestCase):
+    """跨进程失效总线：mmap 代数发布和轮询，Token缓存按代数失效"""
+
+    def setUp(self):
+        self.counselor = _create_counselor(1)
+        self.token = ConsultantAuthToken.objects.create(counselor=self.counselor, token='consultant-token')
+        self.headers = {'HTTP_X_USER_ID': str(self.counselor.id), 'HTTP_X_AUTH_TOKEN': 'consultant-token'}
+        consultant_utils._token_cache.clear()
+
+    def subscribe(self, namespace):
+        calls = []
+        callback = lambda: calls.append(namespace)
+        invalidation.subscribe(namespace, callback)
+        self.addCleanup(invalidation._subscribers[namespace].remove, callback)
+        return calls
+
+    def test_publish_is_visible_across_processes(self):
+        import multiprocessing
+
+        before = invalidation.generation('test:a')
+        other = invalidation.generation('test:b')
+        self.assertEqual(invalidation.publish('test:a'), before + 1)
+
+        process = multiprocessing.get_context('fork').Process(target=_publish_in_child, args=('test:a', 3))
+        process.start()
+        process.join(10)
+        self.assertEqual(process.exitcode, 0)
+        self.assertEqual(invalidation.generation('test:a'), before + 4)
+        self.assertEqual(invalidation.generation('test:b'), other)
+
+    def test_poll_calls_changed_subscribers(self):
+        changed = self.subscribe('test:changed')
+        unchanged = self.subscribe('test:unchanged')
+        invalidation.poll()
+        invalidation.poll()
+        self.assertEqual(changed, [])
+
+        invalidation.publish('test:changed')
+        invalidation.poll()
+        self.assertEqual((changed, unchanged), (['test:changed'], []))
+        # 同一代数只通知一次；请求开始时由中间件轮询
+        invalidation.poll()
+        invalidation.publish('test:changed')
+        self.client.post('/consultant/api/consultant/interview/template/list', {})
+        self.assertEqual(changed, ['test:changed', 'test:changed'])
+
+    def test_token_cache_invalidated_by_generation(self):
+        tokens = TokenCache('test:tokens')
+        self.addCleanup(invalidation._subscribers['test:tokens'].remove, tokens.clear)
+        queryset = ConsultantAuthToken.objects.select_related('counselor').filter(id=self.token.id)
+        key = (self.counselor.id, 'consultant-token')
+
+        cached = tokens.fetch(key, queryset)
+        with self.assertNumQueries(0):
+            again = tokens.fetch(key, queryset)
+        # 每次返回副本，请求修改对象不影响缓存
+        again.counselor.name = '已修改'
+        self.assertEqual(tokens.get(key).counselor.name, cached.counselor.name)
+
+        invalidation.publish('test:tokens')
+        self.assertIsNone(tokens.get(key))
+        # 查询前读取的代数已过时（查询期间发生变更）时写入的缓存项直接失效
+        stale = tokens.generation()
+        invalidation.publish('test:tokens')
+        tokens.set(key, cached, stale)
+        self.assertIsNone(tokens.get(key))
+
+        tokens.set(key, cached, tokens.generation())
+        with override_settings(TOKEN_CACHE_TIMEOUT=0), mock.patch.object(time, 'monotonic', return_value=time.monotonic() + 1):
+            self.assertIsNone(tokens.get(key))
+
+    def test_token_change_invalidates_authentication(self):
+        path = '/consultant/api/consultant/interview/template/list'
+        self.assertEqual(self.client.post(path, {}, content_type='application/json', **self.headers).status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.post(path, {}, content_type='application/json', **self.headers).status_code, 200)
+
+        # 登出或停用Token后所有进程的缓存立即失效
+        ConsultantAuthToken.objects.filter(id=self.token.id).update(is_active=False)
+        self.assertEqual(self.client.post(path, {}, content_type='application/json', **self.headers).status_code, 200)
+        self.token.is_active = False
+        self.token.save()
+        self.assertEqual(self.client.post(path, {}, content_type='application/json', **self.headers).status_code, 401)
+
+
+class AsyncViewTests(TestCase):
+    """异步视图：请求体解析、与同步视图一致的 401/413 响应，ASGI 下文件逐块异步读取"""
+
+    upload_path = '/consultant/api/consultant/interview/upload/template'
+    download_path = '/consultant/api/consultant/interview/download'
+
+    def setUp(self):
+        self.templates = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.templates, ignore_errors=True)
+        patcher = mock.patch.object(template_files, 'templates_dir', return_value=self.templates)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.upload_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.upload_root, ignore_errors=True)
+        settings_override = override_settings(UPLOAD_ROOT=self.upload_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.counselor = _create_counselor(1)
+        ConsultantAuthToken.objects.create(counselor=self.counselor, token='consultant-token')
+        self.async_client = AsyncClient()
+        self.headers = {'X-User-Id': str(self.counselor.id), 'X-Auth-Token': 'consultant-token'}
+
+    def write_template(self, name, content):
+        with open(os.path.join(self.templates, name), 'wb') as f:
+            f.write(content)
+
+    async def test_parse_body_json_form_and_invalid(self):
+        path = '/consultant/api/consultant/auth/email'
+        with mock.patch('Consultant.views.auth._send_email_code', return_value=True) as send:
+            response = await self.async_client.post(path, {'email': 'a@example.com'}, content_type='application/json')
+            self.assertEqual(response.json(), {'code': 0, 'message': '验证码已发送'})
+            response = await self.async_client.post(
+                path, 'email=b%40example.com&purpose=login', content_type='application/x-www-form-urlencoded',
+            )
+            self.assertEqual(response.status_code, 200)
+            response = await self.async_client.post(path, b'{broken', content_type='application/json')
+            self.assertEqual((response.status_code, response.json()['message']), (400, '邮箱必填'))
+        self.assertEqual([call.args[0] for call in send.call_args_list], ['a@example.com', 'b@example.com'])
+        self.assertEqual((await self.async_client.get(self.download_path)).status_code, 405)
+
+    async def test_multipart_upload_with_header_and_body_credentials(self):
+        response = await self.async_client.post(
+            self.upload_path, {'file': SimpleUploadedFile('a.docx', b'one')}, headers=self.headers,
+        )
+        self.assertEqual(response.json()['data'], {'file': 'a.docx'})
+        response = await self.async_client.post(self.upload_path, {
+            'userID': str(self.counselor.id), 'token': 'consultant-token',
+            'files': [SimpleUploadedFile('b.docx', b'two'), SimpleUploadedFile('c.docx', b'three')],
+        })
+        self.assertEqual(response.json()['data']['count'], 2)
+        self.assertEqual(sorted(os.listdir(self.templates)), ['a.docx', 'b.docx', 'c.docx'])
+
+    async def test_rejections_match_sync_views(self):
+        sync_path = '/consultant/api/consultant/interview/template/list'
+        for data in ({}, {'userID': str(self.counselor.id), 'token': 'wrong'}):
+            sync = await sync_to_async(self.client.post)(sync_path, data)
+            response = await self.async_client.post(self.upload_path, data)
+            self.assertEqual((response.status_code, response.json()), (sync.status_code, sync.json()))
+            self.assertEqual(response.status_code, 401)
+        # 管理员端的异步视图与同步视图同样一致
+        sync = await sync_to_async(self.client.post)('/counselor_admin/api/interview/files', {})
+        response = await self.async_client.post('/counselor_admin/api/admin/interview/files/upload', {})
+        self.assertEqual((response.status_code, response.json()), (sync.status_code, sync.json()))
+
+        with override_settings(UPLOAD_MAX_REQUEST_SIZE=64 * 1024, UNAUTHENTICATED_UPLOAD_MAX_SIZE=64 * 1024):
+            # 请求体凭证：超过暂存上限时凭证可能未被读取，返回413
+            response = await self.async_client.post(self.upload_path, {
+                'userID': str(self.counselor.id), 'token': 'consultant-token',
+                'file': SimpleUploadedFile('big.docx', b'\0' * 128 * 1024),
+            })
+            self.assertEqual(response.status_code, 413)
+        with override_settings(COUNSELOR_UPLOAD_QUOTA=1024):
+            response = await self.async_client.post(
+                self.upload_path, {'file': SimpleUploadedFile('big.docx', b'\0' * 2048)}, headers=self.headers,
+            )
+            self.assertEqual((response.status_code, response.json()['message']), (413, '上传文件超过大小限制或剩余存储配额不足'))
+        self.assertEqual(os.listdir(self.templates), [])
+
+    async def test_file_response_streams_under_asgi(self):
+        content = os.urandom(async_views.FILE_CHUNK_SIZE + 10)
+        self.write_template('form.docx', content)
+        response = await self.async_client.post(
+            self.download_path, {'fileNames': ['form.docx']}, content_type='application/json', headers=self.headers,
+        )
+        self.assertIsInstance(response.asgi_request, ASGIRequest)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertTrue(response.is_async)
+        self.assertEqual(response['Content-Length'], str(len(content)))
+        self.assertIn('form.docx', response['Content-Disposition'])
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual((len(chunks), b''.join(chunks)), (2, content))
+
+    def test_file_response_under_wsgi_and_zip(self):
+        self.write_template('form.docx', b'form')
+        self.write_template('plan.xlsx', b'plan')
+        headers = {'HTTP_X_USER_ID': str(self.counselor.id), 'HTTP_X_AUTH_TOKEN': 'consultant-token'}
+        response = self.client.post(self.download_path, {'fileNames': 'form.docx'}, content_type='application/json', **headers)
+        self.assertIsInstance(response, FileResponse)
+        self.assertEqual(b''.join(response.streaming_content), b'form')
+        response = self.client.post(
+            self.download_path, {'fileNames': ['form.docx', 'plan.xlsx', 'missing.doc']}, content_type='application/json', **headers,
+        )
+        self.assertEqual((response['Content-Type'], response['X-Missing-Files']), ('application/zip', 'missing.doc'))
+
+
+class ArchiveTests(TestCase):
+    """冷热数据归档：可归档条件、按批移动档案和访谈、索引标记、include_archived 查询和合并分页"""
+
+    def setUp(self):
+        self.counselor = _create_counselor(1)
+        ConsultantAuthToken.objects.create(counselor=self.counselor, token='consultant-token')
+        self.headers = {'HTTP_X_USER_ID': str(self.counselor.id), 'HTTP_X_AUTH_TOKEN': 'consultant-token'}
+        self.old = timezone.now() - timedelta(days=800)
+
+        self.done = self.create_record('DONE', 'completed')
+        self.hot = self.create_record('HOT', 'completed')
+        self.active = self.create_record('ACTIVE', 'active')
+        self.watched = self.create_record('WATCHED', 'closed')
+        for number in (1, 2):
+            ConsultationSession.objects.create(
+                record=self.done, session_number=number, interview_date=date(2024, 1, number), crisis_status='["低风险"]',
+            )
+        ConsultationSession.objects.create(
+            record=self.watched, session_number=1, interview_date=date(2024, 1, 1), crisis_status='["高风险"]',
+        )
+        self.finished_order = self.create_order('O1', self.done, 'completed')
+        self.open_order = self.create_order('O2', self.hot, 'accepted')
+        ConsultationRecord.objects.update(created_time=self.old)
+        ConsultationOrder.objects.update(created_time=self.old)
+
+    def create_record(self, record_no, current_status):
+        return ConsultationRecord.objects.create(
+            record_no=record_no, client_name=f'来访者{record_no}', gender='女', counselor=self.counselor,
+            current_status=current_status,
+        )
+
+    def create_order(self, order_no, record, order_status):
+        return ConsultationOrder.objects.create(
+            order_no=order_no, record=record, counselor=self.counselor, service_type='online',
+            appointment_date=date(2024, 1, 1), time_slot='09:00-10:00', status=order_status,
+        )
+
+    def post(self, path, data):
+        return self.client.post(path, data, content_type='application/json', **self.headers)
+
+    def test_eligibility_and_dry_run(self):
+        before = archive.cutoff()
+        # 有未结束订单、进行中和仍在危机关注名单上的档案不归档；订单归档后档案才能归档
+        self.assertEqual(list(archive.eligible_records(before)), [])
+        self.assertEqual(
+            archive.pending(before, ('orders', 'records')), {'orders': 1, 'records': 1, 'sessions': 2},
+        )
+
+        out = io.StringIO()
+        call_command('archive', '--dry-run', stdout=out)
+        self.assertIn('records: 1 行待归档', out.getvalue())
+        self.assertFalse(ArchivedConsultationRecord.objects.exists())
+        self.assertFalse(ArchivedConsultationOrder.objects.exists())
+        self.assertEqual(ConsultationSession.objects.count(), 3)
+
+    def test_batches_move_records_with_sessions(self):
+        out = io.StringIO()
+        call_command('archive', '--batch-size', '1', '--tables', 'orders', 'records', stdout=out)
+
+        self.assertEqual(list(ArchivedConsultationRecord.objects.values_list('id', flat=True)), [self.done.id])
+        self.assertEqual(
+            sorted(ArchivedConsultationSession.objects.values_list('session_number', flat=True)), [1, 2],
+        )
+        self.assertFalse(ConsultationSession.objects.filter(record_id=self.done.id).exists())
+        self.assertEqual(
+            set(ConsultationRecord.objects.values_list('id', flat=True)), {self.hot.id, self.active.id, self.watched.id},
+        )
+        self.assertTrue(OrderIndex.objects.get(source='order', source_id=self.finished_order.id).archived)
+        self.assertFalse(OrderIndex.objects.get(source='order', source_id=self.open_order.id).archived)
+        # 关注名单上的档案保留危机标记，归档档案的标记随访谈删除
+        self.assertEqual(list(SessionCrisisFlag.objects.values_list('session__record_id', flat=True)), [self.watched.id])
+
+    def test_include_archived_endpoints(self):
+        call_command('archive', stdout=io.StringIO())
+
+        body = self.post('/consultant/api/consultant/interview/records', {}).json()
+        self.assertEqual(body['data']['total'], 3)
+        body = self.post('/consultant/api/consultant/interview/records', {'include_archived': True}).json()
+        self.assertEqual(body['data']['total'], 4)
+
+        path = '/consultant/api/consultant/interview/records/profile'
+        self.assertEqual(self.post(path, {'id': self.done.id}).status_code, 404)
+        body = self.post(path, {'id': self.done.id, 'include_archived': 'true'}).json()
+        self.assertEqual([item['count'] for item in body['data']], ['1', '2'])
+
+        path = '/consultant/api/consultant/interview/records/personal-profile'
+        body = self.post(path, {'id': self.done.id, 'include_archived': 1}).json()
+        self.assertEqual(body['data']['name'], '来访者DONE')
+
+        body = self.post('/consultant/api/consultant/orders', {'include_archived': True}).json()
+        self.assertEqual({item['id'] for item in body['data']['data']}, {self.finished_order.id, self.open_order.id})
+
+    def test_paginate_merges_tables_in_order(self):
+        archive._move_orders([self.finished_order.id])
+        archive._move_records([self.done.id])
+        # 业务表和归档表的创建时间交错
+        for offset, record_id in enumerate((self.hot.id, self.done.id, self.active.id, self.watched.id)):
+            model = ArchivedConsultationRecord if record_id == self.done.id else ConsultationRecord
+            model.objects.filter(id=record_id).update(created_time=self.old + timedelta(days=offset))
+
+        hot = ConsultationRecord.objects.all()
+        cold = ArchivedConsultationRecord.objects.all()
+        total, page = archive.paginate(hot, cold, 0, 2, order_by='-created_time')
+        self.assertEqual((total, [item.id for item in page]), (4, [self.watched.id, self.active.id]))
+        total, page = archive.paginate(hot, cold, 2, 4, order_by='-created_time')
+        self.assertEqual([(type(item), item.id) for item in page], [
+            (ArchivedConsultationRecord, self.done.id), (ConsultationRecord, self.hot.id),
+        ])
+        # 不指定排序时业务表在前
+        total, page = archive.paginate(hot.order_by('id'), cold, 2, 4)
+        self.assertEqual([item.id for item in page], [self.watched.id, self.done.id])
+
+
+class CrisisWatchTests(TestCase):
+    """危机标记和关注名单：随访谈新增、修改、删除同步，高风险名单一次JOIN查询"""
+
+    def setUp(self):
+        self.counselor = _create_counselor(1)
+        admin = AdminUser.objects.create(username='admin', gender='男', password='x')
+        AdminAuthToken.objects.create(user=admin, token='admin-token')
+        self.admin_headers = {'HTTP_X_USER_ID': str(admin.id), 'HTTP_X_AUTH_TOKEN': 'admin-token'}
+        self.records = [
+            ConsultationRecord.objects.create(
+                record_no=f'R{index:04d}', client_name=f'来访者{index}', gender='男', counselor=self.counselor
+            )
+            for index in range(3)
+        ]
+
+    def create_session(self, record, number, crisis_status):
+        return ConsultationSession.objects.create(
+            record=record, session_number=number, interview_date=date(2026, 1, number), crisis_status=crisis_status
+        )
+
+    def test_watch_follows_latest_session(self):
+        self.create_session(self.records[0], 1, '["高风险", "自伤倾向"]')
+        latest = self.create_session(self.records[0], 2, '["低风险"]')
+        self.create_session(self.records[1], 1, '中风险,失眠')
+
+        self.assertEqual(SessionCrisisFlag.objects.filter(flag='自伤倾向').count(), 1)
+        self.assertEqual(list(crisis.watchlist().values_list('record_id', flat=True)), [self.records[1].id])
+
+        latest.crisis_status = '["高风险"]'
+        latest.save()
+        self.assertEqual(
+            list(crisis.watchlist().values_list('record_id', 'risk_level')),
+            [(self.records[0].id, 3), (self.records[1].id, 2)],
+        )
+        latest.delete()
+        watch = CrisisWatch.objects.get(record=self.records[0])
+        self.assertEqual((watch.session_number, watch.flags), (1, ['高风险', '自伤倾向']))
+
+        ConsultationSession.objects.filter(record=self.records[1]).update(crisis_status='')
+        self.assertEqual(crisis.rebuild(), (2, 2))
+        self.assertEqual(list(crisis.watchlist().values_list('record_id', flat=True)), [self.records[0].id])
+
+    def test_watchlist_endpoint(self):
+        for index, record in enumerate(self.records):
+            self.create_session(record, 1, ['["无"]', '["中风险"]', '["高风险"]'][index])
+
+        path = '/counselor_admin/api/admin/interview/records/crisis-watch'
+        self.client.post(path, {}, content_type='application/json', **self.admin_headers)
+        # COUNT + 名单/档案/咨询师JOIN查询
+        with self.assertNumQueries(2):
+            response = self.client.post(path, {}, content_type='application/json', **self.admin_headers)
+        body = response.json()
+        self.assertEqual(body['total'], 2)
+        self.assertEqual([item['name'] for item in body['data']], ['来访者2', '来访者1'])
+        self.assertEqual(body['data'][0]['crisisStatus'], ['高风险'])
+
+        response = self.client.post(path, {'min_level': 0}, content_type='application/json', **self.admin_headers)
+        self.assertEqual(response.json()['total'], 3)
+
+
+class CounselorTagMatchTests(TestCase):
+    """咨询师标签索引：随资料保存同步，按关键词和咨询方式匹配"""
+
+    def setUp(self):
+        admin = AdminUser.objects.create(username='admin', gender='男', password='x')
+        AdminAuthToken.objects.create(user=admin, token='admin-token')
+        self.admin_headers = {'HTTP_X_USER_ID': str(admin.id), 'HTTP_X_AUTH_TOKEN': 'admin-token'}
+        self.counselors = [_create_counselor(index) for index in range(3)]
+        expertise = [['焦虑', '压力管理'], ['焦虑', '抑郁', '人际关系', '压力管理'], ['抑郁']]
+        serve_types = [['在线咨询'], ['在线咨询', '线下咨询'], ['线下咨询']]
+        for counselor, values, serve_type in zip(self.counselors, expertise, serve_types):
+            counselor.serve_type = serve_type
+            counselor.save()
+            counselor.profile.expertise = values
+            counselor.profile.save()
+
+    def test_links_follow_profile(self):
+        profile = self.counselors[2].profile
+        profile.expertise = '抑郁, 失眠'
+        profile.save()
+        self.assertEqual(
+            set(CounselorTag.objects.filter(counselor=self.counselors[2]).values_list('tag__kind', 'tag__name')),
+            {('expertise', '抑郁'), ('expertise', '失眠'), ('serve_type', 'offline')},
+        )
+        self.assertEqual(tags.drift(), [])
+
+        Counselor.objects.filter(id=self.counselors[0].id).update(expertise_tags=['睡眠'])
+        self.assertEqual(tags.drift(), [self.counselors[0].id])
+        tags.rebuild()
+        self.assertEqual(tags.drift(), [])
+
+    def test_match_ranks_by_coverage_then_similarity(self):
+        result = tags.match('焦虑,压力管理')
+        self.assertEqual([item['counselor_id'] for item in result], [self.counselors[0].id, self.counselors[1].id])
+        self.assertEqual((result[0]['score'], result[0]['similarity']), (1.0, 1.0))
+        self.assertEqual(result[1]['similarity'], 0.5)
+
+        result = tags.match(['抑郁'], service_type='online')
+        self.assertEqual([item['counselor_id'] for item in result], [self.counselors[1].id])
+
+        Counselor.objects.filter(id=self.counselors[1].id).update(status='停用')
+        self.assertEqual(tags.match(['抑郁'], k=5)[0]['counselor_id'], self.counselors[2].id)
+        self.assertEqual(tags.match(['不存在']), [])
+
+    def test_match_endpoint(self):
+        path = '/counselor_admin/api/admin/consultants/match'
+        response = self.client.post(
+            path, {'keywords': ['焦虑', '抑郁'], 'type': '线下咨询', 'k': 1},
+            content_type='application/json', **self.admin_headers,
+        )
+        body = response.json()
+        self.assertEqual(body['total'], '1')
+        self.assertEqual(body['data'][0]['id'], str(self.counselors[1].id))
+        self.assertEqual(body['data'][0]['matched'], ['抑郁', '焦虑'])
+
+        response = self.client.post(path, {}, content_type='application/json', **self.admin_headers)
+        self.assertEqual(response.status_code, 400)
+
+
+class TimeSlotColumnTests(TestCase):
+    """预约时段：保存时解析为分钟数，时段统计和冲突判断在整数列上进行"""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.counselor = _create_counselor(1)
+        ConsultantAuthToken.objects.create(counselor=self.counselor, token='consultant-token')
+        self.consultant_headers = {'HTTP_X_USER_ID': str(self.counselor.id), 'HTTP_X_AUTH_TOKEN': 'consultant-token'}
+        self.today = timezone.now().date()
+        self.orders = [
+            ConsultationOrder.objects.create(
+                order_no=f'O{index:04d}', counselor=self.counselor, service_type='online',
+                appointment_date=self.today, time_slot=time_slot,
+            )
+            for index, time_slot in enumerate(['9:00-10:00', '10:00-11:00', '10:30~11:30', '上午', '14:00'])
+        ]
+
+    def test_columns_follow_time_slot(self):
+        self.assertEqual(
+            list(ConsultationOrder.objects.order_by('id').values_list('slot_start_minute', 'slot_end_minute')),
+            [(540, 600), (600, 660), (630, 690), (None, None), (840, None)],
+        )
+        order = self.orders[3]
+        order.time_slot = '15:00-16:00'
+        order.save(update_fields=['time_slot'])
+        order.refresh_from_db()
+        self.assertEqual((order.slot_start_minute, order.slot_end_minute), (900, 960))
+
+        appointment = Appointment.objects.create(
+            order_no='A0001', client_name='李四', client_gender='女', appointment_date=self.today, time_slot='08:30-09:20',
+        )
+        self.assertEqual((appointment.slot_start_minute, appointment.slot_end_minute), (510, 560))
+        archive._move_appointments([appointment.id])
+        self.assertEqual(ArchivedAppointment.objects.get(id=appointment.id).slot_start_minute, 510)
+
+    def test_overlapping(self):
+        orders = ConsultationOrder.objects.filter(counselor=self.counselor, appointment_date=self.today)
+        self.assertEqual(
+            set(timeslots.overlapping(orders, 600, 630).values_list('order_no', flat=True)), {'O0001'}
+        )
+        self.assertEqual(
+            set(timeslots.overlapping(orders, 570, 840).values_list('order_no', flat=True)), {'O0000', 'O0001', 'O0002'}
+        )
+        self.assertEqual(
+            set(timeslots.overlapping(orders, 840, 900).values_list('order_no', flat=True)), {'O0004'}
+        )
+
+    def test_time_slot_dashboard_uses_exact_hours(self):
+        response = self.client.post(
+            '/consultant/api/consultant/dashboard/time-slot-data', {},
+            content_type='application/json', **self.consultant_headers,
+        )
+        data = response.json()['data']
+        counts = dict(zip(data['timeSlots'], data['appointments']))
+        # "9:00-10:00" 只计入9点（原来按 LIKE '%10%' 同时计入10点）
+        self.assertEqual((counts[9], counts[10], counts[14], counts[11]), (1, 2, 1, 0))
+        self.assertEqual(sum(data['appointments']), 4)
+
+
+class AvailabilityBitmapTests(TestCase):
+    """可预约时段位图：由排班减去停诊计算，随排班、停诊同步，按时间窗口查询全部咨询师"""
+
+    def setUp(self):
+        admin = AdminUser.objects.create(username='admin', gender='男', password='x')
+        AdminAuthToken.objects.create(user=admin, token='admin-token')
+        self.admin_headers = {'HTTP_X_USER_ID': str(admin.id), 'HTTP_X_AUTH_TOKEN': 'admin-token'}
+        self.counselors = [_create_counselor(index) for index in range(3)]
+        # 2026-03-03、2026-03-10 为周二
+        self.days = [date(2026, 3, 3), date(2026, 3, 10)]
+        for day in self.days:
+            Schedule.objects.create(counselor=self.counselors[0], work_date=day, start_time=clock(9), end_time=clock(17))
+            CounselorSchedule.objects.create(
+                counselor=self.counselors[1], schedule_date=day,
+                time_slots=[{'start': '13:00', 'end': '14:00', 'available': True}, '14:00-16:30'],
+            )
+        Schedule.objects.create(
+            counselor=self.counselors[2], work_date=self.days[0], start_time=clock(14), end_time=clock(15)
+        )
+
+    def bitmap(self, counselor, day):
+        return CounselorAvailability.objects.get(counselor=counselor, day=day).available
+
+    def test_bitmap_follows_schedules_and_cancellations(self):
+        self.assertEqual(availability.slot_ranges(self.bitmap(self.counselors[1], self.days[0])), [(780, 990)])
+
+        cancellation = Cancellation.objects.create(
+            counselor=self.counselors[0],
+            cancel_start=datetime(2026, 3, 3, 14, 10), cancel_end=datetime(2026, 3, 3, 15, 0),
+        )
+        self.assertEqual(availability.slot_ranges(self.bitmap(self.counselors[0], self.days[0])), [(540, 840), (900, 1020)])
+
+        # 停诊改到下一周，原来的日期恢复
+        cancellation.cancel_start = datetime(2026, 3, 10, 0, 0)
+        cancellation.cancel_end = datetime(2026, 3, 11, 0, 0)
+        cancellation.save()
+        self.assertEqual(availability.slot_ranges(self.bitmap(self.counselors[0], self.days[0])), [(540, 1020)])
+        self.assertEqual(self.bitmap(self.counselors[0], self.days[1]), 0)
+
+        cancellation.delete()
+        Schedule.objects.filter(counselor=self.counselors[0], work_date=self.days[1]).delete()
+        self.assertFalse(CounselorAvailability.objects.filter(counselor=self.counselors[0], day=self.days[1]).exists())
+
+        self.assertEqual(availability.rebuild(), 4)
+        self.counselors[2].delete()
+        self.assertEqual(CounselorAvailability.objects.count(), 3)
+
+    def test_availability_endpoint(self):
+        path = '/counselor_admin/api/admin/schedule/work/availability'
+        request = {
+            'start_date': '2026-03-01', 'weeks': 2, 'weekdays': [2], 'start_time': '14:00', 'end_time': '15:00',
+        }
+        body = self.client.post(path, request, content_type='application/json', **self.admin_headers).json()
+        self.assertEqual(body['dates'], ['2026-03-03', '2026-03-10'])
+        self.assertEqual(body['coverage'], [3, 2])
+        self.assertEqual([item['id'] for item in body['data']], [str(self.counselors[0].id), str(self.counselors[1].id)])
+
+        body = self.client.post(
+            path, {**request, 'mode': 'any', 'end_time': '16:30'}, content_type='application/json', **self.admin_headers,
+        ).json()
+        self.assertEqual(
+            [(item['name'], item['free_days']) for item in body['data']], [('咨询师0', 2), ('咨询师1', 2)]
+        )
+
+        response = self.client.post(
+            path, {**request, 'end_time': '13:00'}, content_type='application/json', **self.admin_headers,
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class ScheduleRuleTests(TestCase):
+    """周期排班规则：按需展开并缓存，排班记录覆盖当天的规则，月视图、可预约时段和单日修改都按规则加覆盖处理"""
+
+    def setUp(self):
+        admin = AdminUser.objects.create(username='admin', gender='男', password='x')
+        AdminAuthToken.objects.create(user=admin, token='admin-token')
+        self.admin_headers = {'HTTP_X_USER_ID': str(admin.id), 'HTTP_X_AUTH_TOKEN': 'admin-token'}
+        self.counselors = [_create_counselor(index) for index in range(2)]
+        # 2026-03 的周二：3、10、17、24、31日
+        self.rule = ScheduleRule.objects.create(
+            counselor=self.counselors[0], weekdays=[2], start_time=clock(9), end_time=clock(12),
+            start_date=date(2026, 3, 1), end_date=date(2026, 4, 30), exceptions=['2026-03-17'],
+        )
+        Schedule.objects.create(
+            counselor=self.counselors[0], work_date=date(2026, 3, 10), start_time=clock(14), end_time=clock(15)
+        )
+
+    def post(self, path, data):
+        return self.client.post(
+            f'/counselor_admin/api/admin/schedule/{path}', data, content_type='application/json', **self.admin_headers,
+        )
+
+    def month(self):
+        body = self.post('work/list', {'year': 2026, 'month': 3}).json()
+        return {
+            item['date']: [(entry['work_time'], entry['from_rule']) for entry in item['schedules']]
+            for item in body['data'] if item['schedules']
+        }
+
+    def test_month_view_and_availability_merge_rules_with_overrides(self):
+        self.assertEqual(self.month(), {
+            '2026-03-03': [(['09:00-12:00'], True)],
+            '2026-03-10': [(['14:00-15:00'], False)],
+            '2026-03-24': [(['09:00-12:00'], True)],
+            '2026-03-31': [(['09:00-12:00'], True)],
+        })
+        bitmap = CounselorAvailability.objects.get(counselor=self.counselors[0], day=date(2026, 3, 3)).available
+        self.assertEqual(availability.slot_ranges(bitmap), [(540, 720)])
+        bitmap = CounselorAvailability.objects.get(counselor=self.counselors[0], day=date(2026, 3, 10)).available
+        self.assertEqual(availability.slot_ranges(bitmap), [(840, 900)])
+        self.assertFalse(CounselorAvailability.objects.filter(day=date(2026, 3, 17)).exists())
+
+        # 与规则一致的单日排班不写记录；未提交的咨询师记为例外日期
+        self.post('work/create', {
+            'year': 2026, 'month': 3, 'date': 24,
+            'schedules': [{'id': self.counselors[0].id, 'work_time': ['09:00-12:00']}],
+        })
+        self.post('work/create', {'year': 2026, 'month': 3, 'date': 31, 'schedules': []})
+        self.post('work/create', {
+            'year': 2026, 'month': 3, 'date': 17,
+            'schedules': [{'id': self.counselors[0].id, 'work_time': ['09:00-12:00']}],
+        })
+        self.rule.refresh_from_db()
+        self.assertEqual(self.rule.exceptions, ['2026-03-31'])
+        self.assertFalse(Schedule.objects.filter(work_date__in=[date(2026, 3, 17), date(2026, 3, 24)]).exists())
+        self.assertFalse(CounselorAvailability.objects.filter(day=date(2026, 3, 31)).exists())
+        self.assertTrue(CounselorAvailability.objects.filter(day=date(2026, 3, 17)).exists())
+        self.assertNotIn('2026-03-31', self.month())
+
+        # 咨询师端月视图补上规则展开的日期
+        ConsultantAuthToken.objects.create(counselor=self.counselors[0], token='consultant-token')
+        body = self.client.post(
+            '/consultant/api/consultant/schedule/work', {'year': 2026, 'month': 3}, content_type='application/json',
+            HTTP_X_USER_ID=str(self.counselors[0].id), HTTP_X_AUTH_TOKEN='consultant-token',
+        ).json()
+        self.assertEqual([item['date'] for item in body['data']], [3, 17, 24])
+
+    def test_expansion_is_cached_until_rules_change(self):
+        schedule_rules.clear_cache()
+        first = schedule_rules.expand(date(2026, 3, 1), date(2026, 3, 31))
+        self.assertEqual([item[1].day for item in first], [3, 10, 24, 31])
+        hits = schedule_rules.cache_info().hits
+        self.assertIs(schedule_rules.expand(date(2026, 3, 1), date(2026, 3, 31)), first)
+        self.assertEqual(schedule_rules.cache_info().hits, hits + 1)
+
+        self.rule.weekdays = [2, 4]
+        self.rule.save()
+        self.assertEqual(len(schedule_rules.expand(date(2026, 3, 1), date(2026, 3, 31))), 8)
+
+    def test_compact_converts_weekly_rows_to_rules(self):
+        counselor = self.counselors[1]
+        # 2026-05 的周一：4、11、18、25日，6-01 单独调整，6-08 无排班，6-15 恢复
+        for day in (4, 11, 18, 25):
+            for start, end in ((9, 12), (14, 17)):
+                Schedule.objects.create(
+                    counselor=counselor, work_date=date(2026, 5, day), start_time=clock(start), end_time=clock(end)
+                )
+        Schedule.objects.create(counselor=counselor, work_date=date(2026, 6, 1), start_time=clock(10), end_time=clock(11))
+        for start, end in ((9, 12), (14, 17)):
+            Schedule.objects.create(
+                counselor=counselor, work_date=date(2026, 6, 15), start_time=clock(start), end_time=clock(end)
+            )
+        before = schedule_rules.merged(date(2026, 5, 1), date(2026, 6, 30), counselor.id)
+
+        self.assertEqual(
+            schedule_rules.compact([counselor.id], dry_run=True), {'counselors': 1, 'rules': 2, 'deleted': 10, 'kept': 1}
+        )
+        self.assertEqual(Schedule.objects.filter(counselor=counselor).count(), 11)
+        schedule_rules.compact([counselor.id])
+
+        self.assertEqual(list(Schedule.objects.filter(counselor=counselor).values_list('work_date', flat=True)),
+                         [date(2026, 6, 1)])
+        rules = ScheduleRule.objects.filter(counselor=counselor)
+        self.assertEqual({rule.exceptions[0] for rule in rules}, {'2026-06-08'})
+        self.assertEqual(
+            {key: ranges for key, (ranges, _) in schedule_rules.merged(date(2026, 5, 1), date(2026, 6, 30), counselor.id).items()},
+            {key: ranges for key, (ranges, _) in before.items()},
+        )
+        # 已有规则的咨询师不再压缩
+        self.assertEqual(schedule_rules.compact([counselor.id])['rules'], 0)
+
+    def test_rule_endpoints(self):
+        body = self.post('rule/create', {
+            'consultant_id': self.counselors[1].id, 'weekdays': [1, 3], 'start_time': '13:00', 'end_time': '17:00',
+            'start_date': '2026-03-01', 'end_date': '2026-03-31',
+        }).json()
+        rule_id = body['data']['id']
+        self.assertEqual(body['data']['weekdays'], [1, 3])
+        self.assertIn('2026-03-02', self.month())
+
+        response = self.post('rule/update', {'id': rule_id, 'weekdays': [8]})
+        self.assertEqual(response.status_code, 400)
+        response = self.post('rule/update', {'id': rule_id, 'end_date': '2026-02-01'})
+        self.assertEqual(response.status_code, 400)
+        body = self.post('rule/update', {'id': rule_id, 'exceptions': ['2026-03-02'], 'end_date': ''}).json()
+        self.assertEqual((body['data']['exceptions'], body['data']['end_date']), (['2026-03-02'], ''))
+        self.assertNotIn('2026-03-02', self.month())
+
+        body = self.post('rule/list', {'consultant_id': self.counselors[1].id}).json()
+        self.assertEqual(body['total'], '1')
+        self.post('rule/delete', {'id': rule_id})
+        self.assertNotIn('2026-03-04', self.month())
+        self.assertEqual(self.post('rule/delete', {'id': rule_id}).status_code, 404)
+
+    def test_availability_past_rule_horizon(self):
+        # 长期有效的规则只写入 horizon 以内的位图行，之后的日期查询时即时计算（含停诊）
+        with override_settings(SCHEDULE_RULE_HORIZON_DAYS=14):
+            today = timezone.now().date()
+            horizon = schedule_rules.horizon_end()
+            ScheduleRule.objects.create(
+                counselor=self.counselors[1], weekdays=list(range(1, 8)), start_time=clock(9), end_time=clock(12),
+                start_date=today,
+            )
+            self.assertFalse(CounselorAvailability.objects.filter(day__gt=horizon).exists())
+            Cancellation.objects.create(
+                counselor=self.counselors[1],
+                cancel_start=datetime.combine(horizon + timedelta(days=3), clock(9)),
+                cancel_end=datetime.combine(horizon + timedelta(days=3), clock(10)),
+            )
+            body = self.post('work/availability', {
+                'start_date': (horizon - timedelta(days=1)).isoformat(),
+                'end_date': (horizon + timedelta(days=4)).isoformat(),
+                'start_time': '09:00', 'end_time': '10:00', 'mode': 'any',
+            }).json()
+        self.assertEqual(body['coverage'], [1, 1, 1, 1, 0, 1])
+        self.assertEqual([(item['id'], item['all_free']) for item in body['data']], [(str(self.counselors[1].id), False)])
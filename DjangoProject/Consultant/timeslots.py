@@ -0,0 +1,93 @@
+"""
+预约时段解析
+咨询订单（ConsultationOrder）和预约订单（Appointment）的 time_slot 是自由文本（如 "09:00-10:00"、"9:00~10:30"、"上午"），
+保存时解析出当天的开始、结束分钟数写入 slot_start_minute / slot_end_minute，
+时段统计、时间冲突判断都在这两个整数列上比较（与咨询师、预约日期组成联合索引），不再对 time_slot 做 LIKE 匹配
+
+本模块不导入任何模型，模型的 save() 和迁移都可以直接使用
+"""
+import re
+from collections import Counter
+
+from django.db.models import Count, Q
+
+
+# 保存到业务表的字段
+FIELDS = ('slot_start_minute', 'slot_end_minute')
+
+_TIME_RANGE = re.compile(r'(\d{1,2})\s*[:：]\s*(\d{2})(?:\s*[-~～至到—–]+\s*(\d{1,2})\s*[:：]\s*(\d{2}))?')
+
+
+def parse_time_slot(value):
+    """
+    预约时段 -> (开始分钟数, 结束分钟数)，如 "09:00-10:00" -> (540, 600)
+    只有开始时间时结束为None，无法解析（如"上午"）时都为None
+    """
+    match = _TIME_RANGE.search(value or '')
+    if not match:
+        return None, None
+    start_hour, start_minute, end_hour, end_minute = match.groups()
+    start = int(start_hour) * 60 + int(start_minute)
+    if start >= 24 * 60:
+        return None, None
+    if end_hour is None:
+        return start, None
+    end = int(end_hour) * 60 + int(end_minute)
+    return start, end if start < end <= 24 * 60 else None
+
+
+def apply(obj):
+    """按对象的 time_slot 设置 slot_start_minute / slot_end_minute（不保存）"""
+    obj.slot_start_minute, obj.slot_end_minute = parse_time_slot(obj.time_slot)
+
+
+# ==================== 查询 ====================
+
+def overlapping(queryset, start, end):
+    """
+    与 [start, end) 分钟区间重叠的订单（同一咨询师、同一日期的条件由调用方加上）
+    结束时间未知的时段按开始时间落在区间内计
+    """
+    return queryset.filter(
+        Q(slot_end_minute__gt=start) | Q(slot_end_minute__isnull=True, slot_start_minute__gte=start),
+        slot_start_minute__lt=end,
+    )
+
+
+def hour_counts(queryset, hours):
+    """
+    按时段开始时间所在的小时统计订单数，返回与 hours 对应的数量列表
+    按开始分钟数分组查询（取值很少），在Python中归入小时，不依赖数据库的整数除法
+    """
+    counts = Counter()
+    rows = (
+        queryset.filter(slot_start_minute__isnull=False)
+        .values_list('slot_start_minute').annotate(count=Count('pk')).order_by()
+    )
+    for start, count in rows:
+        counts[start // 60] += count
+    return [counts[hour] for hour in hours]
+
+
+# ==================== 回填 ====================
+
+def backfill(model, batch_size=1000):
+    """按主键分批解析 model 全表的 time_slot 并写回（迁移中传入历史模型），返回更新的行数"""
+    updated = 0
+    last = None
+    while True:
+        queryset = model.objects.order_by('pk')
+        if last is not None:
+            queryset = queryset.filter(pk__gt=last)
+        batch = list(queryset.only('pk', 'time_slot', *FIELDS)[:batch_size])
+        if not batch:
+            return updated
+        changed = []
+        for obj in batch:
+            before = (obj.slot_start_minute, obj.slot_end_minute)
+            apply(obj)
+            if (obj.slot_start_minute, obj.slot_end_minute) != before:
+                changed.append(obj)
+        model.objects.bulk_update(changed, FIELDS)
+        updated += len(changed)
+        last = batch[-1].pk
@@ -4,11 +4,51 @@
 from functools import wraps
 from rest_framework.response import Response
 from rest_framework import status
+from django.conf import settings
+from django.db.models import Sum
 from django.utils.timezone import now
-from Consultant.models import ConsultantAuthToken
+from Consultant.models import ConsultantAuthToken, FileStorage
+from DjangoProject.authentication import (
+    HeaderTokenAuthentication, TokenCache, header_credentials, upload_rejection
+)
+from DjangoProject.async_views import json_response, parse_body
 import json
 
 
+# 已验证Token的进程内缓存（咨询师Token或咨询师信息变化时通过失效总线清除）
+_token_cache = TokenCache('tokens:consultant')
+
+
+def _token_queryset(cache_key):
+    """查找该咨询师的活跃token"""
+    return ConsultantAuthToken.objects.select_related('counselor').filter(
+        counselor_id=cache_key[0],
+        token=cache_key[1],
+        is_active=True
+    )
+
+
+def _token_cache_key(user_id, token):
+    """返回 (user_id, token) 缓存键，参数无效时返回None"""
+    if not user_id or not token:
+        return None
+    try:
+        return int(user_id), str(token).strip()
+    except (ValueError, TypeError):
+        return None
+
+
+def _check_token(token_obj):
+    if not token_obj:
+        return False, None
+    
+    # 检查token是否过期
+    if token_obj.expires_at and token_obj.expires_at < now():
+        return False, None
+    
+    return True, token_obj
+
+
 def _verify_id_token(user_id, token):
     """
     验证咨询师用户ID和Token是否匹配
@@ -20,28 +60,18 @@ def _verify_id_token(user_id, token):
     返回:
         (is_valid, token_obj): (是否有效, Token对象或None)
     """
-    if not user_id or not token:
+    cache_key = _token_cache_key(user_id, token)
+    if cache_key is None:
         return False, None
-    
-    try:
-        # 查找该咨询师的活跃token
-        token_obj = ConsultantAuthToken.objects.filter(
-            counselor_id=int(user_id),
-            token=str(token).strip(),
-            is_active=True
-        ).first()
-        
-        if not token_obj:
-            return False, None
-        
-        # 检查token是否过期
-        if token_obj.expires_at and token_obj.expires_at < now():
-            return False, None
-        
-        return True, token_obj
+    return _check_token(_token_cache.fetch(cache_key, _token_queryset(cache_key)))
 
-    except (ValueError, TypeError):
+
+async def _averify_id_token(user_id, token):
+    """_verify_id_token 的异步版本（异步ORM查询）"""
+    cache_key = _token_cache_key(user_id, token)
+    if cache_key is None:
         return False, None
+    return _check_token(await _token_cache.afetch(cache_key, _token_queryset(cache_key)))
 
 
 def _get_request_data(request):
@@ -104,112 +134,124 @@ def _get_request_data(request):
     return {}
 
 
+class ConsultantTokenAuthentication(HeaderTokenAuthentication):
+    """
+    咨询师端认证：优先读取请求头 X-User-Id / X-Auth-Token，兼容请求体中的 userID/token
+    上传请求受咨询师剩余存储配额限制
+    """
+    url_prefix = '/consultant/'
+
+    def verify(self, user_id, token):
+        return _verify_id_token(user_id, token)
+
+    async def averify(self, user_id, token):
+        return await _averify_id_token(user_id, token)
+
+    def get_user(self, token_obj):
+        return token_obj.counselor
+
+    def upload_quota(self, user):
+        return _remaining_upload_quota(user)
+
+    async def aupload_quota(self, user):
+        return await _aremaining_upload_quota(user)
+
+
+def _remaining_upload_quota(counselor):
+    """咨询师剩余的上传配额（字节），未配置 COUNSELOR_UPLOAD_QUOTA 时不限制"""
+    quota = getattr(settings, 'COUNSELOR_UPLOAD_QUOTA', None)
+    if not quota:
+        return None
+    used = FileStorage.objects.filter(uploader=counselor).aggregate(total=Sum('file_size'))['total'] or 0
+    return quota - used
+
+
+async def _aremaining_upload_quota(counselor):
+    """_remaining_upload_quota 的异步版本"""
+    quota = getattr(settings, 'COUNSELOR_UPLOAD_QUOTA', None)
+    if not quota:
+        return None
+    used = (await FileStorage.objects.filter(uploader=counselor).aaggregate(total=Sum('file_size')))['total'] or 0
+    return quota - used
+
+
 def require_body_auth(view_func):
     """
-    从请求体中验证user_id和token的装饰器
-    支持JSON和multipart/form-data格式
-    所有参数都在body中，包括user_id和token
+    验证userID和token的装饰器
+    优先使用请求头（X-User-Id、X-Auth-Token），在解析请求体之前完成认证；
+    请求头中没有凭证时从请求体读取（支持字段：userID, user_id, userId, id），兼容旧客户端
+    认证由 DRF 在调用视图前完成（DEFAULT_AUTHENTICATION_CLASSES 中的 ConsultantTokenAuthentication），
+    这里只把未认证和上传被拒绝的请求转换为咨询师端格式的响应
     注意：这个装饰器必须在@api_view之后应用，并且需要在视图中设置permission_classes=[]
     """
     @wraps(view_func)
     def wrapper(request, *args, **kwargs):
-        # 获取请求数据 - 优先使用DRF的request.data
-        user_id = None
-        token = None
-        
-        # 方法1: 尝试使用DRF的request.data（最可靠）
-        try:
-            # 在DRF的APIView中，request.data是一个属性，会自动解析请求体
-            if hasattr(request, 'data'):
-                data = request.data
-                # 支持QueryDict和普通字典
-                if hasattr(data, 'get'):
-                    user_id = data.get('userID') or data.get('user_id') or data.get('userId') or data.get('id')
-                    token = data.get('token')
-                # 如果是字典类型
-                elif isinstance(data, dict):
-                    user_id = data.get('userID') or data.get('user_id') or data.get('userId') or data.get('id')
-                    token = data.get('token')
-        except (AttributeError, TypeError, Exception):
-            # 如果访问request.data失败，继续尝试其他方法
-            pass
-        
-        # 方法2: 如果request.data不可用，手动解析JSON请求体
-        if not user_id or not token:
-            try:
-                # 获取Content-Type
-                content_type = ''
-                if hasattr(request, 'content_type'):
-                    content_type = request.content_type or ''
-                elif hasattr(request, 'META'):
-                    content_type = request.META.get('CONTENT_TYPE', '')
-                
-                # 如果是JSON请求，手动解析
-                if 'application/json' in content_type.lower():
-                    if hasattr(request, 'body'):
-                        body = request.body
-                        if isinstance(body, bytes):
-                            body_str = body.decode('utf-8')
-                        else:
-                            body_str = str(body)
-                        
-                        if body_str:
-                            parsed_data = json.loads(body_str)
-                            if isinstance(parsed_data, dict):
-                                if not user_id:
-                                    user_id = parsed_data.get('userID') or parsed_data.get('user_id') or parsed_data.get('userId') or parsed_data.get('id')
-                                if not token:
-                                    token = parsed_data.get('token')
-            except (json.JSONDecodeError, UnicodeDecodeError, AttributeError, ValueError, Exception):
-                pass
-        
-        # 方法3: 尝试从POST数据获取（form-data格式）
-        if not user_id or not token:
-            try:
-                if hasattr(request, 'POST') and request.POST:
-                    if not user_id:
-                        user_id = request.POST.get('userID') or request.POST.get('user_id') or request.POST.get('userId') or request.POST.get('id')
-                    if not token:
-                        token = request.POST.get('token')
-            except Exception:
-                pass
-        
-        # 验证是否获取到userID和token
-        if not user_id or not token:
-            # 添加调试信息，帮助排查问题
-            debug_info = {
-                'has_request_data': hasattr(request, 'data'),
-                'request_type': str(type(request)),
-            }
-            try:
-                if hasattr(request, 'data'):
-                    debug_info['data_type'] = str(type(request.data))
-                    if hasattr(request.data, 'keys'):
-                        debug_info['data_keys'] = list(request.data.keys())
-                    elif isinstance(request.data, dict):
-                        debug_info['data_keys'] = list(request.data.keys())
-            except:
-                pass
-            
+        # 未认证的请求不解析请求体，只读取认证时已记录的拒绝原因
+        authenticated = isinstance(request.auth, ConsultantAuthToken)
+        rejected = upload_rejection(request, parse=authenticated)
+        # 请求体凭证的上传超过暂存上限时停止接收，凭证可能未被读取，按413返回
+        if rejected == 'unauthenticated':
             return Response({
-                'code': 401,
-                'message': '认证失败：请求体中缺少 userID 或 token（支持字段：userID, user_id, userId, id）',
-                'debug': debug_info
-            }, status=status.HTTP_401_UNAUTHORIZED)
-        
-        # 验证user_id和token
-        is_valid, token_obj = _verify_id_token(user_id, token)
-        
-        if not is_valid:
+                'code': 413,
+                'message': '上传文件较大，请在请求头中携带 X-User-Id 和 X-Auth-Token 后重试'
+            }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        if not authenticated:
             return Response({
                 'code': 401,
-                'message': '认证失败：用户ID与Token不匹配或Token已过期'
+                'message': '认证失败：缺少 userID 或 token，或用户ID与Token不匹配、Token已过期'
+                           '（请求头 X-User-Id、X-Auth-Token，或请求体字段 userID/user_id/userId/id、token）'
             }, status=status.HTTP_401_UNAUTHORIZED)
-        
+
+        if rejected == 'quota':
+            return Response({
+                'code': 413,
+                'message': '上传文件超过大小限制或剩余存储配额不足'
+            }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
         # 将用户信息附加到request上，供视图函数使用
-        request.counselor = token_obj.counselor
-        request.verified_user_id = int(user_id)
-        
+        request.counselor = request.user
+
         return view_func(request, *args, **kwargs)
     return wrapper
 
+
+def async_require_body_auth(view_func):
+    """
+    require_body_auth 的异步版本，用于 @async_api_view 异步视图（不经过DRF）
+    认证失败和上传被拒绝时的响应与 require_body_auth 相同
+    """
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        if not all(header_credentials(request)):
+            # 凭证在请求体中（旧客户端），先解析请求体
+            await parse_body(request)
+            rejected = upload_rejection(request)
+            # 请求体凭证的上传超过暂存上限时停止接收，凭证可能未被读取，按413返回
+            if rejected == 'unauthenticated':
+                return json_response({
+                    'code': 413,
+                    'message': '上传文件较大，请在请求头中携带 X-User-Id 和 X-Auth-Token 后重试'
+                }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        result = await ConsultantTokenAuthentication().aauthenticate(request)
+        if result is None:
+            return json_response({
+                'code': 401,
+                'message': '认证失败：缺少 userID 或 token，或用户ID与Token不匹配、Token已过期'
+                           '（请求头 X-User-Id、X-Auth-Token，或请求体字段 userID/user_id/userId/id、token）'
+            }, status=status.HTTP_401_UNAUTHORIZED)
+
+        counselor, token_obj = result
+        await parse_body(request)
+        rejected = upload_rejection(request)
+        if rejected == 'quota':
+            return json_response({
+                'code': 413,
+                'message': '上传文件超过大小限制或剩余存储配额不足'
+            }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        request.counselor = counselor
+
+        return await view_func(request, *args, **kwargs)
+    return wrapper
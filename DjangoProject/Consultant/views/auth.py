@@ -4,11 +4,11 @@
 import uuid
 import secrets
 import string
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from datetime import datetime, timedelta
+from django.utils.decorators import method_decorator
 from django.utils.timezone import now
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
@@ -16,6 +16,9 @@ from django.contrib.auth.hashers import make_password, check_password
 
 from CounselorAdmin.models import Counselor, VerificationCode
 from Consultant.models import ConsultantAuthToken, CounselorProfile
+from DjangoProject import invalidation
+from DjangoProject.async_views import json_response, parse_body, run_blocking
+from Consultant import read_model
 from Consultant.serializers.auth import (
     CounselorLoginSerializer,
     CounselorRegisterSerializer,
@@ -32,6 +35,11 @@ def _send_email_code(email: str, code: str) -> bool:
     """
     使用163邮箱SMTP发送验证码
     """
+    # 只有发送验证码时使用，首次调用时才加载
+    import smtplib
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+
     try:
         smtp_server = "smtp.163.com"
         smtp_port = 465
@@ -79,11 +87,11 @@ class LoginView(APIView):
         account = data.get('account')
         credential = data.get('credential')
         
-        # 根据账户类型查找用户
+        # 根据账户类型查找用户（同时取出详情，返回用户信息时不再查询详情表）
         if account_type == 'email':
-            counselor = Counselor.objects.filter(email=account).first()
+            counselor = read_model.counselor_queryset().filter(email=account).first()
         elif account_type == 'phone':
-            counselor = Counselor.objects.filter(phone=account).first()
+            counselor = read_model.counselor_queryset().filter(phone=account).first()
         else:
             return Response({
                 'code': 400,
@@ -257,20 +265,22 @@ class RegisterView(APIView):
         })
 
 
-class SendEmailCodeView(APIView):
+@method_decorator(csrf_exempt, name='dispatch')
+class SendEmailCodeView(View):
     """
     发送邮箱验证码
     POST /api/consultant/auth/email
     支持注册和登录两种用途
+    异步视图：SMTP发送在 smtp 线程池中执行，等待邮件服务器期间不占用 worker 线程
     """
-    permission_classes = []
     
-    def post(self, request):
-        email = request.data.get('email')
-        purpose = request.data.get('purpose', 'register')  # 默认为register，支持login
+    async def post(self, request):
+        data = await parse_body(request)
+        email = data.get('email')
+        purpose = data.get('purpose', 'register')  # 默认为register，支持login
         
         if not email:
-            return Response({
+            return json_response({
                 'code': 400,
                 'message': '邮箱必填'
             }, status=status.HTTP_400_BAD_REQUEST)
@@ -282,21 +292,21 @@ class SendEmailCodeView(APIView):
         code = _generate_code()
         expires = now() + timedelta(minutes=5)
         
-        VerificationCode.objects.create(
+        await VerificationCode.objects.acreate(
             email=email,
             code=code,
             purpose=purpose,
             expires_at=expires,
         )
         
-        sent = _send_email_code(email, code)
+        sent = await run_blocking(_send_email_code, email, code, pool='smtp')
         if not sent:
-            return Response({
+            return json_response({
                 'code': 500,
                 'message': '验证码发送失败，请检查邮件配置'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
-        return Response({
+        return json_response({
             'code': 0,
             'message': '验证码已发送'
         })
@@ -479,8 +489,9 @@ class DeactivateView(APIView):
         counselor.status = '停用'
         counselor.save(update_fields=['status'])
         
-        # 禁用所有token
+        # 禁用所有token（update 不触发信号，手动通知各worker清除Token缓存）
         ConsultantAuthToken.objects.filter(counselor=counselor).update(is_active=False)
+        invalidation.publish('tokens:consultant')
         
         return Response({
             'code': 0,
@@ -10,8 +10,14 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import AllowAny
 
-from Consultant.models import ConsultationOrder, ConsultationRecord
+from Consultant.models import ConsultationOrder, ConsultationRecord, OrderIndex
+from Consultant import order_index, timeslots
 from Consultant.utils import require_body_auth
+from DjangoProject.cache import cached_view
+
+
+# 仪表盘统计缓存时间（秒），订单或档案变化时整体失效
+DASHBOARD_CACHE_TIMEOUT = 60
 
 
 # ==================== 仪表盘 ====================
@@ -19,16 +25,18 @@ from Consultant.utils import require_body_auth
 @api_view(['POST'])
 @permission_classes([AllowAny])  # 禁用DRF默认权限检查
 @require_body_auth  # 业务逻辑中的鉴权
+@cached_view('dashboard', timeout=DASHBOARD_CACHE_TIMEOUT, vary_on=['counselor'])
 def today_transactions(request):
     """POST 获取今日咨询交易情况"""
     counselor = request.counselor
     today = timezone.now().date()
     
-    # 查询今日订单
-    orders = ConsultationOrder.objects.filter(
+    # 查询今日订单（订单索引按咨询师、预约日期有索引）
+    orders = OrderIndex.objects.filter(
+        source=order_index.ORDER,
         counselor=counselor,
         appointment_date=today,
-        status__in=['accepted', 'completed']
+        status__in=['active', 'completed']
     )
     
     count = orders.count()
@@ -48,20 +56,18 @@ def today_transactions(request):
 @api_view(['POST'])
 @permission_classes([AllowAny])  # 禁用DRF默认权限检查
 @require_body_auth  # 业务逻辑中的鉴权
+@cached_view('dashboard', timeout=DASHBOARD_CACHE_TIMEOUT, vary_on=['counselor'])
 def category_data(request):
     """POST 获取咨询类别占比数据"""
     counselor = request.counselor
     
-    # 统计在线和线下咨询数量
-    online_count = ConsultationOrder.objects.filter(
-        counselor=counselor,
-        service_type='online'
-    ).count()
-    
-    offline_count = ConsultationOrder.objects.filter(
-        counselor=counselor,
-        service_type='offline'
-    ).count()
+    # 统计在线和线下咨询数量（含已归档订单），一次分组查询
+    counts = dict(
+        OrderIndex.objects.filter(source=order_index.ORDER, counselor=counselor)
+        .values_list('service_type').annotate(count=Count('id')).order_by()
+    )
+    online_count = counts.get('online', 0)
+    offline_count = counts.get('offline', 0)
     
     return Response({
         'code': 0,
@@ -76,6 +82,7 @@ def category_data(request):
 @api_view(['POST'])
 @permission_classes([AllowAny])  # 禁用DRF默认权限检查
 @require_body_auth  # 业务逻辑中的鉴权
+@cached_view('dashboard', timeout=DASHBOARD_CACHE_TIMEOUT, vary_on=['counselor'])
 def yearly_consultations(request):
     """POST 获取年度咨询量数据"""
     counselor = request.counselor
@@ -110,6 +117,7 @@ def yearly_consultations(request):
 @api_view(['POST'])
 @permission_classes([AllowAny])  # 禁用DRF默认权限检查
 @require_body_auth  # 业务逻辑中的鉴权
+@cached_view('dashboard', timeout=DASHBOARD_CACHE_TIMEOUT, vary_on=['counselor'])
 def time_slot_data(request):
     """POST 获取时段预约趋势数据"""
     counselor = request.counselor
@@ -124,16 +132,10 @@ def time_slot_data(request):
         appointment_date__lte=end_date
     )
     
-    # 统计各时段的预约数量
-    # 这里简化处理，实际应该根据time_slot字段进行分组统计
-    time_slots = []
-    appointments = []
-    
-    # 假设时间段为8:00-20:00，每小时一个时段
-    for hour in range(8, 21):
-        time_slots.append(hour)
-        count = orders.filter(time_slot__contains=str(hour)).count()
-        appointments.append(count)
+    # 按时段开始时间所在的小时统计（8:00-20:00，每小时一个时段）
+    # 在 (咨询师, 预约日期, 开始分钟数) 联合索引上分组，一次查询；无法解析的时段（如"上午"）不计入
+    time_slots = list(range(8, 21))
+    appointments = timeslots.hour_counts(orders, time_slots)
     
     return Response({
         'code': 0,
@@ -148,6 +150,7 @@ def time_slot_data(request):
 @api_view(['POST'])
 @permission_classes([AllowAny])  # 禁用DRF默认权限检查
 @require_body_auth  # 业务逻辑中的鉴权
+@cached_view('dashboard', timeout=DASHBOARD_CACHE_TIMEOUT, vary_on=['counselor'])
 def gender_data(request):
     """POST 获取用户性别分布数据"""
     counselor = request.counselor
@@ -176,6 +179,7 @@ def gender_data(request):
 @api_view(['POST'])
 @permission_classes([AllowAny])  # 禁用DRF默认权限检查
 @require_body_auth  # 业务逻辑中的鉴权
+@cached_view('dashboard', timeout=DASHBOARD_CACHE_TIMEOUT, vary_on=['counselor'])
 def age_data(request):
     """POST 获取用户年龄分布数据"""
     counselor = request.counselor
@@ -0,0 +1,175 @@
+"""
+媒体文件相关视图
+衍生图按需生成：历史图片没有缩略图/WebP版本时，首次访问生成后重定向到静态地址
+上传文件访问：支持 Range、条件请求和长期缓存，不依赖 DEBUG 模式
+"""
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseNotModified, HttpResponseRedirect, StreamingHttpResponse
+)
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_GET, require_http_methods
+
+from Consultant import images, storage
+
+
+@require_GET
+def image_variant(request, variant, path):
+    """GET 获取图片衍生图（不存在时同步生成）"""
+    if variant not in images.variant_specs():
+        raise Http404('不支持的图片规格')
+    source_path = storage.safe_absolute_path(path)
+    if not source_path:
+        raise Http404('文件不存在')
+
+    relative_path = images.generate_variant(path, variant)
+    if relative_path:
+        return HttpResponseRedirect(f"/static/{relative_path}")
+
+    # 无法生成衍生图（原图损坏等）时回退到原图
+    if images.is_image(path) and os.path.exists(source_path):
+        return HttpResponseRedirect(f"/static/{storage.normalize_path(path)}")
+    raise Http404('文件不存在')
+
+
+# ==================== 上传文件访问 ====================
+
+# Range 响应每次读取的块大小
+STREAM_BLOCK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _is_immutable(relative_path):
+    """内容寻址路径（blobs/ 及其衍生图）内容不会改变"""
+    if relative_path.startswith('blobs/'):
+        return True
+    return relative_path.startswith('variants/') and '/blobs/' in relative_path
+
+
+def _make_etag(relative_path, stat_result):
+    if relative_path.startswith('blobs/'):
+        # 文件名就是内容哈希，直接作为强校验ETag
+        return '"%s"' % os.path.splitext(os.path.basename(relative_path))[0]
+    return '"%x-%x"' % (int(stat_result.st_mtime_ns), stat_result.st_size)
+
+
+def _parse_range(header, size):
+    """
+    解析单个字节范围，返回 (start, end)，无法满足时返回 False，不支持的格式返回 None（按完整文件返回）
+    """
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if start == '' and end == '':
+        return None
+    if start == '':
+        # bytes=-500 表示最后500字节
+        length = int(end)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = int(end) if end else size - 1
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1)
+
+
+def _file_range_iterator(file_path, start, length):
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            block = f.read(min(STREAM_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
+def _not_modified(request, etag, last_modified):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        etags = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in etags or etag in etags or f'W/{etag}' in etags
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return if_modified_since is not None and int(last_modified) <= if_modified_since
+
+
+@require_http_methods(['GET', 'HEAD'])
+def serve_upload(request, path):
+    """
+    GET/HEAD 访问 static 目录下的上传文件
+    支持 Range 断点/拖动播放、ETag/Last-Modified 条件请求（304）、内容寻址文件长期缓存，
+    可选通过 X-Accel-Redirect（nginx）或 X-Sendfile（Apache）交给前端服务器发送文件
+    """
+    relative_path = storage.normalize_path(path)
+    file_path = storage.safe_absolute_path(relative_path)
+    if not file_path or relative_path.startswith('blobs/tmp/') or not os.path.isfile(file_path):
+        raise Http404('文件不存在')
+
+    stat_result = os.stat(file_path)
+    size = stat_result.st_size
+    etag = _make_etag(relative_path, stat_result)
+    content_type = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+
+    if _is_immutable(relative_path):
+        cache_control = 'public, max-age=31536000, immutable'
+    else:
+        cache_control = 'public, max-age=%d' % getattr(settings, 'MEDIA_CACHE_MAX_AGE', 3600)
+
+    def with_headers(response):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(stat_result.st_mtime)
+        response['Cache-Control'] = cache_control
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    if _not_modified(request, etag, stat_result.st_mtime):
+        return with_headers(HttpResponseNotModified())
+
+    # 交给 nginx / Apache 发送文件（前端服务器自行处理 Range）
+    sendfile_mode = getattr(settings, 'MEDIA_SENDFILE', None)
+    if sendfile_mode == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-static/') + relative_path
+        return with_headers(response)
+    if sendfile_mode == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = file_path
+        return with_headers(response)
+
+    range_header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if range_header and (not if_range or if_range == etag):
+        byte_range = _parse_range(range_header, size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return with_headers(response)
+        if byte_range:
+            start, end = byte_range
+            length = end - start + 1
+            if request.method == 'HEAD':
+                response = HttpResponse(status=206, content_type=content_type)
+            else:
+                response = StreamingHttpResponse(
+                    _file_range_iterator(file_path, start, length), status=206, content_type=content_type
+                )
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(length)
+            return with_headers(response)
+
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+    else:
+        # FileResponse 在服务器支持时使用 wsgi.file_wrapper（sendfile）发送
+        response = FileResponse(open(file_path, 'rb'), content_type=content_type)
+    response['Content-Length'] = str(size)
+    return with_headers(response)
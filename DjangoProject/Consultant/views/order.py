@@ -4,42 +4,26 @@
 """
 import uuid
 from datetime import datetime
-from django.db.models import Q
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import AllowAny
 
-from Consultant.models import ConsultationOrder, ConsultationRecord
+from Consultant.models import ConsultationOrder, ConsultationRecord, OrderIndex
 from Consultant.serializers.order import ConsultationOrderListSerializer, ConsultationOrderCreateSerializer
+from Consultant import archive, order_index
 from Consultant.utils import require_body_auth
 
 
 # ==================== 咨询列表 ====================
 
-@api_view(['POST'])
-@permission_classes([AllowAny])  # 禁用DRF默认权限检查
-@require_body_auth  # 业务逻辑中的鉴权
-def order_list(request):
-    """POST 获取咨询列表"""
-    counselor = request.counselor
-    data = request.data
-    
-    page = int(data.get('page', 1))
-    page_size = int(data.get('pageSize', 10))
-    name = data.get('name', '')
+def _filter_orders(queryset, data):
+    """订单索引筛选条件"""
     date_start = data.get('date_start', '')
     date_end = data.get('date_end', '')
     service_type = data.get('type', '')
     order_status = data.get('status', '')
     
-    # 构建查询
-    queryset = ConsultationOrder.objects.filter(counselor=counselor)
-    
-    # 姓名筛选（通过关联的档案）
-    if name:
-        queryset = queryset.filter(record__client_name__icontains=name)
-    
     # 日期范围筛选
     if date_start:
         queryset = queryset.filter(appointment_date__gte=date_start)
@@ -53,26 +37,40 @@ def order_list(request):
         elif service_type == '线下咨询':
             queryset = queryset.filter(service_type='offline')
     
-    # 状态筛选
+    # 状态筛选（已结束、咨询中、等待中/待接单、已拒绝 或 completed 等原始状态）
     if order_status:
-        status_map = {
-            '已结束': 'completed',
-            '咨询中': 'accepted',
-            '等待中': 'pending',
-            '待接单': 'pending',
-            '已拒绝': 'rejected'
-        }
-        mapped_status = status_map.get(order_status, order_status)
-        queryset = queryset.filter(status=mapped_status)
+        queryset = queryset.filter(status=order_index.normalize_status(order_status))
+    return queryset
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])  # 禁用DRF默认权限检查
+@require_body_auth  # 业务逻辑中的鉴权
+def order_list(request):
+    """POST 获取咨询列表"""
+    counselor = request.counselor
+    data = request.data
+    
+    page = int(data.get('page', 1))
+    page_size = int(data.get('pageSize', 10))
+    name = data.get('name', '')
+    
+    # 在订单索引上筛选、计数和分页，当前页的订单（及其档案）再批量取出
+    queryset = OrderIndex.objects.filter(source=order_index.ORDER, counselor=counselor)
+    if not archive.wants_archived(data):
+        queryset = queryset.filter(archived=False)
+    
+    # 姓名筛选（索引中保存了关联档案的来访者姓名）
+    if name:
+        queryset = queryset.filter(client_name__icontains=name)
+    queryset = _filter_orders(queryset, data)
     
     # 排序
-    queryset = queryset.order_by('-created_time')
+    queryset = queryset.order_by('-created_time', '-source_id')
     
     # 分页
-    total = queryset.count()
     start = (page - 1) * page_size
-    end = start + page_size
-    orders = queryset[start:end]
+    total, orders = order_index.page(queryset, start, start + page_size)
     
     serializer = ConsultationOrderListSerializer(orders, many=True)
     
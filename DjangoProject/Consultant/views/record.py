@@ -5,28 +5,29 @@
 import uuid
 import os
 import time
-import io
-import zipfile
 import mimetypes
-import pandas as pd
 from datetime import datetime
-from django.db.models import Q, Max
+from django.db import transaction
+from django.db.models import Q
 from django.conf import settings
 from django.utils import timezone
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import AllowAny
-from django.http import FileResponse, HttpResponse
+from django.http import HttpResponse
 
-from Consultant.models import ConsultationRecord, ConsultationSession, FileStorage
+from Consultant.models import ArchivedConsultationRecord, ConsultationRecord, ConsultationSession, FileStorage
 from Consultant.serializers.record import (
     ConsultationRecordListSerializer,
     ConsultationRecordCreateSerializer,
     ConsultationSessionDetailSerializer,
     ConsultationSessionCreateSerializer
 )
-from Consultant.utils import require_body_auth
+from Consultant.utils import require_body_auth, async_require_body_auth
+from DjangoProject.async_views import async_api_view, file_response, json_response, run_blocking
+from Consultant import archive, counters, crisis, storage, template_files
+from CounselorAdmin.filters import filter_records
 import json
 
 
@@ -62,47 +63,28 @@ def record_list(request):
             'code': 400,
             'message': '分页参数错误'
         }, status=status.HTTP_400_BAD_REQUEST)
-    std_name = data.get('std_name', '')
-    std_grade = data.get('std_grade', '')
-    std_class = data.get('std_class', '')
-    std_school = data.get('std_school', '')
-    interview_count = data.get('interview_count', '')
-    interview_status = data.get('interview_status', '')
-    interview_type = data.get('interview_type', '')
-    doctor_evaluation = data.get('doctor_evaluation', '')
-    follow_up_plan = data.get('follow_up_plan', '')
-    
-    # 构建查询
-    queryset = ConsultationRecord.objects.filter(counselor=counselor)
-    
-    # 筛选条件
-    if std_name:
-        queryset = queryset.filter(client_name__icontains=std_name)
-    if std_grade:
-        queryset = queryset.filter(grade__icontains=std_grade)
-    if std_class:
-        queryset = queryset.filter(class_name__icontains=std_class)
-    if std_school:
-        queryset = queryset.filter(school__icontains=std_school)
-    if interview_count:
-        queryset = queryset.filter(interview_count=int(interview_count))
-    if interview_status:
-        status_map = {
-            '进行中': 'active',
-            '已完成': 'completed',
-            '已关闭': 'closed'
-        }
-        mapped_status = status_map.get(interview_status, interview_status)
-        queryset = queryset.filter(current_status=mapped_status)
+    # 构建查询，筛选条件与管理员导出接口共用
+    try:
+        queryset = filter_records(ConsultationRecord.objects.filter(counselor=counselor), data)
+    except (ValueError, TypeError):
+        return Response({
+            'code': 400,
+            'message': '筛选参数错误'
+        }, status=status.HTTP_400_BAD_REQUEST)
     
     # 排序
     queryset = queryset.order_by('-created_time')
     
     # 分页
-    total = queryset.count()
     start = (page - 1) * page_size
     end = start + page_size
-    records = queryset[start:end]
+    if archive.wants_archived(data):
+        # 同时查询归档表，按创建时间合并
+        archived = filter_records(ArchivedConsultationRecord.objects.filter(counselor=counselor), data)
+        total, records = archive.paginate(queryset, archived, start, end, order_by='-created_time')
+    else:
+        total = queryset.count()
+        records = queryset[start:end]
     
     serializer = ConsultationRecordListSerializer(records, many=True)
     
@@ -133,38 +115,38 @@ def record_create(request):
     
     data = serializer.validated_data
     
-    # 创建档案
-    record = ConsultationRecord.objects.create(
-        record_no=f'RC{uuid.uuid4().hex[:12].upper()}',
-        client_name=data.get('std_name'),
-        grade=data.get('std_grade', ''),
-        class_name=data.get('std_class', ''),
-        school=data.get('std_school', ''),
-        counselor=counselor,
-        created_by=counselor,
-        interview_count=int(data.get('interview_count', 0)),
-        interview_type=data.get('interview_type', ''),
-        current_status='active' if data.get('interview_status') == '进行中' else 'completed',
-        client_type='student',
-        gender='男'  # 默认值
-    )
-    
-    # 如果传入了 doctor_evaluation 或 follow_up_plan，创建第一条会话记录
     doctor_evaluation = data.get('doctor_evaluation', '')
     follow_up_plan = data.get('follow_up_plan', '')
     
-    if doctor_evaluation or follow_up_plan:
-        ConsultationSession.objects.create(
-            record=record,
-            session_number=1,
-            interview_date=timezone.now().date(),
-            interview_time='',
-            visit_status='completed',
-            doctor_evaluation=doctor_evaluation,
-            follow_up_plan=follow_up_plan,
-            consultant_name=counselor.name,
-            created_by=counselor
+    with transaction.atomic():
+        # 创建档案（访谈次数由访谈记录维护，不使用传入的 interview_count）
+        record = ConsultationRecord.objects.create(
+            record_no=f'RC{uuid.uuid4().hex[:12].upper()}',
+            client_name=data.get('std_name'),
+            grade=data.get('std_grade', ''),
+            class_name=data.get('std_class', ''),
+            school=data.get('std_school', ''),
+            counselor=counselor,
+            created_by=counselor,
+            interview_type=data.get('interview_type', ''),
+            current_status='active' if data.get('interview_status') == '进行中' else 'completed',
+            client_type='student',
+            gender='男'  # 默认值
         )
+        
+        # 如果传入了 doctor_evaluation 或 follow_up_plan，创建第一条会话记录
+        if doctor_evaluation or follow_up_plan:
+            ConsultationSession.objects.create(
+                record=record,
+                session_number=counters.allocate_session_numbers(record.id)[0],
+                interview_date=timezone.now().date(),
+                interview_time='',
+                visit_status='completed',
+                doctor_evaluation=doctor_evaluation,
+                follow_up_plan=follow_up_plan,
+                consultant_name=counselor.name,
+                created_by=counselor
+            )
     
     return Response({
         'code': 0,
@@ -188,8 +170,10 @@ def record_delete(request):
     
     try:
         record = ConsultationRecord.objects.get(id=record_id, counselor=counselor)
-        # 删除档案会级联删除所有会话
-        record.delete()
+        # 删除档案会级联删除所有会话，咨询师的访谈总数同时减去这些会话
+        with transaction.atomic():
+            counters.adjust_consultation_count(record.counselor_id, -record.sessions.count())
+            record.delete()
         
         return Response({
             'code': 0,
@@ -220,8 +204,8 @@ def record_profile(request):
         }, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        # 业务逻辑鉴权：确保档案属于当前咨询师
-        record = ConsultationRecord.objects.get(id=record_id, counselor=counselor)
+        # 业务逻辑鉴权：确保档案属于当前咨询师（include_archived 时也查找已归档的档案）
+        record = archive.get_record(archive.wants_archived(request.data), id=record_id, counselor=counselor)
         sessions = record.sessions.all().order_by('session_number')
         
         serializer = ConsultationSessionDetailSerializer(sessions, many=True)
@@ -248,10 +232,6 @@ def session_create(request):
     业务逻辑鉴权：确保只能为自己的档案创建会话
     支持 JSON 和 form-data 两种格式
     """
-    import os
-    import time
-    from django.conf import settings
-    
     counselor = request.counselor
     
     # 支持 form-data 和 JSON 两种格式
@@ -304,39 +284,21 @@ def session_create(request):
         # 业务逻辑鉴权：确保档案属于当前咨询师
         record = ConsultationRecord.objects.get(id=record_id, counselor=counselor)
         
-        # 获取下一个会话编号
-        max_session = record.sessions.aggregate(Max('session_number'))
-        next_number = (max_session['session_number__max'] or 0) + 1
-        
         # 处理签名图片文件上传
         signature_image = ''
         if 'signatureImage' in request.FILES:
             uploaded_file = request.FILES['signatureImage']
             # 检查文件类型（图片格式）
-            allowed_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
             file_ext = os.path.splitext(uploaded_file.name)[1].lower()
-            if file_ext not in allowed_extensions:
+            if file_ext not in storage.IMAGE_EXTENSIONS:
                 return Response({
                     'code': 400,
                     'message': '签名图片格式不支持，请上传jpg、png、gif、bmp或webp格式的图片'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            # 确保目录存在
-            signature_dir = os.path.join(settings.BASE_DIR, 'static', 'session_signature')
-            os.makedirs(signature_dir, exist_ok=True)
-            
-            # 生成唯一文件名
-            timestamp = int(time.time() * 1000)
-            file_name = f"signature_{record_id}_{timestamp}{file_ext}"
-            
-            # 保存文件
-            file_path = os.path.join(signature_dir, file_name)
-            with open(file_path, 'wb+') as destination:
-                for chunk in uploaded_file.chunks():
-                    destination.write(chunk)
-            
-            # 保存相对路径到数据库（相对于static目录）
-            signature_image = f"session_signature/{file_name}"
+            # 保存文件（按内容哈希去重存储），保存相对路径到数据库（相对于static目录）
+            stored = storage.save_upload(uploaded_file, 'session_signature', uploader=counselor, associated_id=record_id)
+            signature_image = stored.file_path
         elif 'signatureImage' in validated_data:
             signature_image = validated_data.get('signatureImage', '')
         
@@ -345,56 +307,40 @@ def session_create(request):
         if 'attachImages' in request.FILES:
             uploaded_files = request.FILES.getlist('attachImages')
             
-            # 确保目录存在
-            attach_dir = os.path.join(settings.BASE_DIR, 'static', 'session_attach')
-            os.makedirs(attach_dir, exist_ok=True)
-            
-            for index, uploaded_file in enumerate(uploaded_files):
+            for uploaded_file in uploaded_files:
                 # 检查文件类型（图片格式）
-                allowed_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
                 file_ext = os.path.splitext(uploaded_file.name)[1].lower()
-                if file_ext not in allowed_extensions:
+                if file_ext not in storage.IMAGE_EXTENSIONS:
                     # 如果格式不支持，跳过这个文件
                     continue
                 
-                # 生成唯一文件名
-                timestamp = int(time.time() * 1000)
-                file_name = f"attach_{record_id}_{timestamp}_{index + 1}{file_ext}"
-                
-                # 保存文件
-                file_path = os.path.join(attach_dir, file_name)
-                with open(file_path, 'wb+') as destination:
-                    for chunk in uploaded_file.chunks():
-                        destination.write(chunk)
-                
-                # 保存相对路径（相对于static目录）
-                attach_images.append(f"session_attach/{file_name}")
+                # 保存文件并记录相对路径（相对于static目录）
+                stored = storage.save_upload(uploaded_file, 'session_attach', uploader=counselor, associated_id=record_id)
+                attach_images.append(stored.file_path)
         elif 'attachImages' in validated_data:
             attach_images = validated_data.get('attachImages', [])
         
-        # 创建会话
-        session = ConsultationSession.objects.create(
-            record=record,
-            session_number=next_number,
-            interview_date=validated_data.get('date') or timezone.now().date(),
-            interview_time=validated_data.get('time', ''),
-            duration=int(validated_data.get('duration', 0)) if validated_data.get('duration') and str(validated_data.get('duration')).isdigit() else None,
-            visit_status=validated_data.get('visitStatus', 'scheduled'),
-            objective_description=validated_data.get('description', ''),
-            doctor_evaluation=validated_data.get('doctorEvaluation', ''),
-            follow_up_plan=validated_data.get('followUpPlan', ''),
-            next_visit_plan=validated_data.get('nextVisitPlan', ''),
-            crisis_status=_convert_crisis_status_to_string(validated_data.get('crisisStatus', [])),
-            consultant_name=validated_data.get('consultantName', counselor.name),
-            is_third_party_evaluation=validated_data.get('isThirdPartyEvaluation', False),
-            signature_image=signature_image,
-            attach_images=attach_images,
-            created_by=counselor
-        )
-        
-        # 更新档案的访谈次数
-        record.interview_count = next_number
-        record.save(update_fields=['interview_count'])
+        # 创建会话：在同一事务中原子分配会话编号（同时更新档案访谈次数和咨询师访谈总数）
+        with transaction.atomic():
+            next_number = counters.allocate_session_numbers(record.id, counselor=counselor)[0]
+            session = ConsultationSession.objects.create(
+                record=record,
+                session_number=next_number,
+                interview_date=validated_data.get('date') or timezone.now().date(),
+                interview_time=validated_data.get('time', ''),
+                duration=int(validated_data.get('duration', 0)) if validated_data.get('duration') and str(validated_data.get('duration')).isdigit() else None,
+                visit_status=validated_data.get('visitStatus', 'scheduled'),
+                objective_description=validated_data.get('description', ''),
+                doctor_evaluation=validated_data.get('doctorEvaluation', ''),
+                follow_up_plan=validated_data.get('followUpPlan', ''),
+                next_visit_plan=validated_data.get('nextVisitPlan', ''),
+                crisis_status=_convert_crisis_status_to_string(validated_data.get('crisisStatus', [])),
+                consultant_name=validated_data.get('consultantName', counselor.name),
+                is_third_party_evaluation=validated_data.get('isThirdPartyEvaluation', False),
+                signature_image=signature_image,
+                attach_images=attach_images,
+                created_by=counselor
+            )
         
         return Response({
             'code': 0,
@@ -477,97 +423,47 @@ def session_update(request):
             session.is_third_party_evaluation = data.get('isThirdPartyEvaluation')
         # 处理签名图片文件上传（如果上传了新文件）
         if 'signatureImage' in request.FILES:
-            import os
-            import time
-            from django.conf import settings
-            
-            # 删除旧文件（如果存在）
-            if session.signature_image:
-                old_file_path = os.path.join(settings.BASE_DIR, 'static', session.signature_image)
-                if os.path.exists(old_file_path):
-                    try:
-                        os.remove(old_file_path)
-                    except Exception:
-                        pass  # 如果删除失败，继续处理新文件
-            
             # 处理新文件上传
             uploaded_file = request.FILES['signatureImage']
             # 检查文件类型（图片格式）
-            allowed_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
             file_ext = os.path.splitext(uploaded_file.name)[1].lower()
-            if file_ext not in allowed_extensions:
+            if file_ext not in storage.IMAGE_EXTENSIONS:
                 return Response({
                     'code': 400,
                     'message': '签名图片格式不支持，请上传jpg、png、gif、bmp或webp格式的图片'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            # 确保目录存在
-            signature_dir = os.path.join(settings.BASE_DIR, 'static', 'session_signature')
-            os.makedirs(signature_dir, exist_ok=True)
-            
-            # 生成唯一文件名
-            timestamp = int(time.time() * 1000)
-            record_id = session.record.id
-            file_name = f"signature_{record_id}_{timestamp}{file_ext}"
-            
-            # 保存文件
-            file_path = os.path.join(signature_dir, file_name)
-            with open(file_path, 'wb+') as destination:
-                for chunk in uploaded_file.chunks():
-                    destination.write(chunk)
+            # 释放旧文件引用（磁盘文件可能被其他记录共享，由 gc_storage 统一回收）
+            if session.signature_image:
+                storage.release(session.signature_image, module='session_signature', associated_id=session.record_id)
             
-            # 更新相对路径到数据库（相对于static目录）
-            session.signature_image = f"session_signature/{file_name}"
+            # 保存文件并更新相对路径到数据库（相对于static目录）
+            stored = storage.save_upload(uploaded_file, 'session_signature', uploader=counselor, associated_id=session.record_id)
+            session.signature_image = stored.file_path
         elif 'signatureImage' in data:
             # 如果只是字符串路径，直接更新
             session.signature_image = data.get('signatureImage')
         
         # 处理附加图片文件上传（如果上传了新文件，支持多个文件）
         if 'attachImages' in request.FILES:
-            import os
-            import time
-            from django.conf import settings
-            
-            # 删除旧文件（如果存在）
+            # 释放旧文件引用（磁盘文件由 gc_storage 统一回收）
             if session.attach_images and isinstance(session.attach_images, list):
-                for old_image_path in session.attach_images:
-                    if old_image_path:
-                        old_file_path = os.path.join(settings.BASE_DIR, 'static', old_image_path)
-                        if os.path.exists(old_file_path):
-                            try:
-                                os.remove(old_file_path)
-                            except Exception:
-                                pass  # 如果删除失败，继续处理新文件
+                storage.release(session.attach_images, module='session_attach', associated_id=session.record_id)
             
             # 处理新文件上传
             uploaded_files = request.FILES.getlist('attachImages')
             
-            # 确保目录存在
-            attach_dir = os.path.join(settings.BASE_DIR, 'static', 'session_attach')
-            os.makedirs(attach_dir, exist_ok=True)
-            
             attach_images = []
-            for index, uploaded_file in enumerate(uploaded_files):
+            for uploaded_file in uploaded_files:
                 # 检查文件类型（图片格式）
-                allowed_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
                 file_ext = os.path.splitext(uploaded_file.name)[1].lower()
-                if file_ext not in allowed_extensions:
+                if file_ext not in storage.IMAGE_EXTENSIONS:
                     # 如果格式不支持，跳过这个文件
                     continue
                 
-                # 生成唯一文件名
-                timestamp = int(time.time() * 1000)
-                record_id = session.record.id
-                file_name = f"attach_{record_id}_{timestamp}_{index + 1}{file_ext}"
-                
-                # 保存文件
-                file_path = os.path.join(attach_dir, file_name)
-                with open(file_path, 'wb+') as destination:
-                    for chunk in uploaded_file.chunks():
-                        destination.write(chunk)
-                
-                # 保存相对路径（相对于static目录）
-                attach_images.append(f"session_attach/{file_name}")
+                # 保存文件并记录相对路径（相对于static目录）
+                stored = storage.save_upload(uploaded_file, 'session_attach', uploader=counselor, associated_id=session.record_id)
+                attach_images.append(stored.file_path)
             
             # 更新附加图片路径数组
             if attach_images:
@@ -608,8 +504,8 @@ def personal_profile(request):
         }, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        # 业务逻辑鉴权：确保档案属于当前咨询师
-        record = ConsultationRecord.objects.get(id=record_id, counselor=counselor)
+        # 业务逻辑鉴权：确保档案属于当前咨询师（include_archived 时也查找已归档的档案）
+        record = archive.get_record(archive.wants_archived(request.data), id=record_id, counselor=counselor)
         
         # 构建紧急联系人信息
         emergency_contact = {}
@@ -654,6 +550,8 @@ def upload_records(request):
     POST 上传访谈记录文件
     解析Excel文件并导入ConsultationRecord和ConsultationSession数据
     """
+    import pandas as pd  # 只有导入接口使用，首次调用时才加载pandas/numpy
+
     counselor = request.counselor
     uploaded_file = request.FILES.get('files') or request.FILES.get('file')
     
@@ -776,7 +674,8 @@ def upload_records(request):
         success_count = 0
         error_rows = []
         records_to_create = []
-        sessions_to_create = []
+        # 档案ID -> 待创建的访谈，编号在全部行解析完后按档案一次预留
+        sessions_by_record = {}
         
         for index, row in df.iterrows():
             try:
@@ -827,7 +726,6 @@ def upload_records(request):
                         'referral_source': str(row.get('referral_source', '')).strip() if pd.notna(row.get('referral_source')) else '',
                         'main_complaint': str(row.get('main_complaint', '')).strip() if pd.notna(row.get('main_complaint')) else '',
                         'consultation_goal': str(row.get('consultation_goal', '')).strip() if pd.notna(row.get('consultation_goal')) else '',
-                        'interview_count': int(float(row.get('interview_count', 0))) if pd.notna(row.get('interview_count')) else 0,
                         'current_status': 'active',
                         'created_by': counselor
                     }
@@ -844,10 +742,6 @@ def upload_records(request):
                         else:
                             interview_date = pd.to_datetime(str(row.get('interview_date'))).date()
                         
-                        # 获取下一个会话编号
-                        max_session = record.sessions.aggregate(Max('session_number'))
-                        next_number = (max_session['session_number__max'] or 0) + 1
-                        
                         # 解析访谈时长
                         duration = None
                         if pd.notna(row.get('duration')):
@@ -856,10 +750,9 @@ def upload_records(request):
                             except:
                                 pass
                         
-                        sessions_to_create.append(
+                        sessions_by_record.setdefault(record.id, []).append(
                             ConsultationSession(
                                 record=record,
-                                session_number=next_number,
                                 interview_date=interview_date,
                                 interview_time=str(row.get('interview_time', '')).strip() if pd.notna(row.get('interview_time')) else '',
                                 duration=duration,
@@ -873,19 +766,24 @@ def upload_records(request):
                                 created_by=counselor
                             )
                         )
-                        
-                        # 更新档案的访谈次数
-                        record.interview_count = next_number
-                        record.save(update_fields=['interview_count'])
                     except Exception as e:
                         error_rows.append({'row': index + 2, 'error': f'访谈详情解析失败: {str(e)}'})
                 
             except Exception as e:
                 error_rows.append({'row': index + 2, 'error': f'第{index + 2}行数据错误: {str(e)}'})
         
-        # 批量创建访谈记录
-        if sessions_to_create:
-            ConsultationSession.objects.bulk_create(sessions_to_create, batch_size=100, ignore_conflicts=True)
+        # 批量创建访谈记录：每个档案用一条UPDATE预留连续的访谈编号，与插入在同一事务中
+        if sessions_by_record:
+            sessions_to_create = []
+            with transaction.atomic():
+                for record_id, sessions in sessions_by_record.items():
+                    numbers = counters.allocate_session_numbers(record_id, len(sessions))
+                    for session, number in zip(sessions, numbers):
+                        session.session_number = number
+                    sessions_to_create.extend(sessions)
+                ConsultationSession.objects.bulk_create(sessions_to_create, batch_size=100)
+                # bulk_create 不触发信号，按导入的档案重建危机标记和关注名单
+                crisis.rebuild(sessions_by_record.keys())
             success_count = len(sessions_to_create)
         
         # 返回结果
@@ -909,15 +807,10 @@ def upload_records(request):
         }, status=status.HTTP_400_BAD_REQUEST)
 
 
-@api_view(['POST'])
-@permission_classes([AllowAny])  # 禁用DRF默认权限检查
-@require_body_auth  # 业务逻辑中的鉴权
-def upload_template(request):
-    """POST 上传模板文件到templates文件夹"""
-    counselor = request.counselor
-    templates_dir = os.path.join(settings.BASE_DIR, 'templates')
-    os.makedirs(templates_dir, exist_ok=True)
-    
+@async_api_view
+@async_require_body_auth  # 业务逻辑中的鉴权
+async def upload_template(request):
+    """POST 上传模板文件到templates文件夹（异步视图，文件写入在线程池中执行）"""
     # 支持多个文件上传，可以是'file'或'files'字段
     uploaded_files = []
     if 'files' in request.FILES:
@@ -927,24 +820,15 @@ def upload_template(request):
         uploaded_files.append(request.FILES['file'])
     
     if not uploaded_files:
-        return Response({
+        return json_response({
             'code': 400,
             'message': '请上传文件'
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    saved_files = []
-    for uploaded_file in uploaded_files:
-        filename = os.path.basename(uploaded_file.name)
-        save_path = os.path.join(templates_dir, filename)
-        
-        with open(save_path, 'wb+') as dest:
-            for chunk in uploaded_file.chunks():
-                dest.write(chunk)
-        
-        saved_files.append(filename)
+    saved_files = await run_blocking(template_files.save, uploaded_files)
     
     if len(saved_files) == 1:
-        return Response({
+        return json_response({
             'code': 0,
             'message': '上传成功',
             'data': {
@@ -952,7 +836,7 @@ def upload_template(request):
             }
         })
     else:
-        return Response({
+        return json_response({
             'code': 0,
             'message': '上传成功',
             'data': {
@@ -962,17 +846,13 @@ def upload_template(request):
         })
 
 
-@api_view(['POST'])
-@permission_classes([AllowAny])  # 禁用DRF默认权限检查
-@require_body_auth  # 业务逻辑中的鉴权
-def download_template(request):
-    """POST 下载模板文件（单个直接返回，多个打包zip返回）"""
-    counselor = request.counselor
-    templates_dir = os.path.join(settings.BASE_DIR, 'templates')
-    
+@async_api_view
+@async_require_body_auth  # 业务逻辑中的鉴权
+async def download_template(request):
+    """POST 下载模板文件（单个直接返回，多个打包zip返回；异步视图，文件读取和打包在线程池中执行）"""
     filenames = request.data.get('fileNames') or request.data.get('filenames') or request.data.get('files')
     if not filenames:
-        return Response({
+        return json_response({
             'code': 400,
             'message': '请提供要下载的文件名数组'
         }, status=status.HTTP_400_BAD_REQUEST)
@@ -981,24 +861,15 @@ def download_template(request):
         # 逗号分隔或单字符串
         filenames = [x.strip() for x in filenames.split(',') if x.strip()]
     if not isinstance(filenames, (list, tuple)):
-        return Response({
+        return json_response({
             'code': 400,
             'message': 'filenames格式错误，应为数组或逗号分隔字符串'
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    # 过滤与规范化
-    safe_names = [os.path.basename(n) for n in filenames]
-    file_paths = []
-    missing = []
-    for name in safe_names:
-        path = os.path.join(templates_dir, name)
-        if os.path.isfile(path):
-            file_paths.append(path)
-        else:
-            missing.append(name)
+    file_paths, missing = await run_blocking(template_files.find, filenames)
     
     if not file_paths:
-        return Response({
+        return json_response({
             'code': 404,
             'message': '文件不存在',
             'data': {
@@ -1011,18 +882,11 @@ def download_template(request):
         file_path = file_paths[0]
         content_type, _ = mimetypes.guess_type(file_path)
         content_type = content_type or 'application/octet-stream'
-        response = FileResponse(open(file_path, 'rb'), as_attachment=True, filename=os.path.basename(file_path))
-        response['Content-Type'] = content_type
-        return response
+        return file_response(request, file_path, os.path.basename(file_path), content_type)
     
     # 多文件zip打包
-    memfile = io.BytesIO()
-    with zipfile.ZipFile(memfile, mode='w', compression=zipfile.ZIP_DEFLATED) as zf:
-        for p in file_paths:
-            zf.write(p, arcname=os.path.basename(p))
-    memfile.seek(0)
     zip_name = 'templates_bundle.zip'
-    resp = HttpResponse(memfile.read(), content_type='application/zip')
+    resp = HttpResponse(await run_blocking(template_files.zip_files, file_paths), content_type='application/zip')
     resp['Content-Disposition'] = f'attachment; filename="{zip_name}"'
     if missing:
         resp['X-Missing-Files'] = ','.join(missing)
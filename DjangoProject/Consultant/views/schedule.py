@@ -5,6 +5,7 @@
 import os
 import json
 import time
+from calendar import monthrange
 from datetime import datetime, timedelta
 from django.db.models import Q
 from django.utils import timezone
@@ -15,7 +16,9 @@ from rest_framework import status
 from rest_framework.permissions import AllowAny
 
 from Consultant.models import CounselorSchedule, CounselorAbsence
+from Consultant import availability
 from Consultant.utils import require_body_auth
+from CounselorAdmin import schedule_rules
 
 
 # ==================== 排班管理 ====================
@@ -79,6 +82,24 @@ def schedule_work(request):
             'schedules': schedule_list
         })
     
+    # 没有排班记录的日期补上管理员设置的周期规则展开的排班（管理员端当天有排班记录时以记录为准）
+    if 1 <= month <= 12 and 1 <= year <= 9999:
+        first_date = datetime(year, month, 1).date()
+        last_date = first_date.replace(day=monthrange(year, month)[1])
+        scheduled_days = {item['date'] for item in result}
+        for (_, day), (ranges, from_rule) in schedule_rules.merged(first_date, last_date, counselor.id).items():
+            if from_rule and day.day not in scheduled_days:
+                result.append({
+                    'date': day.day,
+                    'schedules': [{
+                        'id': None,
+                        'name': counselor.name,
+                        'work_time': [f"{start.strftime('%H:%M')}-{end.strftime('%H:%M')}" for start, end in ranges],
+                        'from_rule': True,
+                    }]
+                })
+    result.sort(key=lambda item: item['date'])
+    
     return Response({
         'code': 0,
         'message': '获取成功',
@@ -368,6 +389,8 @@ def schedule_upload(request):
         # 批量入库
         if to_create:
             CounselorSchedule.objects.bulk_create(to_create, batch_size=100, ignore_conflicts=True)
+            # bulk_create 不触发 post_save，重算导入日期的可预约时段
+            availability.refresh_many({(counselor.id, item.schedule_date) for item in to_create})
             success_count = len(to_create)
         
         # 返回结果
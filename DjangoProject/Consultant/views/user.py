@@ -11,6 +11,7 @@ from Consultant.models import ConsultationReview, ConsultationOrder
 from Consultant.serializers.auth import CounselorUserInfoSerializer
 from Consultant.models import CounselorProfile
 from Consultant.utils import require_body_auth
+from Consultant import archive, counters, ratings, storage, images, read_model
 
 
 # ==================== 个人中心 ====================
@@ -27,20 +28,23 @@ def comments(request):
     page = int(data.get('page', 1))
     page_size = int(data.get('page_size', data.get('pageSize', 10)))
     
+    # 订单和档案通过左连接一并取出；订单已归档时 review.order 为None，批量到归档表中查找
     reviews = ConsultationReview.objects.filter(
         counselor=counselor
-    ).order_by('-created_time')
+    ).select_related('order__record').order_by('-created_time')
     
     # 分页
     total = reviews.count()
     start = (page - 1) * page_size
     end = start + page_size
-    reviews = reviews[start:end]
+    reviews = list(reviews[start:end])
+    archived = archive.archived_orders(
+        review.order_id for review in reviews if review.order_id and review.order is None
+    )
     
     result_data = []
     for review in reviews:
-        # 获取订单信息
-        order = review.order
+        order = review.order or archived.get(review.order_id)
         client_name = order.record.client_name if order and order.record else ''
         
         result_data.append({
@@ -58,6 +62,7 @@ def comments(request):
         'code': 0,
         'message': '获取成功',
         'total': total,
+        'rating': ratings.summary(counselor.id),
         'data': result_data
     })
 
@@ -66,37 +71,11 @@ def comments(request):
 @permission_classes([AllowAny])  # 禁用DRF默认权限检查
 @require_body_auth  # 业务逻辑中的鉴权
 def user_profile(request):
-    """POST 获取用户详情信息"""
-    counselor = request.counselor
-    
-    # 获取咨询师详情
-    try:
-        profile = counselor.profile
-    except CounselorProfile.DoesNotExist:
-        profile = None
-    
+    """POST 获取用户详情信息（咨询师卡片缓存，资料或头像更新后失效）"""
     return Response({
         'code': 0,
         'message': '获取成功',
-        'data': {
-            'avatar': profile.avatar if profile and profile.avatar else '',
-            'username': counselor.username,
-            'name': profile.name if profile else counselor.name,
-            'phone': counselor.phone,
-            'email': counselor.email,
-            'graduated_school': profile.graduated_school if profile else '',
-            'address': profile.address if profile else '',
-            'organization': profile.organization if profile else '',
-            'profession': profile.profession if profile else '',
-            'expertise': profile.expertise if profile and profile.expertise else [],
-            'introduction': profile.introduction if profile else '',
-            'education': profile.education if profile else '',
-            'skilled_filed': profile.skilled_filed if profile else '',
-            'certifications': profile.certifications if profile else '',
-            'consultation_count': profile.consultation_count if profile else 0,
-            'created_time': profile.created_time.strftime('%Y-%m-%d %H:%M:%S') if profile and profile.created_time else '',
-            'serve_type': counselor.serve_type if counselor.serve_type else []
-        }
+        'data': read_model.get_card(request.counselor.id)
     })
 
 
@@ -119,6 +98,8 @@ def update_profile(request):
     counselor.name = profile_data.get('name', counselor.name)
     counselor.phone = profile_data.get('phone', counselor.phone)
     counselor.email = profile_data.get('email', counselor.email)
+    if 'serve_type' in profile_data:
+        counselor.serve_type = profile_data.get('serve_type', [])
     counselor.save()
     
     # 更新或创建咨询师详情
@@ -143,14 +124,8 @@ def update_profile(request):
     profile.education = profile_data.get('education', '')
     profile.skilled_filed = profile_data.get('skilled_filed', '')
     profile.certifications = profile_data.get('certifications', '')
-    if 'consultation_count' in profile_data:
-        profile.consultation_count = profile_data.get('consultation_count', 0)
-    profile.save()
-    
-    # 更新咨询师基本信息的 serve_type
-    if 'serve_type' in profile_data:
-        counselor.serve_type = profile_data.get('serve_type', [])
-        counselor.save()
+    # consultation_count 由访谈记录维护，不接受修改，也不写回（避免覆盖并发的计数更新）
+    profile.save(update_fields=counters.PROFILE_EDITABLE_FIELDS)
     
     return Response({
         'code': 0,
@@ -164,8 +139,6 @@ def update_profile(request):
 def update_avatar(request):
     """POST 更新用户头像"""
     import os
-    import uuid
-    from django.conf import settings
     
     counselor = request.counselor
     avatar_file = request.FILES.get('avatar')
@@ -177,7 +150,7 @@ def update_avatar(request):
         }, status=status.HTTP_400_BAD_REQUEST)
     
     # 检查文件类型（只允许图片）
-    allowed_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
+    allowed_extensions = storage.IMAGE_EXTENSIONS
     file_name = avatar_file.name.lower()
     file_ext = os.path.splitext(file_name)[1]
     
@@ -188,35 +161,20 @@ def update_avatar(request):
         }, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        # 确保头像存储目录存在
-        avatar_dir = os.path.join(settings.BASE_DIR, 'static', 'counselor_avatar')
-        os.makedirs(avatar_dir, exist_ok=True)
-        
-        # 生成唯一文件名（使用UUID + 原始扩展名）
-        unique_filename = f"{uuid.uuid4().hex}{file_ext}"
-        file_path = os.path.join(avatar_dir, unique_filename)
-        
-        # 如果咨询师已有头像，删除旧头像
+        # 如果咨询师已有头像，释放旧头像引用（磁盘文件由 gc_storage 统一回收）
         try:
             profile = counselor.profile
             if profile and profile.avatar:
-                old_avatar_path = os.path.join(settings.BASE_DIR, profile.avatar.lstrip('/'))
-                if os.path.exists(old_avatar_path):
-                    try:
-                        os.remove(old_avatar_path)
-                    except:
-                        pass  # 如果删除失败，继续执行
+                storage.release(profile.avatar, module='counselor_avatar', associated_id=counselor.id)
         except CounselorProfile.DoesNotExist:
             pass
         
-        # 保存新头像文件
-        with open(file_path, 'wb+') as destination:
-            for chunk in avatar_file.chunks():
-                destination.write(chunk)
+        # 保存新头像文件（按内容哈希去重存储）
+        stored = storage.save_upload(avatar_file, 'counselor_avatar', uploader=counselor, associated_id=counselor.id)
         
         # 生成相对路径（用于存储到数据库）
-        # 路径格式：/static/counselor_avatar/filename.jpg
-        relative_path = f'/static/counselor_avatar/{unique_filename}'
+        # 路径格式：/static/blobs/ab/cd/<sha256>.jpg
+        relative_path = f'/static/{stored.file_path}'
         
         # 更新或创建咨询师详情记录
         profile, created = CounselorProfile.objects.get_or_create(
@@ -232,7 +190,8 @@ def update_avatar(request):
             'code': 0,
             'message': '头像更新成功',
             'data': {
-                'avatar': relative_path  # 返回头像相对路径
+                'avatar': relative_path,  # 返回头像相对路径
+                'avatar_variants': images.variant_urls(relative_path)
             }
         })
         
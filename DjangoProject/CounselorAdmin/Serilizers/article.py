@@ -11,6 +11,6 @@ class ArticleSerializer(serializers.ModelSerializer):
     class Meta:
         model = Article
         fields = '__all__'
-        read_only_fields = ['id', 'created_time']
+        read_only_fields = ['id', 'created_time', 'updated_time', 'excerpt', 'content_html']
 
 
@@ -17,6 +17,8 @@ from .models import (
     VerificationCode,
     Captcha,
     AdminAuthToken,
+    ChunkedUpload,
+    ExportJob,
 )
 
 
@@ -92,7 +94,7 @@ class ArticleAdmin(admin.ModelAdmin):
     list_display = ['id', 'title', 'category', 'collect_count', 'like_count', 'read_count', 'created_by', 'created_time']
     list_filter = ['category', 'created_time']
     search_fields = ['title', 'content', 'created_by']
-    readonly_fields = ['created_time']
+    readonly_fields = ['created_time', 'updated_time', 'excerpt', 'content_html']
     autocomplete_fields = ['category']
 
 
@@ -187,4 +189,21 @@ class AdminAuthTokenAdmin(admin.ModelAdmin):
     list_filter = ['is_active', 'created_time']
     search_fields = ['token', 'user__username']
     readonly_fields = ['created_time']
-    autocomplete_fields = ['user']
\ No newline at end of file
+    autocomplete_fields = ['user']
+
+
+@admin.register(ChunkedUpload)
+class ChunkedUploadAdmin(admin.ModelAdmin):
+    """分片上传管理"""
+    list_display = ['id', 'upload_id', 'file_name', 'file_size', 'total_chunks', 'status', 'created_by', 'created_time', 'updated_time']
+    list_filter = ['status', 'created_time']
+    search_fields = ['upload_id', 'file_name', 'created_by']
+    readonly_fields = ['created_time', 'updated_time']
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    """导出任务管理"""
+    list_display = ['id', 'job_id', 'kind', 'file_format', 'status', 'row_count', 'created_by', 'created_time', 'finished_time']
+    list_filter = ['kind', 'status', 'created_time']
+    search_fields = ['job_id', 'created_by']
+    readonly_fields = ['created_time', 'finished_time']
@@ -5,3 +5,7 @@ class CounseloradminConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "CounselorAdmin"
     verbose_name = "课程信息"
+
+    def ready(self):
+        # 注册信号处理（查找缓存失效）
+        from CounselorAdmin import signals  # noqa: F401
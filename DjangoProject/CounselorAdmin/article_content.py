@@ -0,0 +1,108 @@
+"""
+宣教资讯内容处理
+资讯保存时将 Markdown 内容渲染为HTML并生成摘要（写入 content_html / excerpt 字段），
+列表接口只返回摘要，详情接口返回完整内容和渲染结果（按 (id, updated_time) 缓存）
+渲染结果直接插入前端页面，因此不保留内容中的原始HTML（按文本转义），
+属性只保留白名单内的项，链接和图片地址只允许 http/https/mailto 和相对地址
+"""
+import html
+import re
+from urllib.parse import urlsplit
+
+import markdown
+from django.utils.html import strip_tags
+from markdown.extensions import Extension
+from markdown.treeprocessors import Treeprocessor
+
+from DjangoProject.cache import get_or_compute
+
+
+# 摘要最大长度（字符）
+EXCERPT_LENGTH = 120
+
+# 渲染结果缓存时间（秒），内容更新后 updated_time 变化，旧键不再被访问
+HTML_CACHE_TIMEOUT = 24 * 60 * 60
+
+# 渲染规则版本，规则变化（重新生成 content_html 而不修改 updated_time）时递增，使旧缓存项不再命中
+RENDER_VERSION = 2
+
+# 渲染结果中允许的属性（attr_list 语法可以给元素加任意属性）
+ALLOWED_ATTRIBUTES = {'href', 'src', 'alt', 'title', 'id', 'class', 'align', 'start', 'colspan', 'rowspan', 'style'}
+URL_ATTRIBUTES = {'href', 'src'}
+ALLOWED_SCHEMES = {'', 'http', 'https', 'mailto'}
+
+_WHITESPACE = re.compile(r'\s+')
+_CONTROL = re.compile(r'[\x00-\x20\x7f]+')
+# 表格对齐生成的 style，其余 style 一律去掉
+_ALIGN_STYLE = re.compile(r'text-align:\s*(left|right|center);?')
+
+
+def _safe_url(value):
+    try:
+        return urlsplit(_CONTROL.sub('', value)).scheme.lower() in ALLOWED_SCHEMES
+    except ValueError:
+        return False
+
+
+class _AttributeFilter(Treeprocessor):
+    """删除白名单外的属性和不安全的链接地址"""
+
+    def run(self, root):
+        for element in root.iter():
+            for name, value in list(element.items()):
+                if (
+                    name not in ALLOWED_ATTRIBUTES
+                    or (name in URL_ATTRIBUTES and not _safe_url(value))
+                    or (name == 'style' and not _ALIGN_STYLE.fullmatch(value.strip()))
+                ):
+                    del element.attrib[name]
+
+
+class SafeExtension(Extension):
+    """禁用原始HTML（按文本输出），并在最后一步过滤属性"""
+
+    def extendMarkdown(self, md):
+        md.preprocessors.deregister('html_block')
+        md.inlinePatterns.deregister('html')
+        # 优先级低于 attr_list 和 unescape，在所有属性写入之后执行
+        md.treeprocessors.register(_AttributeFilter(md), 'attribute_filter', -1)
+
+
+MARKDOWN_EXTENSIONS = ['extra', 'sane_lists', SafeExtension()]
+
+
+def render_html(content):
+    """将 Markdown 内容渲染为HTML（原始HTML转义，属性和链接按白名单过滤）"""
+    if not content:
+        return ''
+    return markdown.markdown(content, extensions=MARKDOWN_EXTENSIONS, output_format='html')
+
+
+def make_excerpt(content, content_html=None, length=EXCERPT_LENGTH):
+    """从渲染后的HTML提取纯文本摘要，超出长度时截断并加省略号"""
+    if content_html is None:
+        content_html = render_html(content)
+    text = _WHITESPACE.sub(' ', html.unescape(strip_tags(content_html))).strip()
+    if len(text) > length:
+        text = text[:length].rstrip() + '…'
+    return text
+
+
+def refresh(article):
+    """根据 content 重新生成 content_html 和 excerpt（Article.save 中调用）"""
+    article.content_html = render_html(article.content)
+    article.excerpt = make_excerpt(article.content, article.content_html)
+
+
+def cached_html(article):
+    """
+    获取资讯的渲染结果，按 (渲染规则版本, id, updated_time) 缓存
+    content_html 为空时（如通过 update() 批量写入的内容）现场渲染
+    """
+    version = article.updated_time.timestamp() if article.updated_time else 0
+    key = f'article_html:v{RENDER_VERSION}:{article.id}:{version}'
+
+    def compute():
+        return article.content_html or render_html(article.content)
+
+    return get_or_compute(key, compute, timeout=HTML_CACHE_TIMEOUT, namespace='article_html')
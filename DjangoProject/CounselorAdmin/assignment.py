@@ -0,0 +1,392 @@
+"""
+预约订单自动分配
+未分配咨询师的预约订单（Appointment.counselor 为空、状态为未开始）按预约日期、开始时间、提交时间依次贪心分配：
+
+- 候选：当天可预约时段位图（CounselorAvailability，已合并排班、周期规则和停诊）中有空闲时段的启用咨询师
+- 冲突：同一咨询师当天已分配的预约订单、咨询订单占用的时段（按 slot_start_minute / slot_end_minute；
+  "上午""下午""晚上"等没有具体时间的时段在对应时间范围内占用最早的一段空闲时段）
+- 负载：负责的进行中档案数（ConsultationRecord.current_status 为 active）加上已分配、未开始的预约订单数；
+  每个订单分给能容纳该时段的咨询师中负载最小的（相同时按本批已分配数、咨询师ID），分配后负载加一
+
+plan() 只在内存中按位运算计算，不访问数据库；load() 一次读取本批涉及日期的位图、已占用时段和负载，
+apply() 在事务中锁定涉及的咨询师，重新读取他们的位图和已占用时段复核，仍能容纳的订单按咨询师分组批量更新订单和订单索引，
+计算期间已被其他订单占用的记为 conflict 未分配。后台任务（AssignmentJob）记录各阶段耗时、吞吐量、未分配原因和负载公平性；
+同一时间只允许一个分配任务处于 running 状态（跨进程按数据库中的任务状态判断）
+"""
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, Exists, F
+from django.utils import timezone
+
+from Consultant import availability, order_index
+from Consultant.models import ConsultationOrder, ConsultationRecord, CounselorAvailability, OrderIndex
+from CounselorAdmin.models import Appointment, AssignmentJob, Counselor
+
+
+# 没有具体时间的预约时段 -> 当天的时间范围（分钟数），无法识别的时段按全天计
+PERIODS = {
+    '上午': (8 * 60, 12 * 60),
+    '下午': (13 * 60, 18 * 60),
+    '晚上': (18 * 60, 21 * 60),
+}
+
+# 未分配原因
+NO_SCHEDULE = 'no_schedule'  # 当天没有启用的咨询师有可预约时段
+NO_FREE_SLOT = 'no_free_slot'  # 有排班的咨询师在该时段都已占用或停诊
+CONFLICT = 'conflict'  # 写入时复核发现分到的时段已被其他订单占用或已停诊
+
+
+class AssignmentBusy(Exception):
+    """已有分配任务正在执行"""
+
+# 占用咨询师时段的订单状态
+OPEN_APPOINTMENT_STATUSES = ('未开始', '进行中')
+OPEN_ORDER_STATUSES = ('pending', 'accepted')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def default_minutes():
+    """只有开始时间或没有具体时间的预约按此时长占用"""
+    return getattr(settings, 'ASSIGNMENT_DEFAULT_MINUTES', 60)
+
+
+# ==================== 计算 ====================
+
+def demand(time_slot, start=None, end=None):
+    """
+    预约时段 -> (时间范围位图, 需要的连续时段数)
+    start/end 为订单的 slot_start_minute / slot_end_minute：有具体时间时需要占满该时段，否则在"上午"等对应范围内占用默认时长
+    """
+    if start is not None:
+        window = availability.touching_bits(start, end or start + default_minutes())
+        return window, bin(window).count('1')
+    text = time_slot or ''
+    first, last = next((value for name, value in PERIODS.items() if name in text), (0, 24 * 60))
+    return availability.touching_bits(first, last), -(-default_minutes() // availability.SLOT_MINUTES)
+
+
+def fit(free, window, length):
+    """free 中位于 window 内最早的连续 length 个时段，返回这些时段的位图（容纳不下时为0）"""
+    runs = free & window
+    for _ in range(length - 1):
+        runs &= runs >> 1
+    if not runs or length <= 0:
+        return 0
+    return ((1 << length) - 1) << ((runs & -runs).bit_length() - 1)
+
+
+def plan(appointments, bitmaps, booked=None, loads=None):
+    """
+    贪心分配（只计算，不访问数据库）
+    appointments: 按分配顺序排列的 [(预约ID, 日期, 时间范围位图, 连续时段数)]
+    bitmaps: {日期: {咨询师ID: 可预约时段位图}}；booked: {(咨询师ID, 日期): 已占用时段位图}，分配后原地更新；
+    loads: {咨询师ID: 当前负载}
+    返回 (分配结果 {预约ID: 咨询师ID}, 未分配 {预约ID: 原因}, 本批各咨询师的分配数)
+    """
+    booked = {} if booked is None else booked
+    loads = loads or {}
+    assigned = {}
+    failed = {}
+    counts = Counter()
+    for appointment_id, day, window, length in appointments:
+        candidates = bitmaps.get(day)
+        if not candidates:
+            failed[appointment_id] = NO_SCHEDULE
+            continue
+        best = best_key = best_mask = None
+        for counselor_id, bits in candidates.items():
+            key = (loads.get(counselor_id, 0) + counts[counselor_id], counts[counselor_id], counselor_id)
+            # 先比较负载，负载不低于当前最优时不再计算时段
+            if best_key is not None and key >= best_key:
+                continue
+            mask = fit(bits & ~booked.get((counselor_id, day), 0), window, length)
+            if mask:
+                best, best_key, best_mask = counselor_id, key, mask
+        if best is None:
+            failed[appointment_id] = NO_FREE_SLOT
+            continue
+        booked[(best, day)] = booked.get((best, day), 0) | best_mask
+        assigned[appointment_id] = best
+        counts[best] += 1
+    return assigned, failed, counts
+
+
+def jain_index(values):
+    """Jain 公平性指数 (Σx)² / (n·Σx²)：1 为完全均衡，越接近 1/n 越集中"""
+    values = list(values)
+    squares = sum(value * value for value in values)
+    return round(sum(values) ** 2 / (len(values) * squares), 4) if squares else 1.0
+
+
+def summarize(total, assigned, failed, counts, bitmaps, loads):
+    """分配结果与负载公平性（只统计本批有可预约时段的咨询师）"""
+    counselors = set()
+    for candidates in bitmaps.values():
+        counselors.update(candidates)
+    final = [loads.get(counselor_id, 0) + counts[counselor_id] for counselor_id in counselors]
+    return {
+        'total': total,
+        'assigned': len(assigned),
+        'unassigned': len(failed),
+        'reasons': dict(Counter(failed.values())),
+        'counselors': len(counselors),
+        'assigned_max': max(counts.values(), default=0),
+        'fairness_batch': jain_index(counts[counselor_id] for counselor_id in counselors),
+        'fairness_load': jain_index(final),
+        'load_min': min(final, default=0),
+        'load_max': max(final, default=0),
+    }
+
+
+# ==================== 读取与写入 ====================
+
+def pending(start=None, end=None):
+    """待分配的预约订单：未分配咨询师、状态为未开始，预约日期在 [start, end] 内（start 默认为今天），按分配顺序排列"""
+    queryset = Appointment.objects.filter(
+        counselor__isnull=True, status='未开始', appointment_date__gte=start or timezone.now().date(),
+    )
+    if end is not None:
+        queryset = queryset.filter(appointment_date__lte=end)
+    return queryset.order_by('appointment_date', F('slot_start_minute').asc(nulls_last=True), 'submit_time', 'id')
+
+
+def current_loads():
+    """{咨询师ID: 进行中的档案数 + 已分配未开始的预约订单数}"""
+    loads = Counter()
+    for queryset in (
+        ConsultationRecord.objects.filter(current_status='active', counselor__isnull=False),
+        Appointment.objects.filter(status='未开始', counselor__isnull=False),
+    ):
+        for counselor_id, count in queryset.values_list('counselor_id').annotate(count=Count('id')).order_by():
+            loads[counselor_id] += count
+    return loads
+
+
+def available(days, counselor_ids=None):
+    """{日期: {咨询师ID: 可预约时段位图}}，只取启用的咨询师"""
+    queryset = CounselorAvailability.objects.filter(day__in=days, available__gt=0, counselor__status='启用')
+    if counselor_ids is not None:
+        queryset = queryset.filter(counselor_id__in=counselor_ids)
+    bitmaps = defaultdict(dict)
+    for counselor_id, day, bits in queryset.values_list('counselor_id', 'day', 'available'):
+        bitmaps[day][counselor_id] = bits
+    return dict(bitmaps)
+
+
+def occupied(days, bitmaps, counselor_ids=None):
+    """{(咨询师ID, 日期): 已分配的预约订单和咨询订单占用的时段位图}"""
+    booked = {}
+    for queryset in (
+        Appointment.objects.filter(status__in=OPEN_APPOINTMENT_STATUSES, counselor__isnull=False, appointment_date__in=days),
+        ConsultationOrder.objects.filter(status__in=OPEN_ORDER_STATUSES, counselor__isnull=False, appointment_date__in=days),
+    ):
+        if counselor_ids is not None:
+            queryset = queryset.filter(counselor_id__in=counselor_ids)
+        for counselor_id, day, time_slot, start, end in queryset.values_list(
+            'counselor_id', 'appointment_date', 'time_slot', 'slot_start_minute', 'slot_end_minute'
+        ):
+            window, length = demand(time_slot, start, end)
+            taken = booked.get((counselor_id, day), 0)
+            # 已有订单优先占用可预约的时段；在排班之外或与其他订单重叠时占用整个时间范围
+            mask = (
+                fit(bitmaps.get(day, {}).get(counselor_id, 0) & ~taken, window, length)
+                or fit(availability.FULL_DAY & ~taken, window, length)
+                or window
+            )
+            booked[(counselor_id, day)] = taken | mask
+    return booked
+
+
+def load(queryset):
+    """读取待分配订单及其日期的可预约时段、已占用时段和咨询师负载，返回 plan() 的参数 (appointments, bitmaps, booked, loads)"""
+    appointments = [
+        (pk, day, *demand(time_slot, start, end))
+        for pk, day, time_slot, start, end in queryset.values_list(
+            'id', 'appointment_date', 'time_slot', 'slot_start_minute', 'slot_end_minute'
+        )
+    ]
+    days = {item[1] for item in appointments}
+    bitmaps = available(days)
+    return appointments, bitmaps, occupied(days, bitmaps), current_loads()
+
+
+@transaction.atomic
+def apply(assigned, appointments, batch_size=500):
+    """
+    写入分配结果并同步订单索引，返回 (实际更新的订单数, 复核未通过的预约ID列表)
+    先锁定涉及的咨询师（select_for_update），在事务内重新读取他们的位图和已占用时段，按分配顺序复核每个订单，
+    计算期间已被其他订单占用或停诊的时段不再写入；只更新仍未分配的订单
+    """
+    counselor_ids = set(assigned.values())
+    list(Counselor.objects.select_for_update().filter(id__in=counselor_ids).order_by('id').values_list('id', flat=True))
+    days = {day for appointment_id, day, _, _ in appointments if appointment_id in assigned}
+    bitmaps = available(days, counselor_ids)
+    booked = occupied(days, bitmaps, counselor_ids)
+
+    by_counselor = defaultdict(list)
+    conflicts = []
+    for appointment_id, day, window, length in appointments:
+        counselor_id = assigned.get(appointment_id)
+        if counselor_id is None:
+            continue
+        taken = booked.get((counselor_id, day), 0)
+        mask = fit(bitmaps.get(day, {}).get(counselor_id, 0) & ~taken, window, length)
+        if not mask:
+            conflicts.append(appointment_id)
+            continue
+        booked[(counselor_id, day)] = taken | mask
+        by_counselor[counselor_id].append(appointment_id)
+
+    updated = 0
+    for counselor_id, ids in by_counselor.items():
+        for index in range(0, len(ids), batch_size):
+            chunk = ids[index:index + batch_size]
+            updated += Appointment.objects.filter(id__in=chunk, counselor__isnull=True).update(counselor_id=counselor_id)
+            # queryset.update 不触发信号，索引行按实际写入的咨询师同步
+            OrderIndex.objects.filter(
+                source=order_index.APPOINTMENT, archived=False,
+                source_id__in=Appointment.objects.filter(id__in=chunk, counselor_id=counselor_id).values('id'),
+            ).update(counselor_id=counselor_id)
+    return updated, conflicts
+
+
+def run(start=None, end=None, dry_run=False):
+    """
+    分配 [start, end] 内全部待分配的预约订单，返回指标：
+    各阶段耗时（毫秒）、吞吐量（订单数/秒，含读取和写入）、分配结果和负载公平性；dry_run 为True时只计算不写入
+    """
+    started = time.perf_counter()
+    appointments, bitmaps, booked, loads = load(pending(start, end))
+    loaded = time.perf_counter()
+    assigned, failed, counts = plan(appointments, bitmaps, booked, loads)
+    planned = time.perf_counter()
+    if dry_run:
+        written = len(assigned)
+    else:
+        written, conflicts = apply(assigned, appointments)
+        for appointment_id in conflicts:
+            counts[assigned.pop(appointment_id)] -= 1
+            failed[appointment_id] = CONFLICT
+    finished = time.perf_counter()
+
+    metrics = summarize(len(appointments), assigned, failed, counts, bitmaps, loads)
+    elapsed = finished - started
+    metrics.update({
+        'written': written,
+        'dry_run': dry_run,
+        'load_ms': round((loaded - started) * 1000, 2),
+        'plan_ms': round((planned - loaded) * 1000, 2),
+        'apply_ms': round((finished - planned) * 1000, 2),
+        'elapsed_ms': round(elapsed * 1000, 2),
+        'throughput': round(len(appointments) / elapsed, 1) if elapsed > 0 else 0,
+    })
+    return metrics
+
+
+# ==================== 后台任务 ====================
+
+def _get_executor():
+    """延迟创建后台线程池（单个线程：同时执行的两个分配任务会争抢同一批订单）"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='assignment')
+    return _executor
+
+
+def _running_jobs():
+    """正在执行的分配任务，超过 ASSIGNMENT_JOB_TIMEOUT 秒仍为 running 的任务视为进程已退出，不再计入"""
+    timeout = getattr(settings, 'ASSIGNMENT_JOB_TIMEOUT', 3600)
+    return AssignmentJob.objects.filter(status='running', created_time__gte=timezone.now() - timedelta(seconds=timeout))
+
+
+def running_job():
+    return _running_jobs().first()
+
+
+def create_job(start=None, end=None, dry_run=False, created_by=''):
+    """
+    创建分配任务记录（不执行），日期保存为 'YYYY-MM-DD'
+    已有任务正在执行时抛出 AssignmentBusy
+    """
+    busy = running_job()
+    if busy is not None:
+        raise AssignmentBusy(busy.job_id)
+    return AssignmentJob.objects.create(
+        job_id=uuid.uuid4().hex,
+        params={
+            'start_date': start.isoformat() if start else '',
+            'end_date': end.isoformat() if end else '',
+            'dry_run': bool(dry_run),
+        },
+        created_by=created_by,
+    )
+
+
+def _claim(job):
+    """
+    把任务从 pending 改为 running，已有其他任务正在执行时不修改，返回是否成功
+    判断和修改在同一条 UPDATE 语句中完成，多个进程同时启动任务时只有一个能成功
+    """
+    others = _running_jobs().exclude(pk=job.pk)
+    return AssignmentJob.objects.filter(pk=job.pk, status='pending').exclude(Exists(others)).update(status='running') == 1
+
+
+def run_job(job_id):
+    """
+    执行分配任务，可在后台线程或管理命令（assign_appointments --job）中调用
+    已有其他任务正在执行或任务已执行过时任务记为失败，不分配
+    """
+    job = AssignmentJob.objects.get(job_id=job_id)
+    if not _claim(job):
+        job.refresh_from_db()
+        if job.status == 'pending':
+            job.status = 'failed'
+            job.error = '已有分配任务正在执行'
+            job.finished_time = timezone.now()
+            job.save(update_fields=['status', 'error', 'finished_time'])
+        return job
+    job.status = 'running'
+
+    params = job.params or {}
+    try:
+        metrics = run(
+            availability.parse_date(params['start_date']) if params.get('start_date') else None,
+            availability.parse_date(params['end_date']) if params.get('end_date') else None,
+            bool(params.get('dry_run')),
+        )
+        job.total = metrics['total']
+        job.assigned = metrics['assigned']
+        job.metrics = metrics
+        job.status = 'completed'
+    except Exception as e:
+        print(f"预约分配任务失败 {job_id}: {e}")
+        job.status = 'failed'
+        job.error = str(e)
+    job.finished_time = timezone.now()
+    job.save(update_fields=['status', 'total', 'assigned', 'metrics', 'error', 'finished_time'])
+    return job
+
+
+def _run_in_background(job_id):
+    close_old_connections()
+    try:
+        run_job(job_id)
+    finally:
+        close_old_connections()
+
+
+def submit(job):
+    """提交到后台线程池执行"""
+    _get_executor().submit(_run_in_background, job.job_id)
+    return job
@@ -0,0 +1,191 @@
+"""
+宣教资讯阅读/点赞/收藏计数的延迟写入
+每次计数只向追加写的计数日志写一行（不更新 articles 表，避免SQLite热点行的写锁竞争），
+日志积累到一定条数或超过时间间隔后，在一个事务中用 F() 表达式批量更新到数据库；
+读取计数时合并日志中尚未写入数据库的增量
+
+刷新时在持有日志排他锁期间提交事务，提交成功后才清空日志：事务失败或进程崩溃时增量仍在日志中，
+刷新期间读取计数会等待锁释放，不会出现增量既不在日志中也未写入数据库的中间状态
+
+计数日志位于本机文件系统，多个worker进程共享；多台服务器部署时每台服务器各自写入和刷新
+"""
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+try:
+    import fcntl
+except ImportError:  # Windows 本地开发为单进程，只使用线程锁
+    fcntl = None
+
+
+# 动作 -> (计数字段, 增量)
+ACTIONS = {
+    'read': ('read_count', 1),
+    'like': ('like_count', 1),
+    'unlike': ('like_count', -1),
+    'collect': ('collect_count', 1),
+    'uncollect': ('collect_count', -1),
+}
+FIELDS = ('read_count', 'like_count', 'collect_count')
+
+_lock = threading.Lock()
+_fd = None
+_pid = None
+_path = None
+_since_flush = 0
+_last_flush = time.monotonic()
+
+
+def _log_path():
+    return getattr(settings, 'ENGAGEMENT_LOG', None) or os.path.join(settings.BASE_DIR, '.cache', 'engagement.log')
+
+
+def _flush_threshold():
+    return getattr(settings, 'ENGAGEMENT_FLUSH_THRESHOLD', 1000)
+
+
+def _flush_interval():
+    return getattr(settings, 'ENGAGEMENT_FLUSH_INTERVAL', 30)
+
+
+def _open():
+    """延迟打开计数日志（fork 之后的子进程、日志路径配置变化时重新打开）"""
+    global _fd, _pid, _path
+    path = _log_path()
+    if _fd is not None and _pid == os.getpid() and _path == path:
+        return _fd
+    with _lock:
+        if _fd is None or _pid != os.getpid() or _path != path:
+            if _fd is not None and _pid == os.getpid():
+                os.close(_fd)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _fd = os.open(path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+            _pid = os.getpid()
+            _path = path
+    return _fd
+
+
+class _FileLock:
+    """
+    计数日志的文件锁：写入和读取用共享锁，刷新时用排他锁
+    flock 对同一进程内共享的文件描述符不互斥，使用时需同时持有线程锁 _lock
+    """
+
+    def __init__(self, fd, exclusive=False, blocking=True):
+        self.fd = fd
+        self.mode = None
+        if fcntl is not None:
+            self.mode = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+            if not blocking:
+                self.mode |= fcntl.LOCK_NB
+
+    def __enter__(self):
+        if fcntl is not None:
+            fcntl.flock(self.fd, self.mode)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+
+def _read_all(fd):
+    size = os.fstat(fd).st_size
+    return os.pread(fd, size, 0) if size else b''
+
+
+def _parse(content):
+    """解析日志内容，返回 {article_id: {field: delta}}"""
+    deltas = defaultdict(lambda: defaultdict(int))
+    for line in content.splitlines():
+        try:
+            article_id, field, delta = line.decode('ascii').split()
+            if field in FIELDS:
+                deltas[int(article_id)][field] += int(delta)
+        except ValueError:
+            # 进程崩溃时可能留下不完整的行，直接丢弃
+            continue
+    return deltas
+
+
+def record(article_id, action):
+    """
+    记录一次阅读/点赞/取消点赞/收藏/取消收藏
+
+    参数:
+        article_id: 资讯ID
+        action: ACTIONS 中的动作名称
+    """
+    global _since_flush
+    field, delta = ACTIONS[action]
+    fd = _open()
+    with _lock, _FileLock(fd):
+        os.write(fd, f'{int(article_id)} {field} {delta}\n'.encode('ascii'))
+        _since_flush += 1
+    maybe_flush()
+
+
+def maybe_flush():
+    """本进程写入条数或距上次刷新的时间超过阈值时刷新（其他进程正在刷新时跳过）"""
+    if _since_flush >= _flush_threshold() or time.monotonic() - _last_flush >= _flush_interval():
+        try:
+            flush(blocking=False)
+        except Exception as e:
+            print(f"计数日志刷新失败: {e}")
+
+
+def pending(article_ids=None):
+    """
+    尚未写入数据库的计数增量
+
+    返回:
+        {article_id: {field: delta}}，article_ids 不为空时只返回这些资讯
+    """
+    fd = _open()
+    with _lock, _FileLock(fd):
+        content = _read_all(fd)
+    deltas = _parse(content)
+    if article_ids is not None:
+        wanted = {int(article_id) for article_id in article_ids}
+        deltas = {article_id: fields for article_id, fields in deltas.items() if article_id in wanted}
+    return deltas
+
+
+def merged_counts(article, deltas):
+    """资讯的数据库计数加上未写入的增量，deltas 为 pending() 的返回值"""
+    fields = deltas.get(article.id, {})
+    return {field: getattr(article, field) + fields.get(field, 0) for field in FIELDS}
+
+
+def flush(blocking=True):
+    """
+    将计数日志中的增量在一个事务中写入数据库并清空日志
+    事务在持有日志排他锁期间提交，提交成功后才清空日志；写入失败时日志保持不变，下次刷新重试
+
+    返回:
+        写入的资讯数量；blocking=False 且其他进程正在刷新时返回0
+    """
+    global _since_flush, _last_flush
+    from CounselorAdmin.models import Article
+
+    fd = _open()
+    try:
+        with _lock, _FileLock(fd, exclusive=True, blocking=blocking):
+            deltas = _parse(_read_all(fd))
+            with transaction.atomic():
+                for article_id, fields in deltas.items():
+                    updates = {field: F(field) + delta for field, delta in fields.items() if delta}
+                    if updates:
+                        Article.objects.filter(id=article_id).update(**updates)
+            os.ftruncate(fd, 0)
+            _since_flush = 0
+            _last_flush = time.monotonic()
+    except BlockingIOError:
+        return 0
+    return len(deltas)
@@ -0,0 +1,259 @@
+"""
+管理员数据导出
+每种导出声明查询集（使用与列表接口相同的筛选函数）和导出列，
+小数据量直接以下载响应返回，大数据量创建 ExportJob 在后台线程池中写入文件
+"""
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from Consultant.models import ConsultationRecord, ConsultationSession
+from CounselorAdmin import filters
+from CounselorAdmin.models import ExportJob, InterviewAssessment, NegativeEvent, StudentReferral
+from DjangoProject.export import Column, iter_rows, write_file
+
+
+# 导出类型 -> (文件名/工作表名, 查询集函数, 列定义)
+_registry = {}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def register(kind, title, columns):
+    """
+    注册一种导出，用法：
+
+        @exports.register('interviews', '访谈评估', [Column('姓名', 'student_name'), ...])
+        def interviews_queryset(data):
+            return filter_interviews(InterviewAssessment.objects.all(), data)
+    """
+    def decorator(queryset_func):
+        _registry[kind] = (title, queryset_func, columns)
+        return queryset_func
+    return decorator
+
+
+def kinds():
+    return list(_registry)
+
+
+# 不保存到任务参数中的请求字段（鉴权信息、导出选项）
+_NON_FILTER_FIELDS = {'user_id', 'userId', 'userID', 'id', 'token', 'kind', 'format', 'background'}
+
+
+def data_or_empty(data):
+    return data if hasattr(data, 'get') else {}
+
+
+def filter_params(data):
+    """请求参数中的筛选条件（multipart 表单的 QueryDict 转为普通字典）"""
+    data = data_or_empty(data)
+    if hasattr(data, 'dict'):
+        data = data.dict()
+    return {key: value for key, value in data.items() if key not in _NON_FILTER_FIELDS}
+
+
+def build(kind, data):
+    """
+    按导出类型和筛选参数生成导出数据
+
+    返回:
+        (title, headers, rows)，rows 为惰性迭代器，写出时才分批查询数据库
+    """
+    title, queryset_func, columns = _registry[kind]
+    queryset = queryset_func(data_or_empty(data)).order_by('id')
+    return title, [column.header for column in columns], iter_rows(queryset, columns)
+
+
+def count(kind, data):
+    """筛选后的行数（用于判断是否转为后台任务）"""
+    _, queryset_func, _ = _registry[kind]
+    return queryset_func(data_or_empty(data)).count()
+
+
+# ==================== 后台任务 ====================
+
+def export_dir():
+    path = getattr(settings, 'EXPORT_DIR', None) or os.path.join(settings.BASE_DIR, '.cache', 'exports')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def job_path(job):
+    return os.path.join(export_dir(), job.file_name)
+
+
+def _get_executor():
+    """延迟创建后台线程池（导出主要等待数据库和磁盘，单个线程即可，避免多个大导出同时占用数据库）"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'EXPORT_WORKERS', 1),
+                    thread_name_prefix='export'
+                )
+    return _executor
+
+
+def create_job(kind, file_format, data, created_by=''):
+    """创建导出任务记录（不执行）"""
+    job_id = uuid.uuid4().hex
+    return ExportJob.objects.create(
+        job_id=job_id,
+        kind=kind,
+        file_format=file_format,
+        params=filter_params(data),
+        created_by=created_by,
+        file_name=f'{kind}_{job_id}.{file_format}',
+    )
+
+
+def run_job(job_id):
+    """
+    执行导出任务：写入临时文件，完成后重命名为最终文件
+    可在后台线程或管理命令（export_data --job）中调用
+    """
+    job = ExportJob.objects.get(job_id=job_id)
+    job.status = 'running'
+    job.save(update_fields=['status'])
+
+    target = job_path(job)
+    tmp_path = f'{target}.part'
+    try:
+        title, headers, rows = build(job.kind, job.params)
+        job.row_count = write_file(job.file_format, headers, rows, tmp_path, sheet_title=title)
+        os.replace(tmp_path, target)
+        job.status = 'completed'
+    except Exception as e:
+        print(f"导出任务失败 {job_id}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        job.status = 'failed'
+        job.error = str(e)
+    job.finished_time = timezone.now()
+    job.save(update_fields=['status', 'row_count', 'error', 'finished_time'])
+    return job
+
+
+def _run_in_background(job_id):
+    close_old_connections()
+    try:
+        run_job(job_id)
+    finally:
+        close_old_connections()
+
+
+def submit(job):
+    """提交到后台线程池执行"""
+    _get_executor().submit(_run_in_background, job.job_id)
+    return job
+
+
+# ==================== 导出定义 ====================
+
+def _choice_label(mapping):
+    return lambda value: mapping.get(value, value)
+
+
+RECORD_STATUS_LABELS = {value: label for label, value in filters.RECORD_STATUS_MAP.items()}
+CLIENT_TYPE_LABELS = dict(ConsultationRecord.CLIENT_TYPE_CHOICES)
+
+
+@register('interviews', '访谈评估', [
+    Column('ID', 'id'),
+    Column('姓名', 'student_name'),
+    Column('年级', 'grade'),
+    Column('班级', 'class_name'),
+    Column('所属机构', 'organization'),
+    Column('访谈次数', 'interview_count'),
+    Column('访谈状态', 'interview_status'),
+    Column('类型', 'interview_type'),
+    Column('医生评定', 'doctor_assessment'),
+    Column('后续计划', 'follow_up_plan'),
+    Column('添加时间', 'created_time'),
+])
+def interviews_queryset(data):
+    return filters.filter_interviews(InterviewAssessment.objects.all(), data)
+
+
+@register('negative_events', '负面事件', [
+    Column('ID', 'id'),
+    Column('学生姓名', 'student_name'),
+    Column('年级', 'grade'),
+    Column('班级', 'class_name'),
+    Column('机构名称', 'organization'),
+    Column('事件详情', 'event_details'),
+    Column('事件日期', 'event_date'),
+    Column('创建人', 'created_by'),
+    Column('创建时间', 'created_time'),
+])
+def negative_events_queryset(data):
+    return filters.filter_negative_events(NegativeEvent.objects.filter(disabled=False), data)
+
+
+@register('referrals', '转介记录', [
+    Column('ID', 'id'),
+    Column('学生姓名', 'student_name'),
+    Column('性别', 'gender'),
+    Column('学校', 'school'),
+    Column('年级', 'grade'),
+    Column('班级', 'class_name'),
+    Column('转介单位', 'referral_unit__unit_name'),
+    Column('转介原因', 'referral_reason'),
+    Column('转介时间', 'referral_date'),
+    Column('创建人', 'created_by'),
+])
+def referrals_queryset(data):
+    return filters.filter_referrals(StudentReferral.objects.all(), data)
+
+
+@register('records', '咨询档案', [
+    Column('ID', 'id'),
+    Column('档案编号', 'record_no'),
+    Column('来访者姓名', 'client_name'),
+    Column('来访者类型', 'client_type', _choice_label(CLIENT_TYPE_LABELS)),
+    Column('性别', 'gender'),
+    Column('年龄', 'age'),
+    Column('学校', 'school'),
+    Column('年级', 'grade'),
+    Column('班级', 'class_name'),
+    Column('咨询来源', 'referral_source'),
+    Column('咨询师', 'counselor__name'),
+    Column('总访谈次数', 'interview_count'),
+    Column('访谈类型', 'interview_type'),
+    Column('档案状态', 'current_status', _choice_label(RECORD_STATUS_LABELS)),
+    Column('创建时间', 'created_time'),
+])
+def records_queryset(data):
+    return filters.filter_counselor(filters.filter_records(ConsultationRecord.objects.all(), data), data)
+
+
+@register('sessions', '咨询记录', [
+    Column('ID', 'id'),
+    Column('档案编号', 'record__record_no'),
+    Column('来访者姓名', 'record__client_name'),
+    Column('第几次访谈', 'session_number'),
+    Column('访谈日期', 'interview_date'),
+    Column('访谈时间', 'interview_time'),
+    Column('访谈时长(分钟)', 'duration'),
+    Column('来访状态', 'visit_status'),
+    Column('客观描述', 'objective_description'),
+    Column('医生评定', 'doctor_evaluation'),
+    Column('后续计划', 'follow_up_plan'),
+    Column('下次访谈计划', 'next_visit_plan'),
+    Column('危机状态', 'crisis_status'),
+    Column('咨询师姓名', 'consultant_name'),
+    Column('是否他评', 'is_third_party_evaluation', lambda value: '是' if value else '否'),
+    Column('创建时间', 'created_time'),
+])
+def sessions_queryset(data):
+    """咨询记录按所属档案的筛选条件导出"""
+    queryset = filters.filter_records(ConsultationSession.objects.all(), data, prefix='record__')
+    return filters.filter_counselor(queryset, data, prefix='record__')
@@ -0,0 +1,93 @@
+"""
+列表查询的筛选条件
+列表接口和导出接口使用相同的请求参数，筛选逻辑集中在这里，保证导出的数据与列表一致
+每个函数接收查询集和请求参数字典，返回筛选后的查询集
+"""
+from datetime import datetime
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+
+def filter_interviews(queryset, data):
+    """访谈评估（interview_list）"""
+    if data.get('std_name'):
+        queryset = queryset.filter(student_name__icontains=data.get('std_name'))
+    if data.get('std_grade'):
+        queryset = queryset.filter(grade=data.get('std_grade'))
+    if data.get('std_class'):
+        queryset = queryset.filter(class_name=data.get('std_class'))
+    if data.get('std_school'):
+        queryset = queryset.filter(organization=data.get('std_school'))
+    if data.get('interview_cout'):
+        queryset = queryset.filter(interview_count=int(data.get('interview_cout')))
+    if data.get('interview_status'):
+        queryset = queryset.filter(interview_status=data.get('interview_status'))
+    if data.get('interview_type'):
+        queryset = queryset.filter(interview_type=data.get('interview_type'))
+    if data.get('doctor_evaluation'):
+        queryset = queryset.filter(doctor_assessment=data.get('doctor_evaluation'))
+    if data.get('follow_up_plan'):
+        queryset = queryset.filter(follow_up_plan=data.get('follow_up_plan'))
+    return queryset
+
+
+def filter_negative_events(queryset, data):
+    """负面事件（negative_events_list），日期格式错误的条件忽略"""
+    if data.get('std_name'):
+        queryset = queryset.filter(student_name__icontains=data.get('std_name'))
+    date_start = _parse_date(data.get('date_start'))
+    if date_start:
+        queryset = queryset.filter(event_date__gte=date_start)
+    date_end = _parse_date(data.get('date_end'))
+    if date_end:
+        queryset = queryset.filter(event_date__lte=date_end)
+    return queryset
+
+
+def filter_referrals(queryset, data):
+    """转介管理（referral_management_list）"""
+    if data.get('std_name'):
+        queryset = queryset.filter(student_name__icontains=data.get('std_name'))
+    return queryset
+
+
+# 档案状态中文名 -> 存储值
+RECORD_STATUS_MAP = {
+    '进行中': 'active',
+    '已完成': 'completed',
+    '已关闭': 'closed',
+}
+
+
+def filter_records(queryset, data, prefix=''):
+    """
+    咨询档案（咨询师端 record_list）
+    prefix 用于通过关联筛选，如筛选咨询记录时传入 'record__'
+    interview_count 不是整数时抛出 ValueError
+    """
+    if data.get('std_name'):
+        queryset = queryset.filter(**{f'{prefix}client_name__icontains': data.get('std_name')})
+    if data.get('std_grade'):
+        queryset = queryset.filter(**{f'{prefix}grade__icontains': data.get('std_grade')})
+    if data.get('std_class'):
+        queryset = queryset.filter(**{f'{prefix}class_name__icontains': data.get('std_class')})
+    if data.get('std_school'):
+        queryset = queryset.filter(**{f'{prefix}school__icontains': data.get('std_school')})
+    if data.get('interview_count'):
+        queryset = queryset.filter(**{f'{prefix}interview_count': int(data.get('interview_count'))})
+    if data.get('interview_status'):
+        mapped_status = RECORD_STATUS_MAP.get(data.get('interview_status'), data.get('interview_status'))
+        queryset = queryset.filter(**{f'{prefix}current_status': mapped_status})
+    return queryset
+
+
+def filter_counselor(queryset, data, prefix=''):
+    """按 counselor_id 筛选（只用于管理员导出，咨询师端只能查询自己的档案），不是整数时抛出 ValueError"""
+    if data.get('counselor_id'):
+        queryset = queryset.filter(**{f'{prefix}counselor_id': int(data.get('counselor_id'))})
+    return queryset
@@ -0,0 +1,160 @@
+"""
+下拉选项等引用数据列表的读穿透缓存
+每个列表声明依赖的模型，模型的版本号在 post_save/post_delete/批量操作后递增（见 signals.py），
+版本号不变时直接返回进程内存中的结果和 ETag，客户端带 If-None-Match 时返回 304
+版本号保存在跨进程失效总线中，其他worker的写操作也能立即生效
+"""
+import hashlib
+import json
+import threading
+
+from rest_framework import status
+from rest_framework.response import Response
+
+from CounselorAdmin.models import Category, Counselor, InterviewAssessment, ReferralUnit
+from DjangoProject import invalidation
+
+
+NAMESPACE_PREFIX = 'lookup:'
+
+# 列表名称 -> (依赖的模型列表, 加载函数)
+_registry = {}
+
+# 列表名称 -> (版本号元组, 数据, ETag)
+_entries = {}
+_lock = threading.Lock()
+
+
+def _namespace(model):
+    return f"{NAMESPACE_PREFIX}{model._meta.label_lower}"
+
+
+def register(name, models):
+    """
+    注册一个查找列表，用法：
+
+        @lookup_cache.register('categories_name', [Category])
+        def load_categories():
+            return [...]
+    """
+    def decorator(loader):
+        _registry[name] = (tuple(models), loader)
+        return loader
+    return decorator
+
+
+def tracked_models():
+    """所有被查找列表依赖的模型"""
+    models = set()
+    for dependencies, _ in _registry.values():
+        models.update(dependencies)
+    return models
+
+
+def bump(model):
+    """模型数据变化后递增版本号，依赖该模型的列表在下次访问时重新加载"""
+    invalidation.publish(_namespace(model))
+
+
+def _current_versions(models):
+    return tuple(invalidation.generation(_namespace(model)) for model in models)
+
+
+def _make_etag(data):
+    payload = json.dumps(data, ensure_ascii=False, sort_keys=True, default=str).encode('utf-8')
+    return '"%s"' % hashlib.sha1(payload).hexdigest()
+
+
+def get(name):
+    """
+    获取列表数据
+
+    返回:
+        (data, etag)
+    """
+    models, loader = _registry[name]
+    versions = _current_versions(models)
+    entry = _entries.get(name)
+    if entry is not None and entry[0] == versions:
+        return entry[1], entry[2]
+
+    with _lock:
+        entry = _entries.get(name)
+        if entry is not None and entry[0] == versions:
+            return entry[1], entry[2]
+        data = loader()
+        etag = _make_etag(data)
+        _entries[name] = (versions, data, etag)
+    return data, etag
+
+
+def _etag_matches(request, etag):
+    header = request.META.get('HTTP_IF_NONE_MATCH', '')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    # 响应经过压缩后 ETag 会变为弱校验（W/"..."），比较时忽略前缀
+    for value in header.split(','):
+        value = value.strip()
+        if value.startswith('W/'):
+            value = value[2:]
+        if value == etag:
+            return True
+    return False
+
+
+def response(request, name):
+    """
+    返回列表接口响应：{'data': [...]}，附带 ETag；客户端 If-None-Match 命中时返回 304（无响应体）
+    """
+    data, etag = get(name)
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    if _etag_matches(request, etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response({'data': data}, headers=headers)
+
+
+def clear():
+    """清空进程内缓存（测试使用）"""
+    with _lock:
+        _entries.clear()
+
+
+# ==================== 查找列表 ====================
+
+@register('categories_name', [Category])
+def load_categories_name():
+    return [
+        {'id': str(category_id), 'category_name': category_name}
+        for category_id, category_name in Category.objects.order_by('sort_order', 'created_time').values_list('id', 'category_name')
+    ]
+
+
+@register('referral_organization_name', [ReferralUnit])
+def load_referral_organization_name():
+    return list(ReferralUnit.objects.values_list('unit_name', flat=True))
+
+
+@register('consultants_id_name', [Counselor])
+def load_consultants_id_name():
+    return [
+        {'id': str(counselor_id), 'name': name}
+        for counselor_id, name in Counselor.objects.order_by('id').values_list('id', 'name')
+    ]
+
+
+@register('interview_grade', [InterviewAssessment])
+def load_interview_grade():
+    return list(
+        InterviewAssessment.objects.exclude(grade__isnull=True).exclude(grade='')
+        .values_list('grade', flat=True).distinct().order_by('grade')
+    )
+
+
+@register('interview_class', [InterviewAssessment])
+def load_interview_class():
+    return list(
+        InterviewAssessment.objects.exclude(class_name__isnull=True).exclude(class_name='')
+        .values_list('class_name', flat=True).distinct().order_by('class_name')
+    )
@@ -0,0 +1,74 @@
+# Generated by Django 5.2 on 2026-10-19 20:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("CounselorAdmin", "0007_cancellation_reason"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChunkedUpload",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                (
+                    "upload_id",
+                    models.CharField(max_length=32, unique=True, verbose_name="上传ID"),
+                ),
+                (
+                    "file_name",
+                    models.CharField(max_length=255, verbose_name="原始文件名"),
+                ),
+                ("file_size", models.BigIntegerField(verbose_name="文件总大小")),
+                ("chunk_size", models.IntegerField(verbose_name="分片大小")),
+                ("total_chunks", models.IntegerField(verbose_name="分片总数")),
+                (
+                    "received_chunks",
+                    models.JSONField(
+                        blank=True, default=list, verbose_name="已接收分片序号"
+                    ),
+                ),
+                (
+                    "file_sha256",
+                    models.CharField(
+                        blank=True, max_length=64, verbose_name="文件SHA-256"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("uploading", "上传中"), ("completed", "已完成")],
+                        default="uploading",
+                        max_length=20,
+                        verbose_name="状态",
+                    ),
+                ),
+                (
+                    "file_path",
+                    models.CharField(
+                        blank=True, max_length=255, verbose_name="文件路径"
+                    ),
+                ),
+                (
+                    "created_by",
+                    models.CharField(blank=True, max_length=50, verbose_name="创建人"),
+                ),
+                (
+                    "created_time",
+                    models.DateTimeField(auto_now_add=True, verbose_name="创建时间"),
+                ),
+                (
+                    "updated_time",
+                    models.DateTimeField(auto_now=True, verbose_name="更新时间"),
+                ),
+            ],
+            options={
+                "verbose_name": "分片上传",
+                "verbose_name_plural": "分片上传",
+                "db_table": "chunked_uploads",
+            },
+        ),
+    ]
@@ -0,0 +1,125 @@
+# Generated by Django 5.2 on 2026-10-19 20:46
+
+import html
+import re
+from urllib.parse import urlsplit
+
+import markdown
+from django.db import migrations, models
+from django.utils.html import strip_tags
+from markdown.extensions import Extension
+from markdown.treeprocessors import Treeprocessor
+
+BATCH_SIZE = 500
+
+# 渲染和摘要逻辑写在迁移中（原始HTML转义、属性白名单），不随 CounselorAdmin.article_content 的修改而变化
+EXCERPT_LENGTH = 120
+ALLOWED_ATTRIBUTES = {
+    "href",
+    "src",
+    "alt",
+    "title",
+    "id",
+    "class",
+    "align",
+    "start",
+    "colspan",
+    "rowspan",
+    "style",
+}
+URL_ATTRIBUTES = {"href", "src"}
+ALLOWED_SCHEMES = {"", "http", "https", "mailto"}
+_WHITESPACE = re.compile(r"\s+")
+_CONTROL = re.compile(r"[\x00-\x20\x7f]+")
+_ALIGN_STYLE = re.compile(r"text-align:\s*(left|right|center);?")
+
+
+def _safe_url(value):
+    try:
+        return urlsplit(_CONTROL.sub("", value)).scheme.lower() in ALLOWED_SCHEMES
+    except ValueError:
+        return False
+
+
+class _AttributeFilter(Treeprocessor):
+    def run(self, root):
+        for element in root.iter():
+            for name, value in list(element.items()):
+                if (
+                    name not in ALLOWED_ATTRIBUTES
+                    or (name in URL_ATTRIBUTES and not _safe_url(value))
+                    or (name == "style" and not _ALIGN_STYLE.fullmatch(value.strip()))
+                ):
+                    del element.attrib[name]
+
+
+class _SafeExtension(Extension):
+    def extendMarkdown(self, md):
+        md.preprocessors.deregister("html_block")
+        md.inlinePatterns.deregister("html")
+        md.treeprocessors.register(_AttributeFilter(md), "attribute_filter", -1)
+
+
+def render_html(content):
+    if not content:
+        return ""
+    return markdown.markdown(
+        content,
+        extensions=["extra", "sane_lists", _SafeExtension()],
+        output_format="html",
+    )
+
+
+def make_excerpt(content_html):
+    text = _WHITESPACE.sub(" ", html.unescape(strip_tags(content_html))).strip()
+    if len(text) > EXCERPT_LENGTH:
+        text = text[:EXCERPT_LENGTH].rstrip() + "…"
+    return text
+
+
+def backfill_articles(apps, schema_editor):
+    """为已有资讯生成摘要和渲染后的HTML，更新时间取创建时间"""
+    Article = apps.get_model("CounselorAdmin", "Article")
+    batch = []
+    for article in Article.objects.only("id", "content", "created_time").iterator(
+        chunk_size=BATCH_SIZE
+    ):
+        article.content_html = render_html(article.content)
+        article.excerpt = make_excerpt(article.content_html)
+        article.updated_time = article.created_time
+        batch.append(article)
+        if len(batch) >= BATCH_SIZE:
+            Article.objects.bulk_update(
+                batch, ["content_html", "excerpt", "updated_time"]
+            )
+            batch = []
+    if batch:
+        Article.objects.bulk_update(batch, ["content_html", "excerpt", "updated_time"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("CounselorAdmin", "0008_chunkedupload"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="article",
+            name="content_html",
+            field=models.TextField(blank=True, default="", verbose_name="渲染后的内容"),
+        ),
+        migrations.AddField(
+            model_name="article",
+            name="excerpt",
+            field=models.CharField(
+                blank=True, default="", max_length=200, verbose_name="摘要"
+            ),
+        ),
+        migrations.AddField(
+            model_name="article",
+            name="updated_time",
+            field=models.DateTimeField(auto_now=True, verbose_name="更新时间"),
+        ),
+        migrations.RunPython(backfill_articles, migrations.RunPython.noop),
+    ]
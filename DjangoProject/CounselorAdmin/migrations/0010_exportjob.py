@@ -0,0 +1,76 @@
+# Generated by Django 5.2 on 2026-10-19 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("CounselorAdmin", "0009_article_excerpt_content_html"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExportJob",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                (
+                    "job_id",
+                    models.CharField(max_length=32, unique=True, verbose_name="任务ID"),
+                ),
+                ("kind", models.CharField(max_length=50, verbose_name="导出类型")),
+                (
+                    "file_format",
+                    models.CharField(
+                        choices=[("csv", "CSV"), ("xlsx", "Excel")],
+                        default="xlsx",
+                        max_length=10,
+                        verbose_name="文件格式",
+                    ),
+                ),
+                (
+                    "params",
+                    models.JSONField(blank=True, default=dict, verbose_name="筛选条件"),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "等待中"),
+                            ("running", "导出中"),
+                            ("completed", "已完成"),
+                            ("failed", "失败"),
+                        ],
+                        default="pending",
+                        max_length=20,
+                        verbose_name="状态",
+                    ),
+                ),
+                ("row_count", models.IntegerField(default=0, verbose_name="导出行数")),
+                (
+                    "file_name",
+                    models.CharField(blank=True, max_length=255, verbose_name="文件名"),
+                ),
+                ("error", models.TextField(blank=True, verbose_name="错误信息")),
+                (
+                    "created_by",
+                    models.CharField(blank=True, max_length=50, verbose_name="创建人"),
+                ),
+                (
+                    "created_time",
+                    models.DateTimeField(auto_now_add=True, verbose_name="创建时间"),
+                ),
+                (
+                    "finished_time",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="完成时间"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "导出任务",
+                "verbose_name_plural": "导出任务",
+                "db_table": "export_jobs",
+            },
+        ),
+    ]
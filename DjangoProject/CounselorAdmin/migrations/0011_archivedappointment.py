@@ -0,0 +1,118 @@
+# Generated by Django 5.2 on 2026-10-19 10:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("CounselorAdmin", "0010_exportjob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedAppointment",
+            fields=[
+                ("id", models.IntegerField(primary_key=True, serialize=False)),
+                (
+                    "order_no",
+                    models.CharField(
+                        max_length=20, unique=True, verbose_name="订单编号"
+                    ),
+                ),
+                (
+                    "client_name",
+                    models.CharField(max_length=50, verbose_name="预约人员姓名"),
+                ),
+                (
+                    "client_gender",
+                    models.CharField(
+                        choices=[("男", "男"), ("女", "女")],
+                        max_length=2,
+                        verbose_name="性别",
+                    ),
+                ),
+                (
+                    "client_age",
+                    models.IntegerField(blank=True, null=True, verbose_name="年龄"),
+                ),
+                (
+                    "service_type",
+                    models.CharField(
+                        blank=True,
+                        choices=[
+                            ("个体咨询", "个体咨询"),
+                            ("团体咨询", "团体咨询"),
+                            ("家庭咨询", "家庭咨询"),
+                            ("危机干预", "危机干预"),
+                        ],
+                        max_length=20,
+                        verbose_name="服务类型",
+                    ),
+                ),
+                (
+                    "counseling_keywords",
+                    models.CharField(
+                        blank=True, max_length=200, verbose_name="咨询关键字"
+                    ),
+                ),
+                (
+                    "appointment_date",
+                    models.DateField(blank=True, null=True, verbose_name="预约日期"),
+                ),
+                (
+                    "time_slot",
+                    models.CharField(
+                        blank=True, max_length=50, verbose_name="预约时段"
+                    ),
+                ),
+                (
+                    "contact",
+                    models.CharField(
+                        blank=True, max_length=100, null=True, verbose_name="联系方式"
+                    ),
+                ),
+                ("submit_time", models.DateTimeField(verbose_name="提交时间")),
+                (
+                    "end_time",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="结束时间"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("未开始", "未开始"),
+                            ("进行中", "进行中"),
+                            ("已完成", "已完成"),
+                        ],
+                        max_length=10,
+                        verbose_name="状态",
+                    ),
+                ),
+                (
+                    "archived_time",
+                    models.DateTimeField(auto_now_add=True, verbose_name="归档时间"),
+                ),
+                (
+                    "counselor",
+                    models.ForeignKey(
+                        blank=True,
+                        db_constraint=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="CounselorAdmin.counselor",
+                        verbose_name="关联咨询师",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "预约订单（归档）",
+                "verbose_name_plural": "预约订单（归档）",
+                "db_table": "appointments_archive",
+            },
+        ),
+    ]
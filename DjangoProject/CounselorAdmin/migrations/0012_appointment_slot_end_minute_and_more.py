@@ -0,0 +1,99 @@
+# Generated by Django 5.2 on 2026-10-19 15:55
+
+import re
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+FIELDS = ("slot_start_minute", "slot_end_minute")
+
+# 时段解析写在迁移中，不随 Consultant.timeslots 的修改而变化
+_TIME_RANGE = re.compile(
+    r"(\d{1,2})\s*[:：]\s*(\d{2})(?:\s*[-~～至到—–]+\s*(\d{1,2})\s*[:：]\s*(\d{2}))?"
+)
+
+
+def parse_time_slot(value):
+    match = _TIME_RANGE.search(value or "")
+    if not match:
+        return None, None
+    start_hour, start_minute, end_hour, end_minute = match.groups()
+    start = int(start_hour) * 60 + int(start_minute)
+    if start >= 24 * 60:
+        return None, None
+    if end_hour is None:
+        return start, None
+    end = int(end_hour) * 60 + int(end_minute)
+    return start, end if start < end <= 24 * 60 else None
+
+
+def backfill(model):
+    """按主键分批解析 model 全表的 time_slot 并写回"""
+    last = None
+    while True:
+        queryset = model.objects.order_by("pk")
+        if last is not None:
+            queryset = queryset.filter(pk__gt=last)
+        batch = list(queryset.only("pk", "time_slot", *FIELDS)[:BATCH_SIZE])
+        if not batch:
+            return
+        changed = []
+        for obj in batch:
+            slot = parse_time_slot(obj.time_slot)
+            if slot != (obj.slot_start_minute, obj.slot_end_minute):
+                obj.slot_start_minute, obj.slot_end_minute = slot
+                changed.append(obj)
+        model.objects.bulk_update(changed, FIELDS)
+        last = batch[-1].pk
+
+
+def backfill_appointment_slots(apps, schema_editor):
+    """分批解析已有预约订单（含归档表）的预约时段，填写开始、结束分钟数"""
+    for name in ["Appointment", "ArchivedAppointment"]:
+        backfill(apps.get_model("CounselorAdmin", name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("CounselorAdmin", "0011_archivedappointment"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="appointment",
+            name="slot_end_minute",
+            field=models.IntegerField(
+                blank=True, null=True, verbose_name="时段结束（当天分钟数）"
+            ),
+        ),
+        migrations.AddField(
+            model_name="appointment",
+            name="slot_start_minute",
+            field=models.IntegerField(
+                blank=True, null=True, verbose_name="时段开始（当天分钟数）"
+            ),
+        ),
+        migrations.AddField(
+            model_name="archivedappointment",
+            name="slot_end_minute",
+            field=models.IntegerField(
+                blank=True, null=True, verbose_name="时段结束（当天分钟数）"
+            ),
+        ),
+        migrations.AddField(
+            model_name="archivedappointment",
+            name="slot_start_minute",
+            field=models.IntegerField(
+                blank=True, null=True, verbose_name="时段开始（当天分钟数）"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="appointment",
+            index=models.Index(
+                fields=["counselor", "appointment_date", "slot_start_minute"],
+                name="appointment_counsel_c298ce_idx",
+            ),
+        ),
+        migrations.RunPython(backfill_appointment_slots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2 on 2026-10-19 11:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("CounselorAdmin", "0012_appointment_slot_end_minute_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ScheduleRule",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                ("weekdays", models.JSONField(default=list, verbose_name="星期几数组")),
+                ("start_time", models.TimeField(verbose_name="开始时间")),
+                ("end_time", models.TimeField(verbose_name="结束时间")),
+                ("start_date", models.DateField(verbose_name="生效日期")),
+                (
+                    "end_date",
+                    models.DateField(blank=True, null=True, verbose_name="失效日期"),
+                ),
+                (
+                    "exceptions",
+                    models.JSONField(
+                        blank=True, default=list, verbose_name="例外日期数组"
+                    ),
+                ),
+                (
+                    "created_by",
+                    models.CharField(blank=True, max_length=50, verbose_name="创建人"),
+                ),
+                (
+                    "created_time",
+                    models.DateTimeField(auto_now_add=True, verbose_name="创建时间"),
+                ),
+                (
+                    "updated_time",
+                    models.DateTimeField(auto_now=True, verbose_name="更新时间"),
+                ),
+                (
+                    "counselor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="schedule_rules",
+                        to="CounselorAdmin.counselor",
+                        verbose_name="咨询师",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "周期排班规则",
+                "verbose_name_plural": "周期排班规则",
+                "db_table": "schedule_rules",
+                "indexes": [
+                    models.Index(
+                        fields=["start_date", "end_date"],
+                        name="schedule_ru_start_d_8d6c27_idx",
+                    )
+                ],
+            },
+        ),
+    ]
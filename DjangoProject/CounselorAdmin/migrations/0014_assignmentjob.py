@@ -0,0 +1,67 @@
+# Generated by Django 5.2 on 2026-10-19 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("CounselorAdmin", "0013_schedulerule"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AssignmentJob",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                (
+                    "job_id",
+                    models.CharField(max_length=32, unique=True, verbose_name="任务ID"),
+                ),
+                (
+                    "params",
+                    models.JSONField(blank=True, default=dict, verbose_name="分配参数"),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "等待中"),
+                            ("running", "分配中"),
+                            ("completed", "已完成"),
+                            ("failed", "失败"),
+                        ],
+                        default="pending",
+                        max_length=20,
+                        verbose_name="状态",
+                    ),
+                ),
+                ("total", models.IntegerField(default=0, verbose_name="待分配数")),
+                ("assigned", models.IntegerField(default=0, verbose_name="已分配数")),
+                (
+                    "metrics",
+                    models.JSONField(blank=True, default=dict, verbose_name="分配指标"),
+                ),
+                ("error", models.TextField(blank=True, verbose_name="错误信息")),
+                (
+                    "created_by",
+                    models.CharField(blank=True, max_length=50, verbose_name="创建人"),
+                ),
+                (
+                    "created_time",
+                    models.DateTimeField(auto_now_add=True, verbose_name="创建时间"),
+                ),
+                (
+                    "finished_time",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="完成时间"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "预约分配任务",
+                "verbose_name_plural": "预约分配任务",
+                "db_table": "assignment_jobs",
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-19 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("CounselorAdmin", "0014_assignmentjob"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="chunkedupload",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("uploading", "上传中"),
+                    ("assembling", "合并中"),
+                    ("completed", "已完成"),
+                ],
+                default="uploading",
+                max_length=20,
+                verbose_name="状态",
+            ),
+        ),
+    ]
@@ -152,6 +152,9 @@ class Appointment(models.Model):
     appointment_date = models.DateField(blank=True, null=True, verbose_name='预约日期')
     # 预约时段，如上午、下午等，允许为空
     time_slot = models.CharField(max_length=50, blank=True, verbose_name='预约时段')
+    # 由预约时段解析出的当天开始、结束分钟数，保存时自动填写，无法解析（如上午、下午）时为空
+    slot_start_minute = models.IntegerField(blank=True, null=True, verbose_name='时段开始（当天分钟数）')
+    slot_end_minute = models.IntegerField(blank=True, null=True, verbose_name='时段结束（当天分钟数）')
     # 联系方式，允许为空
     contact = models.CharField(max_length=100, blank=True, null=True, verbose_name='联系方式')
     # 提交时间，自动记录创建时间
@@ -171,6 +174,10 @@ class Appointment(models.Model):
         verbose_name = '预约订单'
         # 设置复数形式的可读名称为'预约订单'
         verbose_name_plural = '预约订单'
+        indexes = [
+            # 按咨询师、预约日期的时段统计和时间冲突判断
+            models.Index(fields=['counselor', 'appointment_date', 'slot_start_minute']),
+        ]
 
     def __str__(self):
         """
@@ -178,6 +185,53 @@ class Appointment(models.Model):
         """
         return f"{self.order_no} - {self.client_name}"
 
+    def save(self, *args, **kwargs):
+        """
+        保存时由预约时段解析出开始、结束分钟数
+        指定 update_fields 且不包含 time_slot 时（如只更新状态）不重新解析
+        """
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'time_slot' in update_fields:
+            from Consultant import timeslots
+            timeslots.apply(self)
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | set(timeslots.FIELDS)
+        super().save(*args, **kwargs)
+
+
+class ArchivedAppointment(models.Model):
+    """
+    预约订单归档表，已完成且提交时间较早的预约订单由 manage.py archive 从 appointments 移入
+    字段与 Appointment 相同，主键沿用原订单ID；只读，订单列表传入 include_archived 时查询
+    """
+    id = models.IntegerField(primary_key=True)
+    order_no = models.CharField(max_length=20, unique=True, verbose_name='订单编号')
+    client_name = models.CharField(max_length=50, verbose_name='预约人员姓名')
+    client_gender = models.CharField(max_length=2, choices=Appointment.GENDER_CHOICES, verbose_name='性别')
+    client_age = models.IntegerField(blank=True, null=True, verbose_name='年龄')
+    service_type = models.CharField(max_length=20, choices=Appointment.SERVICE_TYPE_CHOICES, blank=True, verbose_name='服务类型')
+    counseling_keywords = models.CharField(max_length=200, blank=True, verbose_name='咨询关键字')
+    appointment_date = models.DateField(blank=True, null=True, verbose_name='预约日期')
+    time_slot = models.CharField(max_length=50, blank=True, verbose_name='预约时段')
+    slot_start_minute = models.IntegerField(blank=True, null=True, verbose_name='时段开始（当天分钟数）')
+    slot_end_minute = models.IntegerField(blank=True, null=True, verbose_name='时段结束（当天分钟数）')
+    contact = models.CharField(max_length=100, blank=True, null=True, verbose_name='联系方式')
+    submit_time = models.DateTimeField(verbose_name='提交时间')
+    end_time = models.DateTimeField(blank=True, null=True, verbose_name='结束时间')
+    status = models.CharField(max_length=10, choices=Appointment.STATUS_CHOICES, verbose_name='状态')
+    # 不建数据库约束，咨询师删除后保留原ID
+    counselor = models.ForeignKey(Counselor, on_delete=models.DO_NOTHING, db_constraint=False, blank=True, null=True,
+                                  related_name='+', verbose_name='关联咨询师')
+    archived_time = models.DateTimeField(auto_now_add=True, verbose_name='归档时间')
+
+    class Meta:
+        db_table = 'appointments_archive'
+        verbose_name = '预约订单（归档）'
+        verbose_name_plural = '预约订单（归档）'
+
+    def __str__(self):
+        return f"{self.order_no} - {self.client_name}"
+
 
 # 轮播图模块表
 # 数据库文档中的 module_name 在接口中简化为 module
@@ -279,11 +333,14 @@ class Article(models.Model):
     )
     title = models.CharField(max_length=200, verbose_name='资讯标题', null=False, blank=False)  # 修正：添加 NOT NULL 约束
     content = models.TextField(blank=True, verbose_name='资讯内容')  # 文本类型的内容字段，允许为空
+    excerpt = models.CharField(max_length=200, blank=True, default='', verbose_name='摘要')  # 保存时由内容生成的纯文本摘要，列表接口使用
+    content_html = models.TextField(blank=True, default='', verbose_name='渲染后的内容')  # 保存时由Markdown内容渲染的HTML
     collect_count = models.IntegerField(default=0, verbose_name='收藏人数')  # 整数类型的收藏人数，默认值为0
     like_count = models.IntegerField(default=0, verbose_name='点赞人数')  # 整数类型的点赞人数，默认值为0
     read_count = models.IntegerField(default=0, verbose_name='阅读人数')  # 整数类型的阅读人数，默认值为0
     created_by = models.CharField(max_length=50, blank=True, verbose_name='创建人')  # 字符串类型的创建人字段，允许为空
     created_time = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')  # 自动记录创建时间
+    updated_time = models.DateTimeField(auto_now=True, verbose_name='更新时间')  # 自动记录更新时间，渲染结果缓存按此区分版本
     video = models.URLField(max_length=500, blank=True, verbose_name='视频URL')  # URL类型的视频字段，允许为空（用于外部链接）
     video_path = models.CharField(max_length=255, blank=True, verbose_name='视频文件路径')  # 视频文件路径字段，存储相对路径，允许为空（用于上传的视频文件）
     resource = models.CharField(max_length=200, blank=True, verbose_name='资源')  # 资源字段
@@ -297,6 +354,19 @@ class Article(models.Model):
         verbose_name = '宣教资讯'  # 模型的单数形式名称
         verbose_name_plural = '宣教资讯'  # 模型的复数形式名称
 
+    def save(self, *args, **kwargs):
+        """
+        保存时根据内容生成摘要和渲染后的HTML
+        指定 update_fields 且不包含 content 时（如只更新计数）不重新渲染
+        """
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'content' in update_fields:
+            from CounselorAdmin import article_content
+            article_content.refresh(self)
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'excerpt', 'content_html', 'updated_time'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         """
         返回模型的字符串表示，通常用于后台显示
@@ -564,6 +634,44 @@ class Schedule(models.Model):
         return f"{self.counselor.name} - {self.work_date}"
 
 
+# 周期排班规则表
+class ScheduleRule(models.Model):
+    """
+    周期排班规则模型类
+    按星期几重复的排班只保存一条规则，查询排班时在日期范围内展开（见 CounselorAdmin/schedule_rules.py）；
+    咨询师某天有 Schedule 记录时以记录为准（覆盖当天所有规则），exceptions 中的日期不展开（如单独调休）
+
+    属性:
+        weekdays: 星期几数组，1-7（周一为1）
+        start_time / end_time: 每天的工作时间段
+        start_date / end_date: 规则生效的日期范围，end_date 为空表示长期有效
+        exceptions: 不展开的日期数组（"YYYY-MM-DD"）
+    """
+    id = models.AutoField(primary_key=True)
+    counselor = models.ForeignKey(Counselor, on_delete=models.CASCADE, related_name='schedule_rules', verbose_name='咨询师')
+    weekdays = models.JSONField(default=list, verbose_name='星期几数组')
+    start_time = models.TimeField(verbose_name='开始时间')
+    end_time = models.TimeField(verbose_name='结束时间')
+    start_date = models.DateField(verbose_name='生效日期')
+    end_date = models.DateField(blank=True, null=True, verbose_name='失效日期')
+    exceptions = models.JSONField(default=list, blank=True, verbose_name='例外日期数组')
+    created_by = models.CharField(max_length=50, blank=True, verbose_name='创建人')
+    created_time = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    updated_time = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        db_table = 'schedule_rules'
+        verbose_name = '周期排班规则'
+        verbose_name_plural = '周期排班规则'
+        indexes = [
+            # 按日期范围查找生效的规则
+            models.Index(fields=['start_date', 'end_date']),
+        ]
+
+    def __str__(self):
+        return f"{self.counselor_id} - {self.weekdays} {self.start_time}-{self.end_time}"
+
+
 # 停诊表
 class Cancellation(models.Model):
     """
@@ -589,4 +697,110 @@ class Cancellation(models.Model):
         格式为：咨询师姓名 - 停诊开始时间
         """
         return f"{self.counselor.name} - {self.cancel_start}"
+
+
+# 分片上传表
+class ChunkedUpload(models.Model):
+    """
+    分片上传模型类
+    用于大文件（宣教视频）的分片、可续传上传，记录已接收的分片
+    """
+    STATUS_CHOICES = [
+        ('uploading', '上传中'),
+        ('assembling', '合并中'),
+        ('completed', '已完成'),
+    ]
+
+    id = models.AutoField(primary_key=True)  # 主键ID，自增
+    upload_id = models.CharField(max_length=32, unique=True, verbose_name='上传ID')  # 对外暴露的上传ID（UUID）
+    file_name = models.CharField(max_length=255, verbose_name='原始文件名')  # 原始文件名
+    file_size = models.BigIntegerField(verbose_name='文件总大小')  # 文件总字节数
+    chunk_size = models.IntegerField(verbose_name='分片大小')  # 每个分片的字节数（最后一片可以更小）
+    total_chunks = models.IntegerField(verbose_name='分片总数')  # 分片总数
+    received_chunks = models.JSONField(default=list, blank=True, verbose_name='已接收分片序号')  # 已接收并校验通过的分片序号
+    file_sha256 = models.CharField(max_length=64, blank=True, verbose_name='文件SHA-256')  # 客户端声明的整个文件哈希，可为空
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading', verbose_name='状态')  # 上传状态
+    file_path = models.CharField(max_length=255, blank=True, verbose_name='文件路径')  # 完成后文件的相对路径（相对static目录）
+    created_by = models.CharField(max_length=50, blank=True, verbose_name='创建人')  # 创建人，可为空
+    created_time = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')  # 创建时间，自动记录
+    updated_time = models.DateTimeField(auto_now=True, verbose_name='更新时间')  # 最后一次接收分片的时间
+
+    class Meta:
+        db_table = 'chunked_uploads'  # 指定数据库表名
+        verbose_name = '分片上传'  # 模型的可读名称
+        verbose_name_plural = '分片上传'  # 模型的复数可读名称
+
+    def __str__(self):
+        return f"{self.file_name} - {self.upload_id}"
+
+
+class ExportJob(models.Model):
+    """
+    导出任务模型类
+    数据量较大的导出在后台线程中执行，生成的文件保存在 EXPORT_DIR，完成后通过任务ID下载
+    """
+    STATUS_CHOICES = [
+        ('pending', '等待中'),
+        ('running', '导出中'),
+        ('completed', '已完成'),
+        ('failed', '失败'),
+    ]
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('xlsx', 'Excel'),
+    ]
+
+    id = models.AutoField(primary_key=True)  # 主键ID，自增
+    job_id = models.CharField(max_length=32, unique=True, verbose_name='任务ID')  # 对外暴露的任务ID（UUID）
+    kind = models.CharField(max_length=50, verbose_name='导出类型')  # 导出的数据类型，见 CounselorAdmin/exports.py
+    file_format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='xlsx', verbose_name='文件格式')  # 导出文件格式
+    params = models.JSONField(default=dict, blank=True, verbose_name='筛选条件')  # 与列表接口相同的筛选参数
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name='状态')  # 任务状态
+    row_count = models.IntegerField(default=0, verbose_name='导出行数')  # 已导出的数据行数
+    file_name = models.CharField(max_length=255, blank=True, verbose_name='文件名')  # 生成的文件名（相对 EXPORT_DIR）
+    error = models.TextField(blank=True, verbose_name='错误信息')  # 失败原因
+    created_by = models.CharField(max_length=50, blank=True, verbose_name='创建人')  # 创建人，可为空
+    created_time = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')  # 创建时间，自动记录
+    finished_time = models.DateTimeField(blank=True, null=True, verbose_name='完成时间')  # 完成或失败的时间
+
+    class Meta:
+        db_table = 'export_jobs'  # 指定数据库表名
+        verbose_name = '导出任务'  # 模型的可读名称
+        verbose_name_plural = '导出任务'  # 模型的复数可读名称
+
+    def __str__(self):
+        return f"{self.kind} - {self.job_id}"
+
+
+class AssignmentJob(models.Model):
+    """
+    预约自动分配任务模型类
+    批量为未分配咨询师的预约订单选择咨询师（见 CounselorAdmin/assignment.py），在后台线程中执行，记录吞吐量和公平性指标
+    """
+    STATUS_CHOICES = [
+        ('pending', '等待中'),
+        ('running', '分配中'),
+        ('completed', '已完成'),
+        ('failed', '失败'),
+    ]
+
+    id = models.AutoField(primary_key=True)  # 主键ID，自增
+    job_id = models.CharField(max_length=32, unique=True, verbose_name='任务ID')  # 对外暴露的任务ID（UUID）
+    params = models.JSONField(default=dict, blank=True, verbose_name='分配参数')  # 预约日期范围、是否试运行
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name='状态')  # 任务状态
+    total = models.IntegerField(default=0, verbose_name='待分配数')  # 参与分配的预约订单数
+    assigned = models.IntegerField(default=0, verbose_name='已分配数')  # 成功分配的预约订单数
+    metrics = models.JSONField(default=dict, blank=True, verbose_name='分配指标')  # 耗时、吞吐量、未分配原因、负载公平性
+    error = models.TextField(blank=True, verbose_name='错误信息')  # 失败原因
+    created_by = models.CharField(max_length=50, blank=True, verbose_name='创建人')  # 创建人，可为空
+    created_time = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')  # 创建时间，自动记录
+    finished_time = models.DateTimeField(blank=True, null=True, verbose_name='完成时间')  # 完成或失败的时间
+
+    class Meta:
+        db_table = 'assignment_jobs'  # 指定数据库表名
+        verbose_name = '预约分配任务'  # 模型的可读名称
+        verbose_name_plural = '预约分配任务'  # 模型的复数可读名称
+
+    def __str__(self):
+        return f"assignment - {self.job_id}"
 # Create your models here.
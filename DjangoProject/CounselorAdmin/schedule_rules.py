@@ -0,0 +1,256 @@
+"""
+周期排班规则的展开与合并
+稳定的排班（如每周一、三 09:00-12:00）只保存一条 ScheduleRule，不再按天写入 Schedule。查询某个日期范围的排班时：
+
+- 规则按星期几、生效日期范围、例外日期展开成 (咨询师ID, 日期, 开始时间, 结束时间)
+- 咨询师某天有 Schedule 记录时以记录为准，覆盖当天的所有规则（单独调整某一天只写这一天）
+
+展开结果按 (开始日期, 结束日期, 咨询师ID, 规则代数) 缓存在进程内的 LRU 中（月视图反复查询同一个月），
+规则保存、删除时信号发布 'schedule_rules' 代数，各进程的旧缓存项不再命中，随 LRU 淘汰。
+长期有效（end_date 为空）的规则在可预约时段位图中只展开到今天起 SCHEDULE_RULE_HORIZON_DAYS 天
+"""
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from CounselorAdmin.models import Schedule, ScheduleRule
+from DjangoProject import invalidation
+
+
+NAMESPACE = 'schedule_rules'
+
+_lock = threading.Lock()
+_cached = None
+
+
+def horizon_days():
+    return getattr(settings, 'SCHEDULE_RULE_HORIZON_DAYS', 180)
+
+
+def horizon_end(today=None):
+    """长期有效规则展开的最后一天"""
+    return (today or timezone.now().date()) + timedelta(days=horizon_days())
+
+
+# ==================== 规则校验 ====================
+
+def parse_weekdays(value):
+    """星期几数组（1-7，或逗号分隔的字符串） -> 去重排序后的列表，含无效值时抛出 ValueError"""
+    if isinstance(value, str):
+        value = [item for item in value.replace('，', ',').split(',') if item.strip()]
+    weekdays = sorted({int(item) for item in value or []})
+    if not weekdays or weekdays[0] < 1 or weekdays[-1] > 7:
+        raise ValueError('星期几应为1-7')
+    return weekdays
+
+
+def parse_exceptions(value):
+    """例外日期数组 -> 去重排序后的 'YYYY-MM-DD' 列表，含无效日期时抛出 ValueError"""
+    if isinstance(value, str):
+        value = [item for item in value.replace('，', ',').split(',') if item.strip()]
+    return sorted({datetime.strptime(str(item).strip(), '%Y-%m-%d').date().isoformat() for item in value or []})
+
+
+# ==================== 展开 ====================
+
+def expand_rule(weekdays, start_date, end_date, exceptions, start, end):
+    """单条规则在 [start, end] 内生效的日期列表"""
+    first = max(start, start_date)
+    last = min(end, end_date) if end_date else end
+    weekdays = set(weekdays or [])
+    skipped = set(exceptions or [])
+    days = []
+    day = first
+    while day <= last:
+        if day.isoweekday() in weekdays and day.isoformat() not in skipped:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def expand_rows(rows, start, end):
+    """
+    规则行 [(咨询师ID, 星期几数组, 开始时间, 结束时间, 生效日期, 失效日期, 例外日期数组)]
+    -> [(咨询师ID, 日期, 开始时间, 结束时间)]，不访问数据库（迁移和位图计算中使用）
+    """
+    result = []
+    for counselor_id, weekdays, start_time, end_time, start_date, end_date, exceptions in rows:
+        for day in expand_rule(weekdays, start_date, end_date, exceptions, start, end):
+            result.append((counselor_id, day, start_time, end_time))
+    return result
+
+
+def rule_rows(queryset, start, end, counselor_ids=None):
+    """与 [start, end] 有交集的规则行（expand_rows 的输入格式），queryset 可传入历史模型的查询集"""
+    queryset = queryset.filter(Q(end_date__isnull=True) | Q(end_date__gte=start), start_date__lte=end)
+    if counselor_ids is not None:
+        queryset = queryset.filter(counselor_id__in=counselor_ids)
+    return queryset.values_list(
+        'counselor_id', 'weekdays', 'start_time', 'end_time', 'start_date', 'end_date', 'exceptions'
+    )
+
+
+def _expand(start, end, counselor_id, generation):
+    # generation 只作为缓存键的一部分：规则变化后旧代数的缓存项不再命中
+    counselor_ids = None if counselor_id is None else [counselor_id]
+    expanded = expand_rows(rule_rows(ScheduleRule.objects.all(), start, end, counselor_ids), start, end)
+    return tuple(sorted(set(expanded)))
+
+
+def expand(start, end, counselor_id=None):
+    """
+    规则在 [start, end] 内展开的排班（不含 Schedule 记录的覆盖），返回排序后的元组
+    [(咨询师ID, 日期, 开始时间, 结束时间)]，结果在进程内缓存，调用方不要修改
+    """
+    global _cached
+    if _cached is None:
+        with _lock:
+            if _cached is None:
+                _cached = lru_cache(maxsize=getattr(settings, 'SCHEDULE_RULE_CACHE_SIZE', 256))(_expand)
+    return _cached(start, end, counselor_id, invalidation.generation(NAMESPACE))
+
+
+def cache_info():
+    return _cached.cache_info() if _cached is not None else None
+
+
+def clear_cache():
+    if _cached is not None:
+        _cached.cache_clear()
+
+
+def merged(start, end, counselor_id=None):
+    """
+    [start, end] 内的实际排班：Schedule 记录加上规则展开的排班（咨询师当天有记录时不取规则）
+    返回 {(咨询师ID, 日期): (按开始时间排序的 [(开始时间, 结束时间)], 是否来自规则)}
+    """
+    explicit = Schedule.objects.filter(work_date__gte=start, work_date__lte=end)
+    if counselor_id is not None:
+        explicit = explicit.filter(counselor_id=counselor_id)
+    ranges = defaultdict(set)
+    for key_id, day, start_time, end_time in explicit.values_list('counselor_id', 'work_date', 'start_time', 'end_time'):
+        ranges[(key_id, day)].add((start_time, end_time))
+    overridden = set(ranges)
+    for key_id, day, start_time, end_time in expand(start, end, counselor_id):
+        if (key_id, day) not in overridden:
+            ranges[(key_id, day)].add((start_time, end_time))
+    return {key: (sorted(items), key not in overridden) for key, items in ranges.items()}
+
+
+# ==================== 覆盖写入 ====================
+
+def set_exception(counselor_id, day, skipped):
+    """把某天加入（skipped 为True）或移出咨询师当天生效规则的例外日期，返回修改的规则数"""
+    value = day.isoformat()
+    changed = 0
+    for rule in ScheduleRule.objects.filter(
+        Q(end_date__isnull=True) | Q(end_date__gte=day), counselor_id=counselor_id, start_date__lte=day,
+    ):
+        if day.isoweekday() not in (rule.weekdays or []):
+            continue
+        exceptions = set(rule.exceptions or [])
+        if (value in exceptions) == skipped:
+            continue
+        exceptions = exceptions | {value} if skipped else exceptions - {value}
+        rule.exceptions = sorted(exceptions)
+        rule.save(update_fields=['exceptions', 'updated_time'])
+        changed += 1
+    return changed
+
+
+def rule_ranges_on(day):
+    """
+    当天生效的规则产生的时间段 {咨询师ID: {(开始时间, 结束时间)}}
+    不计例外日期，用于判断修改后的某天排班是否与规则一致
+    """
+    result = defaultdict(set)
+    for counselor_id, weekdays, start_time, end_time, _, _, _ in rule_rows(ScheduleRule.objects.all(), day, day):
+        if day.isoweekday() in (weekdays or []):
+            result[counselor_id].add((start_time, end_time))
+    return result
+
+
+def by_day(start, end):
+    """规则在 [start, end] 内展开的排班 {(咨询师ID, 日期): {(开始时间, 结束时间)}}（计例外日期）"""
+    result = defaultdict(set)
+    for counselor_id, day, start_time, end_time in expand(start, end):
+        result[(counselor_id, day)].add((start_time, end_time))
+    return result
+
+
+# ==================== 压缩 ====================
+
+def compact(counselor_ids=None, min_weeks=4, dry_run=False):
+    """
+    把 Schedule 中按周重复的排班转为规则：咨询师每个星期几最常见的一天排班（完全相同的时间段组合）
+    出现不少于 min_weeks 次时，按这些日期的首尾建规则，中间没有排班的同星期几日期记为例外，
+    与规则一致的日期删除记录，其余日期保留记录作为覆盖。已有规则的咨询师跳过
+    返回 {'counselors', 'rules', 'deleted', 'kept'}
+    """
+    rows = Schedule.objects.all()
+    if counselor_ids is not None:
+        rows = rows.filter(counselor_id__in=counselor_ids)
+    rows = rows.exclude(counselor_id__in=ScheduleRule.objects.values('counselor_id'))
+
+    days = defaultdict(lambda: defaultdict(set))
+    for pk, counselor_id, day, start_time, end_time in rows.values_list(
+        'id', 'counselor_id', 'work_date', 'start_time', 'end_time'
+    ):
+        days[counselor_id][day].add((pk, start_time, end_time))
+
+    rules = []
+    deleted = []
+    kept = 0
+    compacted = set()
+    for counselor_id, by_day in days.items():
+        groups = defaultdict(list)
+        for day, items in by_day.items():
+            pattern = frozenset((start_time, end_time) for _, start_time, end_time in items)
+            groups[(day.isoweekday(), pattern)].append(day)
+
+        best = {}
+        for (weekday, pattern), dates in groups.items():
+            if len(dates) >= min_weeks and len(dates) > len(best.get(weekday, (None, []))[1]):
+                best[weekday] = (pattern, dates)
+
+        merged_rules = {}
+        for weekday, (pattern, dates) in best.items():
+            first, last = min(dates), max(dates)
+            matched = set(dates)
+            exceptions = [
+                day.isoformat() for day in expand_rule([weekday], first, last, [], first, last)
+                if day not in matched and day not in by_day
+            ]
+            for start_time, end_time in pattern:
+                key = (start_time, end_time, first, last)
+                rule = merged_rules.setdefault(key, {'weekdays': set(), 'exceptions': set()})
+                rule['weekdays'].add(weekday)
+                rule['exceptions'].update(exceptions)
+            for day in dates:
+                deleted.extend(pk for pk, _, _ in by_day[day])
+            compacted.add(counselor_id)
+
+        for (start_time, end_time, first, last), rule in merged_rules.items():
+            rules.append(ScheduleRule(
+                counselor_id=counselor_id, weekdays=sorted(rule['weekdays']), start_time=start_time,
+                end_time=end_time, start_date=first, end_date=last, exceptions=sorted(rule['exceptions']),
+                created_by='compact_schedules',
+            ))
+        kept += sum(len(items) for items in by_day.values()) - sum(
+            len(by_day[day]) for _, dates in best.values() for day in dates
+        )
+
+    if not dry_run and rules:
+        with transaction.atomic():
+            # 先建规则再删记录：删除记录时重算的可预约时段已包含规则展开的排班
+            ScheduleRule.objects.bulk_create(rules, batch_size=500)
+            invalidation.publish(NAMESPACE)
+            for index in range(0, len(deleted), 500):
+                Schedule.objects.filter(id__in=deleted[index:index + 500]).delete()
+    return {'counselors': len(compacted), 'rules': len(rules), 'deleted': len(deleted), 'kept': kept}
@@ -0,0 +1,57 @@
+"""
+信号处理
+模型数据变化时递增查找缓存的版本号，并使相关的视图缓存命名空间失效
+版本号和命名空间代数都保存在跨进程失效总线中（DjangoProject.invalidation），所有worker立即可见
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal
+
+from CounselorAdmin import lookup_cache
+from CounselorAdmin.models import AdminAuthToken, AdminUser, Counselor, Schedule, ScheduleRule
+from DjangoProject import invalidation
+from DjangoProject.cache import invalidate_namespace
+
+
+# 批量操作（bulk_create / QuerySet.update 等不触发 post_save 的操作）完成后发送，sender 为模型类
+bulk_changed = Signal()
+
+
+def bump_lookup_version(sender, **kwargs):
+    lookup_cache.bump(sender)
+
+
+# 只为查找列表依赖的模型注册，避免其他模型的 QuerySet.delete() 因存在监听器而无法走快速删除
+for _model in lookup_cache.tracked_models():
+    post_save.connect(bump_lookup_version, sender=_model, dispatch_uid=f'lookup_save_{_model._meta.label_lower}')
+    post_delete.connect(bump_lookup_version, sender=_model, dispatch_uid=f'lookup_delete_{_model._meta.label_lower}')
+    bulk_changed.connect(bump_lookup_version, sender=_model, dispatch_uid=f'lookup_bulk_{_model._meta.label_lower}')
+
+
+def invalidate_schedule_cache(sender, **kwargs):
+    # 排班列表中包含咨询师姓名，咨询师变化时同样失效
+    invalidate_namespace('schedule')
+
+
+for _model in (Schedule, ScheduleRule, Counselor):
+    post_save.connect(invalidate_schedule_cache, sender=_model, dispatch_uid=f'schedule_save_{_model._meta.label_lower}')
+    post_delete.connect(invalidate_schedule_cache, sender=_model, dispatch_uid=f'schedule_delete_{_model._meta.label_lower}')
+    bulk_changed.connect(invalidate_schedule_cache, sender=_model, dispatch_uid=f'schedule_bulk_{_model._meta.label_lower}')
+
+
+def invalidate_schedule_rules(sender, **kwargs):
+    # 各进程缓存的规则展开结果以该代数为键，递增后不再命中
+    invalidation.publish('schedule_rules')
+
+
+post_save.connect(invalidate_schedule_rules, sender=ScheduleRule, dispatch_uid='schedule_rules_save')
+post_delete.connect(invalidate_schedule_rules, sender=ScheduleRule, dispatch_uid='schedule_rules_delete')
+bulk_changed.connect(invalidate_schedule_rules, sender=ScheduleRule, dispatch_uid='schedule_rules_bulk')
+
+
+def invalidate_admin_tokens(sender, **kwargs):
+    invalidation.publish('tokens:admin')
+
+
+for _model in (AdminAuthToken, AdminUser):
+    post_save.connect(invalidate_admin_tokens, sender=_model, dispatch_uid=f'tokens_save_{_model._meta.label_lower}')
+    post_delete.connect(invalidate_admin_tokens, sender=_model, dispatch_uid=f'tokens_delete_{_model._meta.label_lower}')
@@ -1,3 +1,545 @@
-from django.test import TestCase
+import csv
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import time as clock, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.hashers import make_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.models.query import QuerySet
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from Consultant import availability, order_index, storage
+from Consultant.models import ConsultantAuthToken, ConsultationRecord, FileStorage, OrderIndex
+from CounselorAdmin import article_content, assignment, engagement, exports
+from CounselorAdmin.models import (
+    AdminAuthToken, AdminUser, Appointment, Article, AssignmentJob, Category, ChunkedUpload, Counselor, ExportJob,
+    InterviewAssessment, Schedule,
+)
+from DjangoProject import export
+
+
+def _create_counselor(index):
+    return Counselor.objects.create(
+        username=f'counselor_{index}',
+        name=f'咨询师{index}',
+        gender='女',
+        phone=f'1380000{index:04d}',
+        email=f'counselor{index}@example.com',
+        serve_type=['线下'],
+        password=make_password('password'),
+    )
+
+
+def _admin_headers():
+    admin = AdminUser.objects.create(username='admin', gender='男', password='x')
+    AdminAuthToken.objects.create(user=admin, token='admin-token')
+    return {'HTTP_X_USER_ID': str(admin.id), 'HTTP_X_AUTH_TOKEN': 'admin-token'}
+
+
+def _create_article(title='资讯', content='内容', category=None):
+    category = category or Category.objects.create(category_name='心理健康')
+    return Article.objects.create(category=category, title=title, content=content, created_by='admin')
+
+
+class ArticleEngagementTests(TestCase):
+    """资讯计数延迟写入：追加日志、读取时合并、刷新在持锁期间提交，失败时日志保持不变"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.log = os.path.join(directory, 'engagement.log')
+        settings_override = override_settings(
+            ENGAGEMENT_LOG=self.log, ENGAGEMENT_FLUSH_THRESHOLD=1000, ENGAGEMENT_FLUSH_INTERVAL=3600,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.admin_headers = _admin_headers()
+        self.article = _create_article()
+
+    def read_log(self):
+        with open(self.log, 'rb') as f:
+            return f.read()
+
+    def test_record_appends_without_touching_database(self):
+        engagement.record(self.article.id, 'read')
+        engagement.record(self.article.id, 'like')
+        engagement.record(self.article.id, 'unlike')
+
+        self.assertEqual(self.read_log().count(b'\n'), 3)
+        self.assertEqual(dict(engagement.pending()[self.article.id]), {'read_count': 1, 'like_count': 0})
+        self.article.refresh_from_db()
+        self.assertEqual((self.article.read_count, self.article.like_count), (0, 0))
+
+    def test_flush_applies_deltas_then_truncates(self):
+        other = _create_article(title='另一篇', category=self.article.category)
+        for action in ('read', 'read', 'collect'):
+            engagement.record(self.article.id, action)
+        engagement.record(other.id, 'like')
+        # 进程崩溃留下的不完整行被丢弃
+        with open(self.log, 'ab') as f:
+            f.write(b'%d read_co' % self.article.id)
+
+        self.assertEqual(engagement.flush(), 2)
+        self.assertEqual(self.read_log(), b'')
+        self.assertEqual(engagement.pending(), {})
+        self.article.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.article.read_count, self.article.collect_count, other.like_count), (2, 1, 1))
+
+    def test_reads_merge_pending_deltas(self):
+        Article.objects.filter(id=self.article.id).update(read_count=10)
+        path = '/counselor_admin/api/admin/articles/engage'
+        response = self.client.post(
+            path, {'id': self.article.id, 'action': 'read'}, content_type='application/json', **self.admin_headers,
+        )
+        self.assertEqual(response.json()['data']['read_count'], 11)
+
+        response = self.client.post(
+            '/counselor_admin/api/admin/articles/detail', {'id': self.article.id}, content_type='application/json',
+            **self.admin_headers,
+        )
+        self.assertEqual(response.json()['data']['read_count'], 11)
+
+        engagement.flush()
+        article = Article.objects.get(id=self.article.id)
+        self.assertEqual(engagement.merged_counts(article, engagement.pending([article.id]))['read_count'], 11)
+
+    def test_engage_counts_across_flush_threshold(self):
+        path = '/counselor_admin/api/admin/articles/engage'
+        counts = []
+        with override_settings(ENGAGEMENT_FLUSH_THRESHOLD=3):
+            for _ in range(4):
+                response = self.client.post(
+                    path, {'id': self.article.id, 'action': 'read'}, content_type='application/json', **self.admin_headers,
+                )
+                counts.append(response.json()['data']['read_count'])
+        # 第3次记录触发刷新，返回的计数来自刷新后的数据库
+        self.assertEqual(counts, [1, 2, 3, 4])
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.read_count, 3)
+
+    def test_failed_flush_keeps_log(self):
+        engagement.record(self.article.id, 'like')
+        content = self.read_log()
+
+        with mock.patch.object(QuerySet, 'update', side_effect=OperationalError('database is locked')):
+            with self.assertRaises(OperationalError):
+                engagement.flush()
+        self.assertEqual(self.read_log(), content)
+        self.assertEqual(dict(engagement.pending()[self.article.id]), {'like_count': 1})
+
+        self.assertEqual(engagement.flush(), 1)
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.like_count, 1)
+
+
+class ArticleContentTests(TestCase):
+    """资讯保存时渲染并过滤HTML、生成摘要，列表只查询摘要列，详情的渲染结果按更新时间缓存"""
+
+    def setUp(self):
+        settings_override = override_settings(
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.admin_headers = _admin_headers()
+
+    def post(self, name, data):
+        return self.client.post(f'/counselor_admin/api/admin/articles/{name}', data, content_type='application/json', **self.admin_headers)
+
+    def test_render_escapes_raw_html_and_filters_attributes(self):
+        article = _create_article(content=(
+            '<script>alert(1)</script>\n\n'
+            '[a](javascript:alert(1)) [b](JaVa\tscript:1) [c](https://example.com/x) ![i](data:image/png;base64,AA)\n\n'
+            'text\n{: onclick="alert(1)" class="note" }\n\n'
+            '|a|b|\n|:-|-:|\n|1|2|'
+        ))
+        content_html = article.content_html
+        self.assertIn('&lt;script&gt;alert(1)&lt;/script&gt;', content_html)
+        self.assertNotIn('<script', content_html)
+        self.assertNotIn('javascript', content_html.lower())
+        self.assertNotIn('data:', content_html)
+        self.assertNotIn('onclick', content_html)
+        self.assertIn('<a href="https://example.com/x">c</a>', content_html)
+        self.assertIn('<p class="note">text</p>', content_html)
+        self.assertIn('<th style="text-align: left;">a</th>', content_html)
+
+    def test_excerpt_is_plain_text_and_truncated(self):
+        article = _create_article(content='# 标题\n\n**加粗**和[链接](https://example.com) &amp; ' + '字' * 200)
+        self.assertTrue(article.excerpt.startswith('标题 加粗和链接 & 字'))
+        self.assertEqual(len(article.excerpt), article_content.EXCERPT_LENGTH + 1)
+        self.assertTrue(article.excerpt.endswith('…'))
+        self.assertEqual(article_content.make_excerpt('短内容'), '短内容')
+
+        # 只更新计数时不重新渲染
+        Article.objects.filter(id=article.id).update(excerpt='旧摘要')
+        article.refresh_from_db()
+        article.read_count = 1
+        article.save(update_fields=['read_count'])
+        article.refresh_from_db()
+        self.assertEqual(article.excerpt, '旧摘要')
+
+    def test_list_selects_excerpt_without_content(self):
+        _create_article(content='正文' * 100)
+        with CaptureQueriesContext(connection) as queries:
+            body = self.post('list', {}).json()
+        self.assertEqual(body['data'][0]['excerpt'], '正文' * 60 + '…')
+        self.assertNotIn('content', body['data'][0])
+        article_query = next(query['sql'] for query in queries if 'FROM "articles"' in query['sql'] and 'LIMIT' in query['sql'])
+        self.assertNotIn('"content"', article_query)
+        self.assertNotIn('"content_html"', article_query)
+
+    def test_detail_html_is_cached_by_updated_time(self):
+        article = _create_article(content='第一版')
+        self.assertEqual(self.post('detail', {'id': article.id}).json()['data']['content_html'], '<p>第一版</p>')
+
+        # 同一更新时间命中缓存，不再读取 content_html
+        Article.objects.filter(id=article.id).update(content_html='<p>未读取</p>')
+        self.assertEqual(self.post('detail', {'id': article.id}).json()['data']['content_html'], '<p>第一版</p>')
+
+        # 保存后更新时间变化，读取新的渲染结果
+        article.refresh_from_db()
+        article.content = '第二版'
+        article.save()
+        self.assertEqual(self.post('detail', {'id': article.id}).json()['data']['content_html'], '<p>第二版</p>')
+        self.assertTrue(article_content.cached_html(article).startswith('<p>第二版'))
+
+
+class ChunkedUploadTests(TestCase):
+    """分片上传：初始化、分片校验、断点续传、完成时整体校验，并发的完成请求只合并一次"""
+
+    CHUNK = 64 * 1024
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        settings_override = override_settings(UPLOAD_ROOT=directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.headers = _admin_headers()
+        self.content = os.urandom(self.CHUNK * 2 + 1000)
+
+    def post(self, name, data):
+        return self.client.post(f'/counselor_admin/api/admin/upload/{name}', data, content_type='application/json', **self.headers)
+
+    def init(self, **extra):
+        data = {'file_name': 'video.mp4', 'file_size': len(self.content), 'chunk_size': self.CHUNK}
+        data.update(extra)
+        response = self.post('init', data)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['data']
+
+    def send_chunk(self, upload_id, index, checksum=None):
+        offset = index * self.CHUNK
+        block = self.content[offset:offset + self.CHUNK]
+        data = {'upload_id': upload_id, 'offset': offset, 'chunk': SimpleUploadedFile('chunk', block)}
+        if checksum is not False:
+            data['checksum'] = checksum or hashlib.sha256(block).hexdigest()
+        return self.client.post('/counselor_admin/api/admin/upload/chunk', data, **self.headers)
+
+    def test_init_and_chunk_validation(self):
+        info = self.init()
+        self.assertEqual((info['total_chunks'], info['missing_chunks']), ('3', [0, 1, 2]))
+        self.assertEqual(os.path.getsize(os.path.join(storage.blob_dir(), 'tmp', f"{info['upload_id']}.upload")), len(self.content))
+
+        self.assertEqual(self.post('init', {'file_name': 'video.exe', 'file_size': 10}).status_code, 400)
+        self.assertEqual(self.send_chunk(info['upload_id'], 0, checksum=False).status_code, 400)
+        self.assertEqual(self.send_chunk(info['upload_id'], 0, checksum='0' * 64).status_code, 400)
+        response = self.client.post('/counselor_admin/api/admin/upload/chunk', {
+            'upload_id': info['upload_id'], 'offset': 100, 'checksum': 'x', 'chunk': SimpleUploadedFile('chunk', b'x'),
+        }, **self.headers)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(ChunkedUpload.objects.get().received_chunks, [])
+
+    def test_resume_and_complete(self):
+        info = self.init(sha256=hashlib.sha256(self.content).hexdigest())
+        upload_id = info['upload_id']
+        self.assertEqual(self.send_chunk(upload_id, 2).json()['data']['missing_chunks'], [0, 1])
+        self.send_chunk(upload_id, 0)
+
+        response = self.post('complete', {'upload_id': upload_id})
+        self.assertEqual(response.status_code, 400)
+        # 断点续传：查询缺失分片后只补传缺失的部分
+        missing = self.post('status', {'upload_id': upload_id}).json()['data']['missing_chunks']
+        self.assertEqual(missing, [1])
+        self.send_chunk(upload_id, 1)
+
+        data = self.post('complete', {'upload_id': upload_id}).json()['data']
+        self.assertEqual(data['status'], 'completed')
+        stored = FileStorage.objects.get(module='article_video')
+        self.assertEqual(data['video'], f'/static/{stored.file_path}')
+        with open(storage.absolute_path(stored.file_path), 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+        # 重复完成直接返回结果，不再合并
+        again = self.post('complete', {'upload_id': upload_id}).json()
+        self.assertEqual((again['message'], again['data']['video']), ('上传已完成', data['video']))
+        self.assertEqual(FileStorage.objects.count(), 1)
+
+    def test_complete_rejects_whole_file_mismatch(self):
+        upload_id = self.init(sha256='0' * 64)['upload_id']
+        for index in range(3):
+            self.send_chunk(upload_id, index)
+        self.assertEqual(self.post('complete', {'upload_id': upload_id}).status_code, 400)
+        upload = ChunkedUpload.objects.get()
+        self.assertEqual((upload.status, upload.received_chunks), ('uploading', []))
+        self.assertFalse(FileStorage.objects.exists())
+
+    def test_concurrent_complete_waits_for_assembler(self):
+        upload_id = self.init()['upload_id']
+        for index in range(3):
+            self.send_chunk(upload_id, index)
+        # 另一个请求已把状态改为 assembling 并正在合并
+        ChunkedUpload.objects.update(status='assembling', updated_time=timezone.now())
+        self.assertEqual(self.send_chunk(upload_id, 0).status_code, 409)
+
+        def finish(seconds):
+            ChunkedUpload.objects.update(status='completed', file_path='blobs/aa/bb/video.mp4')
+
+        with mock.patch('CounselorAdmin.views.upload.time.sleep', side_effect=finish), \
+                mock.patch.object(storage, 'save_local_file') as save:
+            response = self.post('complete', {'upload_id': upload_id})
+        save.assert_not_called()
+        self.assertEqual(response.json()['data']['video'], '/static/blobs/aa/bb/video.mp4')
+
+    def test_concurrent_complete_times_out_and_stale_claim_is_reclaimed(self):
+        upload_id = self.init()['upload_id']
+        for index in range(3):
+            self.send_chunk(upload_id, index)
+        ChunkedUpload.objects.update(status='assembling', updated_time=timezone.now())
+        with self.settings(CHUNKED_UPLOAD_COMPLETE_WAIT=0):
+            self.assertEqual(self.post('complete', {'upload_id': upload_id}).status_code, 409)
+
+        # 合并进程退出后 assembling 状态超时，可以重新完成
+        ChunkedUpload.objects.update(updated_time=timezone.now() - timedelta(hours=1))
+        self.assertEqual(self.post('complete', {'upload_id': upload_id}).json()['data']['status'], 'completed')
+
+
+class AppointmentAssignmentTests(TestCase):
+    """预约自动分配：按可预约时段、已占用时段和负载贪心分配，同步订单索引并记录指标"""
+
+    def setUp(self):
+        self.admin_headers = _admin_headers()
+        self.day = timezone.now().date() + timedelta(days=7)
+        self.counselors = [_create_counselor(index) for index in range(3)]
+        for counselor, start, end in ((self.counselors[0], 9, 12), (self.counselors[1], 9, 12), (self.counselors[2], 14, 15)):
+            Schedule.objects.create(counselor=counselor, work_date=self.day, start_time=clock(start), end_time=clock(end))
+        # 负载：咨询师0 已有一个 09:00-10:00 的预约，咨询师1 负责两个进行中的档案
+        self.create('BOOKED', '09:00-10:00', counselor=self.counselors[0])
+        for index in range(2):
+            ConsultationRecord.objects.create(
+                record_no=f'R{index}', client_name='来访者', gender='女', counselor=self.counselors[1]
+            )
+
+    def create(self, order_no, time_slot, day=None, counselor=None):
+        return Appointment.objects.create(
+            order_no=order_no, client_name='来访者', client_gender='男', appointment_date=day or self.day,
+            time_slot=time_slot, status='未开始', counselor=counselor,
+        )
+
+    def test_fit_and_demand(self):
+        self.assertEqual(assignment.fit(0b1110, availability.FULL_DAY, 2), 0b0110)
+        self.assertEqual(assignment.fit(0b1010, availability.FULL_DAY, 2), 0)
+        self.assertEqual(assignment.demand('', 540, 600), (availability.touching_bits(540, 600), 2))
+        self.assertEqual(assignment.demand('下午'), (availability.touching_bits(780, 1080), 2))
+
+    def test_run_assigns_by_availability_conflicts_and_load(self):
+        pending = [
+            self.create('A1', '09:00-10:00'),
+            self.create('A2', '上午'),
+            self.create('A3', '14:00-15:00'),
+            self.create('A4', '14:30'),
+            self.create('A5', '上午', day=self.day + timedelta(days=1)),
+        ]
+
+        metrics = assignment.run(dry_run=True)
+        self.assertEqual((metrics['total'], metrics['assigned'], metrics['written']), (5, 3, 3))
+        self.assertFalse(Appointment.objects.filter(id__in=[item.id for item in pending], counselor__isnull=False).exists())
+
+        metrics = assignment.run()
+        self.assertEqual(metrics['reasons'], {'no_free_slot': 1, 'no_schedule': 1})
+        self.assertEqual(metrics['written'], 3)
+        self.assertEqual(metrics['counselors'], 3)
+        counselors = dict(Appointment.objects.filter(order_no__startswith='A').values_list('order_no', 'counselor_id'))
+        self.assertEqual(counselors, {
+            'A1': self.counselors[1].id, 'A2': self.counselors[0].id, 'A3': self.counselors[2].id, 'A4': None, 'A5': None,
+        })
+        self.assertEqual(
+            OrderIndex.objects.get(source=order_index.APPOINTMENT, source_id=pending[0].id).counselor_id,
+            self.counselors[1].id,
+        )
+        # 已分配的订单不再参与分配
+        self.assertEqual(assignment.run()['total'], 2)
+
+    def test_assignment_job_endpoints(self):
+        self.create('A1', '10:00-11:00')
+        path = '/counselor_admin/api/admin/order/assign'
+        body = self.client.post(
+            path, {'background': False, 'end_date': self.day.isoformat()}, content_type='application/json',
+            **self.admin_headers,
+        ).json()
+        self.assertEqual((body['data']['status'], body['data']['assigned']), ('completed', '1'))
+        self.assertIn('throughput', body['data']['metrics'])
+
+        body = self.client.post(
+            f'{path}/status', {'job_id': body['data']['job_id']}, content_type='application/json', **self.admin_headers,
+        ).json()
+        self.assertEqual(body['data']['total'], '1')
+
+        response = self.client.post(path, {'start_date': '2026-13-01'}, content_type='application/json', **self.admin_headers)
+        self.assertEqual(response.status_code, 400)
+
+    def test_apply_rechecks_slots_booked_after_planning(self):
+        first = self.create('A1', '10:00-11:00')
+        second = self.create('A2', '14:00-15:00')
+        appointments, bitmaps, booked, loads = assignment.load(assignment.pending())
+        assigned, failed, counts = assignment.plan(appointments, bitmaps, booked, loads)
+        self.assertEqual(assigned, {first.id: self.counselors[0].id, second.id: self.counselors[2].id})
+
+        # 计算之后、写入之前咨询师0的 10:00-11:00 被其他订单占用
+        self.create('OTHER', '10:00-11:00', counselor=self.counselors[0])
+        self.assertEqual(assignment.apply(assigned, appointments), (1, [first.id]))
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.counselor_id, second.counselor_id), (None, self.counselors[2].id))
+
+    def test_only_one_job_runs_at_a_time(self):
+        self.create('A1', '10:00-11:00')
+        running = assignment.create_job()
+        waiting = assignment.create_job()
+        AssignmentJob.objects.filter(pk=running.pk).update(status='running')
+
+        with self.assertRaises(assignment.AssignmentBusy):
+            assignment.create_job()
+        response = self.client.post(
+            '/counselor_admin/api/admin/order/assign', {'background': False}, content_type='application/json',
+            **self.admin_headers,
+        )
+        self.assertEqual((response.status_code, response.json()['job_id']), (409, running.job_id))
+
+        job = assignment.run_job(waiting.job_id)
+        self.assertEqual(job.status, 'failed')
+        self.assertFalse(Appointment.objects.filter(order_no='A1', counselor__isnull=False).exists())
+
+        # 超时仍为 running 的任务不再阻止新任务
+        AssignmentJob.objects.filter(pk=running.pk).update(created_time=timezone.now() - timedelta(hours=2))
+        job = assignment.run_job(assignment.create_job().job_id)
+        self.assertEqual((job.status, job.assigned), ('completed', 1))
+
+
+class ExportTests(TestCase):
+    """数据导出：与列表接口相同的筛选结果，CSV流式响应、xlsx文件响应和后台任务，单元格防公式注入"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.directory = directory
+        settings_override = override_settings(EXPORT_DIR=directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.admin_headers = _admin_headers()
+        for index in range(6):
+            InterviewAssessment.objects.create(
+                student_name=f'学生{index}', grade='高一' if index % 2 else '高二', class_name='1班',
+                interview_type='=HYPERLINK("http://example.com")' if index == 1 else '初访',
+            )
+
+    def post(self, path, data):
+        return self.client.post(path, data, content_type='application/json', **self.admin_headers)
+
+    def listed_names(self, filters):
+        body = self.post('/counselor_admin/api/admin/interview/list', dict(filters, page_size=100)).json()
+        return sorted(item['std_name'] for item in body['data'])
+
+    def test_csv_matches_list_and_streams(self):
+        response = self.post('/counselor_admin/api/admin/export', {'kind': 'interviews', 'format': 'csv', 'std_grade': '高一'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], export.CONTENT_TYPES['csv'])
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8-sig'))))
+        self.assertEqual(rows[0][:2], ['ID', '姓名'])
+        self.assertEqual(sorted(row[1] for row in rows[1:]), self.listed_names({'std_grade': '高一'}))
+        # 以公式字符开头的单元格按文本导出
+        self.assertIn('\'=HYPERLINK("http://example.com")', [row[7] for row in rows[1:]])
+
+    def test_csv_rows_are_produced_lazily(self):
+        consumed = []
+
+        def rows():
+            for index in range(1200):
+                consumed.append(index)
+                yield (index, f'学生{index}')
+
+        response = export.export_response('csv', 'test', ['ID', '姓名'], rows())
+        self.assertEqual(consumed, [])
+        chunks = iter(response.streaming_content)
+        next(chunks)
+        next(chunks)
+        # 每块500行，读到第一块数据时后面的行尚未读取
+        self.assertEqual(len(consumed), 500)
+        self.assertEqual(len(list(chunks)), 2)
+
+    def test_xlsx_matches_list(self):
+        from openpyxl import load_workbook
+
+        response = self.post('/counselor_admin/api/admin/export', {'kind': 'interviews', 'format': 'xlsx', 'std_grade': '高一'})
+        self.assertEqual(response['Content-Type'], export.CONTENT_TYPES['xlsx'])
+        sheet = load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True).active
+        rows = list(sheet.iter_rows(values_only=True))
+        self.assertEqual(sheet.title, '访谈评估')
+        self.assertEqual(sorted(row[1] for row in rows[1:]), self.listed_names({'std_grade': '高一'}))
+        self.assertIn('\'=HYPERLINK("http://example.com")', [row[7] for row in rows[1:]])
+
+    def test_background_job(self):
+        with mock.patch.object(exports, 'submit', side_effect=lambda job: job) as submit:
+            body = self.post(
+                '/counselor_admin/api/admin/export', {'kind': 'interviews', 'format': 'csv', 'background': True, 'std_grade': '高二'},
+            ).json()
+        job_id = body['data']['job_id']
+        submit.assert_called_once()
+        self.assertEqual(ExportJob.objects.get(job_id=job_id).params, {'std_grade': '高二'})
+
+        response = self.post('/counselor_admin/api/admin/export/download', {'job_id': job_id})
+        self.assertEqual(response.status_code, 409)
+
+        job = exports.run_job(job_id)
+        self.assertEqual((job.status, job.row_count), ('completed', 3))
+        body = self.post('/counselor_admin/api/admin/export/status', {'job_id': job_id}).json()
+        self.assertEqual(body['data']['row_count'], '3')
+        response = self.post('/counselor_admin/api/admin/export/download', {'job_id': job_id})
+        content = b''.join(response.streaming_content).decode('utf-8-sig')
+        self.assertEqual(sorted(row[1] for row in list(csv.reader(io.StringIO(content)))[1:]), self.listed_names({'std_grade': '高二'}))
+
+    def test_export_command(self):
+        path = os.path.join(self.directory, 'interviews.csv')
+        call_command(
+            'export_data', 'interviews', '--format', 'csv', '--output', path,
+            '--filters', json.dumps({'std_grade': '高一'}), stdout=io.StringIO(),
+        )
+        with open(path, encoding='utf-8-sig') as f:
+            self.assertEqual(len(list(csv.reader(f))), 4)
+
+    def test_counselor_filter_only_for_admin_export(self):
+        counselor = _create_counselor(1)
+        ConsultantAuthToken.objects.create(counselor=counselor, token='consultant-token')
+        ConsultationRecord.objects.create(record_no='R1', client_name='来访者', gender='女', counselor=counselor)
+
+        response = self.post('/counselor_admin/api/admin/export', {'kind': 'records', 'format': 'csv', 'counselor_id': 'abc'})
+        self.assertEqual(response.status_code, 400)
+        response = self.post('/counselor_admin/api/admin/export', {'kind': 'records', 'format': 'csv', 'counselor_id': counselor.id + 1})
+        self.assertEqual(len(b''.join(response.streaming_content).decode('utf-8-sig').splitlines()), 1)
+
+        # 咨询师端列表不使用 counselor_id，无效的筛选参数返回400而不是500
+        headers = {'HTTP_X_USER_ID': str(counselor.id), 'HTTP_X_AUTH_TOKEN': 'consultant-token'}
+        path = '/consultant/api/consultant/interview/records'
+        body = self.client.post(path, {'counselor_id': 'abc'}, content_type='application/json', **headers).json()
+        self.assertEqual(body['data']['total'], 1)
+        response = self.client.post(path, {'interview_count': 'abc'}, content_type='application/json', **headers)
+        self.assertEqual(response.status_code, 400)
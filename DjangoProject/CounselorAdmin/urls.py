@@ -30,6 +30,14 @@ from CounselorAdmin.views.intervention import (
     referral_management_delete,
 )
 
+from CounselorAdmin.views.upload import (
+    # 分片上传
+    upload_init,
+    upload_chunk,
+    upload_status,
+    upload_complete,
+)
+
 from CounselorAdmin.views.education import (
     # 栏目管理
     categories_list,
@@ -43,6 +51,7 @@ from CounselorAdmin.views.education import (
     articles_detail,
     articles_update,
     articles_delete,
+    articles_engage,
     # 通知管理
     notification_list,
     notification_create,
@@ -59,6 +68,8 @@ from CounselorAdmin.views.counseling import (
     # 咨询统计
     order_list,
     order_create,
+    order_assign,
+    order_assign_status,
     # 咨询师管理
     consultants_list,
     consultants_list_profile,
@@ -67,10 +78,16 @@ from CounselorAdmin.views.counseling import (
     consultants_delete,
     consultants_status_update,
     consultants_id_name_list,
+    consultants_match,
     # 排班管理
     schedule_work_list,
     schedule_work_create,
     schedule_files_upload,
+    schedule_work_availability,
+    schedule_rule_list,
+    schedule_rule_create,
+    schedule_rule_update,
+    schedule_rule_delete,
     schedule_stop_list,
     schedule_stop_create,
     schedule_stop_update,
@@ -81,8 +98,12 @@ from CounselorAdmin.views.counseling import (
     session_create,
     session_update,
     personal_profile,
+    crisis_watchlist,
 )
 
+from CounselorAdmin.views.system import cache_stats
+from CounselorAdmin.views.export import export_data, export_status, export_download
+
 urlpatterns = [
     # ==================== 用户认证 ====================
     path('auth/register/send_code', RegisterSendCodeView.as_view()),
@@ -134,6 +155,13 @@ urlpatterns = [
     path('api/admin/articles/detail', articles_detail),  # POST
     path('api/admin/articles/update', articles_update),  # POST
     path('api/admin/articles/delete', articles_delete),  # POST
+    path('api/admin/articles/engage', articles_engage),  # POST 阅读/点赞/收藏计数
+    
+    # 分片上传（宣教视频）
+    path('api/admin/upload/init', upload_init),  # POST 初始化分片上传
+    path('api/admin/upload/chunk', upload_chunk),  # POST/PUT 上传一个分片
+    path('api/admin/upload/status', upload_status),  # POST 查询上传进度（断点续传）
+    path('api/admin/upload/complete', upload_complete),  # POST 完成上传
     
     # 通知管理
     path('api/admin/notification/list', notification_list),  # POST
@@ -151,11 +179,14 @@ urlpatterns = [
     # 咨询统计
     path('api/admin/order/list', order_list),  # POST
     path('api/admin/order/create', order_create),  # POST
+    path('api/admin/order/assign', order_assign),  # POST 自动分配未分配咨询师的预约订单（后台任务）
+    path('api/admin/order/assign/status', order_assign_status),  # POST 查询分配任务状态和指标
     
     # 咨询师管理
     path('api/admin/consultants/list', consultants_list),  # POST
     path('api/admin/consultants/list/profile', consultants_list_profile),  # POST 获取咨询师账户信息和详细信息
     path('api/admin/consultants/list/id_name', consultants_id_name_list),  # POST
+    path('api/admin/consultants/match', consultants_match),  # POST 按关键词匹配咨询师
     path('api/admin/consultants/create', consultants_create),  # POST
     path('api/admin/consultants/update', consultants_update),  # POST
     path('api/admin/consultants/delete', consultants_delete),  # POST
@@ -165,6 +196,11 @@ urlpatterns = [
     path('api/admin/schedule/work/list', schedule_work_list),  # POST
     path('api/admin/schedule/work/create', schedule_work_create),  # POST
     path('api/admin/schedule/files', schedule_files_upload),  # POST
+    path('api/admin/schedule/work/availability', schedule_work_availability),  # POST 按时间窗口查询空闲咨询师
+    path('api/admin/schedule/rule/list', schedule_rule_list),  # POST 周期排班规则
+    path('api/admin/schedule/rule/create', schedule_rule_create),  # POST
+    path('api/admin/schedule/rule/update', schedule_rule_update),  # POST
+    path('api/admin/schedule/rule/delete', schedule_rule_delete),  # POST
     path('api/admin/schedule/stop/list', schedule_stop_list),  # POST
     path('api/admin/schedule/stop/create', schedule_stop_create),  # POST
     path('api/admin/schedule/stop/update', schedule_stop_update),  # POST
@@ -176,4 +212,13 @@ urlpatterns = [
     path('api/admin/interview/records/profile/create', session_create),  # POST 新建一条咨询记录
     path('api/admin/interview/records/profile/update', session_update),  # POST 更新一条咨询记录
     path('api/admin/interview/records/personal-profile', personal_profile),  # POST 获取个人档案
+    path('api/admin/interview/records/crisis-watch', crisis_watchlist),  # POST 危机关注名单（高风险来访者）
+    
+    # ==================== 数据导出 ====================
+    path('api/admin/export', export_data),  # POST 导出CSV/Excel（数据量大时转为后台任务）
+    path('api/admin/export/status', export_status),  # POST 查询导出任务状态
+    path('api/admin/export/download', export_download),  # POST 下载导出文件
+    
+    # ==================== 系统状态 ====================
+    path('api/admin/system/cache_stats', cache_stats),  # POST 缓存命中率（当前worker进程）
 ]
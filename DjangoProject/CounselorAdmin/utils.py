@@ -6,6 +6,44 @@ from rest_framework.response import Response
 from rest_framework import status
 from django.utils.timezone import now
 from CounselorAdmin.models import AdminAuthToken
+from DjangoProject.authentication import (
+    HeaderTokenAuthentication, TokenCache, header_credentials, upload_rejection
+)
+from DjangoProject.async_views import json_response, parse_body
+
+
+# 已验证Token的进程内缓存（管理员Token或管理员信息变化时通过失效总线清除）
+_token_cache = TokenCache('tokens:admin')
+
+
+def _token_queryset(cache_key):
+    """查找该用户的活跃token"""
+    return AdminAuthToken.objects.select_related('user').filter(
+        user_id=cache_key[0],
+        token=cache_key[1],
+        is_active=True
+    )
+
+
+def _token_cache_key(user_id, token):
+    """返回 (user_id, token) 缓存键，参数无效时返回None"""
+    if not user_id or not token:
+        return None
+    try:
+        return int(user_id), str(token).strip()
+    except (ValueError, TypeError):
+        return None
+
+
+def _check_token(token_obj):
+    if not token_obj:
+        return False, None
+    
+    # 检查token是否过期
+    if token_obj.expires_at and token_obj.expires_at < now():
+        return False, None
+    
+    return True, token_obj
 
 
 def _verify_id_token(user_id, token):
@@ -19,61 +57,106 @@ def _verify_id_token(user_id, token):
     返回:
         (is_valid, token_obj): (是否有效, Token对象或None)
     """
-    if not user_id or not token:
+    cache_key = _token_cache_key(user_id, token)
+    if cache_key is None:
         return False, None
-    
-    try:
-        # 查找该用户的活跃token
-        token_obj = AdminAuthToken.objects.filter(
-            user_id=int(user_id),
-            token=str(token).strip(),
-            is_active=True
-        ).first()
-        
-        if not token_obj:
-            return False, None
-        
-        # 检查token是否过期
-        if token_obj.expires_at and token_obj.expires_at < now():
-            return False, None
-        
-        return True, token_obj
-    except (ValueError, TypeError):
+    return _check_token(_token_cache.fetch(cache_key, _token_queryset(cache_key)))
+
+
+async def _averify_id_token(user_id, token):
+    """_verify_id_token 的异步版本（异步ORM查询）"""
+    cache_key = _token_cache_key(user_id, token)
+    if cache_key is None:
         return False, None
+    return _check_token(await _token_cache.afetch(cache_key, _token_queryset(cache_key)))
+
+
+class AdminTokenAuthentication(HeaderTokenAuthentication):
+    """
+    管理员端认证：优先读取请求头 X-User-Id / X-Auth-Token，兼容请求体中的 user_id/token
+    """
+    user_id_fields = ('user_id',)
+    url_prefix = '/counselor_admin/'
+
+    def verify(self, user_id, token):
+        return _verify_id_token(user_id, token)
+
+    async def averify(self, user_id, token):
+        return await _averify_id_token(user_id, token)
+
+    def get_user(self, token_obj):
+        return token_obj.user
 
 
 def require_body_auth(view_func):
     """
-    从请求体中验证user_id和token的装饰器
-    支持JSON和multipart/form-data格式
-    所有参数都在body中，包括user_id和token
+    验证user_id和token的装饰器
+    优先使用请求头（X-User-Id、X-Auth-Token），在解析请求体之前完成认证；
+    请求头中没有凭证时从请求体读取，兼容旧客户端
+    认证由 DRF 在调用视图前完成（DEFAULT_AUTHENTICATION_CLASSES 中的 AdminTokenAuthentication），
+    这里只把未认证和上传被拒绝的请求转换为管理员端格式的响应
     注意：这个装饰器必须在@api_view之后应用，并且需要在视图中设置permission_classes=[]
     """
     @wraps(view_func)
     def wrapper(request, *args, **kwargs):
-        # 从请求体获取user_id和token
-        user_id = request.data.get('user_id')
-        token = request.data.get('token')
-        
-        if not user_id or not token:
+        # 未认证的请求不解析请求体，只读取认证时已记录的拒绝原因
+        authenticated = isinstance(request.auth, AdminAuthToken)
+        rejected = upload_rejection(request, parse=authenticated)
+        # 请求体凭证的上传超过暂存上限时停止接收，凭证可能未被读取，按413返回
+        if rejected == 'unauthenticated':
             return Response({
-                'message': '认证失败',
-                'detail': '请求体中缺少 user_id 或 token'
-            }, status=status.HTTP_401_UNAUTHORIZED)
-        
-        # 验证user_id和token
-        is_valid, token_obj = _verify_id_token(user_id, token)
-        
-        if not is_valid:
+                'code': '0',
+                'message': '上传文件较大，请在请求头中携带 X-User-Id 和 X-Auth-Token 后重试'
+            }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        if not authenticated:
             return Response({
                 'message': '认证失败',
-                'detail': '用户ID与Token不匹配或Token已过期'
+                'detail': '缺少 user_id 或 token（请求头 X-User-Id、X-Auth-Token 或请求体），或用户ID与Token不匹配、Token已过期'
             }, status=status.HTTP_401_UNAUTHORIZED)
-        
+
+        if rejected == 'quota':
+            return Response({'code': '0', 'message': '上传文件超过大小限制'}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
         # 将用户信息附加到request上，供视图函数使用
-        request.admin_user = token_obj.user
-        request.verified_user_id = int(user_id)
-        
+        request.admin_user = request.user
+
         return view_func(request, *args, **kwargs)
     return wrapper
 
+
+def async_require_body_auth(view_func):
+    """
+    require_body_auth 的异步版本，用于 @async_api_view 异步视图（不经过DRF）
+    认证失败和上传被拒绝时的响应与 require_body_auth 相同
+    """
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        if not all(header_credentials(request)):
+            # 凭证在请求体中（旧客户端），先解析请求体
+            await parse_body(request)
+            rejected = upload_rejection(request)
+            # 请求体凭证的上传超过暂存上限时停止接收，凭证可能未被读取，按413返回
+            if rejected == 'unauthenticated':
+                return json_response({
+                    'code': '0',
+                    'message': '上传文件较大，请在请求头中携带 X-User-Id 和 X-Auth-Token 后重试'
+                }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        result = await AdminTokenAuthentication().aauthenticate(request)
+        if result is None:
+            return json_response({
+                'message': '认证失败',
+                'detail': '缺少 user_id 或 token（请求头 X-User-Id、X-Auth-Token 或请求体），或用户ID与Token不匹配、Token已过期'
+            }, status=status.HTTP_401_UNAUTHORIZED)
+
+        admin_user, token_obj = result
+        await parse_body(request)
+        rejected = upload_rejection(request)
+        if rejected == 'quota':
+            return json_response({'code': '0', 'message': '上传文件超过大小限制'}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        request.admin_user = admin_user
+
+        return await view_func(request, *args, **kwargs)
+    return wrapper
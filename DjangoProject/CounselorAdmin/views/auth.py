@@ -2,11 +2,11 @@ import base64
 import io
 import secrets
 import string
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from datetime import datetime, timedelta
+from django.utils.decorators import method_decorator
 from django.utils.timezone import now
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 # 引入Django自带的Token模型
 from django.conf import settings
 from django.dispatch import receiver
@@ -17,6 +17,7 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from CounselorAdmin.models import VerificationCode, Captcha, AdminUser, AdminAuthToken
+from DjangoProject.async_views import json_response, parse_body, run_blocking
 from CounselorAdmin.Serilizers import (
     VerificationCodeSerializer,
     CaptchaSerializer,
@@ -71,6 +72,11 @@ def _send_email_code(email: str, code: str) -> bool:
     """
     使用163邮箱SMTP发送验证码
     """
+    # 只有发送验证码时使用，首次调用时才加载
+    import smtplib
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+
     try:
         # 163邮箱SMTP配置
         smtp_server = "smtp.163.com"
@@ -100,23 +106,25 @@ def _send_email_code(email: str, code: str) -> bool:
         return False
 
 
-class RegisterSendCodeView(APIView):
+@method_decorator(csrf_exempt, name='dispatch')
+class RegisterSendCodeView(View):
     """
     发送邮箱验证码接口 - 不需要鉴权
+    异步视图：SMTP发送在 smtp 线程池中执行，等待邮件服务器期间不占用 worker 线程
     """
-    permission_classes = []  # 不需要任何权限
     
-    def post(self, request):
-        email = request.data.get('email')
-        username = request.data.get('user_name') or ''
-        phone = request.data.get('phone') or ''
+    async def post(self, request):
+        data = await parse_body(request)
+        email = data.get('email')
+        username = data.get('user_name') or ''
+        phone = data.get('phone') or ''
         
         if not email:
-            return Response({'message': 'email必填'}, status=status.HTTP_400_BAD_REQUEST)
+            return json_response({'message': 'email必填'}, status=status.HTTP_400_BAD_REQUEST)
 
         code = _generate_code()
         expires = now() + timedelta(minutes=5)
-        VerificationCode.objects.create(
+        await VerificationCode.objects.acreate(
             username=username,
             email=email,
             phone=phone,
@@ -124,10 +132,10 @@ class RegisterSendCodeView(APIView):
             purpose='register',
             expires_at=expires,
         )
-        sent = _send_email_code(email, code)
+        sent = await run_blocking(_send_email_code, email, code, pool='smtp')
         if not sent:
-            return Response({'message': '验证码发送失败，请检查邮件配置'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        return Response({'message': '验证码已发送'})
+            return json_response({'message': '验证码发送失败，请检查邮件配置'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return json_response({'message': '验证码已发送'})
 
 
 # class RegisterView(APIView):
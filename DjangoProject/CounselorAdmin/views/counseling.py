@@ -6,15 +6,24 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework import status
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 from collections import defaultdict
-from django.db.models import Max
+from django.db import transaction
+from django.db.models import F
 from django.utils import timezone
 
-from CounselorAdmin.models import Appointment, Counselor, Schedule, Cancellation
+from CounselorAdmin.models import (
+    Appointment, ArchivedAppointment, AssignmentJob, Counselor, Schedule, ScheduleRule, Cancellation,
+)
 from CounselorAdmin.utils import require_body_auth
-from Consultant.models import CounselorProfile, ConsultationRecord, ConsultationSession, ConsultantAuthToken
+from CounselorAdmin import assignment, lookup_cache, schedule_rules
+from CounselorAdmin.signals import bulk_changed
+from DjangoProject.cache import cached_view
+from Consultant.models import (
+    CounselorProfile, ConsultationRecord, ConsultationSession, ConsultantAuthToken, OrderIndex,
+)
 from Consultant.serializers.record import ConsultationSessionDetailSerializer
+from Consultant import archive, availability, counters, crisis, order_index, ratings, storage, images, read_model, tags
 import json
 
 
@@ -37,21 +46,8 @@ def _convert_crisis_status_to_string(crisis_status):
 
 # ==================== 咨询统计 ====================
 
-@api_view(['POST'])
-@permission_classes([AllowAny])  # 禁用DRF默认权限检查
-@require_body_auth  # 业务逻辑中的鉴权
-def order_list(request):
-    """POST 分页查询咨询订单记录"""
-    data = request.data
-    
-    try:
-        page = int(data.get('page', 1)) if data.get('page') else 1
-        page_size = int(data.get('page_size', 10))
-    except (ValueError, TypeError):
-        return Response({'message': '分页参数错误'}, status=status.HTTP_400_BAD_REQUEST)
-    
-    queryset = Appointment.objects.all()
-    
+def _filter_orders(queryset, data):
+    """订单索引筛选条件，日期格式错误的条件忽略"""
     if data.get('name'):
         queryset = queryset.filter(client_name__icontains=data.get('name'))
     if data.get('date_start'):
@@ -67,31 +63,88 @@ def order_list(request):
         except:
             pass
     if data.get('type'):
-        queryset = queryset.filter(service_type=data.get('type'))
+        queryset = queryset.filter(service_type=order_index.normalize_service_type(data.get('type')))
     if data.get('status'):
-        queryset = queryset.filter(status=data.get('status'))
+        queryset = queryset.filter(status=order_index.normalize_status(data.get('status')))
+    return queryset
+
+
+def _serialize_appointment(item):
+    return {
+        'id': str(item.id),
+        'source': order_index.APPOINTMENT,
+        'order_id': item.order_no,
+        'name': item.client_name,
+        'gender': item.client_gender or '',
+        'age': str(item.client_age) if item.client_age else '',
+        'type': item.service_type or '',
+        'key_word': item.counseling_keywords or '',
+        'date': item.appointment_date.strftime('%Y-%m-%d') if item.appointment_date else '',
+        'time': item.time_slot or '',
+        'commit_time': item.submit_time.strftime('%Y-%m-%d %H:%M:%S') if item.submit_time else '',
+        'finish_time': item.end_time.strftime('%Y-%m-%d %H:%M:%S') if item.end_time else '',
+        'status': item.status or '未开始',  # 状态：未开始、进行中、已完成
+        'contact': item.contact or '',  # 联系方式字段
+    }
+
+
+def _serialize_consultation_order(item):
+    """咨询师端的咨询订单，字段与预约订单对齐（类型、状态转换为中文名称）"""
+    record = item.record
+    return {
+        'id': str(item.id),
+        'source': order_index.ORDER,
+        'order_id': item.order_no,
+        'name': record.client_name if record else '',
+        'gender': record.gender if record else '',
+        'age': str(record.age) if record and record.age else '',
+        'type': order_index.SERVICE_TYPE_LABELS.get(item.service_type, item.service_type or ''),
+        'key_word': ','.join(order_index.parse_keywords(item.counseling_keywords)),
+        'date': item.appointment_date.strftime('%Y-%m-%d') if item.appointment_date else '',
+        'time': item.time_slot or '',
+        'commit_time': item.submit_time.strftime('%Y-%m-%d %H:%M:%S') if item.submit_time else '',
+        'finish_time': item.end_time.strftime('%Y-%m-%d %H:%M:%S') if item.end_time else '',
+        'status': order_index.STATUS_LABELS.get(order_index.normalize_status(item.status), item.status),
+        'contact': item.contact_info or '',
+    }
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])  # 禁用DRF默认权限检查
+@require_body_auth  # 业务逻辑中的鉴权
+def order_list(request):
+    """POST 分页查询咨询订单记录"""
+    data = request.data
+    
+    try:
+        page = int(data.get('page', 1)) if data.get('page') else 1
+        page_size = int(data.get('page_size', 10))
+    except (ValueError, TypeError):
+        return Response({'message': '分页参数错误'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # source：appointment（默认，预约订单）、order（咨询师端的咨询订单）、all（两者，预约订单在前）
+    source = data.get('source') or order_index.APPOINTMENT
+    if source not in (order_index.APPOINTMENT, order_index.ORDER, 'all'):
+        return Response({'message': 'source参数错误'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # 在订单索引上筛选、计数和分页，当前页的订单再从业务表或归档表批量取出
+    queryset = OrderIndex.objects.all()
+    if source != 'all':
+        queryset = queryset.filter(source=source)
+    if not archive.wants_archived(data):
+        queryset = queryset.filter(archived=False)
+    # 已归档的订单排在业务表之后
+    queryset = _filter_orders(queryset, data).order_by('archived', 'source', 'source_id')
     
-    total = queryset.count()
     start = (page - 1) * page_size
-    items = queryset[start:start + page_size]
+    total, items = order_index.page(queryset, start, start + page_size)
     
     result_data = []
     for item in items:
-        result_data.append({
-            'id': str(item.id),
-            'order_id': item.order_no,
-            'name': item.client_name,
-            'gender': item.client_gender or '',
-            'age': str(item.client_age) if item.client_age else '',
-            'type': item.service_type or '',
-            'key_word': item.counseling_keywords or '',
-            'date': item.appointment_date.strftime('%Y-%m-%d') if item.appointment_date else '',
-            'time': item.time_slot or '',
-            'commit_time': item.submit_time.strftime('%Y-%m-%d %H:%M:%S') if item.submit_time else '',
-            'finish_time': item.end_time.strftime('%Y-%m-%d %H:%M:%S') if item.end_time else '',
-            'status': item.status or '未开始',  # 状态：未开始、进行中、已完成
-            'contact': item.contact or '',  # 联系方式字段
-        })
+        if isinstance(item, (Appointment, ArchivedAppointment)):
+            result_data.append(_serialize_appointment(item))
+        else:
+            result_data.append(_serialize_consultation_order(item))
     
     return Response({'message': '查询成功', 'total': str(total), 'data': result_data})
 
@@ -123,6 +176,64 @@ def order_create(request):
         return Response({'message': f'创建失败: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
 
 
+def _assignment_job_info(job):
+    return {
+        'job_id': job.job_id,
+        'status': job.status,
+        'params': job.params or {},
+        'total': str(job.total),
+        'assigned': str(job.assigned),
+        'metrics': job.metrics or {},
+        'error': job.error or '',
+        'created_time': job.created_time.strftime('%Y-%m-%d %H:%M:%S') if job.created_time else '',
+        'finished_time': job.finished_time.strftime('%Y-%m-%d %H:%M:%S') if job.finished_time else '',
+    }
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])  # 禁用DRF默认权限检查
+@require_body_auth  # 业务逻辑中的鉴权
+def order_assign(request):
+    """
+    POST 为未分配咨询师的预约订单自动分配咨询师（start_date/end_date 限定预约日期，默认从今天起全部）
+    创建分配任务在后台执行，通过 order/assign/status 查询进度和指标；dry_run 只计算不写入，background 为false时同步执行
+    已有分配任务正在执行时返回409
+    """
+    data = request.data
+    try:
+        start = availability.parse_date(data['start_date']) if data.get('start_date') else None
+        end = availability.parse_date(data['end_date']) if data.get('end_date') else None
+    except ValueError:
+        return Response({'message': '日期格式错误，应为YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+    if start and end and start > end:
+        return Response({'message': '开始日期不能晚于结束日期'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        job = assignment.create_job(
+            start, end,
+            dry_run=data.get('dry_run') in (True, 'true', '1', 1),
+            created_by=request.admin_user.username if hasattr(request, 'admin_user') else '',
+        )
+    except assignment.AssignmentBusy as e:
+        return Response({'message': '已有分配任务正在执行', 'job_id': str(e)}, status=status.HTTP_409_CONFLICT)
+    if data.get('background') in (False, 'false', '0', 0):
+        job = assignment.run_job(job.job_id)
+        return Response({'message': '分配完成', 'data': _assignment_job_info(job)})
+    assignment.submit(job)
+    return Response({'message': '分配任务已创建', 'data': _assignment_job_info(job)})
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])  # 禁用DRF默认权限检查
+@require_body_auth  # 业务逻辑中的鉴权
+def order_assign_status(request):
+    """POST 查询预约分配任务的状态和指标"""
+    job = AssignmentJob.objects.filter(job_id=request.data.get('job_id')).first()
+    if not job:
+        return Response({'message': '分配任务不存在'}, status=status.HTTP_404_NOT_FOUND)
+    return Response({'data': _assignment_job_info(job)})
+
+
 # ==================== 咨询师管理 ====================
 
 @api_view(['POST'])
@@ -138,7 +249,17 @@ def consultants_list(request):
     except (ValueError, TypeError):
         return Response({'message': '分页参数错误'}, status=status.HTTP_400_BAD_REQUEST)
     
-    queryset = Counselor.objects.all()
+    # 咨询师、详情和评分汇总一次JOIN查询取出，避免逐条查询详情表和聚合评价表
+    queryset = read_model.counselor_queryset().select_related('rating_summary')
+    if data.get('sort') == 'rating':
+        # 按平均分从高到低（汇总表 average_rating 有索引），没有评价的排在最后
+        queryset = queryset.order_by(
+            F('rating_summary__average_rating').desc(nulls_last=True),
+            F('rating_summary__review_count').desc(nulls_last=True),
+            'id',
+        )
+    else:
+        queryset = queryset.order_by('id')
     
     if data.get('name'):
         queryset = queryset.filter(name__icontains=data.get('name'))
@@ -153,11 +274,9 @@ def consultants_list(request):
     
     result_data = []
     for item in items:
-        # 获取咨询师详情
-        try:
-            profile = item.profile
-        except CounselorProfile.DoesNotExist:
-            profile = None
+        # 获取咨询师详情和评分汇总
+        profile = read_model.profile_of(item)
+        rating = ratings.summary_of(item)
         
         # 构建返回数据
         result_item = {
@@ -172,6 +291,8 @@ def consultants_list(request):
             'education': profile.education if profile else '',
             'skilled_filed': profile.skilled_filed if profile else '',
             'consultation_count': profile.consultation_count if profile else 0,
+            'rating': round(rating.average_rating, 2) if rating else 0,
+            'review_count': rating.review_count if rating else 0,
             'created_time': profile.created_time.strftime('%Y-%m-%d %H:%M:%S') if profile and profile.created_time else '',
             'serve_type': item.serve_type if item.serve_type else [],
             'status': item.status or '启用',
@@ -193,7 +314,7 @@ def consultants_list_profile(request):
         return Response({'message': '缺少id参数'}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        counselor = Counselor.objects.get(id=counselor_id)
+        counselor = read_model.get_counselor(counselor_id)
         
         # 获取咨询师的活跃token
         active_token = ConsultantAuthToken.objects.filter(
@@ -204,10 +325,7 @@ def consultants_list_profile(request):
         token_value = active_token.token if active_token else ''
         
         # 获取咨询师详情
-        try:
-            profile = counselor.profile
-        except CounselorProfile.DoesNotExist:
-            profile = None
+        profile = read_model.profile_of(counselor)
         
         # 构建返回数据
         result = {
@@ -216,6 +334,7 @@ def consultants_list_profile(request):
             'id': str(counselor.id),
             'data': {
                 'avatar': profile.avatar if profile and profile.avatar else '',
+                'avatar_variants': images.variant_urls(profile.avatar) if profile and profile.avatar else {},
                 'graduated_school': profile.graduated_school if profile else '',
                 'address': profile.address if profile else '',
                 'profession': profile.profession if profile else '',
@@ -270,7 +389,6 @@ def consultants_create(request):
             introduction=data.get('introduction', ''),
             education=data.get('education', ''),
             skilled_filed=data.get('skilled_filed', ''),
-            consultation_count=data.get('consultation_count', 0),
         )
         
         return Response({'id': str(obj.id), 'message': '创建成功'})
@@ -290,7 +408,7 @@ def consultants_update(request):
         return Response({'message': '缺少id参数'}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        obj = Counselor.objects.get(id=counselor_id)
+        obj = read_model.get_counselor(counselor_id)
         
         # 更新咨询师基本信息
         if 'name' in data:
@@ -310,11 +428,8 @@ def consultants_update(request):
         
         obj.save()
         
-        # 更新或创建咨询师详情
-        profile, created = CounselorProfile.objects.get_or_create(
-            counselor=obj,
-            defaults={'name': obj.name}
-        )
+        # 更新或创建咨询师详情（详情已随咨询师一起查出）
+        profile = read_model.profile_of(obj) or CounselorProfile(counselor=obj, name=obj.name)
         
         if 'name' in data:
             profile.name = data.get('name')
@@ -334,10 +449,9 @@ def consultants_update(request):
             profile.education = data.get('education', '')
         if 'skilled_filed' in data:
             profile.skilled_filed = data.get('skilled_filed', '')
-        if 'consultation_count' in data:
-            profile.consultation_count = data.get('consultation_count', 0)
         
-        profile.save()
+        # consultation_count 由访谈记录维护，不接受修改，更新时也不写回（避免覆盖并发的计数更新）
+        profile.save(update_fields=counters.PROFILE_EDITABLE_FIELDS if profile.pk else None)
         
         return Response({})
     except Counselor.DoesNotExist:
@@ -350,15 +464,8 @@ def consultants_update(request):
 @permission_classes([AllowAny])  # 禁用DRF默认权限检查
 @require_body_auth  # 业务逻辑中的鉴权
 def consultants_id_name_list(request):
-    """POST 查询所有咨询师的id和名字"""
-    counselors = Counselor.objects.all().order_by('id')
-    result_data = []
-    for counselor in counselors:
-        result_data.append({
-            'id': str(counselor.id),
-            'name': counselor.name,
-        })
-    return Response({'data': result_data})
+    """POST 查询所有咨询师的id和名字（带版本缓存和ETag）"""
+    return lookup_cache.response(request, 'consultants_id_name')
 
 
 @api_view(['POST'])
@@ -393,16 +500,58 @@ def consultants_status_update(request):
     
     try:
         Counselor.objects.filter(id=counselor_id).update(status=new_status)
+        # update 不触发 post_save，通知各worker清除缓存的咨询师信息
+        bulk_changed.send(sender=Counselor)
         return Response({})
     except Exception as e:
         return Response({'message': f'更新失败: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST'])
+@permission_classes([AllowAny])  # 禁用DRF默认权限检查
+@require_body_auth  # 业务逻辑中的鉴权
+def consultants_match(request):
+    """POST 按咨询关键词（和咨询方式）匹配启用的咨询师，返回匹配度最高的前k个"""
+    data = request.data
+    keywords = data.get('keywords')
+    
+    if not keywords:
+        return Response({'message': '缺少keywords参数'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        k = int(data.get('k', 10))
+    except (ValueError, TypeError):
+        return Response({'message': 'k参数错误'}, status=status.HTTP_400_BAD_REQUEST)
+    if not 0 < k <= 100:
+        return Response({'message': 'k必须在1到100之间'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # 在标签关联表上计算匹配度，只取出前k个咨询师的资料
+    matches = tags.match(keywords, data.get('type'), k)
+    counselors = read_model.counselor_queryset().in_bulk([item['counselor_id'] for item in matches])
+    
+    result_data = []
+    for item in matches:
+        counselor = counselors.get(item['counselor_id'])
+        if counselor is None:
+            continue
+        profile = read_model.profile_of(counselor)
+        result_data.append({
+            'id': str(counselor.id),
+            'name': profile.name if profile else counselor.name,
+            'score': item['score'],
+            'similarity': item['similarity'],
+            'matched': item['matched'],
+            'expertise': profile.expertise if profile and profile.expertise else [],
+            'serve_type': counselor.serve_type if counselor.serve_type else [],
+        })
+    
+    return Response({'total': str(len(result_data)), 'data': result_data})
+
 # ==================== 排班管理 ====================
 
 @api_view(['POST'])
 @permission_classes([AllowAny])  # 禁用DRF默认权限检查
 @require_body_auth  # 业务逻辑中的鉴权
+@cached_view('schedule', timeout=300, vary_on=['year', 'month'])
 def schedule_work_list(request):
     """POST 按年月份获取排班管理信息"""
     data = request.data
@@ -416,32 +565,30 @@ def schedule_work_list(request):
     # 获取该月的所有日期
     from calendar import monthrange
     _, last_day = monthrange(year, month)
+    first_date = date(year, month, 1)
+    last_date = date(year, month, last_day)
     
-    result_data = []
+    # 排班记录加上周期规则展开的排班（咨询师当天有记录时以记录为准），一次查询取出整月
+    merged = schedule_rules.merged(first_date, last_date)
+    names = dict(Counselor.objects.filter(id__in={key[0] for key in merged}).values_list('id', 'name'))
     
+    by_date = defaultdict(list)
+    for (counselor_id, work_date), (ranges, from_rule) in sorted(merged.items(), key=lambda item: (item[0][1], item[0][0])):
+        if counselor_id not in names:
+            continue
+        by_date[work_date].append({
+            'id': str(counselor_id),
+            'name': names[counselor_id],
+            'work_time': [f"{start.strftime('%H:%M')}-{end.strftime('%H:%M')}" for start, end in ranges],
+            'from_rule': from_rule,
+        })
+    
+    result_data = []
     for day in range(1, last_day + 1):
         work_date = date(year, month, day)
-        schedules = Schedule.objects.filter(work_date=work_date)
-        
-        schedules_dict = {}
-        for schedule in schedules:
-            counselor_id = str(schedule.counselor.id)
-            counselor_name = schedule.counselor.name
-            
-            if counselor_id not in schedules_dict:
-                schedules_dict[counselor_id] = {
-                    'id': counselor_id,
-                    'name': counselor_name,
-                    'work_time': []
-                }
-            
-            time_str = f"{schedule.start_time.strftime('%H:%M')}-{schedule.end_time.strftime('%H:%M')}"
-            if time_str not in schedules_dict[counselor_id]['work_time']:
-                schedules_dict[counselor_id]['work_time'].append(time_str)
-        
         result_data.append({
             'date': work_date.strftime('%Y-%m-%d'),
-            'schedules': list(schedules_dict.values())
+            'schedules': by_date.get(work_date, [])
         })
     
     return Response({'data': result_data})
@@ -451,7 +598,11 @@ def schedule_work_list(request):
 @permission_classes([AllowAny])  # 禁用DRF默认权限检查
 @require_body_auth  # 业务逻辑中的鉴权
 def schedule_work_create(request):
-    """POST 给单个日期添加/修改排班（覆盖修改）"""
+    """
+    POST 给单个日期添加/修改排班（覆盖修改）
+    与咨询师当天生效的周期规则一致的排班不写入记录（由规则展开），不一致时写入记录覆盖规则；
+    有规则但未提交的咨询师把该日期记为规则的例外日期
+    """
     data = request.data
     
     try:
@@ -461,18 +612,10 @@ def schedule_work_create(request):
         work_date = date(year, month, day)
         
         schedules_list = data.get('schedules', [])
-        
-        # 先删除该日期的所有排班记录（覆盖修改）
-        # 如果 schedules 为空数组，则只删除不创建，相当于清空该日期的排班信息
-        Schedule.objects.filter(work_date=work_date).delete()
-        
-        # 如果 schedules 为空，直接返回（清空操作完成）
-        if not schedules_list:
-            return Response({})
-        
-        # 创建新的排班记录
         created_by = request.admin_user.username if hasattr(request, 'admin_user') else ''
         
+        # 解析提交的排班：咨询师 -> 时间段集合
+        submitted = {}
         for schedule_item in schedules_list:
             counselor_id = schedule_item.get('id')
             counselor_name = schedule_item.get('name')
@@ -491,7 +634,7 @@ def schedule_work_create(request):
             else:
                 continue
             
-            # 为每个工作时间段创建排班记录
+            ranges = submitted.setdefault(counselor.id, set())
             for work_time_str in work_time_list:
                 try:
                     # 解析时间格式 "09:00-17:00"
@@ -499,22 +642,74 @@ def schedule_work_create(request):
                         start_str, end_str = work_time_str.split('-')
                         start_time = datetime.strptime(start_str.strip(), '%H:%M').time()
                         end_time = datetime.strptime(end_str.strip(), '%H:%M').time()
-                        
-                        Schedule.objects.create(
-                            counselor=counselor,
-                            work_date=work_date,
-                            start_time=start_time,
-                            end_time=end_time,
-                            created_by=created_by,
-                        )
+                        ranges.add((start_time, end_time))
                 except (ValueError, AttributeError):
                     continue
         
+        with transaction.atomic():
+            # 先删除该日期的所有排班记录（覆盖修改）
+            # 如果 schedules 为空数组，则只删除不创建，相当于清空该日期的排班信息
+            Schedule.objects.filter(work_date=work_date).delete()
+            
+            rule_ranges = schedule_rules.rule_ranges_on(work_date)
+            for counselor_id in rule_ranges.keys() - {key for key, ranges in submitted.items() if ranges}:
+                schedule_rules.set_exception(counselor_id, work_date, True)
+            
+            for counselor_id, ranges in submitted.items():
+                if ranges and ranges == rule_ranges.get(counselor_id):
+                    # 与规则一致：不写记录，确保该日期不在规则的例外日期中
+                    schedule_rules.set_exception(counselor_id, work_date, False)
+                    continue
+                # 为每个工作时间段创建排班记录
+                for start_time, end_time in sorted(ranges):
+                    Schedule.objects.create(
+                        counselor_id=counselor_id,
+                        work_date=work_date,
+                        start_time=start_time,
+                        end_time=end_time,
+                        created_by=created_by,
+                    )
+        
         return Response({})
     except Exception as e:
         return Response({'message': f'创建失败: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
 
 
+def _merge_with_rules(to_create, created_by):
+    """导入的排班记录与周期规则合并，返回需要写入的记录"""
+    first = min(item.work_date for item in to_create)
+    last = max(item.work_date for item in to_create)
+    rule_ranges = schedule_rules.by_day(first, last)
+    if not rule_ranges:
+        return to_create
+    explicit = set(
+        Schedule.objects.filter(work_date__gte=first, work_date__lte=last)
+        .values_list('counselor_id', 'work_date').distinct()
+    )
+    
+    groups = defaultdict(list)
+    for item in to_create:
+        groups[(item.counselor_id, item.work_date)].append(item)
+    
+    result = []
+    for key, items in groups.items():
+        ranges = rule_ranges.get(key)
+        if not ranges or key in explicit:
+            result.extend(items)
+            continue
+        uploaded = {(item.start_time, item.end_time) for item in items}
+        if uploaded <= ranges:
+            continue
+        counselor_id, work_date = key
+        result.extend(items)
+        result.extend(
+            Schedule(counselor_id=counselor_id, work_date=work_date, start_time=start_time, end_time=end_time,
+                     created_by=created_by)
+            for start_time, end_time in sorted(ranges - uploaded)
+        )
+    return result
+
+
 @api_view(['POST'])
 @permission_classes([AllowAny])  # 禁用DRF默认权限检查
 @require_body_auth  # 业务逻辑中的鉴权
@@ -607,7 +802,6 @@ def schedule_files_upload(request):
             df = df.rename(columns={end_cols[0]: 'end_time'})
         
         # 批量创建记录
-        success_count = 0
         error_rows = []
         to_create = []
         created_by = request.admin_user.username if hasattr(request, 'admin_user') else ''
@@ -708,10 +902,18 @@ def schedule_files_upload(request):
             except Exception as e:
                 error_rows.append({'row': index + 2, 'error': f'第{index + 2}行数据错误: {str(e)}'})
         
+        # 与周期规则合并：没有排班记录的日期上，已由规则产生的时间段不再写入；
+        # 需要新增时间段时连同规则的时间段一起写入（记录会覆盖当天的规则）
+        success_count = len(to_create)
+        if to_create:
+            to_create = _merge_with_rules(to_create, created_by)
+        
         # 批量入库
         if to_create:
             Schedule.objects.bulk_create(to_create, batch_size=500, ignore_conflicts=True)
-            success_count = len(to_create)
+            # bulk_create 不触发 post_save，手动通知缓存失效并重算导入日期的可预约时段
+            bulk_changed.send(sender=Schedule)
+            availability.refresh_many({(item.counselor_id, item.work_date) for item in to_create})
         
         # 返回结果
         result = {
@@ -730,6 +932,226 @@ def schedule_files_upload(request):
         return Response({'message': f'导入失败: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST'])
+@permission_classes([AllowAny])  # 禁用DRF默认权限检查
+@require_body_auth  # 业务逻辑中的鉴权
+def schedule_work_availability(request):
+    """
+    POST 查询全部启用的咨询师在一段日期内某个时间窗口是否空闲（排班覆盖且不在停诊时间内）
+    如"未来8周每周二 14:00-15:00"：start_date、weeks=8、weekdays=[2]、start_time、end_time；
+    mode=all（默认）返回每个日期都空闲的咨询师，mode=any 返回至少一个日期空闲的咨询师
+    """
+    data = request.data
+    
+    try:
+        start_date = availability.parse_date(data['start_date']) if data.get('start_date') else timezone.now().date()
+        if data.get('end_date'):
+            end_date = availability.parse_date(data['end_date'])
+        else:
+            end_date = start_date + timedelta(weeks=int(data.get('weeks', 4))) - timedelta(days=1)
+        weekdays = {int(day) for day in data.get('weekdays') or []}
+        window_start = datetime.strptime(str(data.get('start_time', '')).strip(), '%H:%M').time()
+        window_end = datetime.strptime(str(data.get('end_time', '')).strip(), '%H:%M').time()
+    except (ValueError, TypeError):
+        return Response({'message': '日期或时间参数错误'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    start_minute = window_start.hour * 60 + window_start.minute
+    end_minute = window_end.hour * 60 + window_end.minute
+    if start_minute >= end_minute:
+        return Response({'message': '开始时间必须早于结束时间'}, status=status.HTTP_400_BAD_REQUEST)
+    if not start_date <= end_date <= start_date + timedelta(days=366):
+        return Response({'message': '日期范围错误（最长一年）'}, status=status.HTTP_400_BAD_REQUEST)
+    mode = data.get('mode', 'all')
+    if mode not in ('all', 'any'):
+        return Response({'message': 'mode只能为all或any'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    days = availability.dates_between(start_date, end_date, weekdays)
+    if not days:
+        return Response({'dates': [], 'coverage': [], 'total': '0', 'data': []})
+    
+    # 一次查询取出全部启用咨询师在这些日期的位图，按位与判断时间窗口，再按日期做与/或
+    counselor_ids, bitmaps = availability.matrix(
+        days, list(Counselor.objects.filter(status='启用').order_by('id').values_list('id', flat=True))
+    )
+    free = availability.free(bitmaps, start_minute, end_minute)
+    selected = free.all(axis=1) if mode == 'all' else free.any(axis=1)
+    free_days = free.sum(axis=1)
+    
+    names = dict(Counselor.objects.filter(id__in=counselor_ids[selected].tolist()).values_list('id', 'name'))
+    result_data = []
+    for index in sorted(selected.nonzero()[0], key=lambda index: (-free_days[index], counselor_ids[index])):
+        counselor_id = int(counselor_ids[index])
+        result_data.append({
+            'id': str(counselor_id),
+            'name': names.get(counselor_id, ''),
+            'free_days': int(free_days[index]),
+            'all_free': bool(free[index].all()),
+            'dates': [day.strftime('%Y-%m-%d') for day, is_free in zip(days, free[index]) if is_free],
+        })
+    
+    return Response({
+        'dates': [day.strftime('%Y-%m-%d') for day in days],
+        # 每个日期空闲的咨询师人数
+        'coverage': [int(count) for count in free.sum(axis=0)],
+        'total': str(len(result_data)),
+        'data': result_data,
+    })
+
+
+def _serialize_schedule_rule(rule):
+    return {
+        'id': str(rule.id),
+        'consultant_id': str(rule.counselor_id),
+        'name': rule.counselor.name,
+        'weekdays': rule.weekdays or [],
+        'start_time': rule.start_time.strftime('%H:%M'),
+        'end_time': rule.end_time.strftime('%H:%M'),
+        'start_date': rule.start_date.strftime('%Y-%m-%d'),
+        'end_date': rule.end_date.strftime('%Y-%m-%d') if rule.end_date else '',
+        'exceptions': rule.exceptions or [],
+        'create_time': rule.created_time.strftime('%Y-%m-%d %H:%M') if rule.created_time else '',
+    }
+
+
+def _apply_schedule_rule_fields(rule, data):
+    """把请求中的规则字段写入 rule（不保存），参数错误时返回错误信息"""
+    if 'weekdays' in data:
+        try:
+            rule.weekdays = schedule_rules.parse_weekdays(data.get('weekdays'))
+        except (ValueError, TypeError):
+            return 'weekdays应为1-7的数组'
+    for field in ('start_time', 'end_time'):
+        if field in data:
+            try:
+                setattr(rule, field, datetime.strptime(str(data.get(field)).strip(), '%H:%M').time())
+            except ValueError:
+                return f'{field}格式错误'
+    for field in ('start_date', 'end_date'):
+        if field in data:
+            value = data.get(field)
+            if field == 'end_date' and not value:
+                rule.end_date = None
+                continue
+            try:
+                setattr(rule, field, availability.parse_date(value))
+            except ValueError:
+                return f'{field}格式错误'
+    if 'exceptions' in data:
+        try:
+            rule.exceptions = schedule_rules.parse_exceptions(data.get('exceptions'))
+        except (ValueError, TypeError):
+            return 'exceptions格式错误'
+    
+    if not rule.weekdays or rule.start_time is None or rule.end_time is None or rule.start_date is None:
+        return 'weekdays、start_time、end_time、start_date参数不能为空'
+    if rule.start_time >= rule.end_time:
+        return '开始时间必须早于结束时间'
+    if rule.end_date and rule.end_date < rule.start_date:
+        return '失效日期不能早于生效日期'
+    return None
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])  # 禁用DRF默认权限检查
+@require_body_auth  # 业务逻辑中的鉴权
+def schedule_rule_list(request):
+    """POST 分页查询周期排班规则"""
+    data = request.data
+    
+    try:
+        page = int(data.get('page', 1)) if data.get('page') else 1
+        page_size = int(data.get('page_size', 10))
+    except (ValueError, TypeError):
+        return Response({'message': '分页参数错误'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    queryset = ScheduleRule.objects.select_related('counselor').order_by('-created_time')
+    if str(data.get('consultant_id') or '').isdigit():
+        queryset = queryset.filter(counselor_id=int(data.get('consultant_id')))
+    if data.get('name'):
+        queryset = queryset.filter(counselor__name__icontains=data.get('name'))
+    
+    total = queryset.count()
+    start = (page - 1) * page_size
+    result_data = [_serialize_schedule_rule(item) for item in queryset[start:start + page_size]]
+    
+    return Response({'total': str(total), 'data': result_data})
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])  # 禁用DRF默认权限检查
+@require_body_auth  # 业务逻辑中的鉴权
+def schedule_rule_create(request):
+    """
+    POST 新建周期排班规则：每周 weekdays（1-7）的 start_time-end_time，从 start_date 到 end_date（为空表示长期有效），
+    exceptions 中的日期不排班；咨询师某天已有排班记录时以记录为准
+    """
+    data = request.data
+    
+    consultant_id = data.get('consultant_id')
+    name = data.get('name')
+    if consultant_id:
+        try:
+            counselor = Counselor.objects.get(id=int(consultant_id))
+        except (Counselor.DoesNotExist, ValueError):
+            return Response({'message': '咨询师不存在'}, status=status.HTTP_400_BAD_REQUEST)
+    elif name:
+        counselor = Counselor.objects.filter(name=name).first()
+        if not counselor:
+            return Response({'message': '咨询师不存在'}, status=status.HTTP_400_BAD_REQUEST)
+    else:
+        return Response({'message': 'consultant_id或name参数至少需要一个'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    rule = ScheduleRule(
+        counselor=counselor,
+        start_time=None,
+        end_time=None,
+        start_date=None,
+        created_by=request.admin_user.username if hasattr(request, 'admin_user') else '',
+    )
+    error = _apply_schedule_rule_fields(rule, data)
+    if error:
+        return Response({'message': error}, status=status.HTTP_400_BAD_REQUEST)
+    
+    rule.save()
+    return Response({'message': '创建成功', 'data': _serialize_schedule_rule(rule)})
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])  # 禁用DRF默认权限检查
+@require_body_auth  # 业务逻辑中的鉴权
+def schedule_rule_update(request):
+    """POST 修改周期排班规则（只修改请求中给出的字段）"""
+    data = request.data
+    
+    try:
+        rule = ScheduleRule.objects.select_related('counselor').get(id=int(data.get('id')))
+    except (ScheduleRule.DoesNotExist, ValueError, TypeError):
+        return Response({'message': '排班规则不存在'}, status=status.HTTP_404_NOT_FOUND)
+    
+    error = _apply_schedule_rule_fields(rule, data)
+    if error:
+        return Response({'message': error}, status=status.HTTP_400_BAD_REQUEST)
+    
+    rule.save()
+    return Response({'message': '更新成功', 'data': _serialize_schedule_rule(rule)})
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])  # 禁用DRF默认权限检查
+@require_body_auth  # 业务逻辑中的鉴权
+def schedule_rule_delete(request):
+    """POST 删除周期排班规则（已展开的日期不再排班，排班记录不受影响）"""
+    data = request.data
+    
+    try:
+        rule = ScheduleRule.objects.get(id=int(data.get('id')))
+    except (ScheduleRule.DoesNotExist, ValueError, TypeError):
+        return Response({'message': '排班规则不存在'}, status=status.HTTP_404_NOT_FOUND)
+    
+    rule.delete()
+    return Response({'message': '删除成功'})
+
+
 @api_view(['POST'])
 @permission_classes([AllowAny])  # 禁用DRF默认权限检查
 @require_body_auth  # 业务逻辑中的鉴权
@@ -1020,8 +1442,8 @@ def record_profile(request):
         }, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        # 管理员可以查看所有档案
-        record = ConsultationRecord.objects.get(id=record_id)
+        # 管理员可以查看所有档案（include_archived 时也查找已归档的档案）
+        record = archive.get_record(archive.wants_archived(request.data), id=record_id)
         sessions = record.sessions.all().order_by('session_number')
         
         serializer = ConsultationSessionDetailSerializer(sessions, many=True)
@@ -1048,8 +1470,6 @@ def session_create(request):
     支持 JSON 和 form-data 两种格式
     """
     import os
-    import time
-    from django.conf import settings
     
     # 支持 form-data 和 JSON 两种格式
     # 如果是 form-data，需要从 request.data 中获取文本字段，从 request.FILES 中获取文件
@@ -1090,69 +1510,37 @@ def session_create(request):
     try:
         record = ConsultationRecord.objects.get(id=record_id)
         
-        # 获取下一个会话编号
-        max_session = record.sessions.aggregate(Max('session_number'))
-        next_number = (max_session['session_number__max'] or 0) + 1
-        
         # 处理签名图片文件上传
         signature_image = ''
         if 'signatureImage' in request.FILES:
             uploaded_file = request.FILES['signatureImage']
             # 检查文件类型（图片格式）
-            allowed_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
             file_ext = os.path.splitext(uploaded_file.name)[1].lower()
-            if file_ext not in allowed_extensions:
+            if file_ext not in storage.IMAGE_EXTENSIONS:
                 return Response({
                     'code': 400,
                     'message': '签名图片格式不支持，请上传jpg、png、gif、bmp或webp格式的图片'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            # 确保目录存在
-            signature_dir = os.path.join(settings.BASE_DIR, 'static', 'session_signature')
-            os.makedirs(signature_dir, exist_ok=True)
-            
-            # 生成唯一文件名
-            timestamp = int(time.time() * 1000)
-            file_name = f"signature_{record_id}_{timestamp}{file_ext}"
-            
-            # 保存文件
-            file_path = os.path.join(signature_dir, file_name)
-            with open(file_path, 'wb+') as destination:
-                for chunk in uploaded_file.chunks():
-                    destination.write(chunk)
-            
-            # 保存相对路径到数据库（相对于static目录）
-            signature_image = f"session_signature/{file_name}"
+            # 保存文件（按内容哈希去重存储），保存相对路径到数据库（相对于static目录）
+            stored = storage.save_upload(uploaded_file, 'session_signature', associated_id=record.id)
+            signature_image = stored.file_path
         
         # 处理附加图片文件上传（支持多个文件）
         attach_images = []
         if 'attachImages' in request.FILES:
             uploaded_files = request.FILES.getlist('attachImages')
             
-            # 确保目录存在
-            attach_dir = os.path.join(settings.BASE_DIR, 'static', 'session_attach')
-            os.makedirs(attach_dir, exist_ok=True)
-            
-            for index, uploaded_file in enumerate(uploaded_files):
+            for uploaded_file in uploaded_files:
                 # 检查文件类型（图片格式）
-                allowed_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
                 file_ext = os.path.splitext(uploaded_file.name)[1].lower()
-                if file_ext not in allowed_extensions:
+                if file_ext not in storage.IMAGE_EXTENSIONS:
                     # 如果格式不支持，跳过这个文件
                     continue
                 
-                # 生成唯一文件名
-                timestamp = int(time.time() * 1000)
-                file_name = f"attach_{record_id}_{timestamp}_{index + 1}{file_ext}"
-                
-                # 保存文件
-                file_path = os.path.join(attach_dir, file_name)
-                with open(file_path, 'wb+') as destination:
-                    for chunk in uploaded_file.chunks():
-                        destination.write(chunk)
-                
-            # 保存相对路径（相对于static目录）
-            attach_images.append(f"session_attach/{file_name}")
+                # 保存文件并记录相对路径（相对于static目录）
+                stored = storage.save_upload(uploaded_file, 'session_attach', associated_id=record.id)
+                attach_images.append(stored.file_path)
         elif 'attachImages' in data:
             # 如果只是数组路径，直接使用
             attach_images = data.get('attachImages', [])
@@ -1193,29 +1581,27 @@ def session_create(request):
             else:
                 is_third_party = bool(is_third_party_value)
         
-        # 创建会话
-        session = ConsultationSession.objects.create(
-            record=record,
-            session_number=next_number,
-            interview_date=interview_date,
-            interview_time=data.get('time', ''),
-            duration=duration,
-            visit_status=data.get('visitStatus', 'scheduled'),
-            objective_description=data.get('description', ''),
-            doctor_evaluation=data.get('doctorEvaluation', ''),
-            follow_up_plan=data.get('followUpPlan', ''),
-            next_visit_plan=data.get('nextVisitPlan', ''),
-            crisis_status=_convert_crisis_status_to_string(data.get('crisisStatus', [])),
-            consultant_name=data.get('consultantName', ''),
-            is_third_party_evaluation=is_third_party,
-            signature_image=signature_image or data.get('signatureImage', ''),
-            attach_images=attach_images,
-            created_by=record.counselor  # 使用档案的咨询师作为创建人
-        )
-        
-        # 更新档案的访谈次数
-        record.interview_count = next_number
-        record.save(update_fields=['interview_count'])
+        # 创建会话：在同一事务中原子分配会话编号（同时更新档案访谈次数和咨询师访谈总数）
+        with transaction.atomic():
+            next_number = counters.allocate_session_numbers(record.id)[0]
+            session = ConsultationSession.objects.create(
+                record=record,
+                session_number=next_number,
+                interview_date=interview_date,
+                interview_time=data.get('time', ''),
+                duration=duration,
+                visit_status=data.get('visitStatus', 'scheduled'),
+                objective_description=data.get('description', ''),
+                doctor_evaluation=data.get('doctorEvaluation', ''),
+                follow_up_plan=data.get('followUpPlan', ''),
+                next_visit_plan=data.get('nextVisitPlan', ''),
+                crisis_status=_convert_crisis_status_to_string(data.get('crisisStatus', [])),
+                consultant_name=data.get('consultantName', ''),
+                is_third_party_evaluation=is_third_party,
+                signature_image=signature_image or data.get('signatureImage', ''),
+                attach_images=attach_images,
+                created_by=record.counselor  # 使用档案的咨询师作为创建人
+            )
         
         return Response({
             'code': '0',
@@ -1264,9 +1650,7 @@ def session_update(request):
     
     try:
         import os
-        import time
         import json
-        from django.conf import settings
         
         session = ConsultationSession.objects.get(id=session_id)
         
@@ -1310,86 +1694,44 @@ def session_update(request):
         
         # 处理签名图片文件上传（如果上传了新文件）
         if 'signatureImage' in request.FILES:
-            # 删除旧文件（如果存在）
-            if session.signature_image:
-                old_file_path = os.path.join(settings.BASE_DIR, 'static', session.signature_image)
-                if os.path.exists(old_file_path):
-                    try:
-                        os.remove(old_file_path)
-                    except Exception:
-                        pass  # 如果删除失败，继续处理新文件
-            
             # 处理新文件上传
             uploaded_file = request.FILES['signatureImage']
             # 检查文件类型（图片格式）
-            allowed_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
             file_ext = os.path.splitext(uploaded_file.name)[1].lower()
-            if file_ext not in allowed_extensions:
+            if file_ext not in storage.IMAGE_EXTENSIONS:
                 return Response({
                     'code': 400,
                     'message': '签名图片格式不支持，请上传jpg、png、gif、bmp或webp格式的图片'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            # 确保目录存在
-            signature_dir = os.path.join(settings.BASE_DIR, 'static', 'session_signature')
-            os.makedirs(signature_dir, exist_ok=True)
-            
-            # 生成唯一文件名
-            timestamp = int(time.time() * 1000)
-            record_id = session.record.id
-            file_name = f"signature_{record_id}_{timestamp}{file_ext}"
-            
-            # 保存文件
-            file_path = os.path.join(signature_dir, file_name)
-            with open(file_path, 'wb+') as destination:
-                for chunk in uploaded_file.chunks():
-                    destination.write(chunk)
+            # 释放旧文件引用（磁盘文件可能被其他记录共享，由 gc_storage 统一回收）
+            if session.signature_image:
+                storage.release(session.signature_image, module='session_signature', associated_id=session.record_id)
             
-            # 更新相对路径到数据库（相对于static目录）
-            session.signature_image = f"session_signature/{file_name}"
+            # 保存文件并更新相对路径到数据库（相对于static目录）
+            stored = storage.save_upload(uploaded_file, 'session_signature', associated_id=session.record_id)
+            session.signature_image = stored.file_path
         
         # 处理附加图片文件上传（如果上传了新文件，支持多个文件）
         if 'attachImages' in request.FILES:
-            # 删除旧文件（如果存在）
+            # 释放旧文件引用（磁盘文件由 gc_storage 统一回收）
             if session.attach_images and isinstance(session.attach_images, list):
-                for old_image_path in session.attach_images:
-                    if old_image_path:
-                        old_file_path = os.path.join(settings.BASE_DIR, 'static', old_image_path)
-                        if os.path.exists(old_file_path):
-                            try:
-                                os.remove(old_file_path)
-                            except Exception:
-                                pass  # 如果删除失败，继续处理新文件
+                storage.release(session.attach_images, module='session_attach', associated_id=session.record_id)
             
             # 处理新文件上传
             uploaded_files = request.FILES.getlist('attachImages')
             
-            # 确保目录存在
-            attach_dir = os.path.join(settings.BASE_DIR, 'static', 'session_attach')
-            os.makedirs(attach_dir, exist_ok=True)
-            
             attach_images = []
-            for index, uploaded_file in enumerate(uploaded_files):
+            for uploaded_file in uploaded_files:
                 # 检查文件类型（图片格式）
-                allowed_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
                 file_ext = os.path.splitext(uploaded_file.name)[1].lower()
-                if file_ext not in allowed_extensions:
+                if file_ext not in storage.IMAGE_EXTENSIONS:
                     # 如果格式不支持，跳过这个文件
                     continue
                 
-                # 生成唯一文件名
-                timestamp = int(time.time() * 1000)
-                record_id = session.record.id
-                file_name = f"attach_{record_id}_{timestamp}_{index + 1}{file_ext}"
-                
-                # 保存文件
-                file_path = os.path.join(attach_dir, file_name)
-                with open(file_path, 'wb+') as destination:
-                    for chunk in uploaded_file.chunks():
-                        destination.write(chunk)
-                
-                # 保存相对路径（相对于static目录）
-                attach_images.append(f"session_attach/{file_name}")
+                # 保存文件并记录相对路径（相对于static目录）
+                stored = storage.save_upload(uploaded_file, 'session_attach', associated_id=session.record_id)
+                attach_images.append(stored.file_path)
             
             # 更新附加图片路径数组
             if attach_images:
@@ -1422,7 +1764,7 @@ def personal_profile(request):
         }, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        record = ConsultationRecord.objects.get(id=record_id)
+        record = archive.get_record(archive.wants_archived(request.data), id=record_id)
         
         # 构建紧急联系人信息
         emergency_contact = {}
@@ -1456,3 +1798,56 @@ def personal_profile(request):
             'code': 404,
             'message': '档案不存在'
         }, status=status.HTTP_404_NOT_FOUND)
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])  # 禁用DRF默认权限检查
+@require_body_auth  # 业务逻辑中的鉴权
+def crisis_watchlist(request):
+    """
+    POST 分页查询危机关注名单（管理员端）
+    按档案最近一次访谈的危机状态，返回风险等级不低于 min_level（默认 CRISIS_WATCH_LEVEL）的来访者，风险高、访谈近的在前
+    """
+    data = request.data
+    
+    try:
+        page = int(data.get('page', 1))
+        page_size = int(data.get('page_size', 10))
+        min_level = int(data['min_level']) if data.get('min_level') not in (None, '') else None
+    except (ValueError, TypeError):
+        return Response({'code': 400, 'message': '参数错误'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # 关注名单按风险等级有索引，档案和咨询师一次JOIN取出
+    queryset = crisis.watchlist(min_level, data.get('counselor_id')).select_related('record', 'counselor')
+    if data.get('name'):
+        queryset = queryset.filter(record__client_name__icontains=data.get('name'))
+    
+    total = queryset.count()
+    start = (page - 1) * page_size
+    result_data = []
+    for watch in queryset[start:start + page_size]:
+        record = watch.record
+        result_data.append({
+            'id': str(record.id),
+            'record_no': record.record_no,
+            'name': record.client_name,
+            'gender': record.gender,
+            'age': str(record.age) if record.age else '',
+            'school': record.school or '',
+            'grade': record.grade or '',
+            'class_name': record.class_name or '',
+            'counselor_id': str(watch.counselor_id) if watch.counselor_id else '',
+            'counselor_name': watch.counselor.name if watch.counselor else '',
+            'session_id': str(watch.session_id) if watch.session_id else '',
+            'count': watch.session_number,
+            'date': watch.interview_date.strftime('%Y-%m-%d') if watch.interview_date else '',
+            'crisisStatus': watch.flags,
+            'riskLevel': watch.risk_level,
+        })
+    
+    return Response({
+        'code': 0,
+        'message': '获取成功',
+        'total': total,
+        'data': result_data
+    })
@@ -7,8 +7,10 @@ from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework import status
 
-from CounselorAdmin.models import Category, Article, Notification, BannerModule
+from CounselorAdmin.models import Category, Article, Notification, BannerModule, ChunkedUpload
 from CounselorAdmin.utils import require_body_auth
+from CounselorAdmin import lookup_cache, article_content, engagement
+from Consultant import storage, images
 
 
 # ==================== 栏目管理 ====================
@@ -113,15 +115,8 @@ def categories_delete(request):
 @permission_classes([AllowAny])  # 禁用DRF默认权限检查
 @require_body_auth  # 业务逻辑中的鉴权
 def categories_name_list(request):
-    """POST 查询所有栏目的id和名称"""
-    categories = Category.objects.all().order_by('sort_order', 'created_time')
-    result_data = []
-    for category in categories:
-        result_data.append({
-            'id': str(category.id),
-            'category_name': category.category_name,
-        })
-    return Response({'data': result_data})
+    """POST 查询所有栏目的id和名称（带版本缓存和ETag）"""
+    return lookup_cache.response(request, 'categories_name')
 
 
 # ==================== 宣教管理 ====================
@@ -139,17 +134,24 @@ def articles_list(request):
     except (ValueError, TypeError):
         return Response({'message': '分页参数错误'}, status=status.HTTP_400_BAD_REQUEST)
     
-    queryset = Article.objects.all()
+    # 列表只取需要的列（不含正文），栏目名称随资讯一起JOIN查询
+    queryset = Article.objects.select_related('category').only(
+        'id', 'title', 'category__category_name', 'excerpt', 'collect_count', 'like_count', 'read_count',
+        'created_by', 'created_time', 'video', 'video_path',
+    )
     
     if data.get('title'):
         queryset = queryset.filter(title__icontains=data.get('title'))
     
     total = queryset.count()
     start = (page - 1) * page_size
-    items = queryset[start:start + page_size]
+    items = list(queryset[start:start + page_size])
+    # 合并尚未写入数据库的阅读/点赞/收藏计数
+    deltas = engagement.pending([item.id for item in items])
     
     result_data = []
     for item in items:
+        counts = engagement.merged_counts(item, deltas)
         # 构建视频URL（优先使用上传的视频文件，否则使用外部链接）
         video_url = ''
         if item.video_path:
@@ -161,10 +163,10 @@ def articles_list(request):
             'id': str(item.id),
             'title': item.title,
             'category_name': item.category.category_name if item.category else '',
-            'content': item.content or '',
-            'collect_count': item.collect_count,
-            'like_count': item.like_count,
-            'read_count': item.read_count,
+            'excerpt': item.excerpt or '',
+            'collect_count': counts['collect_count'],
+            'like_count': counts['like_count'],
+            'read_count': counts['read_count'],
             'created_by': item.created_by or '',
             'created_time': item.created_time.strftime('%Y-%m-%d %H:%M:%S') if item.created_time else '',
             'video': video_url,
@@ -179,8 +181,6 @@ def articles_list(request):
 def articles_create(request):
     """POST 创建一条新的资讯（支持视频文件上传）"""
     import os
-    import time
-    from django.conf import settings
     from datetime import datetime
     
     data = request.data
@@ -214,6 +214,7 @@ def articles_create(request):
         
         # 处理视频文件上传
         video_path = ''
+        stored_video = None
         if 'video' in request.FILES:
             uploaded_video = request.FILES['video']
             # 检查文件类型（视频格式）
@@ -222,24 +223,15 @@ def articles_create(request):
             if file_ext not in allowed_extensions:
                 return Response({'code': '0', 'message': '不支持的视频格式，请上传mp4、avi、mov、wmv、flv、mkv或webm格式的视频'}, status=status.HTTP_400_BAD_REQUEST)
             
-            # 确保目录存在
-            article_video_dir = os.path.join(settings.BASE_DIR, 'static', 'article_video')
-            os.makedirs(article_video_dir, exist_ok=True)
-            
-            # 生成文件名：时间_创建者_序号.扩展名
-            timestamp = int(time.time() * 1000)
-            author = data.get('author', 'author').replace(' ', '_')
-            # 使用时间戳作为序号确保唯一性
-            file_name = f"{timestamp}_{author}{file_ext}"
-            
-            # 保存文件
-            file_path = os.path.join(article_video_dir, file_name)
-            with open(file_path, 'wb+') as destination:
-                for chunk in uploaded_video.chunks():
-                    destination.write(chunk)
-            
-            # 保存相对路径到数据库（相对于static目录）
-            video_path = f"article_video/{file_name}"
+            # 保存文件（按内容哈希去重存储），保存相对路径到数据库（相对于static目录）
+            stored_video = storage.save_upload(uploaded_video, 'article_video')
+            video_path = stored_video.file_path
+        elif data.get('upload_id'):
+            # 引用已完成的分片上传
+            upload = ChunkedUpload.objects.filter(upload_id=data.get('upload_id'), status='completed').first()
+            if not upload:
+                return Response({'code': '0', 'message': '视频上传未完成或不存在'}, status=status.HTTP_400_BAD_REQUEST)
+            video_path = upload.file_path
         
         # 处理创建时间
         created_time = None
@@ -268,6 +260,12 @@ def articles_create(request):
             obj.created_time = created_time
             obj.save()
         
+        # 回填文件的关联记录ID
+        if stored_video:
+            storage.bind([stored_video], obj.id)
+        elif video_path:
+            storage.bind_path(video_path, 'article_video', obj.id)
+        
         return Response({'code': '1', 'id': str(obj.id), 'message': '创建成功'})
     except Exception as e:
         return Response({'code': '0', 'message': f'创建失败: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
@@ -285,7 +283,8 @@ def articles_detail(request):
         return Response({'code': '0', 'message': '缺少id参数'}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        obj = Article.objects.select_related('category').get(id=article_id)
+        # 渲染结果命中缓存时无需读取 content_html 列
+        obj = Article.objects.select_related('category').defer('content_html').get(id=article_id)
         
         # 构建视频URL（优先使用上传的视频文件，否则使用外部链接）
         video_url = ''
@@ -293,6 +292,7 @@ def articles_detail(request):
             video_url = f"/static/{obj.video_path}"
         elif obj.video:
             video_url = obj.video
+        counts = engagement.merged_counts(obj, engagement.pending([obj.id]))
         
         result = {
             'code': '1',
@@ -301,9 +301,10 @@ def articles_detail(request):
                 'title': obj.title,
                 'category_name': obj.category.category_name if obj.category else '',
                 'content': obj.content or '',
-                'collect_count': obj.collect_count,
-                'like_count': obj.like_count,
-                'read_count': obj.read_count,
+                'content_html': article_content.cached_html(obj),
+                'collect_count': counts['collect_count'],
+                'like_count': counts['like_count'],
+                'read_count': counts['read_count'],
                 'created_by': obj.created_by or '',
                 'created_time': obj.created_time.strftime('%Y-%m-%d %H:%M:%S') if obj.created_time else '',
                 'video': video_url,
@@ -325,8 +326,6 @@ def articles_detail(request):
 def articles_update(request):
     """POST 修改一条宣教资讯信息（支持视频文件更新）"""
     import os
-    import time
-    from django.conf import settings
     
     data = request.data
     article_id = data.get('id')
@@ -335,19 +334,11 @@ def articles_update(request):
         return Response({'code': '0', 'message': '缺少id参数'}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        obj = Article.objects.get(id=article_id)
+        # 不加载计数字段，保存时不会覆盖期间写入的阅读/点赞/收藏计数
+        obj = Article.objects.defer(*engagement.FIELDS).get(id=article_id)
         
         # 处理视频文件更新（如果上传了新视频）
         if 'video' in request.FILES:
-            # 删除旧视频文件（如果存在）
-            if obj.video_path:
-                old_video_path = os.path.join(settings.BASE_DIR, 'static', obj.video_path)
-                if os.path.exists(old_video_path):
-                    try:
-                        os.remove(old_video_path)
-                    except Exception:
-                        pass  # 如果删除失败，继续处理新视频
-            
             # 处理新视频上传
             uploaded_video = request.FILES['video']
             # 检查文件类型
@@ -356,24 +347,24 @@ def articles_update(request):
             if file_ext not in allowed_extensions:
                 return Response({'code': '0', 'message': '不支持的视频格式，请上传mp4、avi、mov、wmv、flv、mkv或webm格式的视频'}, status=status.HTTP_400_BAD_REQUEST)
             
-            # 确保目录存在
-            article_video_dir = os.path.join(settings.BASE_DIR, 'static', 'article_video')
-            os.makedirs(article_video_dir, exist_ok=True)
-            
-            # 生成新文件名
-            timestamp = int(time.time() * 1000)
-            author = data.get('author', obj.created_by or 'author').replace(' ', '_')
-            file_name = f"{timestamp}_{author}{file_ext}"
-            
-            # 保存新文件
-            file_path = os.path.join(article_video_dir, file_name)
-            with open(file_path, 'wb+') as destination:
-                for chunk in uploaded_video.chunks():
-                    destination.write(chunk)
+            # 释放旧视频引用（磁盘文件可能被其他记录共享，由 gc_storage 统一回收）
+            if obj.video_path:
+                storage.release(obj.video_path, module='article_video', associated_id=obj.id)
             
-            # 更新视频路径
-            obj.video_path = f"article_video/{file_name}"
+            # 保存新文件并更新视频路径
+            stored_video = storage.save_upload(uploaded_video, 'article_video', associated_id=obj.id)
+            obj.video_path = stored_video.file_path
+            obj.video = ''  # 清空外部链接，因为使用上传的文件
+        elif data.get('upload_id'):
+            # 引用已完成的分片上传
+            upload = ChunkedUpload.objects.filter(upload_id=data.get('upload_id'), status='completed').first()
+            if not upload:
+                return Response({'code': '0', 'message': '视频上传未完成或不存在'}, status=status.HTTP_400_BAD_REQUEST)
+            if obj.video_path and obj.video_path != upload.file_path:
+                storage.release(obj.video_path, module='article_video', associated_id=obj.id)
+            obj.video_path = upload.file_path
             obj.video = ''  # 清空外部链接，因为使用上传的文件
+            storage.bind_path(upload.file_path, 'article_video', obj.id)
         
         # 更新栏目信息（优先使用 category_id，如果没有则使用 category_name）
         if 'category_id' in data or 'category_name' in data:
@@ -403,6 +394,8 @@ def articles_update(request):
             obj.type = data.get('type')
         if 'video' in data and 'video' not in request.FILES:  # 如果提供的是外部链接而不是文件
             obj.video = data.get('video')
+            if obj.video_path:
+                storage.release(obj.video_path, module='article_video', associated_id=obj.id)
             obj.video_path = ''  # 清空上传的文件路径
         
         obj.save()
@@ -417,10 +410,7 @@ def articles_update(request):
 @permission_classes([AllowAny])  # 禁用DRF默认权限检查
 @require_body_auth  # 业务逻辑中的鉴权
 def articles_delete(request):
-    """POST 删除一条资讯（同时删除对应的视频文件）"""
-    import os
-    from django.conf import settings
-    
+    """POST 删除一条资讯（同时释放对应的视频文件）"""
     data = request.data
     article_id = data.get('id')
     
@@ -432,14 +422,9 @@ def articles_delete(request):
         if not obj:
             return Response({'code': '0', 'message': '记录不存在'}, status=status.HTTP_404_NOT_FOUND)
         
-        # 删除对应的视频文件（如果存在）
+        # 释放对应的视频文件引用（磁盘文件由 gc_storage 统一回收）
         if obj.video_path:
-            video_path = os.path.join(settings.BASE_DIR, 'static', obj.video_path)
-            if os.path.exists(video_path):
-                try:
-                    os.remove(video_path)
-                except Exception:
-                    pass  # 如果删除失败，继续删除数据库记录
+            storage.release(obj.video_path, module='article_video', associated_id=obj.id)
         
         # 删除数据库记录
         obj.delete()
@@ -448,6 +433,34 @@ def articles_delete(request):
         return Response({'code': '0', 'message': f'删除失败: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST'])
+@permission_classes([AllowAny])  # 禁用DRF默认权限检查
+@require_body_auth  # 业务逻辑中的鉴权
+def articles_engage(request):
+    """POST 记录一次资讯的阅读/点赞/取消点赞/收藏/取消收藏（计数延迟批量写入数据库）"""
+    data = request.data
+    article_id = data.get('id')
+    action = data.get('action')
+    
+    if not article_id:
+        return Response({'code': '0', 'message': '缺少id参数'}, status=status.HTTP_400_BAD_REQUEST)
+    if action not in engagement.ACTIONS:
+        return Response({'code': '0', 'message': f'action参数错误，可选值：{", ".join(engagement.ACTIONS)}'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        pk = Article.objects.filter(id=article_id).values_list('id', flat=True).first()
+        if pk is None:
+            return Response({'code': '0', 'message': '记录不存在'}, status=status.HTTP_404_NOT_FOUND)
+        
+        engagement.record(pk, action)
+        # 记录后再读取计数：本次记录达到阈值时增量已刷新到数据库，日志中不再有这些增量
+        article = Article.objects.only(*engagement.FIELDS).get(id=pk)
+        counts = engagement.merged_counts(article, engagement.pending([article.id]))
+        return Response({'code': '1', 'message': '操作成功', 'data': counts})
+    except Exception as e:
+        return Response({'code': '0', 'message': f'操作失败: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+
+
 # ==================== 通知管理 ====================
 
 @api_view(['POST'])
@@ -578,20 +591,19 @@ def banner_list(request):
     result_data = []
     for item in items:
         # 构建图片URL数组（如果存在图片路径）
-        images = []
+        pictures = []
         if item.pictures:
             if isinstance(item.pictures, list):
-                for pic_path in item.pictures:
-                    if pic_path:
-                        images.append(f"/static/{pic_path}")
+                pictures = [pic_path for pic_path in item.pictures if pic_path]
             elif isinstance(item.pictures, str):
-                images.append(f"/static/{item.pictures}")
+                pictures = [item.pictures]
         
         result_data.append({
             'id': str(item.id),
             'module': item.module_name,
             'count': str(item.carousel_count),
-            'images': images,
+            'images': [f"/static/{pic_path}" for pic_path in pictures],
+            'image_variants': [images.variant_urls(pic_path) for pic_path in pictures],
             'creator': item.created_by or '',
             'create_time': item.created_time.strftime('%Y-%m-%d %H:%M:%S') if item.created_time else '',
         })
@@ -605,8 +617,6 @@ def banner_list(request):
 def banner_create(request):
     """POST 新建一条banner（支持图片文件上传）"""
     import os
-    from django.conf import settings
-    from datetime import datetime
     
     data = request.data
     
@@ -620,7 +630,6 @@ def banner_create(request):
         )
         
         banner_id = obj.id
-        date_str = datetime.now().strftime('%Y%m%d')
         
         # 处理图片上传
         image_paths = []
@@ -628,29 +637,16 @@ def banner_create(request):
             # 支持多个图片文件上传
             uploaded_images = request.FILES.getlist('images')
             
-            # 确保目录存在
-            banner_photo_dir = os.path.join(settings.BASE_DIR, 'static', 'banner_photo')
-            os.makedirs(banner_photo_dir, exist_ok=True)
-            
-            for index, uploaded_image in enumerate(uploaded_images):
+            for uploaded_image in uploaded_images:
                 # 检查文件类型（图片格式）
-                allowed_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
                 file_ext = os.path.splitext(uploaded_image.name)[1].lower()
-                if file_ext not in allowed_extensions:
+                if file_ext not in storage.IMAGE_EXTENSIONS:
                     # 如果格式不支持，跳过这个文件
                     continue
                 
-                # 生成文件名：date_banner_id_序号.扩展名
-                file_name = f"{date_str}_{banner_id}_{index + 1}{file_ext}"
-                
-                # 保存文件
-                file_path = os.path.join(banner_photo_dir, file_name)
-                with open(file_path, 'wb+') as destination:
-                    for chunk in uploaded_image.chunks():
-                        destination.write(chunk)
-                
-                # 保存相对路径（相对于static目录）
-                image_paths.append(f"banner_photo/{file_name}")
+                # 保存文件（按内容哈希去重存储），记录相对路径（相对于static目录）
+                stored = storage.save_upload(uploaded_image, 'banner_photo', associated_id=banner_id)
+                image_paths.append(stored.file_path)
         
         # 更新记录，保存图片路径和数量
         obj.pictures = image_paths
@@ -668,8 +664,6 @@ def banner_create(request):
 def banner_update(request):
     """POST 修改一条banner数据（支持图片文件更新）"""
     import os
-    from django.conf import settings
-    from datetime import datetime
     
     data = request.data
     banner_id = data.get('id')
@@ -682,45 +676,24 @@ def banner_update(request):
         
         # 处理图片更新（如果上传了新图片）
         if 'images' in request.FILES:
-            # 删除旧图片文件（如果存在）
+            # 释放旧图片引用（磁盘文件可能被其他记录共享，由 gc_storage 统一回收）
             if obj.pictures:
                 old_images = obj.pictures if isinstance(obj.pictures, list) else [obj.pictures]
-                for pic_path in old_images:
-                    if pic_path:
-                        old_image_path = os.path.join(settings.BASE_DIR, 'static', pic_path)
-                        if os.path.exists(old_image_path):
-                            try:
-                                os.remove(old_image_path)
-                            except Exception:
-                                pass  # 如果删除失败，继续处理新图片
+                storage.release(old_images, module='banner_photo', associated_id=obj.id)
             
             # 处理新图片上传
             uploaded_images = request.FILES.getlist('images')
-            date_str = datetime.now().strftime('%Y%m%d')
-            
-            # 确保目录存在
-            banner_photo_dir = os.path.join(settings.BASE_DIR, 'static', 'banner_photo')
-            os.makedirs(banner_photo_dir, exist_ok=True)
             
             image_paths = []
-            for index, uploaded_image in enumerate(uploaded_images):
+            for uploaded_image in uploaded_images:
                 # 检查文件类型
-                allowed_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
                 file_ext = os.path.splitext(uploaded_image.name)[1].lower()
-                if file_ext not in allowed_extensions:
+                if file_ext not in storage.IMAGE_EXTENSIONS:
                     continue
                 
-                # 生成新文件名：date_banner_id_序号.扩展名
-                file_name = f"{date_str}_{banner_id}_{index + 1}{file_ext}"
-                
-                # 保存新文件
-                file_path = os.path.join(banner_photo_dir, file_name)
-                with open(file_path, 'wb+') as destination:
-                    for chunk in uploaded_image.chunks():
-                        destination.write(chunk)
-                
-                # 保存相对路径
-                image_paths.append(f"banner_photo/{file_name}")
+                # 保存新文件并记录相对路径
+                stored = storage.save_upload(uploaded_image, 'banner_photo', associated_id=obj.id)
+                image_paths.append(stored.file_path)
             
             # 更新图片路径和数量
             obj.pictures = image_paths
@@ -742,10 +715,7 @@ def banner_update(request):
 @permission_classes([AllowAny])  # 禁用DRF默认权限检查
 @require_body_auth  # 业务逻辑中的鉴权
 def banner_delete(request):
-    """POST 删除一条banner数据（同时删除对应的图片文件）"""
-    import os
-    from django.conf import settings
-    
+    """POST 删除一条banner数据（同时释放对应的图片文件）"""
     data = request.data
     banner_id = data.get('id')
     
@@ -757,17 +727,10 @@ def banner_delete(request):
         if not obj:
             return Response({'code': '0', 'message': '记录不存在'}, status=status.HTTP_404_NOT_FOUND)
         
-        # 删除对应的图片文件（如果存在）
+        # 释放对应的图片文件引用（磁盘文件由 gc_storage 统一回收）
         if obj.pictures:
-            images = obj.pictures if isinstance(obj.pictures, list) else [obj.pictures]
-            for pic_path in images:
-                if pic_path:
-                    image_path = os.path.join(settings.BASE_DIR, 'static', pic_path)
-                    if os.path.exists(image_path):
-                        try:
-                            os.remove(image_path)
-                        except Exception:
-                            pass  # 如果删除失败，继续删除其他文件
+            pictures = obj.pictures if isinstance(obj.pictures, list) else [obj.pictures]
+            storage.release(pictures, module='banner_photo', associated_id=obj.id)
         
         # 删除数据库记录
         obj.delete()
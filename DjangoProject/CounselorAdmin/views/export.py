@@ -0,0 +1,96 @@
+"""
+数据导出接口 - 函数式视图
+所有接口使用POST方法，参数和鉴权都在请求体JSON中
+导出接口接收与对应列表接口相同的筛选参数；行数超过 EXPORT_SYNC_MAX_ROWS 或指定 background 时转为后台任务
+"""
+import os
+
+from django.conf import settings
+from django.http import FileResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework import status
+
+from CounselorAdmin import exports
+from CounselorAdmin.models import ExportJob
+from CounselorAdmin.utils import require_body_auth
+from DjangoProject import export
+
+
+def _job_info(job):
+    return {
+        'job_id': job.job_id,
+        'kind': job.kind,
+        'format': job.file_format,
+        'status': job.status,
+        'row_count': str(job.row_count),
+        'error': job.error or '',
+        'created_time': job.created_time.strftime('%Y-%m-%d %H:%M:%S') if job.created_time else '',
+        'finished_time': job.finished_time.strftime('%Y-%m-%d %H:%M:%S') if job.finished_time else '',
+    }
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])  # 禁用DRF默认权限检查
+@require_body_auth  # 业务逻辑中的鉴权
+def export_data(request):
+    """POST 导出数据（kind: interviews/negative_events/referrals/records/sessions，format: csv/xlsx）"""
+    data = request.data
+    kind = data.get('kind')
+    file_format = data.get('format') or 'xlsx'
+
+    if kind not in exports.kinds():
+        return Response({'code': '0', 'message': f'kind参数错误，可选值：{", ".join(exports.kinds())}'}, status=status.HTTP_400_BAD_REQUEST)
+    if file_format not in export.FORMATS:
+        return Response({'code': '0', 'message': 'format参数错误，可选值：csv、xlsx'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        params = exports.filter_params(data)
+        background = data.get('background') in (True, 'true', '1', 1)
+        if not background:
+            background = exports.count(kind, params) > getattr(settings, 'EXPORT_SYNC_MAX_ROWS', 50000)
+
+        if background:
+            job = exports.create_job(kind, file_format, params, created_by=request.admin_user.username)
+            exports.submit(job)
+            return Response({'code': '1', 'message': '导出任务已创建', 'data': _job_info(job)})
+
+        title, headers, rows = exports.build(kind, params)
+        return export.export_response(file_format, title, headers, rows, sheet_title=title)
+    except (ValueError, TypeError) as e:
+        return Response({'code': '0', 'message': f'筛选参数错误: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])  # 禁用DRF默认权限检查
+@require_body_auth  # 业务逻辑中的鉴权
+def export_status(request):
+    """POST 查询导出任务状态"""
+    job = ExportJob.objects.filter(job_id=request.data.get('job_id')).first()
+    if not job:
+        return Response({'code': '0', 'message': '导出任务不存在'}, status=status.HTTP_404_NOT_FOUND)
+    return Response({'code': '1', 'data': _job_info(job)})
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])  # 禁用DRF默认权限检查
+@require_body_auth  # 业务逻辑中的鉴权
+def export_download(request):
+    """POST 下载已完成的导出文件"""
+    job = ExportJob.objects.filter(job_id=request.data.get('job_id')).first()
+    if not job:
+        return Response({'code': '0', 'message': '导出任务不存在'}, status=status.HTTP_404_NOT_FOUND)
+    if job.status != 'completed':
+        return Response({'code': '0', 'message': '导出任务未完成', 'data': _job_info(job)}, status=status.HTTP_409_CONFLICT)
+
+    path = exports.job_path(job)
+    if not os.path.exists(path):
+        return Response({'code': '0', 'message': '导出文件已被清理，请重新导出'}, status=status.HTTP_410_GONE)
+
+    return FileResponse(
+        open(path, 'rb'),
+        as_attachment=True,
+        filename=f'{job.kind}_{job.created_time.strftime("%Y%m%d%H%M%S")}.{job.file_format}',
+        content_type=export.CONTENT_TYPES[job.file_format],
+    )
@@ -9,13 +9,16 @@ from rest_framework.permissions import AllowAny
 from datetime import datetime
 
 from CounselorAdmin.models import InterviewAssessment, NegativeEvent, ReferralUnit, StudentReferral
-from CounselorAdmin.utils import require_body_auth
+from CounselorAdmin.utils import require_body_auth, async_require_body_auth
+from CounselorAdmin import lookup_cache
+from CounselorAdmin.filters import filter_interviews, filter_negative_events, filter_referrals
+from CounselorAdmin.signals import bulk_changed
+from Consultant import storage, images, template_files
+from DjangoProject.async_views import async_api_view, file_response, json_response, run_blocking
 from django.conf import settings
-from django.http import FileResponse, HttpResponse
+from django.http import HttpResponse
 import os
 import mimetypes
-import io
-import zipfile
 
 
 # ==================== 访谈评估 ====================
@@ -33,27 +36,8 @@ def interview_list(request):
     except (ValueError, TypeError):
         return Response({'message': '分页参数错误'}, status=status.HTTP_400_BAD_REQUEST)
     
-    queryset = InterviewAssessment.objects.all()
-    
-    # 过滤条件（从body中获取）
-    if data.get('std_name'):
-        queryset = queryset.filter(student_name__icontains=data.get('std_name'))
-    if data.get('std_grade'):
-        queryset = queryset.filter(grade=data.get('std_grade'))
-    if data.get('std_class'):
-        queryset = queryset.filter(class_name=data.get('std_class'))
-    if data.get('std_school'):
-        queryset = queryset.filter(organization=data.get('std_school'))
-    if data.get('interview_cout'):
-        queryset = queryset.filter(interview_count=int(data.get('interview_cout')))
-    if data.get('interview_status'):
-        queryset = queryset.filter(interview_status=data.get('interview_status'))
-    if data.get('interview_type'):
-        queryset = queryset.filter(interview_type=data.get('interview_type'))
-    if data.get('doctor_evaluation'):
-        queryset = queryset.filter(doctor_assessment=data.get('doctor_evaluation'))
-    if data.get('follow_up_plan'):
-        queryset = queryset.filter(follow_up_plan=data.get('follow_up_plan'))
+    # 过滤条件（从body中获取，与导出接口共用）
+    queryset = filter_interviews(InterviewAssessment.objects.all(), data)
     
     total = queryset.count()
     start = (page - 1) * page_size
@@ -254,6 +238,8 @@ def interview_upload(request):
         # 批量入库
         if to_create:
             InterviewAssessment.objects.bulk_create(to_create, batch_size=500)
+            # bulk_create 不触发 post_save，手动通知查找缓存
+            bulk_changed.send(sender=InterviewAssessment)
             success_count = len(to_create)
         
         # 返回结果
@@ -291,14 +277,10 @@ def interview_files_list(request):
     return Response({'files': result})
 
 
-@api_view(['POST'])
-@permission_classes([AllowAny])
-@require_body_auth
-def interview_files_upload(request):
-    """POST 上传模板文件到templates目录（支持多个文件）"""
-    templates_dir = os.path.join(settings.BASE_DIR, 'templates')
-    os.makedirs(templates_dir, exist_ok=True)
-
+@async_api_view
+@async_require_body_auth
+async def interview_files_upload(request):
+    """POST 上传模板文件到templates目录（支持多个文件；异步视图，文件写入在线程池中执行）"""
     # 支持多个文件上传，可以是'file'或'files'字段
     uploaded_files = []
     if 'files' in request.FILES:
@@ -310,73 +292,45 @@ def interview_files_upload(request):
         uploaded_files.append(request.FILES['file'])
     
     if not uploaded_files:
-        return Response({'message': '请上传文件'}, status=status.HTTP_400_BAD_REQUEST)
+        return json_response({'message': '请上传文件'}, status=status.HTTP_400_BAD_REQUEST)
     
-    saved_files = []
-    for uploaded_file in uploaded_files:
-        filename = os.path.basename(uploaded_file.name)
-        save_path = os.path.join(templates_dir, filename)
-        
-        with open(save_path, 'wb+') as dest:
-            for chunk in uploaded_file.chunks():
-                dest.write(chunk)
-        
-        saved_files.append(filename)
+    saved_files = await run_blocking(template_files.save, uploaded_files)
     
     if len(saved_files) == 1:
-        return Response({'message': '上传成功', 'file': saved_files[0]})
+        return json_response({'message': '上传成功', 'file': saved_files[0]})
     else:
-        return Response({'message': '上传成功', 'files': saved_files, 'count': len(saved_files)})
+        return json_response({'message': '上传成功', 'files': saved_files, 'count': len(saved_files)})
 
 
-@api_view(['POST'])
-@permission_classes([AllowAny])
-@require_body_auth
-def interview_files_download(request):
-    """POST 下载模板文件（单个直接返回，多个打包zip返回）"""
-    templates_dir = os.path.join(settings.BASE_DIR, 'templates')
-    
+@async_api_view
+@async_require_body_auth
+async def interview_files_download(request):
+    """POST 下载模板文件（单个直接返回，多个打包zip返回；异步视图，文件读取和打包在线程池中执行）"""
     filenames = request.data.get('filenames') or request.data.get('files')
     if not filenames:
-        return Response({'message': '请提供要下载的文件名数组'}, status=status.HTTP_400_BAD_REQUEST)
+        return json_response({'message': '请提供要下载的文件名数组'}, status=status.HTTP_400_BAD_REQUEST)
     
     if isinstance(filenames, str):
         # 逗号分隔或单字符串
         filenames = [x.strip() for x in filenames.split(',') if x.strip()]
     if not isinstance(filenames, (list, tuple)):
-        return Response({'message': 'filenames格式错误，应为数组或逗号分隔字符串'}, status=status.HTTP_400_BAD_REQUEST)
+        return json_response({'message': 'filenames格式错误，应为数组或逗号分隔字符串'}, status=status.HTTP_400_BAD_REQUEST)
 
-    # 过滤与规范化
-    safe_names = [os.path.basename(n) for n in filenames]
-    file_paths = []
-    missing = []
-    for name in safe_names:
-        path = os.path.join(templates_dir, name)
-        if os.path.isfile(path):
-            file_paths.append(path)
-        else:
-            missing.append(name)
+    file_paths, missing = await run_blocking(template_files.find, filenames)
     
     if not file_paths:
-        return Response({'message': '文件不存在', 'missing': missing}, status=status.HTTP_404_NOT_FOUND)
+        return json_response({'message': '文件不存在', 'missing': missing}, status=status.HTTP_404_NOT_FOUND)
 
     # 单文件直接返回
     if len(file_paths) == 1:
         file_path = file_paths[0]
         content_type, _ = mimetypes.guess_type(file_path)
         content_type = content_type or 'application/octet-stream'
-        response = FileResponse(open(file_path, 'rb'), as_attachment=True, filename=os.path.basename(file_path))
-        response['Content-Type'] = content_type
-        return response
+        return file_response(request, file_path, os.path.basename(file_path), content_type)
 
     # 多文件zip打包
-    memfile = io.BytesIO()
-    with zipfile.ZipFile(memfile, mode='w', compression=zipfile.ZIP_DEFLATED) as zf:
-        for p in file_paths:
-            zf.write(p, arcname=os.path.basename(p))
-    memfile.seek(0)
     zip_name = 'templates_bundle.zip'
-    resp = HttpResponse(memfile.read(), content_type='application/zip')
+    resp = HttpResponse(await run_blocking(template_files.zip_files, file_paths), content_type='application/zip')
     resp['Content-Disposition'] = f'attachment; filename="{zip_name}"'
     if missing:
         resp['X-Missing-Files'] = ','.join(missing)
@@ -398,22 +352,7 @@ def negative_events_list(request):
     except (ValueError, TypeError):
         return Response({'message': '分页参数错误'}, status=status.HTTP_400_BAD_REQUEST)
     
-    queryset = NegativeEvent.objects.filter(disabled=False)
-    
-    if data.get('std_name'):
-        queryset = queryset.filter(student_name__icontains=data.get('std_name'))
-    if data.get('date_start'):
-        try:
-            date_start = datetime.strptime(data.get('date_start'), '%Y-%m-%d').date()
-            queryset = queryset.filter(event_date__gte=date_start)
-        except:
-            pass
-    if data.get('date_end'):
-        try:
-            date_end = datetime.strptime(data.get('date_end'), '%Y-%m-%d').date()
-            queryset = queryset.filter(event_date__lte=date_end)
-        except:
-            pass
+    queryset = filter_negative_events(NegativeEvent.objects.filter(disabled=False), data)
     
     total = queryset.count()
     start = (page - 1) * page_size
@@ -556,9 +495,8 @@ def referral_organization_delete(request):
 @permission_classes([AllowAny])  # 禁用DRF默认权限检查
 @require_body_auth  # 业务逻辑中的鉴权
 def referral_organization_name_list(request):
-    """POST 查询转介单位名称列表"""
-    names = list(ReferralUnit.objects.values_list('unit_name', flat=True))
-    return Response({'data': names})
+    """POST 查询转介单位名称列表（带版本缓存和ETag）"""
+    return lookup_cache.response(request, 'referral_organization_name')
 
 
 # ==================== 转介管理 ====================
@@ -577,10 +515,7 @@ def referral_management_list(request):
     except (ValueError, TypeError):
         return Response({'message': '分页参数错误'}, status=status.HTTP_400_BAD_REQUEST)
     
-    queryset = StudentReferral.objects.select_related('referral_unit').all()
-    
-    if data.get('std_name'):
-        queryset = queryset.filter(student_name__icontains=data.get('std_name'))
+    queryset = filter_referrals(StudentReferral.objects.select_related('referral_unit').all(), data)
     
     total = queryset.count()
     start = (page - 1) * page_size
@@ -605,6 +540,7 @@ def referral_management_list(request):
             'reason': item.referral_reason or '',
             'time': item.referral_date.strftime('%Y-%m-%d') if item.referral_date else '',
             'image': image_url,
+            'image_variants': images.variant_urls(item.image_path),
         })
     
     return Response({'total': str(total), 'data': result_data})
@@ -616,40 +552,23 @@ def referral_management_list(request):
 def referral_management_create(request):
     """POST 新建一条转介记录（支持图片上传）"""
     import os
-    import time
-    from django.conf import settings
     
     data = request.data
     
     try:
         # 处理图片上传
         image_path = ''
+        stored_image = None
         if 'image' in request.FILES:
             uploaded_image = request.FILES['image']
             # 检查文件类型（图片格式）
-            allowed_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
             file_ext = os.path.splitext(uploaded_image.name)[1].lower()
-            if file_ext not in allowed_extensions:
+            if file_ext not in storage.IMAGE_EXTENSIONS:
                 return Response({'message': '不支持的图片格式，请上传jpg、png、gif、bmp或webp格式的图片'}, status=status.HTTP_400_BAD_REQUEST)
             
-            # 确保目录存在
-            referral_image_dir = os.path.join(settings.BASE_DIR, 'static', 'referral_image')
-            os.makedirs(referral_image_dir, exist_ok=True)
-            
-            # 生成文件名：name_time_序号.扩展名
-            student_name = data.get('name', 'student').replace(' ', '_')
-            timestamp = int(time.time() * 1000)
-            # 使用序号（可以是记录ID，但这里先用时间戳确保唯一性）
-            file_name = f"{student_name}_{timestamp}{file_ext}"
-            
-            # 保存文件
-            file_path = os.path.join(referral_image_dir, file_name)
-            with open(file_path, 'wb+') as destination:
-                for chunk in uploaded_image.chunks():
-                    destination.write(chunk)
-            
-            # 保存相对路径到数据库（相对于static目录）
-            image_path = f"referral_image/{file_name}"
+            # 保存文件（按内容哈希去重存储），保存相对路径到数据库（相对于static目录）
+            stored_image = storage.save_upload(uploaded_image, 'referral_image')
+            image_path = stored_image.file_path
         
         # 查找或创建转介单位
         org_name = data.get('organization', '')
@@ -672,6 +591,11 @@ def referral_management_create(request):
             image_path=image_path,
             created_by=request.admin_user.username if hasattr(request, 'admin_user') else '',
         )
+        
+        # 回填文件的关联记录ID
+        if stored_image:
+            storage.bind([stored_image], obj.id)
+        
         return Response({'code': '1', 'id': str(obj.id), 'message': '创建成功'})
     except Exception as e:
         return Response({'code': '0', 'message': f'创建失败: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
@@ -683,8 +607,6 @@ def referral_management_create(request):
 def referral_management_update(request):
     """POST 更改一条转介记录（支持图片更新）"""
     import os
-    import time
-    from django.conf import settings
     
     data = request.data
     record_id = data.get('id')
@@ -697,40 +619,20 @@ def referral_management_update(request):
         
         # 处理图片更新（如果上传了新图片）
         if 'image' in request.FILES:
-            # 删除旧图片（如果存在）
-            if obj.image_path:
-                old_image_path = os.path.join(settings.BASE_DIR, 'static', obj.image_path)
-                if os.path.exists(old_image_path):
-                    try:
-                        os.remove(old_image_path)
-                    except Exception:
-                        pass  # 如果删除失败，继续处理新图片
-            
             # 处理新图片上传
             uploaded_image = request.FILES['image']
             # 检查文件类型
-            allowed_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
             file_ext = os.path.splitext(uploaded_image.name)[1].lower()
-            if file_ext not in allowed_extensions:
+            if file_ext not in storage.IMAGE_EXTENSIONS:
                 return Response({'message': '不支持的图片格式，请上传jpg、png、gif、bmp或webp格式的图片'}, status=status.HTTP_400_BAD_REQUEST)
             
-            # 确保目录存在
-            referral_image_dir = os.path.join(settings.BASE_DIR, 'static', 'referral_image')
-            os.makedirs(referral_image_dir, exist_ok=True)
-            
-            # 生成新文件名
-            student_name = data.get('name', obj.student_name).replace(' ', '_')
-            timestamp = int(time.time() * 1000)
-            file_name = f"{student_name}_{timestamp}{file_ext}"
-            
-            # 保存新文件
-            file_path = os.path.join(referral_image_dir, file_name)
-            with open(file_path, 'wb+') as destination:
-                for chunk in uploaded_image.chunks():
-                    destination.write(chunk)
+            # 释放旧图片引用（磁盘文件可能被其他记录共享，由 gc_storage 统一回收）
+            if obj.image_path:
+                storage.release(obj.image_path, module='referral_image', associated_id=obj.id)
             
-            # 更新图片路径
-            obj.image_path = f"referral_image/{file_name}"
+            # 保存新文件并更新图片路径
+            stored_image = storage.save_upload(uploaded_image, 'referral_image', associated_id=obj.id)
+            obj.image_path = stored_image.file_path
         
         # 查找或创建转介单位
         org_name = data.get('organization', '')
@@ -769,10 +671,7 @@ def referral_management_update(request):
 @permission_classes([AllowAny])  # 禁用DRF默认权限检查
 @require_body_auth  # 业务逻辑中的鉴权
 def referral_management_delete(request):
-    """POST 删除一条转介记录（同时删除对应的图片文件）"""
-    import os
-    from django.conf import settings
-    
+    """POST 删除一条转介记录（同时释放对应的图片文件）"""
     data = request.data
     record_id = data.get('id')
     
@@ -784,14 +683,9 @@ def referral_management_delete(request):
         if not obj:
             return Response({'code': '0', 'message': '记录不存在'}, status=status.HTTP_404_NOT_FOUND)
         
-        # 删除对应的图片文件（如果存在）
+        # 释放对应的图片文件引用（磁盘文件由 gc_storage 统一回收）
         if obj.image_path:
-            image_path = os.path.join(settings.BASE_DIR, 'static', obj.image_path)
-            if os.path.exists(image_path):
-                try:
-                    os.remove(image_path)
-                except Exception:
-                    pass  # 如果删除失败，继续删除数据库记录
+            storage.release(obj.image_path, module='referral_image', associated_id=obj.id)
         
         # 删除数据库记录
         obj.delete()
@@ -804,19 +698,13 @@ def referral_management_delete(request):
 @permission_classes([AllowAny])  # 禁用DRF默认权限检查
 @require_body_auth  # 业务逻辑中的鉴权
 def interview_grade_list(request):
-    """POST 获取访谈评估表中所有年级名字（不重复）"""
-    # 查询所有非空的年级，去重并排序
-    grades = InterviewAssessment.objects.exclude(grade__isnull=True).exclude(grade='').values_list('grade', flat=True).distinct().order_by('grade')
-    grade_list = list(grades)
-    return Response({'data': grade_list})
+    """POST 获取访谈评估表中所有年级名字（不重复，带版本缓存和ETag）"""
+    return lookup_cache.response(request, 'interview_grade')
 
 
 @api_view(['POST'])
 @permission_classes([AllowAny])  # 禁用DRF默认权限检查
 @require_body_auth  # 业务逻辑中的鉴权
 def interview_class_list(request):
-    """POST 获取访谈评估表中所有班级名字（不重复）"""
-    # 查询所有非空的班级，去重并排序
-    classes = InterviewAssessment.objects.exclude(class_name__isnull=True).exclude(class_name='').values_list('class_name', flat=True).distinct().order_by('class_name')
-    class_list = list(classes)
-    return Response({'data': class_list})
\ No newline at end of file
+    """POST 获取访谈评估表中所有班级名字（不重复，带版本缓存和ETag）"""
+    return lookup_cache.response(request, 'interview_class')
\ No newline at end of file
@@ -0,0 +1,28 @@
+"""
+系统运行状态接口 - 函数式视图
+所有接口使用POST方法，参数和鉴权都在请求体JSON中
+"""
+import os
+
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+
+from CounselorAdmin.utils import require_body_auth
+from DjangoProject import cache as tiered_cache
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])  # 禁用DRF默认权限检查
+@require_body_auth  # 业务逻辑中的鉴权
+def cache_stats(request):
+    """POST 查询当前worker进程各缓存命名空间的命中率"""
+    if request.data.get('reset') in (True, 'true', '1', 1):
+        tiered_cache.reset_stats()
+    return Response({
+        'code': '1',
+        'data': {
+            'pid': os.getpid(),
+            'namespaces': tiered_cache.stats(),
+        }
+    })
@@ -0,0 +1,261 @@
+"""
+分片上传接口 - 函数式视图
+大文件（宣教视频）分片、可续传上传：init -> chunk（按偏移写入） -> complete
+分片直接写入预分配的临时文件对应偏移处，完成后通过重命名移入内容寻址存储，不产生额外拷贝
+complete 先把状态由 uploading 条件更新为 assembling，只有更新成功的请求执行合并，
+同时到达的其他 complete 请求等待合并结束后返回同一结果
+"""
+import hashlib
+import math
+import mimetypes
+import os
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework import status
+
+from CounselorAdmin.models import ChunkedUpload
+from CounselorAdmin.utils import require_body_auth
+from Consultant import storage
+
+
+# 允许分片上传的视频格式
+VIDEO_EXTENSIONS = ['.mp4', '.avi', '.mov', '.wmv', '.flv', '.mkv', '.webm']
+
+# 默认分片大小 2MB（小于 FILE_UPLOAD_MAX_MEMORY_SIZE，分片直接在内存中处理不落临时文件）
+DEFAULT_CHUNK_SIZE = 2 * 1024 * 1024
+
+
+def _part_path(upload_id):
+    """分片组装用的临时文件路径（与内容寻址存储同一文件系统，完成时可直接重命名）"""
+    return os.path.join(storage.blob_dir(), 'tmp', f'{upload_id}.upload')
+
+
+def _assemble_timeout():
+    """assembling 状态超过该秒数视为合并进程已退出，允许重新完成"""
+    return getattr(settings, 'CHUNKED_UPLOAD_ASSEMBLE_TIMEOUT', 600)
+
+
+def _claim(upload):
+    """uploading -> assembling，返回是否由本次请求执行合并"""
+    stale = timezone.now() - timedelta(seconds=_assemble_timeout())
+    return ChunkedUpload.objects.filter(
+        Q(status='uploading') | Q(status='assembling', updated_time__lt=stale), id=upload.id,
+    ).update(status='assembling', updated_time=timezone.now()) == 1
+
+
+def _wait_assembled(upload):
+    """等待其他请求的合并结束，返回最新的上传记录（超时仍为 assembling）"""
+    deadline = time.monotonic() + getattr(settings, 'CHUNKED_UPLOAD_COMPLETE_WAIT', 30)
+    while True:
+        upload.refresh_from_db()
+        if upload.status != 'assembling' or time.monotonic() >= deadline:
+            return upload
+        time.sleep(0.2)
+
+
+def _missing_chunks(upload):
+    received = set(upload.received_chunks or [])
+    return [index for index in range(upload.total_chunks) if index not in received]
+
+
+def _upload_info(upload):
+    return {
+        'upload_id': upload.upload_id,
+        'file_name': upload.file_name,
+        'file_size': str(upload.file_size),
+        'chunk_size': str(upload.chunk_size),
+        'total_chunks': str(upload.total_chunks),
+        'received_chunks': sorted(upload.received_chunks or []),
+        'missing_chunks': _missing_chunks(upload),
+        'status': upload.status,
+        'video': f"/static/{upload.file_path}" if upload.file_path else '',
+    }
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])  # 禁用DRF默认权限检查
+@require_body_auth  # 业务逻辑中的鉴权
+def upload_init(request):
+    """POST 初始化一次分片上传，返回上传ID和分片信息"""
+    data = request.data
+
+    file_name = data.get('file_name', '')
+    file_ext = os.path.splitext(file_name)[1].lower()
+    if file_ext not in VIDEO_EXTENSIONS:
+        return Response({'code': '0', 'message': '不支持的视频格式，请上传mp4、avi、mov、wmv、flv、mkv或webm格式的视频'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        file_size = int(data.get('file_size', 0))
+        chunk_size = int(data.get('chunk_size', DEFAULT_CHUNK_SIZE))
+    except (ValueError, TypeError):
+        return Response({'code': '0', 'message': '文件大小或分片大小参数错误'}, status=status.HTTP_400_BAD_REQUEST)
+
+    max_size = getattr(settings, 'CHUNKED_UPLOAD_MAX_SIZE', 2 * 1024 * 1024 * 1024)
+    if file_size <= 0 or file_size > max_size:
+        return Response({'code': '0', 'message': f'文件大小需在 1 ~ {max_size} 字节之间'}, status=status.HTTP_400_BAD_REQUEST)
+    if chunk_size < 64 * 1024 or chunk_size > 16 * 1024 * 1024:
+        return Response({'code': '0', 'message': '分片大小需在 64KB ~ 16MB 之间'}, status=status.HTTP_400_BAD_REQUEST)
+
+    upload = ChunkedUpload.objects.create(
+        upload_id=uuid.uuid4().hex,
+        file_name=file_name[:255],
+        file_size=file_size,
+        chunk_size=chunk_size,
+        total_chunks=math.ceil(file_size / chunk_size),
+        file_sha256=(data.get('sha256') or '').lower()[:64],
+        created_by=request.admin_user.username if hasattr(request, 'admin_user') else '',
+    )
+
+    # 预分配临时文件，各分片按偏移直接写入
+    part_path = _part_path(upload.upload_id)
+    os.makedirs(os.path.dirname(part_path), exist_ok=True)
+    with open(part_path, 'wb') as f:
+        f.truncate(file_size)
+
+    return Response({'code': '1', 'message': '初始化成功', 'data': _upload_info(upload)})
+
+
+@api_view(['POST', 'PUT'])
+@permission_classes([AllowAny])  # 禁用DRF默认权限检查
+@require_body_auth  # 业务逻辑中的鉴权
+def upload_chunk(request):
+    """
+    POST/PUT 上传一个分片（multipart：upload_id、offset、checksum、chunk文件）
+    checksum 为该分片的SHA-256（必填），校验失败的分片不会写入
+    """
+    data = request.data
+    upload_id = data.get('upload_id')
+    chunk_file = request.FILES.get('chunk')
+
+    checksum = (data.get('checksum') or '').lower()
+
+    if not upload_id or chunk_file is None:
+        return Response({'code': '0', 'message': '缺少upload_id或chunk参数'}, status=status.HTTP_400_BAD_REQUEST)
+    if not checksum:
+        return Response({'code': '0', 'message': '缺少checksum参数'}, status=status.HTTP_400_BAD_REQUEST)
+
+    upload = ChunkedUpload.objects.filter(upload_id=upload_id).first()
+    if not upload:
+        return Response({'code': '0', 'message': '上传任务不存在'}, status=status.HTTP_404_NOT_FOUND)
+    if upload.status == 'completed':
+        return Response({'code': '1', 'message': '上传已完成', 'data': _upload_info(upload)})
+    if upload.status == 'assembling':
+        return Response({'code': '0', 'message': '文件正在合并，不能再上传分片', 'data': _upload_info(upload)}, status=status.HTTP_409_CONFLICT)
+
+    try:
+        offset = int(data.get('offset', -1))
+    except (ValueError, TypeError):
+        offset = -1
+    if offset < 0 or offset >= upload.file_size or offset % upload.chunk_size != 0:
+        return Response({'code': '0', 'message': '分片偏移量错误'}, status=status.HTTP_400_BAD_REQUEST)
+
+    chunk_index = offset // upload.chunk_size
+    expected_size = min(upload.chunk_size, upload.file_size - offset)
+    if chunk_file.size != expected_size:
+        return Response({'code': '0', 'message': f'分片大小错误，应为 {expected_size} 字节'}, status=status.HTTP_400_BAD_REQUEST)
+
+    # 校验分片哈希
+    hasher = hashlib.sha256()
+    for block in chunk_file.chunks():
+        hasher.update(block)
+    if checksum != hasher.hexdigest():
+        return Response({'code': '0', 'message': '分片校验失败，请重新上传该分片'}, status=status.HTTP_400_BAD_REQUEST)
+
+    part_path = _part_path(upload.upload_id)
+    if not os.path.exists(part_path):
+        return Response({'code': '0', 'message': '上传任务已过期，请重新初始化'}, status=status.HTTP_410_GONE)
+
+    # 写入对应偏移处（不同分片互不重叠，可并发上传）
+    with open(part_path, 'r+b') as f:
+        f.seek(offset)
+        for block in chunk_file.chunks():
+            f.write(block)
+
+    with transaction.atomic():
+        upload = ChunkedUpload.objects.select_for_update().get(id=upload.id)
+        received = set(upload.received_chunks or [])
+        received.add(chunk_index)
+        upload.received_chunks = sorted(received)
+        upload.save(update_fields=['received_chunks', 'updated_time'])
+
+    return Response({'code': '1', 'message': '分片上传成功', 'data': _upload_info(upload)})
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])  # 禁用DRF默认权限检查
+@require_body_auth  # 业务逻辑中的鉴权
+def upload_status(request):
+    """POST 查询上传进度（断点续传时获取缺失的分片）"""
+    upload_id = request.data.get('upload_id')
+    upload = ChunkedUpload.objects.filter(upload_id=upload_id).first() if upload_id else None
+    if not upload:
+        return Response({'code': '0', 'message': '上传任务不存在'}, status=status.HTTP_404_NOT_FOUND)
+    return Response({'code': '1', 'data': _upload_info(upload)})
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])  # 禁用DRF默认权限检查
+@require_body_auth  # 业务逻辑中的鉴权
+def upload_complete(request):
+    """POST 完成上传：检查分片齐全，校验整体哈希后移入存储"""
+    upload_id = request.data.get('upload_id')
+    upload = ChunkedUpload.objects.filter(upload_id=upload_id).first() if upload_id else None
+    if not upload:
+        return Response({'code': '0', 'message': '上传任务不存在'}, status=status.HTTP_404_NOT_FOUND)
+    if upload.status == 'completed':
+        return Response({'code': '1', 'message': '上传已完成', 'data': _upload_info(upload)})
+
+    missing = _missing_chunks(upload)
+    if missing:
+        return Response({
+            'code': '0',
+            'message': f'还有 {len(missing)} 个分片未上传',
+            'data': _upload_info(upload)
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    part_path = _part_path(upload.upload_id)
+    if upload.status == 'uploading' and not os.path.exists(part_path):
+        return Response({'code': '0', 'message': '上传任务已过期，请重新初始化'}, status=status.HTTP_410_GONE)
+
+    if not _claim(upload):
+        # 其他请求正在合并：等待其结束后返回同一结果
+        upload = _wait_assembled(upload)
+        if upload.status == 'completed':
+            return Response({'code': '1', 'message': '上传完成', 'data': _upload_info(upload)})
+        if upload.status == 'assembling':
+            return Response({'code': '0', 'message': '文件正在合并，请稍后查询上传进度', 'data': _upload_info(upload)}, status=status.HTTP_409_CONFLICT)
+        return Response({'code': '0', 'message': '文件校验失败，请重新上传', 'data': _upload_info(upload)}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        # 计算整体哈希并重命名到内容寻址目录（不复制数据）
+        file_type = mimetypes.guess_type(upload.file_name)[0] or 'application/octet-stream'
+        stored = storage.save_local_file(part_path, upload.file_name, 'article_video', file_type=file_type)
+    except OSError:
+        # 分片文件已被清理或读取失败：恢复上传状态，由客户端重新完成或重新初始化
+        upload.status = 'uploading'
+        upload.save(update_fields=['status', 'updated_time'])
+        return Response({'code': '0', 'message': '上传任务已过期，请重新初始化'}, status=status.HTTP_410_GONE)
+
+    if upload.file_sha256 and upload.file_sha256 != stored.content_hash:
+        # 整体校验失败：丢弃本次结果（文件由 gc_storage 回收），重置进度以便重新上传
+        stored.delete()
+        with open(part_path, 'wb') as f:
+            f.truncate(upload.file_size)
+        upload.status = 'uploading'
+        upload.received_chunks = []
+        upload.save(update_fields=['status', 'received_chunks', 'updated_time'])
+        return Response({'code': '0', 'message': '文件校验失败，请重新上传'}, status=status.HTTP_400_BAD_REQUEST)
+
+    upload.status = 'completed'
+    upload.file_path = stored.file_path
+    upload.save(update_fields=['status', 'file_path', 'updated_time'])
+    return Response({'code': '1', 'message': '上传完成', 'data': _upload_info(upload)})
@@ -0,0 +1,146 @@
+"""
+异步视图工具（ASGI 部署模式）
+发送邮件、读写上传文件、打包zip等接口的耗时主要在等待 I/O，异步视图在等待期间不占用 worker 线程：
+- 数据库访问优先使用Django的异步ORM（acreate、afirst、aaggregate等）
+- 没有异步版本的阻塞调用（SMTP、文件读写、zip打包）通过 run_blocking 放到有界线程池中执行，
+  不同类型的阻塞操作使用各自的线程池（ASYNC_THREAD_POOLS），SMTP服务器变慢不会占满文件读写的线程
+异步视图不经过DRF，请求体由 parse_body 解析到 request.data，响应使用与DRF相同的JSON渲染器
+WSGI 部署下异步视图同样可用（Django自动在事件循环中执行），返回结果与同步视图一致
+"""
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+
+from DjangoProject.renderers import FastJSONRenderer
+
+
+# 线程池名称 -> 最大线程数（未配置的名称使用 default 的大小）
+DEFAULT_THREAD_POOLS = {
+    'default': 8,
+    'smtp': 4,
+}
+
+# 异步读取文件时每块的大小
+FILE_CHUNK_SIZE = 256 * 1024
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+_renderer = FastJSONRenderer()
+
+
+def pool_size(name):
+    pools = {**DEFAULT_THREAD_POOLS, **getattr(settings, 'ASYNC_THREAD_POOLS', {})}
+    return pools.get(name, pools['default'])
+
+
+def _get_executor(name):
+    """延迟创建指定名称的有界线程池"""
+    executor = _executors.get(name)
+    if executor is None:
+        with _executors_lock:
+            executor = _executors.get(name)
+            if executor is None:
+                executor = ThreadPoolExecutor(max_workers=pool_size(name), thread_name_prefix=f'async-{name}')
+                _executors[name] = executor
+    return executor
+
+
+async def run_blocking(func, *args, pool='default', **kwargs):
+    """
+    在有界线程池中执行阻塞调用（不访问数据库的代码），返回其结果
+    线程池满时后续调用排队等待，不会无限创建线程
+    """
+    return await sync_to_async(func, thread_sensitive=False, executor=_get_executor(pool))(*args, **kwargs)
+
+
+def _parse_body(request):
+    """解析JSON或表单请求体到 request.data（multipart 会在此处写入上传临时文件，需在线程池中执行）"""
+    content_type = (request.content_type or '').lower()
+    if content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except (ValueError, UnicodeDecodeError) as e:
+            print(f"请求体解析失败: {e}")
+            data = {}
+        request.data = data if isinstance(data, dict) else {}
+    else:
+        request.data = request.POST
+        request.FILES  # 触发 multipart 解析，上传文件在此写入临时文件
+
+
+async def parse_body(request):
+    """解析请求体到 request.data，已解析时直接返回"""
+    if not hasattr(request, 'data'):
+        await run_blocking(_parse_body, request)
+    return request.data
+
+
+def json_response(data, status=200):
+    """返回JSON响应，输出与DRF接口一致（orjson渲染、不转义中文）"""
+    return HttpResponse(_renderer.render(data), status=status, content_type='application/json')
+
+
+def async_api_view(view_func):
+    """
+    异步函数视图装饰器：只接受POST（其他方法返回405），免除CSRF检查（与 @api_view 一致）
+    用法：
+
+        @async_api_view
+        @async_require_body_auth
+        async def upload_template(request):
+            ...
+    """
+    if not iscoroutinefunction(view_func):
+        raise TypeError(f'{view_func.__name__} 不是异步函数')
+
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'POST':
+            return json_response({'detail': f'方法 "{request.method}" 不被允许。'}, status=405)
+        return await view_func(request, *args, **kwargs)
+
+    wrapper.csrf_exempt = True
+    return wrapper
+
+
+async def _iter_file(path, chunk_size):
+    """逐块异步读取文件（每次读取在线程池中执行）"""
+    f = await run_blocking(open, path, 'rb')
+    try:
+        while True:
+            chunk = await run_blocking(f.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        await run_blocking(f.close)
+
+
+def file_response(request, path, filename, content_type=None):
+    """
+    下载文件响应
+    ASGI 下使用异步迭代器逐块读取（同步的 FileResponse 在ASGI下会被一次性读入内存）；WSGI 下使用 FileResponse
+    """
+    if not isinstance(request, ASGIRequest):
+        response = FileResponse(open(path, 'rb'), as_attachment=True, filename=filename)
+        if content_type:
+            response['Content-Type'] = content_type
+        return response
+
+    response = StreamingHttpResponse(
+        _iter_file(path, FILE_CHUNK_SIZE),
+        content_type=content_type or 'application/octet-stream'
+    )
+    response['Content-Length'] = str(os.path.getsize(path))
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    return response
+
@@ -0,0 +1,266 @@
+"""
+请求头Token认证
+客户端在请求头中携带 X-User-Id 和 X-Auth-Token，认证在解析请求体之前完成，
+未认证的上传请求不必接收整个 multipart 请求体即可拒绝
+请求头中的凭证无效时标记上传被拒绝，上传处理器不再接收请求体中的文件
+兼容旧客户端：请求头中没有凭证时从请求体读取（userID/user_id/userId/id 和 token），
+此时上传的文件先暂存在有大小上限的临时文件中，认证通过并检查配额后才由视图写入存储
+各端的认证类注册在 REST_FRAMEWORK 的 DEFAULT_AUTHENTICATION_CLASSES 中，按 url_prefix 只认证本端的请求
+"""
+import copy
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.authentication import BaseAuthentication
+
+from DjangoProject import invalidation
+
+# 请求头中的凭证字段（对应 META 中的 HTTP_X_USER_ID / HTTP_X_AUTH_TOKEN）
+USER_ID_HEADER = 'HTTP_X_USER_ID'
+TOKEN_HEADER = 'HTTP_X_AUTH_TOKEN'
+
+# 请求体中用户ID的候选字段名
+BODY_USER_ID_FIELDS = ('userID', 'user_id', 'userId', 'id')
+
+
+def _django_request(request):
+    """DRF Request 对象取出底层的 HttpRequest（上传处理器只能访问后者）"""
+    return getattr(request, '_request', request)
+
+
+def header_credentials(request):
+    """从请求头读取 (user_id, token)，不触发请求体解析"""
+    meta = _django_request(request).META
+    user_id = (meta.get(USER_ID_HEADER) or '').strip()
+    token = (meta.get(TOKEN_HEADER) or '').strip()
+    return user_id or None, token or None
+
+
+def body_credentials(request, user_id_fields=BODY_USER_ID_FIELDS):
+    """
+    从请求体读取 (user_id, token)，解析结果缓存在请求对象上
+
+    只通过 request.data 解析一次（DRF会缓存解析结果），解析失败时同样缓存空结果，
+    不再回退到 json.loads(request.body) 或 request.POST 重复解析
+    """
+    cache_key = '_body_credentials'
+    cached = getattr(request, cache_key, None)
+    if cached is not None:
+        return cached
+
+    user_id = token = None
+    try:
+        data = request.data
+    except Exception as e:
+        print(f"请求体解析失败: {e}")
+        data = None
+    if hasattr(data, 'get'):
+        for field in user_id_fields:
+            user_id = data.get(field)
+            if user_id:
+                break
+        token = data.get('token')
+
+    cached = (user_id or None, token or None)
+    setattr(request, cache_key, cached)
+    return cached
+
+
+def mark_upload_authenticated(request, quota=None):
+    """
+    标记请求已通过认证，上传处理器据此放行文件写入（请求头认证时在解析请求体之前调用）
+    quota 为本次请求允许上传的剩余字节数（None表示只受 UPLOAD_MAX_REQUEST_SIZE 限制）
+    """
+    django_request = _django_request(request)
+    django_request.upload_authenticated = True
+    django_request.upload_quota = quota
+
+
+def mark_upload_rejected(request, reason):
+    """标记上传被拒绝（在解析请求体之前调用），上传处理器收到第一个文件时即停止接收"""
+    _django_request(request).upload_rejected = reason
+
+
+def is_upload(request):
+    return (_django_request(request).content_type or '').startswith('multipart/')
+
+
+def upload_rejection(request, parse=True):
+    """
+    返回拒绝本次上传的原因，未拒绝时返回None：
+    'credentials'（请求头凭证无效）、'unauthenticated'（请求体凭证的上传超过暂存上限）、'quota'（超过配额）
+    非 multipart 请求直接返回None；parse 为True时 multipart 请求会在此处触发请求体解析，
+    未认证的请求应传入False，只读取已记录的原因，不接收请求体
+    认证前暂存的文件（凭证在请求体中）在此处按认证后的剩余配额检查
+    """
+    django_request = _django_request(request)
+    if not is_upload(request):
+        return None
+    if parse:
+        try:
+            request.data
+        except Exception:
+            pass
+    rejected = getattr(django_request, 'upload_rejected', None)
+    if rejected:
+        return rejected
+    quota = getattr(django_request, 'upload_quota', None)
+    if quota is not None and getattr(django_request, 'upload_spooled_size', 0) > max(quota, 0):
+        return 'quota'
+    return None
+
+
+class TokenCache:
+    """
+    已验证Token的进程内缓存，避免每个请求都查询Token表
+    缓存项记录写入时失效总线的代数，Token或用户变化（publish）后所有进程中的缓存项立即失效
+    """
+
+    def __init__(self, namespace, max_entries=10000):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self._entries = {}  # (user_id, token) -> (generation, cached_at, token_obj)
+        self._lock = threading.Lock()
+        invalidation.subscribe(namespace, self.clear)
+
+    def generation(self):
+        return invalidation.generation(self.namespace)
+
+    def get(self, key):
+        """返回缓存的Token对象副本（各请求可独立修改），未命中返回None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        generation, cached_at, token_obj = entry
+        timeout = getattr(settings, 'TOKEN_CACHE_TIMEOUT', 300)
+        if generation != self.generation() or time.monotonic() - cached_at > timeout:
+            self._entries.pop(key, None)
+            return None
+        return self._clone(token_obj)
+
+    def set(self, key, token_obj, generation):
+        """generation 为查询数据库之前读取的代数，查询期间发生的变更会使该缓存项直接失效"""
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            self._entries[key] = (generation, time.monotonic(), self._clone(token_obj))
+
+    def fetch(self, key, queryset):
+        """
+        读取缓存的Token对象，未命中时执行 queryset.first() 查询并写入缓存
+        查询前读取代数，查询期间发生的变更会使写入的缓存项直接失效
+        """
+        token_obj = self.get(key)
+        if token_obj is None:
+            generation = self.generation()
+            token_obj = queryset.first()
+            if token_obj:
+                self.set(key, token_obj, generation)
+        return token_obj
+
+    async def afetch(self, key, queryset):
+        """fetch 的异步版本（异步视图中使用，数据库查询使用异步ORM）"""
+        token_obj = self.get(key)
+        if token_obj is None:
+            generation = self.generation()
+            token_obj = await queryset.afirst()
+            if token_obj:
+                self.set(key, token_obj, generation)
+        return token_obj
+
+    @staticmethod
+    def _clone(token_obj):
+        """复制Token对象及已加载的关联对象（用户），缓存中的对象不会被请求修改"""
+        clone = copy.copy(token_obj)
+        clone._state.fields_cache = {name: copy.copy(obj) for name, obj in token_obj._state.fields_cache.items()}
+        return clone
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class HeaderTokenAuthentication(BaseAuthentication):
+    """
+    请求头Token认证基类，子类实现 verify(user_id, token) -> (is_valid, token_obj) 和 get_user(token_obj)
+    请求头没有凭证时回退到请求体凭证；认证失败返回None，由鉴权装饰器按各端格式返回401，
+    请求头凭证无效的上传请求在解析请求体之前标记为拒绝
+    认证成功的上传请求按 upload_quota(user) 标记允许上传的字节数（请求头认证时在解析请求体之前标记）
+    异步视图使用 aauthenticate，子类需同时实现 averify 和 aupload_quota
+    """
+    user_id_fields = BODY_USER_ID_FIELDS
+    # 只认证路径以此开头的请求（两端的认证类同时注册在 DRF 中，避免查询另一端的Token表）
+    url_prefix = '/'
+
+    def verify(self, user_id, token):
+        raise NotImplementedError
+
+    async def averify(self, user_id, token):
+        raise NotImplementedError
+
+    def get_user(self, token_obj):
+        raise NotImplementedError
+
+    def upload_quota(self, user):
+        """本次上传允许的字节数，None表示只受 UPLOAD_MAX_REQUEST_SIZE 限制"""
+        return None
+
+    async def aupload_quota(self, user):
+        return None
+
+    def applies_to(self, request):
+        return _django_request(request).path.startswith(self.url_prefix)
+
+    def authenticate(self, request):
+        if not self.applies_to(request):
+            return None
+        user_id, token = header_credentials(request)
+        from_header = bool(user_id and token)
+        if not from_header:
+            user_id, token = body_credentials(request, self.user_id_fields)
+        if not user_id or not token:
+            return None
+
+        is_valid, token_obj = self.verify(user_id, token)
+        if not is_valid:
+            if from_header and is_upload(request):
+                mark_upload_rejected(request, 'credentials')
+            return None
+
+        user = self.get_user(token_obj)
+        if is_upload(request):
+            mark_upload_authenticated(request, self.upload_quota(user))
+        request.verified_user_id = int(user_id)
+        request.auth_from_header = from_header
+        return user, token_obj
+
+    async def aauthenticate(self, request):
+        """
+        authenticate 的异步版本，request 为 Django 的 HttpRequest（异步视图不经过DRF）
+        请求体凭证从 request.data 读取，调用前需先用 async_views.parse_body 解析请求体
+        """
+        if not self.applies_to(request):
+            return None
+        user_id, token = header_credentials(request)
+        from_header = bool(user_id and token)
+        if not from_header:
+            user_id, token = body_credentials(request, self.user_id_fields)
+        if not user_id or not token:
+            return None
+
+        is_valid, token_obj = await self.averify(user_id, token)
+        if not is_valid:
+            if from_header and is_upload(request):
+                mark_upload_rejected(request, 'credentials')
+            return None
+
+        user = self.get_user(token_obj)
+        if is_upload(request):
+            mark_upload_authenticated(request, await self.aupload_quota(user))
+        request.verified_user_id = int(user_id)
+        request.auth_from_header = from_header
+        return user, token_obj
+
+    def authenticate_header(self, request):
+        return 'X-Auth-Token'
@@ -0,0 +1,369 @@
+"""
+分级缓存
+- TieredCache：Django缓存后端，L1为进程内LRU（短TTL），L2为共享缓存（默认文件缓存，多个worker共享，无需额外服务）
+- get_or_compute：读穿透缓存，同一个键并发未命中时只计算一次（进程内合并请求 + 跨进程锁），
+  并按 XFetch 算法在过期前概率性提前刷新，避免缓存同时过期引起的请求雪崩
+- cached_view：视图缓存装饰器，按命名空间统计命中率，命名空间可整体失效
+"""
+import hashlib
+import math
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from functools import wraps
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from rest_framework.response import Response
+
+from DjangoProject import invalidation
+
+
+_MISSING = object()
+
+# 进程内L1存储，按缓存别名共享（Django为每个线程创建独立的后端实例）
+_l1_stores = {}
+_l1_stores_lock = threading.Lock()
+
+
+class _LRUStore:
+    """带TTL的LRU字典，线程安全"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.data = OrderedDict()  # key -> (expire_at, value)
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                return _MISSING
+            expire_at, value = item
+            if expire_at < time.monotonic():
+                del self.data[key]
+                return _MISSING
+            self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.data[key] = (time.monotonic() + ttl, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.max_entries:
+                self.data.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            return self.data.pop(key, None) is not None
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+class TieredCache(BaseCache):
+    """
+    两级缓存后端
+
+    配置示例：
+        "default": {
+            "BACKEND": "DjangoProject.cache.TieredCache",
+            "LOCATION": "shared",  # L2 使用的缓存别名
+            "OPTIONS": {"L1_MAX_ENTRIES": 2000, "L1_TIMEOUT": 5},
+        }
+
+    L1 中的对象不做拷贝，调用方不应修改取到的值；L1_TIMEOUT 决定其他worker写入后本进程最多读到旧值的时间
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._l2_alias = location or options.get('L2', 'shared')
+        self._l1_timeout = float(options.get('L1_TIMEOUT', 5))
+        max_entries = int(options.get('L1_MAX_ENTRIES', 1000))
+        with _l1_stores_lock:
+            self._l1 = _l1_stores.setdefault(self._l2_alias, _LRUStore(max_entries))
+
+    @property
+    def l2(self):
+        return caches[self._l2_alias]
+
+    def _l1_ttl(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return self._l1_timeout
+        return min(self._l1_timeout, timeout)
+
+    def get(self, key, default=None, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        value = self._l1.get(l1_key)
+        if value is not _MISSING:
+            return value
+        value = self.l2.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            return default
+        self._l1.set(l1_key, value, self._l1_timeout)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        self.l2.set(key, value, timeout=timeout, version=version)
+        ttl = self._l1_ttl(timeout)
+        if ttl > 0:
+            self._l1.set(l1_key, value, ttl)
+        else:
+            self._l1.delete(l1_key)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        # 以L2为准，保证跨进程的互斥语义（用于分布式锁）
+        added = self.l2.add(key, value, timeout=timeout, version=version)
+        if added:
+            ttl = self._l1_ttl(timeout)
+            if ttl > 0:
+                self._l1.set(self.make_and_validate_key(key, version=version), value, ttl)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._l1.delete(self.make_and_validate_key(key, version=version))
+        return self.l2.touch(key, timeout=timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._l1.delete(self.make_and_validate_key(key, version=version))
+        return self.l2.delete(key, version=version)
+
+    def has_key(self, key, version=None):
+        if self._l1.get(self.make_and_validate_key(key, version=version)) is not _MISSING:
+            return True
+        return self.l2.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self._l1.delete(self.make_and_validate_key(key, version=version))
+        return self.l2.incr(key, delta, version=version)
+
+    def clear(self):
+        self._l1.clear()
+        self.l2.clear()
+
+    def clear_local(self):
+        """只清空本进程的L1"""
+        self._l1.clear()
+
+
+# ==================== 命中率统计 ====================
+
+_stats = defaultdict(lambda: {'hits': 0, 'misses': 0, 'early_refreshes': 0, 'coalesced': 0})
+_stats_lock = threading.Lock()
+
+
+def _record(namespace, field):
+    with _stats_lock:
+        _stats[namespace][field] += 1
+
+
+def stats():
+    """
+    本进程各命名空间的缓存统计
+    返回 {namespace: {'hits', 'misses', 'early_refreshes', 'coalesced', 'hit_ratio'}}
+    """
+    with _stats_lock:
+        result = {}
+        for namespace, counters in _stats.items():
+            total = counters['hits'] + counters['misses'] + counters['early_refreshes']
+            result[namespace] = dict(counters, hit_ratio=round(counters['hits'] / total, 4) if total else 0.0)
+        return result
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+# ==================== 读穿透 / 合并请求 / 提前刷新 ====================
+
+class _Flight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+# 跨进程锁等待时的轮询间隔（秒）
+LOCK_POLL_INTERVAL = 0.05
+
+
+def _should_refresh_early(delta, expire_at, beta, now):
+    """
+    XFetch：now - delta * beta * ln(rand) >= expire_at 时提前刷新
+    计算越慢（delta大）、越接近过期，提前刷新的概率越高
+    """
+    if expire_at is None:
+        return False
+    return now - delta * beta * math.log(random.random() or 1e-12) >= expire_at
+
+
+def _compute_and_store(cache, key, compute, timeout, namespace, stale, lock_timeout):
+    """
+    跨进程合并：抢到锁的进程计算，其余进程有旧值时直接返回旧值，没有旧值时等待结果
+    """
+    lock_key = f'{key}:lock'
+    owns_lock = cache.add(lock_key, os.getpid(), lock_timeout)
+    if not owns_lock:
+        if stale is not _MISSING:
+            _record(namespace, 'coalesced')
+            return stale
+        deadline = time.monotonic() + lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            envelope = cache.get(key)
+            if envelope is not None:
+                _record(namespace, 'coalesced')
+                return envelope[0]
+            if not cache.has_key(lock_key):
+                # 持锁进程计算失败或结果不可缓存
+                break
+        # 持锁进程未得到结果或超时（可能已崩溃），自行计算
+
+    try:
+        start = time.monotonic()
+        value = compute()
+        delta = time.monotonic() - start
+        expire_at = time.time() + timeout if timeout else None
+        cache.set(key, (value, delta, expire_at), timeout)
+    finally:
+        if owns_lock:
+            cache.delete(lock_key)
+    return value
+
+
+def get_or_compute(key, compute, timeout=60, namespace='default', beta=1.0, lock_timeout=30, alias='default'):
+    """
+    读穿透缓存
+
+    参数:
+        key: 缓存键
+        compute: 无参函数，未命中时调用
+        timeout: 过期时间（秒），None表示不过期
+        namespace: 统计命中率的命名空间
+        beta: 提前刷新系数，越大越早刷新，0表示关闭
+        lock_timeout: 跨进程计算锁的超时时间（秒）
+
+    同一进程内多个线程同时未命中同一个键时，只有一个线程调用 compute，其余线程等待其结果
+    """
+    cache = caches[alias]
+    envelope = cache.get(key)
+    stale = _MISSING
+    if envelope is not None:
+        value, delta, expire_at = envelope
+        if beta <= 0 or not _should_refresh_early(delta, expire_at, beta, time.time()):
+            _record(namespace, 'hits')
+            return value
+        _record(namespace, 'early_refreshes')
+        stale = value
+    else:
+        _record(namespace, 'misses')
+
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+
+    if not leader:
+        # 提前刷新时其他线程直接使用旧值，不必等待
+        if stale is not _MISSING:
+            return stale
+        _record(namespace, 'coalesced')
+        flight.event.wait(lock_timeout)
+        if flight.event.is_set() and flight.error is None:
+            return flight.value
+        # 计算线程出错或超时，自行计算（错误由本线程的计算抛出）
+        return compute()
+
+    try:
+        flight.value = _compute_and_store(cache, key, compute, timeout, namespace, stale, lock_timeout)
+        return flight.value
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        flight.event.set()
+        with _flights_lock:
+            _flights.pop(key, None)
+
+
+# ==================== 命名空间 ====================
+
+def _bus_namespace(namespace):
+    return f'cache:{namespace}'
+
+
+def namespace_generation(namespace):
+    """命名空间的当前代数（保存在跨进程失效总线中，读取不访问缓存）"""
+    return invalidation.generation(_bus_namespace(namespace))
+
+
+def invalidate_namespace(namespace):
+    """使命名空间下的所有缓存失效（递增代数，旧键自然过期）"""
+    invalidation.publish(_bus_namespace(namespace))
+
+
+def make_key(namespace, *parts):
+    """生成带命名空间代数的缓存键，参数部分做哈希避免过长或含非法字符"""
+    digest = hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+    return f'{namespace}:{namespace_generation(namespace)}:{digest}'
+
+
+def _vary_value(request, name):
+    if name == 'counselor':
+        counselor = getattr(request, 'counselor', None)
+        return counselor.id if counselor is not None else None
+    if name == 'admin':
+        admin_user = getattr(request, 'admin_user', None)
+        return admin_user.id if admin_user is not None else None
+    data = request.data
+    return data.get(name) if hasattr(data, 'get') else None
+
+
+def cached_view(namespace, timeout=60, vary_on=(), beta=1.0):
+    """
+    视图缓存装饰器（放在 require_body_auth 之后，鉴权通过后才读缓存）
+
+    参数:
+        namespace: 命名空间，可通过 invalidate_namespace 整体失效
+        timeout: 过期时间（秒）
+        vary_on: 区分缓存的维度，'counselor'/'admin' 表示当前用户，其余为请求体字段名
+
+    只缓存状态码为200的响应数据，不满足时直接返回视图结果
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            parts = (view_func.__name__,) + tuple(_vary_value(request, name) for name in vary_on)
+            key = make_key(namespace, *parts)
+            uncacheable = []
+
+            def compute():
+                response = view_func(request, *args, **kwargs)
+                if not isinstance(response, Response) or response.status_code != 200:
+                    uncacheable.append(response)
+                    raise _Uncacheable()
+                return response.data
+
+            try:
+                data = get_or_compute(key, compute, timeout=timeout, namespace=namespace, beta=beta)
+            except _Uncacheable:
+                return uncacheable[0]
+            return Response(data)
+        return wrapper
+    return decorator
+
+
+class _Uncacheable(Exception):
+    """视图返回了不可缓存的响应（如参数错误），不写入缓存"""
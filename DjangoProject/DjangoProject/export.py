@@ -0,0 +1,176 @@
+"""
+表格导出
+按列定义从查询集中只取需要的字段（values_list），分批迭代（iterator），逐行写出 CSV 或 xlsx，
+内存占用与导出行数无关：
+- CSV 以流式响应逐块返回
+- xlsx 使用 openpyxl 的 write_only 模式逐行写入临时文件，完成后以文件响应返回
+以 = + - @ 等字符开头的文本单元格前加单引号，Excel 打开时不会当作公式执行（公式注入）
+"""
+import csv
+import os
+import tempfile
+from datetime import date, datetime
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
+
+
+FORMATS = ('csv', 'xlsx')
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# 每批从数据库读取的行数
+DEFAULT_CHUNK_SIZE = 2000
+
+
+class Column:
+    """
+    导出列定义
+
+    参数:
+        header: 表头
+        field: values_list 使用的字段路径（可跨关联，如 'referral_unit__unit_name'）
+        formatter: 可选，对字段值做转换（如状态码转中文）
+    """
+
+    def __init__(self, header, field, formatter=None):
+        self.header = header
+        self.field = field
+        self.formatter = formatter
+
+
+# 表格软件会当作公式解析的开头字符
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+
+
+def iter_rows(queryset, columns):
+    """按列定义逐行产出导出数据（每行为元组）"""
+    formatters = [column.formatter for column in columns]
+    rows = queryset.values_list(*[column.field for column in columns]).iterator(chunk_size=chunk_size())
+    if not any(formatters):
+        yield from rows
+        return
+    for row in rows:
+        yield tuple(formatter(value) if formatter else value for formatter, value in zip(formatters, row))
+
+
+def _escape_formula(value):
+    """以公式字符开头的文本前加单引号，按纯文本显示"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _cell_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.strftime('%Y-%m-%d')
+    return _escape_formula(value)
+
+
+def _excel_value(value):
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        # xlsx 不支持带时区的时间
+        return value.replace(tzinfo=None)
+    if isinstance(value, (list, dict)):
+        value = str(value)
+    return _escape_formula(value)
+
+
+class _Echo:
+    """csv.writer 的写入目标，直接返回写入的字符串"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(headers, rows, batch_rows=500):
+    """
+    逐块产出CSV内容（UTF-8 带 BOM，Excel 直接打开不乱码）
+    每 batch_rows 行合并为一块，减少响应分块数量
+    """
+    writer = csv.writer(_Echo())
+    yield '\ufeff' + writer.writerow(headers)
+    buffer = []
+    for row in rows:
+        buffer.append(writer.writerow([_cell_text(value) for value in row]))
+        if len(buffer) >= batch_rows:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def write_csv(headers, rows, path):
+    """将CSV写入文件，返回写入的数据行数"""
+    count = 0
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        for row in rows:
+            writer.writerow([_cell_text(value) for value in row])
+            count += 1
+    return count
+
+
+def write_xlsx(headers, rows, path, sheet_title='Sheet1'):
+    """以 write_only 模式写入xlsx文件，返回写入的数据行数"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=sheet_title[:31])
+    sheet.append(headers)
+    count = 0
+    for row in rows:
+        sheet.append([_excel_value(value) for value in row])
+        count += 1
+    workbook.save(path)
+    return count
+
+
+def write_file(fmt, headers, rows, path, sheet_title='Sheet1'):
+    """按格式写入文件，返回写入的数据行数"""
+    if fmt == 'xlsx':
+        return write_xlsx(headers, rows, path, sheet_title)
+    return write_csv(headers, rows, path)
+
+
+def _attachment(response, filename):
+    response['Content-Disposition'] = f"attachment; filename*=UTF-8''{quote(filename)}"
+    return response
+
+
+def export_response(fmt, filename, headers, rows, sheet_title='Sheet1'):
+    """
+    返回导出文件的下载响应
+
+    参数:
+        fmt: 'csv' 或 'xlsx'
+        filename: 下载文件名（不含扩展名）
+        headers: 表头列表
+        rows: 行迭代器（通常为 iter_rows 的返回值）
+    """
+    if fmt == 'csv':
+        response = StreamingHttpResponse(iter_csv(headers, rows), content_type=CONTENT_TYPES['csv'])
+        return _attachment(response, f'{filename}.csv')
+
+    # xlsx 为zip格式，需写完后才能发送；写入匿名临时文件，响应结束关闭文件时自动删除
+    tmp = tempfile.TemporaryFile(suffix='.xlsx')
+    write_xlsx(headers, rows, tmp, sheet_title)
+    tmp.seek(0, os.SEEK_END)
+    size = tmp.tell()
+    tmp.seek(0)
+    response = FileResponse(tmp, content_type=CONTENT_TYPES['xlsx'])
+    response['Content-Length'] = str(size)
+    return _attachment(response, f'{filename}.xlsx')
@@ -0,0 +1,136 @@
+"""
+跨进程缓存失效总线
+多个worker进程通过 mmap 共享同一个代数文件（固定数量的64位计数器槽位），
+写操作后 publish(命名空间) 递增对应槽位；各进程读取代数只是一次内存访问，不需要访问共享缓存
+命名空间按 CRC32 映射到槽位，不同命名空间落到同一槽位时只会多失效一次，不影响正确性
+
+仅适用于同一台机器上的多个进程；多台服务器部署时需改用共享缓存（Redis等）保存代数
+"""
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows 本地开发为单进程，只使用线程锁
+    fcntl = None
+
+
+SLOT_COUNT = 1024
+SLOT_SIZE = 8
+_SLOT = struct.Struct('<Q')
+
+_lock = threading.Lock()
+_mm = None
+_fd = None
+_pid = None
+
+# 命名空间 -> 回调列表，poll() 发现代数变化时调用
+_subscribers = {}
+_snapshot = None
+
+
+def _bus_path():
+    return getattr(settings, 'INVALIDATION_FILE', None) or os.path.join(settings.BASE_DIR, '.cache', 'invalidation.bin')
+
+
+def _open():
+    """延迟打开代数文件（fork 之后的子进程重新映射）"""
+    global _mm, _fd, _pid
+    if _mm is not None and _pid == os.getpid():
+        return _mm
+    with _lock:
+        if _mm is not None and _pid == os.getpid():
+            return _mm
+        path = _bus_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        size = SLOT_COUNT * SLOT_SIZE
+        if os.fstat(fd).st_size < size:
+            os.ftruncate(fd, size)
+        _mm = mmap.mmap(fd, size)
+        _fd = fd
+        _pid = os.getpid()
+    return _mm
+
+
+def _slot_offset(namespace):
+    return (zlib.crc32(namespace.encode('utf-8')) % SLOT_COUNT) * SLOT_SIZE
+
+
+def generation(namespace):
+    """读取命名空间的当前代数（未发布过时为0）"""
+    return _SLOT.unpack_from(_open(), _slot_offset(namespace))[0]
+
+
+def publish(namespace):
+    """通知所有进程该命名空间的数据已变化，返回新的代数"""
+    mm = _open()
+    offset = _slot_offset(namespace)
+    with _lock:
+        if fcntl is not None:
+            fcntl.lockf(_fd, fcntl.LOCK_EX, SLOT_SIZE, offset)
+        try:
+            value = _SLOT.unpack_from(mm, offset)[0] + 1
+            _SLOT.pack_into(mm, offset, value)
+        finally:
+            if fcntl is not None:
+                fcntl.lockf(_fd, fcntl.LOCK_UN, SLOT_SIZE, offset)
+    return value
+
+
+def subscribe(namespace, callback):
+    """注册回调：本进程在 poll() 时发现该命名空间代数变化后调用 callback()"""
+    _subscribers.setdefault(namespace, []).append(callback)
+
+
+def poll():
+    """
+    对比代数快照，调用代数发生变化的命名空间的回调
+    由 InvalidationMiddleware 在每个请求开始时调用，开销为一次内存拷贝
+    """
+    global _snapshot
+    if not _subscribers:
+        return
+    current = bytes(_open())
+    previous = _snapshot
+    _snapshot = current
+    if previous is None or previous == current:
+        return
+    for namespace, callbacks in list(_subscribers.items()):
+        offset = _slot_offset(namespace)
+        if current[offset:offset + SLOT_SIZE] != previous[offset:offset + SLOT_SIZE]:
+            for callback in callbacks:
+                try:
+                    callback()
+                except Exception as e:
+                    print(f"缓存失效回调执行失败 {namespace}: {e}")
+
+
+class InvalidationMiddleware:
+    """
+    每个请求开始时检查失效总线，清理本进程中已过期的内存缓存
+    同时支持同步和异步（ASGI）请求处理链，异步模式下不需要切换线程
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        poll()
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        poll()
+        return await self.get_response(request)
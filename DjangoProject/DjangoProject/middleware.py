@@ -0,0 +1,114 @@
+"""
+项目级中间件
+"""
+import gzip
+import re
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖，未安装时只使用 gzip
+    brotli = None
+
+
+_ACCEPT_ENCODING_RE = re.compile(r'\s*([a-zA-Z*]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*')
+
+# 可压缩的响应类型
+COMPRESSIBLE_TYPES = (
+    'application/json',
+    'text/',
+    'application/javascript',
+    'application/xml',
+)
+
+
+def _accepted_encodings(header):
+    """解析 Accept-Encoding，返回 {编码: q值}"""
+    encodings = {}
+    for part in header.split(','):
+        match = _ACCEPT_ENCODING_RE.fullmatch(part)
+        if not match:
+            continue
+        name, q = match.groups()
+        try:
+            encodings[name.lower()] = float(q) if q is not None else 1.0
+        except ValueError:
+            continue
+    return encodings
+
+
+def _choose_encoding(header):
+    """按客户端声明和服务端支持情况选择压缩算法，优先 brotli"""
+    encodings = _accepted_encodings(header)
+    wildcard = encodings.get('*', 0)
+    candidates = []
+    if brotli is not None:
+        candidates.append('br')
+    candidates.append('gzip')
+    best, best_q = None, 0
+    for name in candidates:
+        q = encodings.get(name, wildcard)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+class CompressionMiddleware:
+    """
+    响应压缩中间件
+    超过 COMPRESSION_MIN_SIZE 字节的 JSON/文本响应按 Accept-Encoding 协商使用 brotli 或 gzip 压缩
+    同时支持同步和异步（ASGI）请求处理链
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+        self.gzip_level = getattr(settings, 'COMPRESSION_GZIP_LEVEL', 6)
+        self.brotli_quality = getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 5)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        return self.process_response(request, response)
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if response.status_code != 200 or len(response.content) < self.min_size:
+            return response
+        content_type = response.get('Content-Type', '')
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = _choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if encoding == 'br':
+            compressed = brotli.compress(response.content, quality=self.brotli_quality)
+        else:
+            compressed = gzip.compress(response.content, compresslevel=self.gzip_level, mtime=0)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # 压缩后内容变化，强ETag改为弱ETag
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
@@ -9,7 +9,11 @@ https://docs.djangoproject.com/en/5.2/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
+import atexit
 import os
+import shutil
+import sys
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -47,6 +51,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "DjangoProject.invalidation.InvalidationMiddleware",  # 检查跨进程缓存失效总线
+    "DjangoProject.middleware.CompressionMiddleware",  # 响应压缩（gzip/brotli），需要放在修改响应内容的中间件之前
     "corsheaders.middleware.CorsMiddleware",  # CORS中间件，需要放在CommonMiddleware之前
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -76,6 +82,9 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "DjangoProject.wsgi.application"
 
+# ASGI 部署（uvicorn/daphne 等）入口，邮件验证码、模板上传下载等I/O密集接口为异步视图
+ASGI_APPLICATION = "DjangoProject.asgi.application"
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -88,6 +97,85 @@ DATABASES = {
 }
 
 
+# 运行时数据目录（共享文件缓存、失效总线、资讯计数日志、导出文件），各项也可用环境变量单独指定；
+# 运行测试（manage.py test）时使用临时目录，测试结束后删除，不读写开发环境的数据
+if len(sys.argv) > 1 and sys.argv[1] == "test":
+    RUNTIME_DIR = tempfile.mkdtemp(prefix="sunnycounselor-test-")
+    atexit.register(shutil.rmtree, RUNTIME_DIR, ignore_errors=True)
+else:
+    RUNTIME_DIR = os.path.join(BASE_DIR, ".cache")
+
+# 缓存：default 为两级缓存（L1进程内LRU + L2共享文件缓存），多个worker共享L2，无需额外服务
+CACHES = {
+    "default": {
+        "BACKEND": "DjangoProject.cache.TieredCache",
+        "LOCATION": "shared",  # L2 使用的缓存别名
+        "TIMEOUT": 300,
+        "OPTIONS": {
+            "L1_MAX_ENTRIES": 2000,
+            "L1_TIMEOUT": 5,  # L1最长保留时间（秒），即其他worker更新后本进程最多读到旧值的时间
+        },
+    },
+    "shared": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ.get("CACHE_DIR") or RUNTIME_DIR,
+        "TIMEOUT": 300,
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+}
+
+# 跨进程缓存失效总线（mmap代数文件，同一台机器上的所有worker共享）
+INVALIDATION_FILE = os.environ.get("INVALIDATION_FILE") or os.path.join(RUNTIME_DIR, "invalidation.bin")
+
+# 已验证Token在进程内的最长缓存时间（秒）
+TOKEN_CACHE_TIMEOUT = 300
+
+# 资讯阅读/点赞/收藏计数日志，积累到一定条数或时间后批量写入数据库
+ENGAGEMENT_LOG = os.environ.get("ENGAGEMENT_LOG") or os.path.join(RUNTIME_DIR, "engagement.log")
+ENGAGEMENT_FLUSH_THRESHOLD = 1000
+ENGAGEMENT_FLUSH_INTERVAL = 30
+
+# 数据导出：超过 EXPORT_SYNC_MAX_ROWS 行时转为后台任务，文件保存在 EXPORT_DIR（不在static下，只能通过下载接口获取）
+EXPORT_DIR = os.environ.get("EXPORT_DIR") or os.path.join(RUNTIME_DIR, "exports")
+EXPORT_SYNC_MAX_ROWS = 50000
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_WORKERS = 1
+
+# 冷热数据归档：已结束且创建时间早于 ARCHIVE_AFTER_DAYS 天的档案、订单移入归档表（manage.py archive），每批 ARCHIVE_BATCH_SIZE 行一个事务
+ARCHIVE_AFTER_DAYS = 365
+ARCHIVE_BATCH_SIZE = 500
+
+# 咨询师评分汇总中"近期平均分"统计的天数
+RATING_RECENT_DAYS = 90
+
+# 访谈危机标记的风险等级（未列出的非空标记按 CRISIS_UNKNOWN_LEVEL 计），档案最近一次访谈的风险等级不低于 CRISIS_WATCH_LEVEL 时列入高风险名单
+CRISIS_LEVELS = {
+    "无": 0,
+    "低风险": 1,
+    "中风险": 2,
+    "高风险": 3,
+}
+CRISIS_UNKNOWN_LEVEL = 1
+CRISIS_WATCH_LEVEL = 2
+
+# 周期排班规则：长期有效的规则在可预约时段位图中只展开到今天起 SCHEDULE_RULE_HORIZON_DAYS 天（每天执行 rebuild_availability 向后滚动），
+# 每个进程缓存 SCHEDULE_RULE_CACHE_SIZE 个日期范围的展开结果
+SCHEDULE_RULE_HORIZON_DAYS = 180
+SCHEDULE_RULE_CACHE_SIZE = 256
+
+# 预约自动分配：只有开始时间或只有"上午""下午"等时段的预约按 ASSIGNMENT_DEFAULT_MINUTES 分钟占用咨询师的时间
+ASSIGNMENT_DEFAULT_MINUTES = 60
+
+# 分配任务处于 running 状态超过该秒数视为执行进程已退出，不再阻止新任务
+ASSIGNMENT_JOB_TIMEOUT = 3600
+
+# 异步视图中阻塞调用（SMTP、文件读写）使用的线程池大小，按用途分开，互不占用
+ASYNC_THREAD_POOLS = {
+    "default": 8,
+    "smtp": 4,
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -134,6 +222,40 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, "static"),
 ]
 
+# 上传文件存储根目录（与static目录一致，数据库中保存相对该目录的路径）
+UPLOAD_ROOT = os.path.join(BASE_DIR, "static")
+
+# 内容寻址存储目录（相对UPLOAD_ROOT），文件按SHA-256分片存放
+BLOB_STORAGE_DIR = "blobs"
+
+# 图片衍生图规格（名称 -> 最长边像素），统一输出WebP格式
+IMAGE_VARIANTS = {
+    "thumb": 320,
+    "webp": 1280,
+}
+
+# 生成衍生图的后台线程数
+IMAGE_WORKERS = 2
+
+# 生成衍生图时原图的最大像素数（宽×高），超过时不生成
+IMAGE_MAX_PIXELS = 50_000_000
+
+# 上传文件访问：非内容寻址文件的缓存时间（秒）
+MEDIA_CACHE_MAX_AGE = 3600
+
+# 交给前端服务器发送文件：None（由Django发送）、"x-accel-redirect"（nginx）或 "x-sendfile"（Apache）
+MEDIA_SENDFILE = os.environ.get("MEDIA_SENDFILE") or None
+
+# X-Accel-Redirect 模式下 nginx 中配置为 internal 的 location 前缀
+MEDIA_ACCEL_PREFIX = "/protected-static/"
+
+# 分片上传单个文件大小上限（2GB）
+CHUNKED_UPLOAD_MAX_SIZE = 2 * 1024 * 1024 * 1024
+
+# 分片上传完成时，并发的 complete 请求等待合并结束的最长秒数；合并超过 CHUNKED_UPLOAD_ASSEMBLE_TIMEOUT 秒视为合并进程已退出
+CHUNKED_UPLOAD_COMPLETE_WAIT = 30
+CHUNKED_UPLOAD_ASSEMBLE_TIMEOUT = 600
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -145,8 +267,7 @@ REST_FRAMEWORK = {
     "PAGE_SIZE": 50,
     "DATETIME_FORMAT": "%Y-%m-%d %H:%M:%S",
     "DEFAULT_RENDERER_CLASSES": [
-        "rest_framework.renderers.JSONRenderer",
-        "rest_framework.renderers.BrowsableAPIRenderer",
+        "DjangoProject.renderers.FastJSONRenderer",  # orjson渲染，未安装时回退标准库
     ],
     "DEFAULT_PARSER_CLASSES": [  # 解析request.data
         "rest_framework.parsers.JSONParser",
@@ -157,12 +278,43 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.IsAuthenticated",
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
+        # 请求头 X-User-Id / X-Auth-Token（兼容请求体凭证），各自只认证本端路径下的请求
+        "Consultant.utils.ConsultantTokenAuthentication",
+        "CounselorAdmin.utils.AdminTokenAuthentication",
         "rest_framework.authentication.BasicAuthentication",
         "rest_framework.authentication.SessionAuthentication",
         "rest_framework.authentication.TokenAuthentication",
     ]
 }
 
+# 上传处理器：GuardedUploadHandler 在写入临时文件前检查认证和大小限制
+FILE_UPLOAD_HANDLERS = [
+    "DjangoProject.upload_handlers.GuardedUploadHandler",
+    "django.core.files.uploadhandler.MemoryFileUploadHandler",
+    "django.core.files.uploadhandler.TemporaryFileUploadHandler",
+]
+
+# 通过请求头认证的单次上传上限
+UPLOAD_MAX_REQUEST_SIZE = 100 * 1024 * 1024
+
+# 未通过请求头认证（凭证在请求体中）的上传上限，文件在认证前暂存，认证失败时随请求丢弃
+# 不超过 FILE_UPLOAD_MAX_MEMORY_SIZE（默认2.5MB）时暂存的文件只在内存中，更大的文件需在请求头中携带凭证
+UNAUTHENTICATED_UPLOAD_MAX_SIZE = 2621440
+
+# 每个咨询师的上传存储配额（字节），None表示不限制
+COUNSELOR_UPLOAD_QUOTA = 1024 * 1024 * 1024
+
+# 可浏览API只在调试环境开启（生产环境渲染HTML页面开销大且会暴露接口信息）
+if DEBUG:
+    REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"].append("rest_framework.renderers.BrowsableAPIRenderer")
+
+# 响应压缩：超过该字节数的JSON/文本响应才压缩
+COMPRESSION_MIN_SIZE = 1024
+
+# gzip压缩级别（1-9）和 brotli 压缩质量（0-11，需安装 brotli 包）
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+
 # CORS配置 - 允许所有来源、方法和头部（测试环境）
 CORS_ALLOW_ALL_ORIGINS = True  # 允许所有来源
 CORS_ALLOW_CREDENTIALS = True  # 允许携带凭证
@@ -184,4 +336,6 @@ CORS_ALLOW_HEADERS = [  # 允许的请求头
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'x-user-id',  # 请求头认证
+    'x-auth-token',
 ]
@@ -0,0 +1,98 @@
+"""
+上传处理器
+在 multipart 请求体写入临时文件之前做准入检查：
+- 请求头凭证无效的请求（认证类已标记 request.upload_rejected）：收到第一个文件时即停止接收
+- 已通过请求头认证的请求：超过单次上传上限或剩余存储配额时直接停止接收
+- 未通过请求头认证的请求（凭证在请求体中的旧客户端）：文件写入有大小上限的匿名临时文件
+  （较小的文件只在内存中），认证通过并检查配额后才由视图写入存储；认证失败时请求结束即删除
+"""
+import tempfile
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers, StopUpload
+
+
+class GuardedUploadHandler(FileUploadHandler):
+    """
+    需放在 FILE_UPLOAD_HANDLERS 第一位
+    拒绝原因写入 request.upload_rejected，由鉴权装饰器转换为 401/413 响应；
+    认证前暂存的文件总字节数写入 request.upload_spooled_size，认证通过后再按配额检查
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.authenticated = False
+        self.limit = None
+        self.content_length = None
+        self.received = 0
+        self.spool = None
+        self.rejected = None
+
+    def _reject(self, reason):
+        if self.request is not None:
+            self.request.upload_rejected = reason
+        raise StopUpload(connection_reset=True)
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        request = self.request
+        self.rejected = getattr(request, 'upload_rejected', None)
+        self.authenticated = bool(getattr(request, 'upload_authenticated', False))
+        max_size = getattr(settings, 'UPLOAD_MAX_REQUEST_SIZE', 100 * 1024 * 1024)
+        if self.authenticated:
+            self.limit = max_size
+            quota = getattr(request, 'upload_quota', None)
+            if quota is not None:
+                self.limit = min(self.limit, max(quota, 0))
+        else:
+            self.limit = getattr(settings, 'UNAUTHENTICATED_UPLOAD_MAX_SIZE', max_size)
+        # 超限的请求在 new_file 中拒绝（此处抛出 StopUpload 会被当作服务器错误）
+        self.content_length = content_length
+        return None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        if self.rejected:
+            # 认证类已拒绝（请求头凭证无效），保留原因，不接收文件内容
+            raise StopUpload(connection_reset=True)
+        if self.content_length and self.content_length > self.limit:
+            self._reject('quota' if self.authenticated else 'unauthenticated')
+        if not self.authenticated:
+            # 超过 FILE_UPLOAD_MAX_MEMORY_SIZE 才写入磁盘，文件无路径名，关闭即删除
+            self.spool = tempfile.SpooledTemporaryFile(
+                max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE, dir=settings.FILE_UPLOAD_TEMP_DIR
+            )
+            # 后续处理器不再创建文件对象（TemporaryFileUploadHandler 会创建有路径名的临时文件）
+            raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        # Content-Length 缺失或与实际不符时按实际接收的字节数再检查一次
+        self.received += len(raw_data)
+        if self.received > self.limit:
+            self._reject('quota' if self.authenticated else 'unauthenticated')
+        if self.spool is not None:
+            self.spool.write(raw_data)
+            return None
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.spool is None:
+            return None
+        self.spool.seek(0)
+        uploaded_file = UploadedFile(
+            file=self.spool,
+            name=self.file_name,
+            content_type=self.content_type,
+            size=file_size,
+            charset=self.charset,
+            content_type_extra=self.content_type_extra,
+        )
+        self.spool = None
+        if self.request is not None:
+            self.request.upload_spooled_size = getattr(self.request, 'upload_spooled_size', 0) + file_size
+        return uploaded_file
+
+    def upload_interrupted(self):
+        if self.spool is not None:
+            self.spool.close()
+            self.spool = None
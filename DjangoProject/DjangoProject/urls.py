@@ -16,9 +16,9 @@ Including another URLconf
 """
 
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
-from django.conf.urls.static import static
+from Consultant.views.media import image_variant, serve_upload
 # from rest_framework.authtoken import views
 
 urlpatterns = [
@@ -26,8 +26,12 @@ urlpatterns = [
     path("admin/", admin.site.urls),
     path('counselor_admin/', include('CounselorAdmin.urls')),
     path('consultant/', include('Consultant.urls')),
+    # 图片衍生图按需生成（缩略图/WebP）
+    path('media/variant/<str:variant>/<path:path>', image_variant),
 ]
 
-# 配置静态文件URL（开发环境和生产环境都适用）
-if settings.DEBUG:
-    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATICFILES_DIRS[0] if settings.STATICFILES_DIRS else settings.STATIC_ROOT)
+# 上传文件访问（开发环境和生产环境都适用，支持Range和条件请求）
+# 注意：DEBUG 下 runserver 的静态文件处理会优先拦截 /static/，需要 Range 时使用 runserver --nostatic
+urlpatterns += [
+    re_path(r'^%s(?P<path>.+)$' % settings.STATIC_URL.lstrip('/'), serve_upload),
+]